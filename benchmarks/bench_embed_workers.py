@@ -0,0 +1,69 @@
+"""Bulk embedding throughput with 1..N worker processes.
+
+Compares in-process ``SearchService.embed_batch`` with ``ProcessEmbedder``
+at each worker count on the same synthetic corpus. On a CPU-only host
+throughput should grow close to linearly until the cores run out.
+
+Usage:
+    python benchmarks/bench_embed_workers.py --model-dir bge-m3-onnx \
+        --texts 512 --workers 4
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from embed_workers import ProcessEmbedder, onnx_worker_factory
+
+
+def corpus(n: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    words = ["memory", "search", "vector", "index", "channel", "token",
+             "model", "batch"]
+    return [
+        " ".join(rng.choice(words) for _ in range(rng.randint(8, 120)))
+        for _ in range(n)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model-dir", default="bge-m3-onnx")
+    parser.add_argument("--texts", type=int, default=512)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+
+    texts = corpus(args.texts)
+    cores = os.cpu_count() or 1
+
+    embed_batch = onnx_worker_factory(args.model_dir)
+    started = time.perf_counter()
+    for start in range(0, len(texts), args.batch_size):
+        embed_batch(texts[start:start + args.batch_size])
+    baseline = len(texts) / (time.perf_counter() - started)
+    print(f"{'in-process':<12} {baseline:>10.1f} texts/s")
+
+    for workers in range(1, args.workers + 1):
+        embedder = ProcessEmbedder(
+            onnx_worker_factory,
+            (args.model_dir, None, max(1, cores // workers)),
+            workers=workers, max_rows=args.batch_size
+        )
+        try:
+            embedder.wait_ready()
+            started = time.perf_counter()
+            embedder.embed_batch(texts)
+            rate = len(texts) / (time.perf_counter() - started)
+        finally:
+            embedder.close()
+        print(f"{workers:>2} worker(s) {rate:>10.1f} texts/s  "
+              f"x{rate / baseline:.2f}")
+
+
+if __name__ == "__main__":
+    main()
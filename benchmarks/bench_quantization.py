@@ -0,0 +1,83 @@
+"""Recall@k, footprint and latency of each NumpyBackend quantization mode.
+
+Synthetic clustered unit vectors stand in for real embeddings (purely
+random high-dimensional vectors are nearly orthogonal, which makes every
+mode look worse than it is). Ground truth is exact float32 search.
+
+Usage:
+    python benchmarks/bench_quantization.py --rows 50000 --queries 200 --k 10
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from quantization import MODES, MODE_FLOAT32  # noqa: E402
+from vector_backends import NumpyBackend  # noqa: E402
+
+
+def make_vectors(rows: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+    """Return unit vectors drawn around random cluster centres."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centres[rng.integers(0, clusters, rows)] \
+        + 0.6 * rng.standard_normal((rows, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--rescore-factors", default="0,4,10,32")
+    args = parser.parse_args()
+
+    data = make_vectors(args.rows, args.dim, args.clusters, seed=0)
+    queries = make_vectors(args.queries, args.dim, args.clusters, seed=1)
+    truth = np.argsort(-(queries @ data.T), axis=1)[:, :args.k]
+    rows = [{"id": str(i), "vector": vector} for i, vector in enumerate(data)]
+
+    print(f"{args.rows} rows x {args.dim} dims, {args.queries} queries, "
+          f"recall@{args.k}")
+    print(f"{'mode':<8} {'rescore':>7} {'bytes/vec':>9} {'resident MB':>11} "
+          f"{'disk MB':>8} {'recall':>7} {'ms/query':>9}")
+
+    factors = [int(f) for f in args.rescore_factors.split(",")]
+    for mode in MODES:
+        for factor in ([0] if mode == MODE_FLOAT32 else factors):
+            with tempfile.TemporaryDirectory() as directory:
+                backend = NumpyBackend(
+                    directory, dim=args.dim, mmap=False,
+                    quantization=mode, rescore_factor=factor
+                )
+                backend.add(rows)
+
+                hits_found = 0
+                started = time.perf_counter()
+                for query, expected in zip(queries, truth):
+                    hits = backend.search(query, args.k)
+                    found = {int(hit["id"]) for hit in hits}
+                    hits_found += len(found.intersection(expected.tolist()))
+                elapsed = time.perf_counter() - started
+
+                stats = backend.stats()
+                print(
+                    f"{mode:<8} {factor:>7} {stats['bytes_per_vector']:>9} "
+                    f"{stats['resident_bytes'] / 2**20:>11.1f} "
+                    f"{stats['disk_bytes'] / 2**20:>8.1f} "
+                    f"{hits_found / (args.queries * args.k):>7.3f} "
+                    f"{1000 * elapsed / args.queries:>9.2f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
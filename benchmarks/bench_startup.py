@@ -0,0 +1,100 @@
+"""Cold versus warm start of the embedding model with the startup cache.
+
+Each start runs in a fresh Python process, so runtime imports are paid
+every time as they are in the server. Starts measured:
+
+* ``uncached``: no cache (tokenizer parsed, full graph optimization);
+* ``cold``: empty cache, the optimized graph and tokenizer are written;
+* ``warm``: the cache from the cold start is reused (``--warm`` times).
+
+Usage:
+    python benchmarks/bench_startup.py --model-dir bge-m3-onnx --warm 3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PHASES = ("imports", "model_cache", "tokenizer", "session", "first_inference")
+
+
+def child(model_dir: str, cache_dir: str) -> None:
+    """Start the model once and print per-phase seconds as JSON."""
+    timings = {}
+    started = time.perf_counter()
+    import numpy as np
+    import onnxruntime as ort
+    import transformers
+    from model_cache import (
+        ModelCache, create_session, load_tokenizer, session_providers
+    )
+    timings["imports"] = time.perf_counter() - started
+
+    onnx_path = os.path.join(model_dir, "sentence_transformers.onnx")
+    mark = time.perf_counter()
+    cache = None
+    if cache_dir:
+        cache = ModelCache(
+            cache_dir, onnx_path, ort.__version__, session_providers()[0],
+            tokenizer_version=transformers.__version__
+        )
+    timings["model_cache"] = time.perf_counter() - mark
+
+    mark = time.perf_counter()
+    tokenizer = load_tokenizer(model_dir, cache)
+    timings["tokenizer"] = time.perf_counter() - mark
+
+    mark = time.perf_counter()
+    session = create_session(onnx_path, session_providers(), cache)
+    timings["session"] = time.perf_counter() - mark
+
+    mark = time.perf_counter()
+    inputs = tokenizer("warm-up", return_tensors="np")
+    session.run(None, {k: v.astype(np.int64) for k, v in inputs.items()})
+    timings["first_inference"] = time.perf_counter() - mark
+
+    timings["total"] = time.perf_counter() - started
+    print(json.dumps(timings))
+
+
+def start(model_dir: str, cache_dir: str) -> dict:
+    """Run one start in a subprocess and return its timings."""
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child",
+         "--model-dir", model_dir, "--cache-dir", cache_dir],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model-dir", default="bge-m3-onnx")
+    parser.add_argument("--warm", type=int, default=3)
+    parser.add_argument("--cache-dir", default="")
+    parser.add_argument("--child", action="store_true")
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.model_dir, args.cache_dir)
+        return
+
+    columns = " ".join(f"{phase:>15}" for phase in PHASES)
+    print(f"{'start':<10} {columns} {'total':>8}")
+    with tempfile.TemporaryDirectory() as cache_dir:
+        runs = [("uncached", ""), ("cold", cache_dir)]
+        runs += [("warm", cache_dir)] * args.warm
+        for name, directory in runs:
+            timings = start(args.model_dir, directory)
+            row = " ".join(f"{timings[phase]:>15.3f}" for phase in PHASES)
+            print(f"{name:<10} {row} {timings['total']:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
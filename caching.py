@@ -0,0 +1,111 @@
+"""Bounded in-process caches used by the search service."""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+DEFAULT_CACHE_SIZE = 1024
+DEFAULT_CACHE_TTL_SECONDS = 3600.0
+
+
+class LRUCache:
+    """Thread-safe LRU cache with size- and TTL-based eviction.
+
+    Entries older than ``ttl_seconds`` are treated as misses and dropped
+    on access; when the cache is full the least recently used entry is
+    evicted. Hit, miss, eviction and expiration counters are kept for
+    observability.
+    """
+
+    def __init__(
+        self,
+        max_size: int = DEFAULT_CACHE_SIZE,
+        ttl_seconds: Optional[float] = DEFAULT_CACHE_TTL_SECONDS,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """Initialize an empty cache.
+
+        Args:
+            max_size: Maximum number of entries kept.
+            ttl_seconds: Entry lifetime in seconds, None for no expiry.
+            clock: Monotonic time source, injectable for tests.
+        """
+        self._max_size = max(1, max_size)
+        self._ttl = ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Look up a key and mark it as recently used.
+
+        Args:
+            key: Cache key.
+
+        Returns:
+            The cached value, or None on a miss or expired entry.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+
+            value, stored_at = entry
+            if self._ttl is not None and self._clock() - stored_at > self._ttl:
+                del self._entries[key]
+                self._expirations += 1
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Insert or refresh an entry, evicting the LRU entry if full.
+
+        Args:
+            key: Cache key.
+            value: Value to cache.
+        """
+        with self._lock:
+            self._entries[key] = (value, self._clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self) -> None:
+        """Drop every entry without touching the counters."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache occupancy and hit/miss/eviction counters.
+
+        Returns:
+            Dict with size, limits, counters and the hit rate.
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._entries),
+                "max_size": self._max_size,
+                "ttl_seconds": self._ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "hit_rate": self._hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,301 @@
+"""Channels: named partitions of the memory store (e.g. one per git branch)."""
+import collections
+import contextlib
+import hashlib
+import logging
+import re
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+
+DEFAULT_CHANNEL = "default"
+ALL_CHANNELS = "*"
+DEFAULT_MAX_OPEN_CHANNELS = 16
+
+# Must start with a letter or digit so the name always yields an FTS token.
+_CHANNEL_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._/-]{0,127}$")
+
+
+def validate_channel(channel: Optional[str], allow_all: bool = False) -> str:
+    """Check a channel name, mapping None / "" to the default channel.
+
+    Args:
+        channel: Channel name such as ``"main"`` or ``"feature/login"``.
+        allow_all: Whether ``"*"`` (every channel) is acceptable.
+
+    Returns:
+        The channel name.
+
+    Raises:
+        ValueError: If the name is not allowed.
+    """
+    if not channel:
+        return DEFAULT_CHANNEL
+    if channel == ALL_CHANNELS and allow_all:
+        return channel
+    if not _CHANNEL_PATTERN.match(channel):
+        raise ValueError(
+            f"Invalid channel {channel!r}: use 1-128 letters, digits, '.', "
+            f"'_', '/' or '-', starting with a letter or digit"
+        )
+    return channel
+
+
+def channel_key(channel: str) -> str:
+    """Return a file- and table-name-safe key that is unique per channel.
+
+    Args:
+        channel: Valid channel name.
+
+    Returns:
+        The sanitized name plus a short hash of the original name.
+    """
+    readable = re.sub(r"[^A-Za-z0-9_-]", "_", channel)[:48]
+    digest = hashlib.blake2b(channel.encode("utf-8"), digest_size=4).hexdigest()
+    return f"{readable}_{digest}"
+
+
+class ChannelRegistry:
+    """Lazily opened, LRU-bounded vector backends, one per channel.
+
+    A channel's backend is opened on first use and kept while it is among
+    the ``max_open`` most recently used; older ones are closed. Opening is
+    delegated to ``open_backend(channel, create)``, which returns None for
+    a channel that does not exist yet when ``create`` is False, so
+    searching an unknown channel never creates storage for it.
+
+    Backends are opened outside the registry lock (one opener per
+    channel), so a slow open never blocks lookups of other channels. Code
+    that uses a backend holds it with ``lease``: a backend evicted (or
+    closed with the registry) while leased is closed only when its last
+    lease ends. Until then a lookup of its channel gets that same
+    instance back instead of opening a second one on the same files.
+    Lookups on a closed registry raise.
+    """
+
+    def __init__(
+        self,
+        open_backend: Callable[[str, bool], Optional[Any]],
+        max_open: int = DEFAULT_MAX_OPEN_CHANNELS
+    ):
+        """Create the registry.
+
+        Args:
+            open_backend: Opens (or with ``create`` True, creates) the
+                backend of a channel.
+            max_open: Most backends kept open at once.
+        """
+        self._open_backend = open_backend
+        self._max_open = max(1, max_open)
+        self._lock = threading.Lock()
+        self._open: "collections.OrderedDict[str, Any]" = (
+            collections.OrderedDict())
+        self._opening: Dict[str, threading.Lock] = {}
+        # Active leases by backend id, and closed-while-leased backends.
+        self._leases: Dict[int, int] = {}
+        self._retired: Dict[int, Tuple[str, Any]] = {}
+        self._opens = 0
+        self._evictions = 0
+        self._closed = False
+
+    def get(self, channel: str, create: bool = False) -> Optional[Any]:
+        """Return the backend of a channel, opening it if needed.
+
+        The backend is not held: LRU eviction may close it at any time, so
+        use ``lease`` to work with it.
+
+        Args:
+            channel: Channel name.
+            create: Create the channel's storage if it does not exist.
+
+        Returns:
+            The backend, or None if the channel has no storage and
+            ``create`` is False.
+        """
+        return self._acquire(channel, create, hold=False)
+
+    @contextlib.contextmanager
+    def lease(
+        self, channel: str, create: bool = False
+    ) -> Iterator[Optional[Any]]:
+        """Hold the backend of a channel open for the duration of a block.
+
+        Args:
+            channel: Channel name.
+            create: Create the channel's storage if it does not exist.
+
+        Yields:
+            The backend, or None if the channel has no storage and
+            ``create`` is False.
+        """
+        backend = self._acquire(channel, create, hold=True)
+        try:
+            yield backend
+        finally:
+            if backend is not None:
+                self._release(backend)
+
+    def _acquire(
+        self, channel: str, create: bool, hold: bool
+    ) -> Optional[Any]:
+        """Look up or open a channel's backend, optionally taking a lease.
+
+        Raises:
+            RuntimeError: If the registry has been closed.
+        """
+        while True:
+            with self._lock:
+                self._check_open()
+                backend = self._open.get(channel)
+                if backend is not None:
+                    self._open.move_to_end(channel)
+                    if hold:
+                        self._hold(backend)
+                    return backend
+                backend = self._reinstate(channel)
+                if backend is not None:
+                    if hold:
+                        self._hold(backend)
+                    evicted = self._evict()
+                else:
+                    opening = self._opening.setdefault(
+                        channel, threading.Lock()
+                    )
+
+            if backend is None:
+                with opening:
+                    with self._lock:
+                        if channel in self._open or self._reinstatable(channel):
+                            continue  # opened by another thread meanwhile
+                    backend = self._open_backend(channel, create)
+                    if backend is None:
+                        return None
+                    with self._lock:
+                        if self._closed:
+                            closed = backend
+                        else:
+                            closed = None
+                            self._open[channel] = backend
+                            self._opens += 1
+                            if hold:
+                                self._hold(backend)
+                            evicted = self._evict()
+                    if closed is not None:
+                        _close(closed)
+                        self._check_open()
+
+            for name, old in evicted:
+                logging.info(
+                    f"Closing vector backend of channel '{name}' (LRU)")
+                _close(old)
+            return backend
+
+    def _check_open(self) -> None:
+        """Raise if the registry has been closed."""
+        if self._closed:
+            raise RuntimeError("ChannelRegistry is closed")
+
+    def _hold(self, backend: Any) -> None:
+        """Take a lease on a backend (caller holds the lock)."""
+        self._leases[id(backend)] = self._leases.get(id(backend), 0) + 1
+
+    def _reinstatable(self, channel: str) -> bool:
+        """Whether an evicted, still leased backend of a channel exists."""
+        return any(name == channel for name, _ in self._retired.values())
+
+    def _reinstate(self, channel: str) -> Optional[Any]:
+        """Put a channel's evicted, still leased backend back in service.
+
+        Caller holds the lock.
+        """
+        for key, (name, backend) in self._retired.items():
+            if name == channel:
+                del self._retired[key]
+                self._open[channel] = backend
+                return backend
+        return None
+
+    def _evict(self) -> List[Tuple[str, Any]]:
+        """Retire least recently used backends beyond ``max_open``.
+
+        Caller holds the lock.
+
+        Returns:
+            The retired backends that can be closed now.
+        """
+        evicted = []
+        while len(self._open) > self._max_open:
+            evicted.extend(self._retire(*self._open.popitem(last=False)))
+            self._evictions += 1
+        return evicted
+
+    def _retire(self, name: str, backend: Any) -> List[Tuple[str, Any]]:
+        """Take a backend out of service (caller holds the lock).
+
+        Returns:
+            ``[(name, backend)]`` if it can be closed now, or an empty list
+            if it is leased and will be closed by its last ``_release``.
+        """
+        if self._leases.get(id(backend)):
+            self._retired[id(backend)] = (name, backend)
+            return []
+        return [(name, backend)]
+
+    def _release(self, backend: Any) -> None:
+        """End one lease, closing the backend if it was retired meanwhile."""
+        with self._lock:
+            remaining = self._leases[id(backend)] - 1
+            if remaining:
+                self._leases[id(backend)] = remaining
+                return
+            del self._leases[id(backend)]
+            retired = self._retired.pop(id(backend), None)
+        if retired is not None:
+            logging.info(
+                f"Closing vector backend of channel '{retired[0]}' (released)")
+            _close(backend)
+
+    def open_channels(self) -> List[str]:
+        """Names of the channels whose backends are open, oldest first."""
+        with self._lock:
+            return list(self._open)
+
+    def backends(self) -> Dict[str, Any]:
+        """Snapshot of the open backends by channel."""
+        with self._lock:
+            return dict(self._open)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return open channels and open/eviction counters."""
+        with self._lock:
+            return {
+                "open": list(self._open),
+                "max_open": self._max_open,
+                "opens": self._opens,
+                "evictions": self._evictions
+            }
+
+    def close(self) -> None:
+        """Close every open backend (leased ones when their lease ends).
+
+        Later lookups raise ``RuntimeError``.
+        """
+        with self._lock:
+            self._closed = True
+            closable = [
+                pair for name, backend in self._open.items()
+                for pair in self._retire(name, backend)
+            ]
+            self._open.clear()
+        for _, backend in closable:
+            _close(backend)
+
+
+def _close(backend: Any) -> None:
+    """Close a backend if it has anything to close."""
+    close = getattr(backend, "close", None)
+    if close is not None:
+        try:
+            close()
+        except Exception as e:
+            logging.warning(f"Error closing vector backend: {e}")
@@ -0,0 +1,191 @@
+"""Token-window chunking of long memories into multiple vectors."""
+import logging
+from typing import (
+    Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+)
+
+import numpy as np
+
+
+# The model sees at most 512 tokens including [CLS] and [SEP].
+DEFAULT_CHUNK_TOKENS = 510
+DEFAULT_CHUNK_OVERLAP = 64
+
+# Chunk vectors are stored as "<memory id>#<index>"; memory ids are UUIDs
+# and never contain the separator.
+CHUNK_ID_SEPARATOR = "#"
+
+
+def chunk_id(memory_id: str, index: int) -> str:
+    """Return the vector-store id of one chunk of a memory."""
+    return f"{memory_id}{CHUNK_ID_SEPARATOR}{index}"
+
+
+def parent_id(vector_id: str) -> str:
+    """Return the memory id a vector-store id belongs to.
+
+    Unchunked memories are stored under their own id.
+    """
+    return vector_id.split(CHUNK_ID_SEPARATOR, 1)[0]
+
+
+def token_windows(
+    n_tokens: int,
+    chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+    overlap: int = DEFAULT_CHUNK_OVERLAP
+) -> Iterator[Tuple[int, int]]:
+    """Yield [start, end) token windows covering a sequence.
+
+    Consecutive windows share ``overlap`` tokens so text cut at a window
+    edge is still seen whole by one of them. The last window ends at
+    ``n_tokens``.
+
+    Args:
+        n_tokens: Sequence length in tokens.
+        chunk_tokens: Tokens per window.
+        overlap: Tokens shared by neighbouring windows.
+
+    Yields:
+        (start, end) token indices.
+    """
+    step = chunk_tokens - overlap
+    start = 0
+    while True:
+        end = min(start + chunk_tokens, n_tokens)
+        yield start, end
+        if end >= n_tokens:
+            return
+        start += step
+
+
+class Chunker:
+    """Splits text into overlapping windows on token boundaries.
+
+    Text is tokenized once (without special tokens) and cut by the
+    tokenizer's character offsets, so every chunk is an exact substring
+    of the input and re-tokenizes to at most ``chunk_tokens`` tokens.
+    Text that fits in one window is returned unchanged.
+    """
+
+    def __init__(
+        self,
+        tokenizer: Any,
+        chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+        overlap: int = DEFAULT_CHUNK_OVERLAP
+    ):
+        """Create a chunker.
+
+        Args:
+            tokenizer: Hugging Face tokenizer (a fast tokenizer provides
+                the character offsets; others fall back to decoding).
+            chunk_tokens: Tokens per chunk.
+            overlap: Tokens shared by consecutive chunks.
+
+        Raises:
+            ValueError: If the sizes leave no room to advance.
+        """
+        if chunk_tokens <= 0 or not 0 <= overlap < chunk_tokens:
+            raise ValueError(
+                f"Need chunk_tokens > 0 and 0 <= overlap < chunk_tokens, "
+                f"got {chunk_tokens} and {overlap}"
+            )
+        self._tokenizer = tokenizer
+        self.chunk_tokens = chunk_tokens
+        self.overlap = overlap
+
+    def iter_chunks(self, text: str) -> Iterator[str]:
+        """Yield the chunks of one text in order.
+
+        Args:
+            text: Memory content.
+
+        Yields:
+            Chunk texts; just ``text`` if it fits in one chunk or cannot
+            be tokenized.
+        """
+        try:
+            encoded = self._tokenizer(
+                text, add_special_tokens=False, return_offsets_mapping=True
+            )
+            offsets = encoded["offset_mapping"]
+        except Exception as e:
+            offsets = None
+            try:
+                encoded = self._tokenizer(text, add_special_tokens=False)
+            except Exception:
+                logging.warning(
+                    f"Chunker: cannot tokenize, keeping text whole: {e}"
+                )
+                yield text
+                return
+
+        input_ids = encoded["input_ids"]
+        if len(input_ids) <= self.chunk_tokens:
+            yield text
+            return
+
+        windows = token_windows(
+            len(input_ids), self.chunk_tokens, self.overlap
+        )
+        for start, end in windows:
+            if offsets is not None:
+                yield text[offsets[start][0]:offsets[end - 1][1]]
+            else:
+                yield self._tokenizer.decode(input_ids[start:end])
+
+    def split(self, text: str) -> List[str]:
+        """Return every chunk of one text."""
+        return list(self.iter_chunks(text))
+
+
+def vector_ids(memory_id: str, n_chunks: int) -> List[str]:
+    """Return the vector-store ids of a memory stored as ``n_chunks`` rows."""
+    if n_chunks == 1:
+        return [memory_id]
+    return [chunk_id(memory_id, index) for index in range(n_chunks)]
+
+
+def embedded_texts(
+    contents: Iterable[str], chunker: Optional[Chunker]
+) -> Iterator[str]:
+    """Yield the texts that were embedded for a set of memories.
+
+    These are the embedding-store keys of the memories: their chunks, or
+    the whole content without a chunker.
+
+    Args:
+        contents: Memory contents.
+        chunker: Chunker the memories were saved with, or None.
+
+    Yields:
+        Chunk texts.
+    """
+    for content in contents:
+        if chunker is None:
+            yield content
+        else:
+            yield from chunker.iter_chunks(content)
+
+
+def chunk_rows(
+    row: Dict[str, Any], chunks: Sequence[str], vectors: np.ndarray
+) -> List[Dict]:
+    """Build the vector-store rows of one memory.
+
+    A single-chunk memory keeps one row under its own id; a chunked one
+    gets a row per chunk with a ``chunk_id`` and the chunk's text.
+
+    Args:
+        row: Memory fields (id, content, tags, note, created_at).
+        chunks: Chunk texts from ``Chunker``.
+        vectors: One embedding per chunk.
+
+    Returns:
+        Rows ready for a vector backend's ``add``.
+    """
+    if len(chunks) == 1:
+        return [dict(row, vector=vectors[0])]
+    return [
+        dict(row, id=chunk_id(row["id"], index), content=chunk, vector=vector)
+        for index, (chunk, vector) in enumerate(zip(chunks, vectors))
+    ]
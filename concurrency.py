@@ -0,0 +1,115 @@
+"""Bounded thread pools with fail-fast backpressure for async tool handlers."""
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+
+DEFAULT_CPU_WORKERS = 2
+DEFAULT_IO_WORKERS = 8
+DEFAULT_MAX_PENDING = 32
+
+
+class ExecutorBusyError(RuntimeError):
+    """Raised when a bounded executor has no room for another task."""
+
+
+class BoundedExecutor:
+    """Thread pool that rejects work instead of queueing without limit.
+
+    At most ``max_workers`` tasks run at once and at most ``max_pending``
+    more wait for a thread. Anything beyond that fails immediately with
+    ``ExecutorBusyError`` so callers get a fast "busy" answer rather than
+    piling up behind the GIL.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_pending: int):
+        """Create the pool.
+
+        Args:
+            name: Pool name used for thread names and stats.
+            max_workers: Number of worker threads.
+            max_pending: Tasks allowed to wait for a free thread.
+        """
+        self._name = name
+        self._max_workers = max(1, max_workers)
+        self._capacity = self._max_workers + max(0, max_pending)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self._max_workers, thread_name_prefix=name
+        )
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+
+    @property
+    def name(self) -> str:
+        """Pool name."""
+        return self._name
+
+    async def run(
+        self, fn: Callable[..., Any], *args: Any, **kwargs: Any
+    ) -> Any:
+        """Run a blocking callable on the pool and await its result.
+
+        Args:
+            fn: Blocking callable.
+            *args: Positional arguments for ``fn``.
+            **kwargs: Keyword arguments for ``fn``.
+
+        Returns:
+            Whatever ``fn`` returns.
+
+        Raises:
+            ExecutorBusyError: If the pool and its queue are full.
+        """
+        with self._lock:
+            if self._in_flight >= self._capacity:
+                self._rejected += 1
+                raise ExecutorBusyError(
+                    f"{self._name} pool is full "
+                    f"({self._in_flight} tasks in flight)"
+                )
+            self._in_flight += 1
+
+        try:
+            call = functools.partial(fn, *args, **kwargs)
+            future = self._executor.submit(call)
+        except Exception:
+            with self._lock:
+                self._in_flight -= 1
+            raise
+        # Released when the thread finishes, even if the awaiting caller
+        # was cancelled, so the count reflects real pool occupancy.
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> Dict[str, int]:
+        """Return occupancy and rejection counters.
+
+        Returns:
+            Dict with limits, tasks in flight, completed and rejected.
+        """
+        with self._lock:
+            return {
+                "max_workers": self._max_workers,
+                "capacity": self._capacity,
+                "in_flight": self._in_flight,
+                "completed": self._completed,
+                "rejected": self._rejected
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the pool.
+
+        Args:
+            wait: Whether to wait for running tasks.
+        """
+        self._executor.shutdown(wait=wait)
+
+    def _release(self, _future: Any) -> None:
+        """Free one slot after a task finished."""
+        with self._lock:
+            self._in_flight -= 1
+            self._completed += 1
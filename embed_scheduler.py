@@ -0,0 +1,212 @@
+"""Micro-batching scheduler that coalesces concurrent embedding requests."""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+DEFAULT_MAX_BATCH_SIZE = 32
+DEFAULT_MAX_WAIT_MS = 5.0
+
+
+class EmbeddingScheduler:
+    """Queues single-text embed requests and flushes them as one batch.
+
+    A background worker takes the first pending request, then keeps
+    collecting until either ``max_batch_size`` requests are queued or
+    ``max_wait_ms`` has passed since that first request. The batch is run
+    through ``embed_batch`` and every caller receives its own row.
+
+    With ``workers`` > 1 several workers collect and flush batches at
+    once, so a pool of inference sessions is kept busy under concurrent
+    load instead of serving one batch at a time.
+    """
+
+    def __init__(
+        self,
+        embed_batch: Callable[[List[str]], np.ndarray],
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+        workers: int = 1
+    ):
+        """Initialize the scheduler and start its worker thread.
+
+        Args:
+            embed_batch: Function embedding a list of texts into an
+                (N, dim) matrix, e.g. ``SearchService.embed_batch``.
+            max_batch_size: Flush as soon as this many requests are queued.
+            max_wait_ms: Longest time the first request of a batch waits
+                for company before the batch is flushed.
+            workers: Batches flushed concurrently, e.g. the size of the
+                session pool behind ``embed_batch``.
+        """
+        self._embed_batch = embed_batch
+        self._max_batch_size = max(1, max_batch_size)
+        self._max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: "queue.Queue[Optional[Tuple[str, Future, float]]]" = (
+            queue.Queue()
+        )
+        # Guards ``_closed`` so no request can be queued behind the close
+        # sentinel, where the worker would never see it.
+        self._submit_lock = threading.Lock()
+        self._closed = False
+
+        self._stats_lock = threading.Lock()
+        self._requests = 0
+        self._batches = 0
+        self._max_queue_depth = 0
+        self._total_wait = 0.0
+        self._batch_sizes: Dict[int, int] = {}
+
+        self._workers = [
+            threading.Thread(
+                target=self._run, name=f"embed-scheduler-{i}", daemon=True
+            )
+            for i in range(max(1, workers))
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, text: str) -> Future:
+        """Queue a text for embedding.
+
+        Args:
+            text: Input text to embed.
+
+        Returns:
+            Future resolving to the text's 1-D embedding vector.
+
+        Raises:
+            RuntimeError: If the scheduler has been closed.
+        """
+        future: Future = Future()
+        with self._submit_lock:
+            if self._closed:
+                raise RuntimeError("EmbeddingScheduler is closed")
+            self._queue.put((text, future, time.monotonic()))
+
+        depth = self._queue.qsize()
+        with self._stats_lock:
+            self._requests += 1
+            self._max_queue_depth = max(self._max_queue_depth, depth)
+
+        return future
+
+    def embed(self, text: str, timeout: Optional[float] = None) -> np.ndarray:
+        """Embed a text through the shared batch and wait for its row.
+
+        Args:
+            text: Input text to embed.
+            timeout: Seconds to wait for the result, None to wait forever.
+
+        Returns:
+            The text's 1-D embedding vector.
+        """
+        return self.submit(text).result(timeout=timeout)
+
+    def stats(self) -> Dict:
+        """Return queue-depth and batch-size statistics.
+
+        Returns:
+            Dict with request/batch counts, current and peak queue depth,
+            mean batch size, mean queueing delay and a batch-size histogram.
+        """
+        with self._stats_lock:
+            flushed = sum(
+                size * count for size, count in self._batch_sizes.items()
+            )
+            return {
+                "max_batch_size": self._max_batch_size,
+                "max_wait_ms": self._max_wait * 1000.0,
+                "workers": len(self._workers),
+                "requests": self._requests,
+                "batches": self._batches,
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self._max_queue_depth,
+                "mean_batch_size": (
+                    flushed / self._batches if self._batches else 0.0
+                ),
+                "mean_wait_ms": (
+                    self._total_wait * 1000.0 / flushed if flushed else 0.0
+                ),
+                "batch_size_histogram": dict(sorted(self._batch_sizes.items()))
+            }
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Stop accepting requests and let the workers drain the queue.
+
+        Args:
+            timeout: Seconds to wait for each worker to exit.
+        """
+        with self._submit_lock:
+            if self._closed:
+                return
+            self._closed = True
+            # One sentinel per worker; each stops at the first it takes.
+            for _ in self._workers:
+                self._queue.put(None)
+        for worker in self._workers:
+            worker.join(timeout)
+
+    def _collect(self) -> Tuple[List[Tuple[str, Future, float]], bool]:
+        """Block for the next batch of requests.
+
+        Returns:
+            Tuple of (batch, stop) where ``stop`` is True once the close
+            sentinel has been seen.
+        """
+        first = self._queue.get()
+        if first is None:
+            return [], True
+
+        batch = [first]
+        deadline = time.monotonic() + self._max_wait
+        while len(batch) < self._max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 \
+                    else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+
+        return batch, False
+
+    def _run(self) -> None:
+        """Worker loop: collect, embed and resolve futures until closed."""
+        stop = False
+        while not stop:
+            batch, stop = self._collect()
+            if batch:
+                self._flush(batch)
+
+    def _flush(self, batch: List[Tuple[str, Future, float]]) -> None:
+        """Run one batched inference and hand each caller its row.
+
+        Args:
+            batch: Queued (text, future, enqueue_time) tuples.
+        """
+        started = time.monotonic()
+        with self._stats_lock:
+            self._batches += 1
+            self._batch_sizes[len(batch)] = (
+                self._batch_sizes.get(len(batch), 0) + 1
+            )
+            self._total_wait += sum(started - queued for _, _, queued in batch)
+
+        try:
+            vectors = self._embed_batch([text for text, _, _ in batch])
+        except Exception as e:
+            logging.error(f"Embed scheduler batch error: {e}")
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        for row, (_, future, _) in enumerate(batch):
+            future.set_result(vectors[row])
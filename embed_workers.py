@@ -0,0 +1,522 @@
+"""Embedding in worker processes with results returned through shared memory."""
+import contextlib
+import itertools
+import logging
+import math
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import connection, shared_memory
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+DEFAULT_EMBEDDING_DIM = 1024
+DEFAULT_MAX_ROWS = 64
+DEFAULT_TASK_TIMEOUT = 300.0
+# Seconds between checks of the closed flag by the supervisor thread.
+WATCH_INTERVAL = 1.0
+
+_READY = "ready"
+_FAILED = "failed"
+_DONE = "done"
+_ERROR = "error"
+
+_spawn_lock = threading.Lock()
+
+
+def onnx_worker_factory(
+    model_dir: str,
+    cache_dir: Optional[str] = None,
+    intra_op_threads: int = 0
+) -> Callable[[List[str]], np.ndarray]:
+    """Load the tokenizer and an ONNX session inside a worker process.
+
+    Runs in the child, so the heavy imports stay out of the parent. The
+    session is primed with one inference before the worker reports ready.
+
+    Args:
+        model_dir: Model directory (``sentence_transformers.onnx`` and
+            tokenizer files).
+        cache_dir: ``ModelCache`` directory, None to load uncached.
+        intra_op_threads: Intra-op threads of the session (0: runtime
+            default).
+
+    Returns:
+        The worker's ``embed_batch``.
+    """
+    import onnxruntime as ort
+    import transformers
+
+    from model_cache import (
+        ModelCache, create_session, load_tokenizer, session_providers
+    )
+    from search_engine import SearchService
+
+    onnx_path = os.path.join(model_dir, "sentence_transformers.onnx")
+    providers = session_providers()
+    cache = None
+    if cache_dir is not None:
+        cache = ModelCache(
+            cache_dir, onnx_path, ort.__version__, providers[0],
+            tokenizer_version=transformers.__version__
+        )
+
+    def configure(options: Any) -> None:
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = 1
+
+    tokenizer = load_tokenizer(model_dir, cache)
+    session = create_session(onnx_path, providers, cache, configure)
+    service = SearchService(
+        session, tokenizer, vector_table=None, sqlite_conn=None
+    )
+    service.embed_batch(["warm-up"])
+    return service.embed_batch
+
+
+@contextlib.contextmanager
+def _detached_main():
+    """Keep spawned workers from re-running the parent's ``__main__``.
+
+    ``spawn`` re-imports the main script in every child so that objects
+    defined there can be unpickled. The server script opens its stores at
+    import time, and workers only need importable factories, so the main
+    module's path and spec are hidden while the processes start.
+    """
+    main = sys.modules.get("__main__")
+    saved = {
+        name: main.__dict__[name] for name in ("__file__", "__spec__")
+        if main is not None and name in main.__dict__
+    }
+    with _spawn_lock:
+        try:
+            if "__file__" in saved:
+                del main.__file__
+            if "__spec__" in saved:
+                main.__spec__ = None
+            yield
+        finally:
+            for name, value in saved.items():
+                setattr(main, name, value)
+
+
+def _worker_main(
+    index: int,
+    factory: Callable[..., Callable[[List[str]], np.ndarray]],
+    factory_args: Tuple,
+    tasks: Any,
+    results: Any,
+    shm_name: str,
+    max_rows: int,
+    dim: int
+) -> None:
+    """Worker process loop: embed each task into the shared block.
+
+    Reports go through the worker's own pipe, not a queue shared by all
+    workers, so a worker dying mid-report cannot leave a shared lock held.
+    """
+    try:
+        embed_batch = factory(*factory_args)
+    except Exception as e:
+        results.send((_FAILED, index, repr(e)))
+        return
+    shm = shared_memory.SharedMemory(name=shm_name)
+    block = np.ndarray((max_rows, dim), dtype=np.float32, buffer=shm.buf)
+    results.send((_READY, index, None))
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            task_id, texts = task
+            try:
+                block[:len(texts)] = embed_batch(texts)
+                results.send((_DONE, task_id, None))
+            except Exception as e:
+                results.send((_ERROR, task_id, repr(e)))
+    finally:
+        del block
+        shm.close()
+
+
+class _Worker:
+    """Parent-side handle of one worker process."""
+
+    def __init__(
+        self, index: int, process: Any, tasks: Any, results: Any, shm: Any,
+        block: np.ndarray
+    ):
+        self.index = index
+        self.process = process
+        self.tasks = tasks
+        self.results = results
+        self.shm = shm
+        self.block = block
+        self.tasks_done = 0
+        # Set once the process died or was killed; a respawn replaces the
+        # handle.
+        self.retired = False
+
+
+class ProcessEmbedder:
+    """Runs ``embed_batch`` across worker processes.
+
+    Tokenization and pooling run in Python and hold the GIL, so threads
+    cannot scale them; each worker here is a separate process (spawned,
+    never forked, so no runtime threads are copied) with its own
+    tokenizer and session built by ``factory``. A batch is cut into one
+    task per worker (at most ``max_rows`` texts each), each sent to an
+    idle worker.
+    Embeddings do not travel back pickled: each worker owns a
+    ``(max_rows, dim)`` float32 shared-memory block, writes a task's rows
+    there and reports only completion; the parent copies the rows out
+    before the worker takes its next task.
+
+    ``embed_batch`` has the signature of ``SearchService.embed_batch``,
+    so a ``SearchService`` given this as ``embedder`` works unchanged. A
+    failed task fails the whole batch with ``RuntimeError`` rather than
+    leaving zero rows that would be stored. A worker that dies fails its
+    task at once and is respawned; one that exceeds ``task_timeout`` is
+    killed and respawned the same way.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[..., Callable[[List[str]], np.ndarray]],
+        factory_args: Sequence[Any] = (),
+        workers: int = 2,
+        dim: int = DEFAULT_EMBEDDING_DIM,
+        max_rows: int = DEFAULT_MAX_ROWS,
+        task_timeout: float = DEFAULT_TASK_TIMEOUT
+    ):
+        """Start the worker processes (returns before they are ready).
+
+        Args:
+            factory: Importable module-level callable (not from
+                ``__main__``) run in each worker with
+                ``factory_args``; returns that worker's embed function.
+            factory_args: Picklable arguments for ``factory``.
+            workers: Number of worker processes.
+            dim: Embedding dimension.
+            max_rows: Texts per task (rows of each shared block).
+            task_timeout: Seconds to wait for one task before killing
+                its worker and failing the batch.
+        """
+        self._factory = factory
+        self._factory_args = tuple(factory_args)
+        self._dim = dim
+        self._max_rows = max_rows
+        self._task_timeout = task_timeout
+        self._context = multiprocessing.get_context("spawn")
+        self._wake, self._wake_sender = self._context.Pipe(duplex=False)
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._pending: Dict[int, Tuple[_Worker, Future, np.ndarray]] = {}
+        self._task_ids = itertools.count()
+        self._started = 0
+        self._failed: List[str] = []
+        self._all_started = threading.Event()
+        self._closed = False
+        self._embedded = 0
+        self._task_errors = 0
+        self._respawns = 0
+        self._busy_seconds = 0.0
+
+        self._workers: List[_Worker] = []
+        for index in range(max(1, workers)):
+            shm = shared_memory.SharedMemory(
+                create=True, size=max_rows * dim * 4
+            )
+            block = np.ndarray(
+                (max_rows, dim), dtype=np.float32, buffer=shm.buf
+            )
+            self._workers.append(self._spawn(index, shm, block))
+
+        self._supervisor = threading.Thread(
+            target=self._supervise, name="embed-results", daemon=True
+        )
+        self._supervisor.start()
+
+    def _spawn(self, index: int, shm: Any, block: np.ndarray) -> _Worker:
+        """Start a worker process that writes into ``shm``."""
+        tasks = self._context.Queue()
+        results, sender = self._context.Pipe(duplex=False)
+        with _detached_main():
+            process = self._context.Process(
+                target=_worker_main,
+                args=(index, self._factory, self._factory_args, tasks, sender,
+                      shm.name, self._max_rows, self._dim),
+                name=f"embed-worker-{index}",
+                daemon=True
+            )
+            process.start()
+        # Only the child holds the sending end now, so its exit reads as EOF.
+        sender.close()
+        return _Worker(index, process, tasks, results, shm, block)
+
+    @property
+    def size(self) -> int:
+        """Number of workers that started successfully so far."""
+        return self._started
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every worker has started or failed.
+
+        Returns:
+            True if at least one worker is ready.
+
+        Raises:
+            RuntimeError: If every worker failed to start.
+        """
+        self._all_started.wait(timeout)
+        if self._all_started.is_set() and not self._started:
+            raise RuntimeError(f"No embedding worker started: {self._failed}")
+        return self._started > 0
+
+    def embed_batch(
+        self, texts: List[str], batch_size: Optional[int] = None
+    ) -> np.ndarray:
+        """Embed texts on the workers.
+
+        Args:
+            texts: Input texts.
+            batch_size: Accepted for ``SearchService.embed_batch``
+                compatibility; workers bucket their tasks themselves.
+
+        Returns:
+            Float32 matrix of shape (len(texts), dim) in input order.
+
+        Raises:
+            RuntimeError: If the embedder is closed, no worker could
+                start, none became idle within ``task_timeout``, or a
+                task failed, timed out or lost its worker.
+        """
+        embeddings = np.zeros((len(texts), self._dim), dtype=np.float32)
+        if not texts:
+            return embeddings
+        if self._closed:
+            raise RuntimeError("ProcessEmbedder is closed")
+        if not self._started and not self.wait_ready(self._task_timeout):
+            raise RuntimeError("No embedding worker is available")
+
+        started = time.perf_counter()
+        # One task per worker so a single batch keeps them all busy.
+        task_rows = min(
+            self._max_rows, math.ceil(len(texts) / len(self._workers))
+        )
+        tasks = []
+        for start in range(0, len(texts), task_rows):
+            chunk = list(texts[start:start + task_rows])
+            worker = self._next_idle()
+            future: Future = Future()
+            with self._lock:
+                task_id = next(self._task_ids)
+                self._pending[task_id] = (
+                    worker, future, embeddings[start:start + len(chunk)]
+                )
+            worker.tasks.put((task_id, chunk))
+            tasks.append((task_id, future))
+
+        errors = []
+        for task_id, future in tasks:
+            try:
+                future.result(timeout=self._task_timeout)
+            except Exception as e:
+                if future.done():
+                    errors.append(str(e))
+                else:
+                    self._abandon(task_id)
+                    errors.append(f"timed out after {self._task_timeout}s")
+        if errors:
+            with self._lock:
+                self._task_errors += len(errors)
+            raise RuntimeError(
+                f"Embedding failed for {len(errors)} of {len(tasks)} "
+                f"task(s): {errors[0]}"
+            )
+        with self._lock:
+            self._embedded += len(texts)
+            self._busy_seconds += time.perf_counter() - started
+        return embeddings
+
+    def _next_idle(self) -> _Worker:
+        """Take an idle worker, skipping handles of dead workers."""
+        deadline = time.monotonic() + self._task_timeout
+        while True:
+            try:
+                worker = self._idle.get(
+                    timeout=max(0.0, deadline - time.monotonic())
+                )
+            except queue.Empty:
+                raise RuntimeError(
+                    "No embedding worker became idle within "
+                    f"{self._task_timeout}s"
+                )
+            if not worker.retired and worker.process.is_alive():
+                return worker
+
+    def _abandon(self, task_id: int) -> None:
+        """Give up on a timed-out task: drop it and kill its (hung) worker.
+
+        The supervisor then respawns the worker; the late result, if any,
+        is ignored because the task is no longer pending.
+        """
+        with self._lock:
+            entry = self._pending.pop(task_id, None)
+        if entry is None:
+            return
+        worker = entry[0]
+        logging.error(
+            f"Embed worker {worker.index} exceeded {self._task_timeout}s, "
+            "restarting it"
+        )
+        worker.process.kill()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return worker counts, tasks per worker and embedded texts."""
+        with self._lock:
+            return {
+                "workers": len(self._workers),
+                "ready": self._started,
+                "failed": list(self._failed),
+                "idle": self._idle.qsize(),
+                "tasks": [worker.tasks_done for worker in self._workers],
+                "embedded": self._embedded,
+                "task_errors": self._task_errors,
+                "respawns": self._respawns,
+                "texts_per_sec": round(
+                    self._embedded / self._busy_seconds, 2
+                ) if self._busy_seconds > 0 else 0.0
+            }
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Stop the workers and free the shared memory."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._wake_sender.send(None)
+        self._supervisor.join(timeout)
+        for worker in self._workers:
+            worker.tasks.put(None)
+        for worker in self._workers:
+            worker.process.join(timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            worker.results.close()
+            worker.block = None
+            worker.shm.close()
+            worker.shm.unlink()
+
+    def _supervise(self) -> None:
+        """Resolve reports as workers send them and replace dead workers.
+
+        Rows are copied out of a worker's shared block before it is made
+        idle again. A worker whose process exited has its remaining
+        reports drained, then is respawned.
+        """
+        while not self._closed:
+            with self._lock:
+                workers = [
+                    worker for worker in self._workers if not worker.retired
+                ]
+            ready = connection.wait(
+                [self._wake]
+                + [worker.results for worker in workers]
+                + [worker.process.sentinel for worker in workers],
+                timeout=WATCH_INTERVAL
+            )
+            if self._closed:
+                return
+            for worker in workers:
+                if worker.results in ready:
+                    self._receive(worker)
+            for worker in workers:
+                if worker.process.sentinel in ready:
+                    while self._receive(worker):
+                        pass
+                    self._respawn(worker)
+
+    def _receive(self, worker: _Worker) -> bool:
+        """Handle one report of ``worker`` if one is waiting.
+
+        Returns:
+            Whether a report was read.
+        """
+        try:
+            if not worker.results.poll():
+                return False
+            kind, key, error = worker.results.recv()
+        except (EOFError, OSError):
+            return False
+
+        if kind in (_READY, _FAILED):
+            with self._lock:
+                if kind == _FAILED:
+                    # Not respawned: the factory would fail again.
+                    worker.retired = True
+                    logging.error(
+                        f"Embed worker {key} failed to start: {error}"
+                    )
+                if not self._all_started.is_set():
+                    if kind == _READY:
+                        self._started += 1
+                    else:
+                        self._failed.append(error)
+                    if self._started + len(self._failed) == len(self._workers):
+                        self._all_started.set()
+            if kind == _READY:
+                self._idle.put(worker)
+            return True
+
+        with self._lock:
+            entry = self._pending.pop(key, None)
+            if entry is None:
+                # Timed out or its worker died; the batch has moved on.
+                return True
+            _, future, target = entry
+            worker.tasks_done += 1
+        if kind == _DONE:
+            target[:] = worker.block[:len(target)]
+        self._idle.put(worker)
+        if kind == _ERROR:
+            future.set_exception(RuntimeError(error))
+        else:
+            future.set_result(None)
+        return True
+
+    def _respawn(self, worker: _Worker) -> None:
+        """Replace a dead worker, failing the task it was running."""
+        with self._lock:
+            if self._closed or worker.retired:
+                return
+            worker.retired = True
+            lost = [
+                (task_id, future)
+                for task_id, (owner, future, _) in self._pending.items()
+                if owner is worker
+            ]
+            for task_id, _ in lost:
+                del self._pending[task_id]
+            self._respawns += 1
+        worker.process.join(WATCH_INTERVAL)
+        exitcode = worker.process.exitcode
+        logging.error(
+            f"Embed worker {worker.index} exited ({exitcode}), restarting it"
+        )
+        for _, future in lost:
+            future.set_exception(RuntimeError(
+                f"embed worker {worker.index} exited with code {exitcode}"
+            ))
+        worker.results.close()
+        worker.tasks.close()
+        replacement = self._spawn(worker.index, worker.shm, worker.block)
+        replacement.tasks_done = worker.tasks_done
+        with self._lock:
+            self._workers[worker.index] = replacement
@@ -0,0 +1,291 @@
+"""Persistent content-addressed cache of document embeddings."""
+import hashlib
+import logging
+import os
+import threading
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+import generations
+
+
+DEFAULT_EMBEDDING_DIM = 1024
+KEY_SIZE = 16
+VECTORS_FILE = "vectors.f32"
+KEYS_FILE = "keys.bin"
+
+
+def content_key(text: str, model_id: str) -> bytes:
+    """Hash a text together with the id of the model that embeds it.
+
+    Args:
+        text: Embedded text.
+        model_id: Embedding model fingerprint.
+
+    Returns:
+        16-byte BLAKE2b digest.
+    """
+    digest = hashlib.blake2b(digest_size=KEY_SIZE)
+    digest.update(model_id.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(text.encode("utf-8"))
+    return digest.digest()
+
+
+class EmbeddingStore:
+    """Append-only on-disk embedding cache keyed by content hash.
+
+    Vectors live in one raw float32 matrix file that is memory-mapped,
+    never read into memory; a parallel file holds one 16-byte key per row.
+    Only the key file is read at startup to build the hash-to-row index,
+    so opening a large store costs a few milliseconds. Rows are appended
+    vector-first, so a key on disk always has its vector; a torn append
+    after a crash is truncated on the next open.
+
+    ``compact`` writes both files into a new generation directory and
+    then switches the ``CURRENT`` file to it with one atomic rename, so a
+    crash leaves either the old pair or the new pair, never a mix. Before
+    the first compaction the files live directly in ``directory``.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        model_id: str,
+        dim: int = DEFAULT_EMBEDDING_DIM
+    ):
+        """Open (or create) the store in a directory.
+
+        Args:
+            directory: Directory holding the store files.
+            model_id: Fingerprint of the model whose vectors are stored.
+            dim: Embedding dimension.
+        """
+        self._directory = directory
+        self._model_id = model_id
+        self._dim = dim
+        self._row_bytes = dim * 4
+        self._generation = 0
+        self._vectors_path = os.path.join(directory, VECTORS_FILE)
+        self._keys_path = os.path.join(directory, KEYS_FILE)
+        self._lock = threading.Lock()
+        self._index: Dict[bytes, int] = {}
+        self._rows = 0
+        self._mapped: Optional[np.memmap] = None
+        self._hits = 0
+        self._misses = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    @property
+    def model_id(self) -> str:
+        """Fingerprint of the model whose vectors are stored."""
+        return self._model_id
+
+    def key(self, text: str) -> bytes:
+        """Return the store key of a text for this store's model.
+
+        Args:
+            text: Embedded text.
+
+        Returns:
+            16-byte content key.
+        """
+        return content_key(text, self._model_id)
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """Look up the cached embedding of a text.
+
+        Args:
+            text: Embedded text.
+
+        Returns:
+            A copy of the stored vector, or None if it is not cached.
+        """
+        return self.get_many([text])[0]
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Look up cached embeddings for several texts.
+
+        Args:
+            texts: Embedded texts.
+
+        Returns:
+            One vector (copied out of the mapping) or None per text.
+        """
+        keys = [self.key(text) for text in texts]
+        with self._lock:
+            results: List[Optional[np.ndarray]] = []
+            for key in keys:
+                row = self._index.get(key)
+                if row is None:
+                    self._misses += 1
+                    results.append(None)
+                else:
+                    self._hits += 1
+                    results.append(np.array(self._matrix()[row]))
+            return results
+
+    def put_many(self, texts: List[str], vectors: np.ndarray) -> int:
+        """Append embeddings for texts that are not stored yet.
+
+        Zero vectors (failed inference) are never stored.
+
+        Args:
+            texts: Embedded texts.
+            vectors: Matrix of shape (len(texts), dim).
+
+        Returns:
+            Number of rows appended.
+        """
+        with self._lock:
+            new_keys: List[bytes] = []
+            new_rows: List[np.ndarray] = []
+            for text, vector in zip(texts, vectors):
+                key = self.key(text)
+                if key in self._index or not vector.any():
+                    continue
+                self._index[key] = self._rows + len(new_keys)
+                new_keys.append(key)
+                new_rows.append(vector)
+
+            if not new_keys:
+                return 0
+
+            block = np.ascontiguousarray(new_rows, dtype=np.float32)
+            with open(self._vectors_path, "ab") as f:
+                f.write(block.tobytes())
+            with open(self._keys_path, "ab") as f:
+                f.write(b"".join(new_keys))
+            self._rows += len(new_keys)
+            return len(new_keys)
+
+    def compact(self, live_texts: Iterable[str]) -> Dict[str, int]:
+        """Rewrite the store keeping only rows still referenced.
+
+        Args:
+            live_texts: Every text whose embedding should be kept, e.g.
+                the content of all memories currently stored.
+
+        Returns:
+            Dict with the number of rows kept, rows removed and bytes
+            reclaimed.
+        """
+        live_keys = {self.key(text) for text in live_texts}
+
+        with self._lock:
+            before = self._rows
+            size_before = self._disk_size()
+            kept = sorted(
+                (row, key)
+                for key, row in self._index.items()
+                if key in live_keys
+            )
+
+            generation = self._generation + 1
+            new_dir = generations.new_generation(self._directory, generation)
+            new_vectors = os.path.join(new_dir, VECTORS_FILE)
+            new_keys = os.path.join(new_dir, KEYS_FILE)
+            matrix = self._matrix()
+            with open(new_vectors, "wb") as fv, open(new_keys, "wb") as fk:
+                for row, key in kept:
+                    fv.write(np.ascontiguousarray(matrix[row]).tobytes())
+                    fk.write(key)
+                for f in (fv, fk):
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            # Release the mapping before switching files (required on Windows).
+            matrix = None
+            self._mapped = None
+            old_files = (self._vectors_path, self._keys_path)
+            generations.switch_generation(self._directory, generation)
+            self._vectors_path, self._keys_path = new_vectors, new_keys
+            self._generation = generation
+            for path in old_files:
+                os.remove(path)
+            generations.remove_stale(self._directory, generation)
+
+            self._index = {
+                key: new_row for new_row, (_, key) in enumerate(kept)
+            }
+            self._rows = len(kept)
+            reclaimed = size_before - self._disk_size()
+
+        logging.info(
+            f"Embedding store compacted: kept {len(kept)}, "
+            f"removed {before - len(kept)}, reclaimed {reclaimed} bytes"
+        )
+        return {
+            "kept": len(kept),
+            "removed": before - len(kept),
+            "bytes_reclaimed": reclaimed
+        }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._rows
+
+    def stats(self) -> Dict[str, int]:
+        """Return row count, disk usage and lookup counters.
+
+        Returns:
+            Dict with rows, disk_bytes, hits and misses.
+        """
+        with self._lock:
+            return {
+                "rows": self._rows,
+                "disk_bytes": self._disk_size(),
+                "hits": self._hits,
+                "misses": self._misses
+            }
+
+    def _load(self) -> None:
+        """Pick the current generation, index its keys, repair a torn append."""
+        self._generation = generations.current_generation(self._directory)
+        data_dir = generations.generation_dir(self._directory, self._generation)
+        self._vectors_path = os.path.join(data_dir, VECTORS_FILE)
+        self._keys_path = os.path.join(data_dir, KEYS_FILE)
+        generations.remove_stale(
+            self._directory, self._generation, (VECTORS_FILE, KEYS_FILE)
+        )
+
+        for path in (self._vectors_path, self._keys_path):
+            if not os.path.exists(path):
+                open(path, "wb").close()
+
+        vector_rows = os.path.getsize(self._vectors_path) // self._row_bytes
+        key_rows = os.path.getsize(self._keys_path) // KEY_SIZE
+        rows = min(vector_rows, key_rows)
+
+        if os.path.getsize(self._vectors_path) != rows * self._row_bytes:
+            os.truncate(self._vectors_path, rows * self._row_bytes)
+        if os.path.getsize(self._keys_path) != rows * KEY_SIZE:
+            os.truncate(self._keys_path, rows * KEY_SIZE)
+
+        keys = np.fromfile(self._keys_path, dtype=f"V{KEY_SIZE}", count=rows)
+        self._index = {key.tobytes(): row for row, key in enumerate(keys)}
+        self._rows = rows
+
+    def _matrix(self) -> np.ndarray:
+        """Return a read-only mapping covering every appended row."""
+        if self._rows == 0:
+            return np.zeros((0, self._dim), dtype=np.float32)
+        if self._mapped is None or self._mapped.shape[0] < self._rows:
+            self._mapped = np.memmap(
+                self._vectors_path,
+                dtype=np.float32,
+                mode="r",
+                shape=(self._rows, self._dim)
+            )
+        return self._mapped
+
+    def _disk_size(self) -> int:
+        """Return the combined size of the store files in bytes."""
+        return sum(
+            os.path.getsize(path)
+            for path in (self._vectors_path, self._keys_path)
+            if os.path.exists(path)
+        )
@@ -0,0 +1,162 @@
+"""Tag and creation-time filters pushed down into both retrieval legs."""
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, List, Optional, Sequence, Tuple, Union
+
+
+@dataclass(frozen=True)
+class SearchFilter:
+    """Restricts a search to memories with all ``tags`` created in a range.
+
+    ``created_after`` is inclusive and ``created_before`` exclusive, both
+    Unix seconds. Instances are hashable so they can be part of a cache
+    key.
+    """
+
+    tags: Tuple[str, ...] = ()
+    created_after: Optional[float] = None
+    created_before: Optional[float] = None
+
+    @classmethod
+    def build(
+        cls,
+        tags: Optional[Sequence[str]] = None,
+        created_after: Union[str, float, None] = None,
+        created_before: Union[str, float, None] = None
+    ) -> Optional["SearchFilter"]:
+        """Build a filter from tool arguments.
+
+        Args:
+            tags: Tags a memory must all carry.
+            created_after: ISO 8601 date/datetime or Unix seconds.
+            created_before: ISO 8601 date/datetime or Unix seconds.
+
+        Returns:
+            A filter, or None if no constraint was given.
+
+        Raises:
+            ValueError: If a time cannot be parsed.
+        """
+        tags = tuple(sorted({tag for tag in (tags or []) if tag}))
+        after = parse_time(created_after)
+        before = parse_time(created_before)
+        if not tags and after is None and before is None:
+            return None
+        return cls(tags=tags, created_after=after, created_before=before)
+
+    def matches(self, tags: Sequence[str], created_at: Optional[float]) -> bool:
+        """Check one memory against the filter.
+
+        Args:
+            tags: The memory's tags.
+            created_at: Its creation time (Unix seconds).
+
+        Returns:
+            True if the memory is eligible.
+        """
+        if not set(self.tags).issubset(tags):
+            return False
+        if self.created_after is not None or self.created_before is not None:
+            if created_at is None:
+                return False
+            after, before = self.created_after, self.created_before
+            if after is not None and created_at < after:
+                return False
+            if before is not None and created_at >= before:
+                return False
+        return True
+
+    def fts_match(self, query: str) -> str:
+        """Return the FTS5 MATCH expression for a prefix query and tags.
+
+        Args:
+            query: User query.
+
+        Returns:
+            The query with a ``tags`` column filter per required tag.
+        """
+        if not self.tags:
+            return f"{query}*"
+        constraints = " AND ".join(
+            'tags : "' + tag.replace('"', '""') + '"' for tag in self.tags
+        )
+        return f"({query}*) AND {constraints}"
+
+    def sql_conditions(self, alias: str = "m") -> Tuple[str, List[Any]]:
+        """Return exact SQL conditions on the ``memories`` table.
+
+        The FTS column filter matches tokens, so a tag like ``c++`` would
+        also match ``c``; these conditions make the tag match exact.
+
+        Args:
+            alias: Alias of the ``memories`` table in the query.
+
+        Returns:
+            Tuple of (" AND ..." clause, parameters).
+        """
+        clauses: List[str] = []
+        params: List[Any] = []
+        for tag in self.tags:
+            clauses.append(f"instr(' ' || {alias}.tags || ' ', ?) > 0")
+            params.append(f" {tag} ")
+        if self.created_after is not None:
+            clauses.append(f"{alias}.created_at >= ?")
+            params.append(self.created_after)
+        if self.created_before is not None:
+            clauses.append(f"{alias}.created_at < ?")
+            params.append(self.created_before)
+        return "".join(f" AND {clause}" for clause in clauses), params
+
+    def lance_where(self, include_time: bool = True) -> str:
+        """Return a LanceDB ``where`` prefilter.
+
+        Rows written before ``created_at`` existed in LanceDB have it NULL
+        and pass the time bounds here; callers re-check them with
+        ``matches``. ``_`` in a tag acts as a LIKE wildcard, which can
+        only admit extra rows, so the re-check covers it as well.
+
+        Args:
+            include_time: False if the table has no ``created_at`` column.
+
+        Returns:
+            SQL filter expression.
+        """
+        clauses = [
+            "concat(' ', tags, ' ') LIKE '% " + tag.replace("'", "''") + " %'"
+            for tag in self.tags
+        ]
+        if include_time and self.created_after is not None:
+            clauses.append(
+                f"(created_at IS NULL OR created_at >= {self.created_after!r})")
+        if include_time and self.created_before is not None:
+            clauses.append(
+                f"(created_at IS NULL OR created_at < {self.created_before!r})")
+        return " AND ".join(clauses)
+
+
+def parse_time(value: Union[str, float, None]) -> Optional[float]:
+    """Parse a time given as Unix seconds or ISO 8601.
+
+    Naive datetimes and plain dates are taken as UTC.
+
+    Args:
+        value: Number, numeric string, ISO 8601 string, or None.
+
+    Returns:
+        Unix seconds, or None for None / "".
+
+    Raises:
+        ValueError: If the value cannot be parsed.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
@@ -0,0 +1,85 @@
+"""Atomic replacement of a set of store files through generation directories."""
+import os
+import shutil
+from typing import Iterable
+
+
+CURRENT_FILE = "CURRENT"
+GENERATION_PREFIX = "gen-"
+
+
+def current_generation(directory: str) -> int:
+    """Return the generation ``CURRENT`` points at.
+
+    Generation 0 means the files live directly in ``directory``.
+    """
+    path = os.path.join(directory, CURRENT_FILE)
+    if not os.path.exists(path):
+        return 0
+    with open(path, encoding="utf-8") as f:
+        return int(f.read().strip()[len(GENERATION_PREFIX):])
+
+
+def generation_dir(directory: str, generation: int) -> str:
+    """Directory holding the files of a generation."""
+    if generation == 0:
+        return directory
+    return os.path.join(directory, f"{GENERATION_PREFIX}{generation}")
+
+
+def new_generation(directory: str, generation: int) -> str:
+    """Create an empty directory for the next generation's files.
+
+    Returns:
+        The directory; write every file there, then ``switch_generation``.
+    """
+    path = generation_dir(directory, generation)
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+    return path
+
+
+def switch_generation(directory: str, generation: int) -> None:
+    """Point ``CURRENT`` at a generation with one atomic rename.
+
+    Every file of the generation must already be written and fsynced, so
+    a crash leaves either the old set of files or the new one.
+    """
+    path = os.path.join(directory, CURRENT_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(f"{GENERATION_PREFIX}{generation}\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+    if hasattr(os, "O_DIRECTORY"):
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def remove_stale(
+    directory: str, generation: int, base_files: Iterable[str] = ()
+) -> None:
+    """Delete files of generations other than the current one.
+
+    They are left by a swap that crashed before (new, unfinished) or after
+    (old, replaced) switching ``CURRENT``.
+
+    Args:
+        directory: Store directory.
+        generation: Current generation.
+        base_files: Names of the store files as written directly in
+            ``directory`` by generation 0; removed once a later
+            generation is current.
+    """
+    current = f"{GENERATION_PREFIX}{generation}"
+    for name in os.listdir(directory):
+        if name.startswith(GENERATION_PREFIX) and name != current:
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+    if generation:
+        for name in base_files:
+            path = os.path.join(directory, name)
+            if os.path.exists(path):
+                os.remove(path)
@@ -0,0 +1,418 @@
+"""Crash-safe write-behind journal for memory saves."""
+import collections
+import itertools
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+
+JOURNAL_FILE = "journal.jsonl"
+DEAD_LETTER_FILE = "journal.dead.jsonl"
+DEFAULT_BATCH_SIZE = 32
+DEFAULT_RETRY_SECONDS = 1.0
+DEFAULT_MAX_RETRY_SECONDS = 60.0
+DEFAULT_MAX_ATTEMPTS = 8
+DEFAULT_COMPACT_BYTES = 4 * 1024 * 1024
+DEFAULT_CANCEL_TIMEOUT = 30.0
+
+
+class IngestJournal:
+    """Durable queue of saves that are stored in the background.
+
+    ``append`` writes each memory as a JSON line and fsyncs it before
+    returning, so a save is never lost once acknowledged. A worker drains
+    the queue in order, ``batch_size`` entries at a time, through the
+    ``apply`` callback (one embed batch, one SQLite transaction, one
+    vector add), then appends an ``{"applied": n}`` marker. On open,
+    entries after the last marker are queued again and handed to
+    ``apply`` with ``replay=True``: a crash between storing a batch and
+    marking it makes the batch run twice, so ``apply`` must be
+    idempotent. Failed batches are retried, also with ``replay=True``,
+    since a failure may come after part of the batch was stored. The
+    pause starts at ``retry_seconds`` and doubles per failure up to
+    ``max_retry_seconds``.
+
+    A batch that fails ``max_attempts`` times is retried one entry at a
+    time, once each; entries that still fail are moved to
+    ``journal.dead.jsonl`` with their error and counted in ``stats``, so
+    one poisoned save cannot block every later one.
+
+    Records: ``{"n": seq, "memory": {...}}`` for a save,
+    ``{"cancel": id}`` for a save deleted before it was applied,
+    ``{"applied": seq}``, and ``{"dead": seq}`` once the entries up to
+    ``seq`` are dead-lettered. The file is truncated whenever the queue
+    is empty and it has grown past ``compact_bytes``.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        apply: Callable[[List[Dict[str, Any]], bool], None],
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        retry_seconds: float = DEFAULT_RETRY_SECONDS,
+        compact_bytes: int = DEFAULT_COMPACT_BYTES,
+        fsync: bool = True,
+        max_retry_seconds: float = DEFAULT_MAX_RETRY_SECONDS,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS
+    ):
+        """Open (or create) the journal and start draining it.
+
+        Args:
+            directory: Directory holding the journal file.
+            apply: Stores a batch of memory dicts; the flag is True for
+                entries replayed after a restart.
+            batch_size: Entries per ``apply`` call.
+            retry_seconds: Pause after the first failure of a batch.
+            compact_bytes: Size past which a drained journal is truncated.
+            fsync: Fsync every append (turn off only for tests).
+            max_retry_seconds: Longest pause between retries.
+            max_attempts: Failures of a batch before its entries are
+                tried alone and dead-lettered if they fail again.
+        """
+        self._path = os.path.join(directory, JOURNAL_FILE)
+        self._dead_path = os.path.join(directory, DEAD_LETTER_FILE)
+        self._apply = apply
+        self._batch_size = max(1, batch_size)
+        self._retry_seconds = retry_seconds
+        self._max_retry_seconds = max(retry_seconds, max_retry_seconds)
+        self._max_attempts = max(1, max_attempts)
+        self._compact_bytes = compact_bytes
+        self._fsync = fsync
+
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._pending: Deque[Tuple[int, Dict[str, Any]]] = collections.deque()
+        self._in_flight = 0
+        self._replay_until = 0
+        # Entries up to this seq are applied alone after their batch
+        # used up its attempts.
+        self._isolate_until = 0
+        self._attempts = 0
+        self._next_n = 1
+        self._closed = False
+        self._applied = 0
+        self._batches = 0
+        self._failures = 0
+        self._dead_lettered = 0
+        self._last_error: Optional[str] = None
+
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+        self._file = open(self._path, "a", encoding="utf-8")
+        self._worker = threading.Thread(
+            target=self._run, name="journal-drain", daemon=True
+        )
+        self._worker.start()
+
+    def append(self, memories: Sequence[Dict[str, Any]]) -> None:
+        """Durably queue memories for storage.
+
+        Args:
+            memories: Dicts with id, content, tags, note, created_at and
+                channel.
+
+        Raises:
+            RuntimeError: If the journal is closed.
+        """
+        with self._changed:
+            if self._closed:
+                raise RuntimeError("Journal is closed")
+            entries = []
+            for memory in memories:
+                entries.append((self._next_n, dict(memory)))
+                self._next_n += 1
+            self._write([{"n": n, "memory": memory} for n, memory in entries])
+            self._pending.extend(entries)
+            self._changed.notify_all()
+
+    def cancel(
+        self, memory_id: str, timeout: Optional[float] = DEFAULT_CANCEL_TIMEOUT
+    ) -> bool:
+        """Drop a queued save that has not been applied yet.
+
+        If the memory is in the batch being applied, waits for that batch
+        to be stored so the caller can delete it like any stored memory.
+        A memory from a failed or replayed batch may be partly stored: it
+        is dropped from the queue but reported as not queued, so the
+        caller deletes whatever was stored.
+
+        Args:
+            memory_id: Memory id.
+            timeout: Seconds to wait for an in-flight batch (None: no limit).
+
+        Returns:
+            True if the memory was still queued and never stored.
+
+        Raises:
+            TimeoutError: If the in-flight batch was not stored in time
+                (e.g. it keeps failing); the save is still queued.
+        """
+        with self._changed:
+            for index, (n, memory) in enumerate(self._pending):
+                if memory["id"] != memory_id:
+                    continue
+                if index >= self._in_flight:
+                    del self._pending[index]
+                    self._write([{"cancel": memory_id}])
+                    return n > self._replay_until
+                if not self._changed.wait_for(
+                    lambda: self._closed or all(
+                        m["id"] != memory_id for _, m in self._pending
+                    ),
+                    timeout
+                ):
+                    raise TimeoutError(
+                        f"Memory {memory_id} is still being stored "
+                        f"({self._last_error or 'busy'})"
+                    )
+                return False
+        return False
+
+    def pending(self, channel: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Return a snapshot of the memories not stored yet, oldest first."""
+        with self._lock:
+            return [
+                dict(memory) for _, memory in self._pending
+                if channel is None or memory.get("channel") == channel
+            ]
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued save is applied.
+
+        Returns:
+            False if the timeout expired first.
+        """
+        with self._changed:
+            return self._changed.wait_for(lambda: not self._pending, timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth, oldest pending age and drain counters."""
+        with self._lock:
+            oldest = None
+            if self._pending:
+                oldest = self._pending[0][1].get("created_at")
+            age = round(time.time() - oldest, 3) if oldest else 0.0
+            return {
+                "pending": len(self._pending),
+                "oldest_pending_seconds": age,
+                "applied": self._applied,
+                "batches": self._batches,
+                "failures": self._failures,
+                "dead_lettered": self._dead_lettered,
+                "last_error": self._last_error
+            }
+
+    def close(self, timeout: Optional[float] = 5.0) -> None:
+        """Stop the worker; queued saves stay in the file for the next start."""
+        with self._changed:
+            self._closed = True
+            self._changed.notify_all()
+        self._worker.join(timeout=timeout)
+        with self._lock:
+            self._file.close()
+
+    def _run(self) -> None:
+        """Worker loop: apply the head of the queue batch by batch."""
+        while True:
+            with self._changed:
+                self._changed.wait_for(lambda: self._pending or self._closed)
+                if self._closed:
+                    return
+                isolated = self._pending[0][0] <= self._isolate_until
+                size = 1 if isolated else self._batch_size
+                batch = list(itertools.islice(self._pending, size))
+                self._in_flight = len(batch)
+            replay = batch[0][0] <= self._replay_until
+            try:
+                self._apply([memory for _, memory in batch], replay)
+            except Exception as e:
+                with self._changed:
+                    self._failed(batch, e, isolated)
+                continue
+
+            with self._changed:
+                if self._closed:
+                    # Not marked: the batch is replayed on the next open.
+                    return
+                for _ in batch:
+                    self._pending.popleft()
+                self._in_flight = 0
+                self._attempts = 0
+                self._write([{"applied": batch[-1][0]}])
+                self._applied += len(batch)
+                self._batches += 1
+                if (not self._pending
+                        and self._file.tell() > self._compact_bytes):
+                    self._file.truncate(0)
+                    self._file.seek(0)
+                self._changed.notify_all()
+
+    def _failed(
+        self, batch: List[Tuple[int, Dict[str, Any]]], error: Exception,
+        isolated: bool
+    ) -> None:
+        """Handle a failed batch: back off, isolate or dead-letter it.
+
+        Caller holds the lock.
+        """
+        self._in_flight = 0
+        # Part of the batch may have been stored before the failure: the
+        # retry must delete before inserting.
+        self._replay_until = max(self._replay_until, batch[-1][0])
+        self._failures += 1
+        self._last_error = str(error)
+        self._attempts += 1
+
+        if isolated or self._attempts >= self._max_attempts:
+            self._attempts = 0
+            if len(batch) > 1:
+                logging.error(
+                    f"Journal: {len(batch)} memories failed "
+                    f"{self._max_attempts} times, retrying one by one: {error}"
+                )
+                self._isolate_until = batch[-1][0]
+            else:
+                self._dead_letter(batch, error)
+            return
+
+        delay = min(
+            self._retry_seconds * 2 ** (self._attempts - 1),
+            self._max_retry_seconds
+        )
+        logging.error(
+            f"Journal: storing {len(batch)} memories failed, "
+            f"retry in {delay:.1f}s: {error}"
+        )
+        # Appends notify the condition; only close() may cut the pause.
+        self._changed.wait_for(lambda: self._closed, delay)
+
+    def _dead_letter(
+        self, batch: List[Tuple[int, Dict[str, Any]]], error: Exception
+    ) -> None:
+        """Move entries to the dead-letter file (caller holds the lock)."""
+        logging.error(
+            f"Journal: giving up on memories "
+            f"{[memory['id'] for _, memory in batch]}, see {self._dead_path}: "
+            f"{error}"
+        )
+        with open(self._dead_path, "a", encoding="utf-8") as f:
+            f.writelines(
+                json.dumps(
+                    {"n": n, "memory": memory, "error": str(error),
+                     "at": time.time()},
+                    ensure_ascii=False
+                ) + "\n"
+                for n, memory in batch
+            )
+            f.flush()
+            if self._fsync:
+                os.fsync(f.fileno())
+        for _ in batch:
+            self._pending.popleft()
+        self._write([{"dead": batch[-1][0]}])
+        self._dead_lettered += len(batch)
+        self._changed.notify_all()
+
+    def _write(self, records: List[Dict[str, Any]]) -> None:
+        """Append records durably (caller holds the lock)."""
+        self._file.write("".join(
+            json.dumps(record, ensure_ascii=False) + "\n" for record in records
+        ))
+        self._file.flush()
+        if self._fsync:
+            os.fsync(self._file.fileno())
+
+    def _load(self) -> None:
+        """Queue entries written after the last applied marker.
+
+        A torn last line (crash mid-append) is dropped: its save was
+        never acknowledged.
+        """
+        if not os.path.exists(self._path):
+            return
+        entries: Dict[int, Dict[str, Any]] = {}
+        cancelled = set()
+        applied = 0
+        good_bytes = 0
+        with open(self._path, "rb") as f:
+            for line in f:
+                try:
+                    record = json.loads(line) if line.endswith(b"\n") else None
+                except ValueError:
+                    record = None
+                if record is None:
+                    break
+                good_bytes += len(line)
+                if "n" in record:
+                    entries[record["n"]] = record["memory"]
+                elif "cancel" in record:
+                    cancelled.add(record["cancel"])
+                elif "applied" in record or "dead" in record:
+                    marker = record.get("applied", record.get("dead"))
+                    applied = max(applied, marker)
+        if os.path.getsize(self._path) != good_bytes:
+            os.truncate(self._path, good_bytes)
+
+        self._pending.extend(
+            (n, memory) for n, memory in sorted(entries.items())
+            if n > applied and memory["id"] not in cancelled
+        )
+        self._next_n = max(entries, default=applied) + 1
+        if self._pending:
+            self._replay_until = self._pending[-1][0]
+            logging.info(
+                f"Journal: replaying {len(self._pending)} unapplied saves"
+            )
+
+
+def match_pending(
+    memories: Sequence[Dict[str, Any]],
+    query: str,
+    search_filter: Optional[Any] = None,
+    limit: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """Find queued memories matching a query, for read-your-writes search.
+
+    Pending memories have no embedding or FTS entry yet, so a memory
+    matches when it contains every word of the query (case-insensitive)
+    in its content, tags or note.
+
+    Args:
+        memories: ``IngestJournal.pending`` output.
+        query: Search query.
+        search_filter: Optional ``SearchFilter``.
+        limit: Maximum results, newest first.
+
+    Returns:
+        Result dicts shaped like ``hybrid_search`` results, marked
+        ``pending`` with source ``"pending"``.
+    """
+    words = [word.lower() for word in re.findall(r"\w+", query)]
+    results = []
+    for memory in reversed(memories):
+        tags = memory.get("tags") or []
+        haystack = " ".join(
+            [memory["content"], " ".join(tags), memory.get("note", "")]
+        ).lower()
+        if not words or not all(word in haystack for word in words):
+            continue
+        if search_filter is not None and not search_filter.matches(
+            tags, memory.get("created_at")
+        ):
+            continue
+        results.append({
+            "id": memory["id"],
+            "content": memory["content"],
+            "tags": list(tags),
+            "note": memory.get("note", ""),
+            "channel": memory.get("channel"),
+            "sources": ["pending"],
+            "pending": True
+        })
+        if limit is not None and len(results) >= limit:
+            break
+    return results
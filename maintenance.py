@@ -0,0 +1,204 @@
+"""Background fragment compaction and version cleanup for LanceDB tables."""
+import logging
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+
+DEFAULT_COMPACT_AFTER_ADDS = 200
+DEFAULT_COMPACT_AFTER_DELETES = 100
+DEFAULT_INTERVAL_SECONDS = 3600.0
+DEFAULT_KEEP_VERSIONS_FOR = timedelta(hours=1)
+
+
+class TableMaintenance:
+    """Keeps a LanceDB table from degrading into many tiny fragments.
+
+    Every single-row ``add`` writes a new fragment and every ``delete``
+    writes a deletion file. This class counts both, and once either
+    threshold is crossed (or the periodic timer fires with writes
+    pending) it compacts the data files and removes table versions older
+    than ``keep_versions_for`` on a background thread. LanceDB commits
+    the compaction as a new version, so searches keep reading the old
+    one in the meantime and are never blocked.
+    """
+
+    def __init__(
+        self,
+        table: Any,
+        compact_after_adds: int = DEFAULT_COMPACT_AFTER_ADDS,
+        compact_after_deletes: int = DEFAULT_COMPACT_AFTER_DELETES,
+        keep_versions_for: timedelta = DEFAULT_KEEP_VERSIONS_FOR,
+        interval_seconds: Optional[float] = DEFAULT_INTERVAL_SECONDS
+    ):
+        """Create the maintainer and start its periodic timer.
+
+        Args:
+            table: LanceDB table to maintain.
+            compact_after_adds: ``add`` calls (≈ new fragments) that
+                trigger a run.
+            compact_after_deletes: Deleted rows that trigger a run.
+            keep_versions_for: Versions younger than this are kept so
+                in-flight readers never lose their snapshot.
+            interval_seconds: Period of the timer that runs maintenance
+                if any writes are pending; None disables the timer.
+        """
+        self._table = table
+        self._compact_after_adds = compact_after_adds
+        self._compact_after_deletes = compact_after_deletes
+        self._keep_versions_for = keep_versions_for
+
+        self._lock = threading.Lock()
+        self._running = False
+        self._adds_since_run = 0
+        self._deletes_since_run = 0
+        self._runs = 0
+        self._last_report: Optional[Dict[str, Any]] = None
+        self._last_error: Optional[str] = None
+
+        self._stop = threading.Event()
+        self._timer: Optional[threading.Thread] = None
+        if interval_seconds:
+            self._timer = threading.Thread(
+                target=self._run_timer, args=(interval_seconds,),
+                name="lance-maintenance-timer", daemon=True
+            )
+            self._timer.start()
+
+    def note_writes(self, adds: int = 0, deleted_rows: int = 0) -> None:
+        """Record writes and start a background run if a threshold is hit.
+
+        Args:
+            adds: Number of ``add`` calls made.
+            deleted_rows: Number of rows deleted.
+        """
+        with self._lock:
+            self._adds_since_run += adds
+            self._deletes_since_run += deleted_rows
+            due = (
+                self._adds_since_run >= self._compact_after_adds
+                or self._deletes_since_run >= self._compact_after_deletes
+            )
+        if due:
+            self.run_in_background()
+
+    def run_in_background(self) -> bool:
+        """Start a maintenance run on a background thread.
+
+        Returns:
+            False if a run is already in progress.
+        """
+        with self._lock:
+            if self._running:
+                return False
+            self._running = True
+        threading.Thread(
+            target=self._run_guarded, name="lance-maintenance", daemon=True
+        ).start()
+        return True
+
+    def run(self) -> Dict[str, Any]:
+        """Compact fragments and clean up old versions synchronously.
+
+        Returns:
+            Report of what was reclaimed: fragment counts before and after,
+            files rewritten, old versions and bytes removed, and seconds.
+
+        Raises:
+            RuntimeError: If a run is already in progress.
+        """
+        with self._lock:
+            if self._running:
+                raise RuntimeError("Maintenance is already running")
+            self._running = True
+        try:
+            return self._run()
+        finally:
+            with self._lock:
+                self._running = False
+
+    def stats(self) -> Dict[str, Any]:
+        """Return pending-write counters and the last report.
+
+        Returns:
+            Dict with fragment count, pending adds and deletes, run
+            count, running flag, last report and last error.
+        """
+        with self._lock:
+            stats = {
+                "adds_since_run": self._adds_since_run,
+                "deleted_rows_since_run": self._deletes_since_run,
+                "running": self._running,
+                "runs": self._runs,
+                "last_report": self._last_report,
+                "last_error": self._last_error
+            }
+        stats["fragments"] = self._fragment_count()
+        return stats
+
+    def close(self) -> None:
+        """Stop the periodic timer."""
+        self._stop.set()
+        if self._timer is not None:
+            self._timer.join(timeout=1)
+
+    def _run_guarded(self) -> None:
+        """Thread target: run once and record any failure."""
+        try:
+            self._run()
+        except Exception as e:
+            logging.error(f"LanceDB maintenance failed: {e}")
+            with self._lock:
+                self._last_error = str(e)
+        finally:
+            with self._lock:
+                self._running = False
+
+    def _run(self) -> Dict[str, Any]:
+        """Do the actual compaction and cleanup (caller holds ``_running``)."""
+        started = time.monotonic()
+        with self._lock:
+            adds, deletes = self._adds_since_run, self._deletes_since_run
+        fragments_before = self._fragment_count()
+
+        compaction = self._table.compact_files()
+        cleanup = self._table.cleanup_old_versions(
+            older_than=self._keep_versions_for
+        )
+
+        report = {
+            "fragments_before": fragments_before,
+            "fragments_after": self._fragment_count(),
+            "fragments_removed": getattr(compaction, "fragments_removed", None),
+            "fragments_added": getattr(compaction, "fragments_added", None),
+            "files_removed": getattr(compaction, "files_removed", None),
+            "files_added": getattr(compaction, "files_added", None),
+            "old_versions_removed": getattr(cleanup, "old_versions", None),
+            "bytes_removed": getattr(cleanup, "bytes_removed", None),
+            "seconds": time.monotonic() - started
+        }
+        with self._lock:
+            # Writes that arrived during the run count toward the next one.
+            self._adds_since_run -= adds
+            self._deletes_since_run -= deletes
+            self._runs += 1
+            self._last_report = report
+            self._last_error = None
+        logging.info(f"LanceDB maintenance done: {report}")
+        return report
+
+    def _run_timer(self, interval_seconds: float) -> None:
+        """Timer loop: run maintenance periodically if writes are pending."""
+        while not self._stop.wait(interval_seconds):
+            with self._lock:
+                pending = self._adds_since_run or self._deletes_since_run
+            if pending:
+                self.run_in_background()
+
+    def _fragment_count(self) -> Optional[int]:
+        """Return the table's fragment count, None if it cannot be read."""
+        try:
+            return len(self._table.to_lance().get_fragments())
+        except Exception:
+            return None
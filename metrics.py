@@ -0,0 +1,338 @@
+"""Per-stage latency histograms, counters and a slow-query log."""
+import contextlib
+import logging
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+
+DEFAULT_WINDOW = 1024
+DEFAULT_SLOW_QUERY_MS = 500.0
+DEFAULT_SLOW_LOG_SIZE = 50
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Stage names recorded by SearchService.
+STAGE_SEARCH = "search"
+STAGE_TOKENIZE = "tokenize"
+STAGE_SESSION_RUN = "session_run"
+STAGE_EMBEDDER = "embedder"
+STAGE_EMBED_QUERY = "embed_query"
+STAGE_FTS = "fts"
+STAGE_VECTOR_SCAN = "vector_scan"
+STAGE_FUSION = "rrf_fusion"
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram:
+    """Latency samples of one stage.
+
+    Quantiles are exact over the most recent ``window`` samples; count,
+    sum and max cover every sample since start.
+    """
+
+    def __init__(self, window: int = DEFAULT_WINDOW):
+        self._samples: "deque[float]" = deque(maxlen=max(1, window))
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def total(self) -> float:
+        return self._sum
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+        self._count += 1
+        self._sum += seconds
+        self._max = max(self._max, seconds)
+
+    def quantiles(self) -> Dict[float, float]:
+        """Return the ``QUANTILES`` of the window (nearest rank)."""
+        ordered = sorted(self._samples)
+        if not ordered:
+            return {q: 0.0 for q in QUANTILES}
+        last = len(ordered) - 1
+        return {
+            q: ordered[min(last, max(0, int(round(q * len(ordered))) - 1))]
+            for q in QUANTILES
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        """Return count, sum and quantiles in milliseconds."""
+        quantiles = self.quantiles()
+        return {
+            "count": self._count,
+            "sum_ms": round(self._sum * 1000, 3),
+            "p50_ms": round(quantiles[0.5] * 1000, 3),
+            "p95_ms": round(quantiles[0.95] * 1000, 3),
+            "p99_ms": round(quantiles[0.99] * 1000, 3),
+            "max_ms": round(self._max * 1000, 3)
+        }
+
+
+class Metrics:
+    """Thread-safe registry of stage timers, counters and slow queries.
+
+    Stages are timed with ``timer`` (or ``observe``) and summarized as
+    p50/p95/p99 histograms. Counters carry optional labels, e.g.
+    ``increment("leg_failures", leg="fts")``. A query slower than
+    ``slow_query_ms`` is logged at warning level together with its
+    per-stage breakdown and kept in a bounded log. Gauges are callables
+    read when a snapshot or Prometheus page is rendered.
+    """
+
+    def __init__(
+        self,
+        window: int = DEFAULT_WINDOW,
+        slow_query_ms: Optional[float] = DEFAULT_SLOW_QUERY_MS,
+        slow_log_size: int = DEFAULT_SLOW_LOG_SIZE,
+        clock: Callable[[], float] = time.perf_counter
+    ):
+        """Create an empty registry.
+
+        Args:
+            window: Recent samples per stage used for quantiles.
+            slow_query_ms: Queries at least this slow are logged, None
+                disables the slow-query log.
+            slow_log_size: Slow queries kept for ``snapshot``.
+            clock: Time source in seconds, injectable for tests.
+        """
+        self._window = window
+        self._slow_query_ms = slow_query_ms
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Histogram] = {}
+        self._counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], int] = {}
+        self._gauges: Dict[str, Callable[[], float]] = {}
+        self._slow_queries: "deque[Dict[str, Any]]" = deque(
+            maxlen=max(1, slow_log_size)
+        )
+
+    @property
+    def slow_query_ms(self) -> Optional[float]:
+        """Slow-query threshold in milliseconds (None: disabled)."""
+        return self._slow_query_ms
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """Record one duration of ``stage``."""
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram(self._window)
+            histogram.observe(seconds)
+
+    @contextlib.contextmanager
+    def timer(
+        self, stage: str, trace: Optional[Dict[str, float]] = None
+    ) -> Iterator[None]:
+        """Time the block as ``stage``, also adding it to ``trace`` if given.
+
+        The duration is recorded even if the block raises.
+        """
+        started = self._clock()
+        try:
+            yield
+        finally:
+            seconds = self._clock() - started
+            self.observe(stage, seconds)
+            if trace is not None:
+                trace[stage] = trace.get(stage, 0.0) + seconds
+
+    def increment(self, counter: str, amount: int = 1, **labels: str) -> None:
+        """Add ``amount`` to a counter, keyed by its labels."""
+        key = (counter, _sorted_labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def counter(self, counter: str, **labels: str) -> int:
+        """Current value of a counter (0 if never incremented)."""
+        key = (counter, _sorted_labels(labels))
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def gauge(self, name: str, read: Callable[[], float]) -> None:
+        """Register a gauge read on every snapshot."""
+        with self._lock:
+            self._gauges[name] = read
+
+    def record_query(
+        self,
+        query: str,
+        seconds: float,
+        trace: Optional[Dict[str, float]] = None,
+        **details: Any
+    ) -> None:
+        """Record an end-to-end search and log it if it was slow.
+
+        Args:
+            query: Query text (truncated in the log).
+            seconds: End-to-end duration.
+            trace: Per-stage seconds of this query.
+            details: Extra fields kept with a slow entry (e.g. channel).
+        """
+        self.observe(STAGE_SEARCH, seconds)
+        if self._slow_query_ms is None or seconds * 1000 < self._slow_query_ms:
+            return
+        self.increment("slow_queries")
+        entry = {
+            "query": query[:200],
+            "total_ms": round(seconds * 1000, 3),
+            "stages_ms": {
+                stage: round(value * 1000, 3)
+                for stage, value in (trace or {}).items()
+            },
+            "at": time.time(),
+            **details
+        }
+        with self._lock:
+            self._slow_queries.append(entry)
+        logging.warning(
+            f"Slow query ({entry['total_ms']:.1f} ms >= "
+            f"{self._slow_query_ms:.0f} ms): "
+            f"{entry['query'][:80]!r} stages={entry['stages_ms']}"
+        )
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return stage summaries, counters, gauges and recent slow queries."""
+        with self._lock:
+            stages = {
+                name: h.summary()
+                for name, h in sorted(self._histograms.items())
+            }
+            counters = {
+                _label_key(name, labels): value
+                for (name, labels), value in sorted(self._counters.items())
+            }
+            gauges = dict(self._gauges)
+            slow = list(self._slow_queries)
+        return {
+            "stages": stages,
+            "counters": counters,
+            "gauges": {
+                name: _read_gauge(read) for name, read in sorted(gauges.items())
+            },
+            "slow_query_ms": self._slow_query_ms,
+            "slow_queries": slow
+        }
+
+    def prometheus(self, prefix: str = "memory") -> str:
+        """Render the metrics in the Prometheus text exposition format.
+
+        Stages become one summary (``<prefix>_stage_seconds``) labelled by
+        stage, counters ``<prefix>_<name>_total`` and gauges
+        ``<prefix>_<name>``.
+        """
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            stage_rows = [
+                (stage, h.quantiles(), h.count, h.total)
+                for stage, h in histograms
+            ]
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+
+        lines: List[str] = []
+        metric = f"{prefix}_stage_seconds"
+        lines.append(f"# HELP {metric} Latency of search and embedding stages.")
+        lines.append(f"# TYPE {metric} summary")
+        for stage, quantiles, count, total in stage_rows:
+            for q, value in quantiles.items():
+                lines.append(
+                    f'{metric}{{stage="{stage}",quantile="{q}"}} {value:.6f}'
+                )
+            lines.append(f'{metric}_sum{{stage="{stage}"}} {total:.6f}')
+            lines.append(f'{metric}_count{{stage="{stage}"}} {count}')
+
+        seen = set()
+        for (name, labels), value in counters:
+            metric = f"{prefix}_{name}_total"
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_prometheus_labels(labels)} {value}")
+
+        for name, read in gauges:
+            value = _read_gauge(read)
+            if value is None:
+                continue
+            metric = f"{prefix}_{name}"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {float(value):g}")
+        return "\n".join(lines) + "\n"
+
+
+def _sorted_labels(labels: Dict[str, Any]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _label_key(name: str, labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return name
+    return f"{name}{{{','.join(f'{k}={v}' for k, v in labels)}}}"
+
+
+def _prometheus_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in labels
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def _read_gauge(read: Callable[[], float]) -> Optional[float]:
+    try:
+        return read()
+    except Exception as e:
+        logging.debug(f"Gauge read error: {e}")
+        return None
+
+
+def start_metrics_server(
+    metrics: Metrics,
+    port: int,
+    host: str = "127.0.0.1",
+    prefix: str = "memory"
+) -> ThreadingHTTPServer:
+    """Serve ``metrics.prometheus()`` at ``/metrics`` on a daemon thread.
+
+    Args:
+        metrics: Registry to expose.
+        port: TCP port (0 picks a free one, see ``server_address``).
+        host: Interface to bind; loopback by default.
+        prefix: Metric name prefix.
+
+    Returns:
+        The running server; call ``shutdown()`` to stop it.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = metrics.prometheus(prefix).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            logging.debug(f"Metrics endpoint: {format % args}")
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(
+        target=server.serve_forever, name="metrics-http", daemon=True
+    ).start()
+    port = server.server_address[1]
+    logging.info(f"Prometheus metrics on http://{host}:{port}/metrics")
+    return server
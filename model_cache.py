@@ -0,0 +1,355 @@
+"""Startup cache of the optimized inference graph and the loaded tokenizer."""
+import hashlib
+import json
+import logging
+import os
+import pickle
+import platform
+import shutil
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+
+CACHE_VERSION = 1
+OPTIMIZED_MODEL_FILE = "model.onnx"
+OPTIMIZED_DATA_FILE = "model.onnx_data"
+DIGESTS_FILE = "digests.json"
+TOKENIZER_FILES = (
+    "tokenizer.json", "tokenizer_config.json", "special_tokens_map.json",
+    "added_tokens.json", "vocab.txt", "sentencepiece.bpe.model", "config.json"
+)
+HASH_CHUNK_BYTES = 8 * 1024 * 1024
+PREFERRED_PROVIDERS = (
+    "TensorrtExecutionProvider", "CUDAExecutionProvider", "CPUExecutionProvider"
+)
+
+
+def file_digest(path: str) -> str:
+    """Return the BLAKE2b hex digest of a file's content."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ModelCache:
+    """Reuses expensive startup artifacts across restarts.
+
+    Two artifacts are cached in ``cache_dir``:
+
+    * The inference graph after full graph optimization, written by the
+      runtime through ``optimized_model_filepath`` on the first start and
+      loaded with optimization disabled afterwards. Its key covers the
+      content of the model files, the runtime version, the execution
+      provider and the machine architecture, so any change rebuilds it.
+      Compiling providers (TensorRT) cannot serialize their graph; for
+      them the directory holds the provider's own engine cache instead.
+    * The tokenizer object, pickled after the first ``from_pretrained``
+      and keyed by the tokenizer files and the tokenizer library version.
+
+    Hashing a multi-gigabyte model is done once: digests are remembered
+    per path together with the file's size and mtime. Stale entries of
+    other keys are pruned when a new one is written. Every cache failure
+    falls back to the uncached path.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        model_path: str,
+        runtime_version: str,
+        provider: str,
+        tokenizer_version: str = ""
+    ):
+        """Create the cache for one model file.
+
+        Args:
+            cache_dir: Directory holding the cached artifacts.
+            model_path: The source ``.onnx`` file (its external
+                ``.onnx_data`` file, if any, is hashed too).
+            runtime_version: Inference runtime version.
+            provider: Execution provider the session will run on.
+            tokenizer_version: Tokenizer library version.
+        """
+        self._dir = cache_dir
+        self._model_path = model_path
+        self._runtime_version = runtime_version
+        self._provider = provider
+        self._tokenizer_version = tokenizer_version
+        self._graph_state = "unused"
+        self._tokenizer_state = "unused"
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._digests_path = os.path.join(cache_dir, DIGESTS_FILE)
+        self._digests = self._read_digests()
+        self.graph_key = self._key(
+            [model_path, model_path + "_data"],
+            runtime_version, provider, platform.machine()
+        )
+
+    @property
+    def graph_dir(self) -> str:
+        """Directory of this key's optimized graph or engine cache."""
+        return os.path.join(self._dir, f"graph-{self.graph_key}")
+
+    def cached_graph(self) -> Optional[str]:
+        """Return the optimized graph of this key, None on a miss."""
+        path = os.path.join(self.graph_dir, OPTIMIZED_MODEL_FILE)
+        self._graph_state = "hit" if os.path.exists(path) else "miss"
+        return path if self._graph_state == "hit" else None
+
+    def prepare_graph(self) -> str:
+        """Return where the runtime should write the optimized graph.
+
+        The graph goes to a per-process staging directory that
+        ``commit_graph`` renames into place once the session has been
+        built, so a crash mid-write never leaves a torn graph under the
+        real key and processes starting together do not collide.
+        """
+        staging = self._staging_dir()
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        return os.path.join(staging, OPTIMIZED_MODEL_FILE)
+
+    def commit_graph(self) -> None:
+        """Publish the staged graph and drop graphs of other keys.
+
+        If another process published the same key first, its graph is
+        kept and the staged copy dropped.
+        """
+        staging = self._staging_dir()
+        if not os.path.exists(os.path.join(staging, OPTIMIZED_MODEL_FILE)):
+            shutil.rmtree(staging, ignore_errors=True)
+            logging.warning("Model cache: the runtime wrote no optimized graph")
+            return
+        try:
+            os.rename(staging, self.graph_dir)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+            return
+        self._prune("graph-", os.path.basename(self.graph_dir))
+        logging.info(f"Model cache: optimized graph saved to {self.graph_dir}")
+
+    def discard_graph(self) -> None:
+        """Remove this key's graph (e.g. after it failed to load)."""
+        shutil.rmtree(self.graph_dir, ignore_errors=True)
+        shutil.rmtree(self._staging_dir(), ignore_errors=True)
+        self._graph_state = "discarded"
+
+    def engine_cache_dir(self) -> str:
+        """Return (creating it) a compiling provider's engine cache dir."""
+        os.makedirs(self.graph_dir, exist_ok=True)
+        self._prune("graph-", os.path.basename(self.graph_dir))
+        self._graph_state = "engine_cache"
+        return self.graph_dir
+
+    def load_tokenizer(self, model_dir: str, loader: Callable[[], Any]) -> Any:
+        """Return the tokenizer of ``model_dir``, unpickled when cached.
+
+        Args:
+            model_dir: Directory with the tokenizer files.
+            loader: Builds the tokenizer on a miss (``from_pretrained``).
+
+        Returns:
+            The tokenizer.
+        """
+        key = self._key(
+            [os.path.join(model_dir, name) for name in TOKENIZER_FILES],
+            self._tokenizer_version
+        )
+        name = f"tokenizer-{key}.pkl"
+        path = os.path.join(self._dir, name)
+        if os.path.exists(path):
+            try:
+                with open(path, "rb") as f:
+                    tokenizer = pickle.load(f)
+                self._tokenizer_state = "hit"
+                return tokenizer
+            except Exception as e:
+                logging.warning(
+                    f"Model cache: unreadable tokenizer cache, rebuilding: {e}"
+                )
+
+        tokenizer = loader()
+        self._tokenizer_state = "miss"
+        try:
+            tmp = f"{path}.tmp{os.getpid()}"
+            with open(tmp, "wb") as f:
+                pickle.dump(tokenizer, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+            self._prune("tokenizer-", name)
+        except Exception as e:
+            logging.warning(f"Model cache: cannot cache the tokenizer: {e}")
+        return tokenizer
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the cache directory, graph key and per-artifact hits."""
+        return {
+            "directory": self._dir,
+            "graph_key": self.graph_key,
+            "provider": self._provider,
+            "runtime_version": self._runtime_version,
+            "graph": self._graph_state,
+            "tokenizer": self._tokenizer_state
+        }
+
+    def _staging_dir(self) -> str:
+        return f"{self.graph_dir}.tmp{os.getpid()}"
+
+    def _key(self, paths: Sequence[str], *parts: str) -> str:
+        """Hash the content of the existing ``paths`` and ``parts``."""
+        digest = hashlib.blake2b(digest_size=8)
+        digest.update(f"v{CACHE_VERSION}".encode("utf-8"))
+        for path in paths:
+            if os.path.exists(path):
+                entry = f"\0{os.path.basename(path)}={self._file_digest(path)}"
+                digest.update(entry.encode("utf-8"))
+        for part in parts:
+            digest.update(f"\0{part}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def _file_digest(self, path: str) -> str:
+        """Content digest of a file, rehashed when its size or mtime change."""
+        stat = os.stat(path)
+        path = os.path.abspath(path)
+        known = self._digests.get(path)
+        if (known and known["size"] == stat.st_size
+                and known["mtime_ns"] == stat.st_mtime_ns):
+            return known["digest"]
+        logging.info(f"Model cache: hashing {path}")
+        digest = file_digest(path)
+        self._digests[path] = {
+            "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+            "digest": digest
+        }
+        self._write_digests()
+        return digest
+
+    def _read_digests(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self._digests_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_digests(self) -> None:
+        tmp = f"{self._digests_path}.tmp{os.getpid()}"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._digests, f)
+        os.replace(tmp, self._digests_path)
+
+    def _prune(self, prefix: str, keep: str) -> None:
+        """Delete cached artifacts named ``prefix*`` other than ``keep``."""
+        stale: List[str] = [
+            name for name in os.listdir(self._dir)
+            if name.startswith(prefix) and name != keep and ".tmp" not in name
+        ]
+        for name in stale:
+            path = os.path.join(self._dir, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)
+
+
+def session_providers() -> List[str]:
+    """Return the preferred execution providers this runtime build offers."""
+    import onnxruntime as ort
+
+    available = set(ort.get_available_providers())
+    preferred = [p for p in PREFERRED_PROVIDERS if p in available]
+    return preferred or ["CPUExecutionProvider"]
+
+
+def load_tokenizer(model_dir: str, cache: Optional[ModelCache] = None) -> Any:
+    """Load a Hugging Face tokenizer, through ``cache`` when given."""
+    from transformers import AutoTokenizer
+
+    if cache is None:
+        return AutoTokenizer.from_pretrained(model_dir)
+    return cache.load_tokenizer(
+        model_dir, lambda: AutoTokenizer.from_pretrained(model_dir)
+    )
+
+
+def create_session(
+    onnx_path: str,
+    providers: List[Any],
+    cache: Optional[ModelCache] = None,
+    configure: Optional[Callable[[Any], None]] = None
+) -> Any:
+    """Create an ONNX Runtime session with full graph optimization.
+
+    With a cache, the first start saves the optimized graph (weights
+    above 1 KiB go to an external data file, as models over 2 GB
+    require) and later starts load it with optimization disabled; a
+    cached graph that fails to load is discarded and rebuilt. A leading
+    TensorRT provider gets its engine and timing caches pointed at the
+    cache directory instead.
+
+    Args:
+        onnx_path: Source model file.
+        providers: Execution providers in order of preference.
+        cache: Optional ``ModelCache`` for ``onnx_path``.
+        configure: Optional callback adjusting the ``SessionOptions``
+            (threads, affinity) before the session is built.
+
+    Returns:
+        The inference session.
+    """
+    import onnxruntime as ort
+
+    providers = list(providers)
+    load_path = onnx_path
+    staged = False
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.log_severity_level = 1
+    if configure is not None:
+        configure(options)
+
+    if (cache is not None and providers
+            and providers[0] == "TensorrtExecutionProvider"):
+        engine_dir = cache.engine_cache_dir()
+        providers[0] = ("TensorrtExecutionProvider", {
+            "trt_engine_cache_enable": True,
+            "trt_engine_cache_path": engine_dir,
+            "trt_timing_cache_enable": True,
+            "trt_timing_cache_path": engine_dir
+        })
+    elif cache is not None:
+        cached = cache.cached_graph()
+        if cached is not None:
+            load_path = cached
+            options.graph_optimization_level = (
+                ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+            )
+        else:
+            options.optimized_model_filepath = cache.prepare_graph()
+            options.add_session_config_entry(
+                "session.optimized_model_external_initializers_file_name",
+                OPTIMIZED_DATA_FILE
+            )
+            options.add_session_config_entry(
+                "session."
+                "optimized_model_external_initializers_min_size_in_bytes",
+                "1024"
+            )
+            staged = True
+
+    try:
+        session = ort.InferenceSession(
+            load_path, sess_options=options, providers=providers
+        )
+    except Exception as e:
+        if load_path == onnx_path:
+            raise
+        logging.warning(
+            f"Model cache: cached graph failed to load, rebuilding it: {e}"
+        )
+        cache.discard_graph()
+        return create_session(onnx_path, providers, cache, configure)
+    if staged:
+        cache.commit_graph()
+    return session
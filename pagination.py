@@ -0,0 +1,155 @@
+"""Keyset cursors and content previews for listing memories."""
+import base64
+import json
+import sqlite3
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+
+PROJECTION_FULL = "full"
+PROJECTION_SUMMARY = "summary"
+DEFAULT_PREVIEW_BYTES = 200
+
+
+def encode_cursor(created_at: float, seq: int) -> str:
+    """Encode the sort key of the last row of a page as an opaque token.
+
+    Args:
+        created_at: ``created_at`` of the last row returned.
+        seq: ``seq`` of the last row returned.
+
+    Returns:
+        URL-safe base64 cursor string.
+    """
+    payload = json.dumps([created_at, seq], separators=(",", ":"))
+    payload = payload.encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    """Decode a cursor produced by ``encode_cursor``.
+
+    Args:
+        cursor: Opaque cursor string.
+
+    Returns:
+        Tuple of (created_at, seq).
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii"))
+        created_at, seq = json.loads(raw)
+        return float(created_at), int(seq)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+def make_preview(data: bytes, max_bytes: int) -> str:
+    """Decode at most ``max_bytes`` of UTF-8 without splitting a character.
+
+    Args:
+        data: UTF-8 encoded content (possibly already cut).
+        max_bytes: Byte budget of the preview.
+
+    Returns:
+        The longest prefix that fits the budget.
+    """
+    return data[:max_bytes].decode("utf-8", errors="ignore")
+
+
+def list_page(
+    conn: sqlite3.Connection,
+    limit: int,
+    cursor: Optional[str] = None,
+    projection: str = PROJECTION_FULL,
+    preview_bytes: int = DEFAULT_PREVIEW_BYTES,
+    offset: int = 0,
+    channel: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Read one page of memories, newest first, by keyset pagination.
+
+    The page starts strictly after the row encoded in ``cursor`` and is
+    located with the ``created_at`` index (or the ``(channel, created_at)``
+    index for one channel), so every page costs the same no matter how
+    deep it is.
+
+    Args:
+        conn: Read connection.
+        limit: Page size.
+        cursor: Cursor of the previous page, None or "" for the first.
+        projection: ``"full"`` for whole memories or ``"summary"`` for id,
+            tags, note, timestamp and a content preview.
+        preview_bytes: Byte budget of the summary preview.
+        offset: Rows to skip (legacy OFFSET paging, O(offset); ignored
+            when a cursor is given).
+        channel: Only list this channel; None lists every channel.
+
+    Returns:
+        Tuple of (memories, next_cursor); ``next_cursor`` is None on the
+        last page.
+
+    Raises:
+        ValueError: On a malformed cursor or unknown projection.
+    """
+    if projection not in (PROJECTION_FULL, PROJECTION_SUMMARY):
+        raise ValueError(f"Unknown projection: {projection!r}")
+
+    if projection == PROJECTION_SUMMARY:
+        # Only the first bytes of the content leave the database.
+        columns = (
+            "id, substr(CAST(content AS BLOB), 1, ?), tags, note, "
+            "created_at, seq, channel, length(CAST(content AS BLOB))"
+        )
+        params: List[Any] = [preview_bytes]
+    else:
+        columns = "id, content, tags, note, created_at, seq, channel"
+        params = []
+
+    conditions = []
+    if channel is not None:
+        conditions.append("channel = ?")
+        params.append(channel)
+    if cursor:
+        created_at, seq = decode_cursor(cursor)
+        conditions.append("(created_at, seq) < (?, ?)")
+        params += [created_at, seq]
+        offset = 0
+    where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+    params += [limit + 1, offset]
+
+    rows = conn.execute(
+        f"SELECT {columns} FROM memories {where}"
+        "ORDER BY created_at DESC, seq DESC LIMIT ? OFFSET ?",
+        params
+    ).fetchall()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    memories = []
+    for row in rows:
+        tags = row[2].split() if row[2] else []
+        if projection == PROJECTION_SUMMARY:
+            created = datetime.fromtimestamp(row[4], tz=timezone.utc)
+            memories.append({
+                "id": row[0],
+                "tags": tags,
+                "note": row[3],
+                "timestamp": created.isoformat(),
+                "preview": make_preview(bytes(row[1] or b""), preview_bytes),
+                "truncated": row[7] > preview_bytes,
+                "channel": row[6]
+            })
+        else:
+            memories.append({
+                "id": row[0],
+                "content": row[1],
+                "tags": tags,
+                "note": row[3],
+                "channel": row[6]
+            })
+
+    next_cursor = encode_cursor(rows[-1][4], rows[-1][5]) if has_more else None
+    return memories, next_cursor
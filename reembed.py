@@ -0,0 +1,333 @@
+"""Background re-embedding into shadow storage.
+
+Lets the embedding model be switched without downtime.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import (
+    Any, Callable, ContextManager, Dict, List, Optional, Set, Tuple
+)
+
+import numpy as np
+
+from chunking import chunk_rows
+from storage import existing_ids
+
+
+DEFAULT_BATCH_SIZE = 64
+MANIFEST_FILE = "model_manifest.json"
+CHECKPOINT_FILE = "reembed_checkpoint.json"
+
+STATE_IDLE = "idle"
+STATE_RUNNING = "running"
+STATE_DONE = "done"
+STATE_FAILED = "failed"
+STATE_CANCELLED = "cancelled"
+
+
+def storage_suffix(model_fingerprint: str) -> str:
+    """Return a short name-safe key for a model's tables and directories."""
+    digest = hashlib.blake2b(model_fingerprint.encode("utf-8"), digest_size=4)
+    return digest.hexdigest()
+
+
+def read_manifest(path: str) -> Optional[Dict[str, Any]]:
+    """Read the active-model manifest, None if there is none yet.
+
+    Args:
+        path: Manifest file.
+
+    Returns:
+        Dict with ``model_dir``, ``model_fingerprint`` and
+        ``storage_suffix``, or None.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_json_atomic(path: str, data: Dict[str, Any]) -> None:
+    """Write JSON to a temporary file and rename it over ``path``.
+
+    Readers see either the old or the new content, never a torn file.
+    """
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class ReembedJob:
+    """Re-embeds every memory with a new model into shadow vector storage.
+
+    Memories are read from SQLite in ``seq`` order, a batch at a time, and
+    written to the shadow backend of their channel; the last ``seq`` done
+    is checkpointed after every batch so a restarted job resumes there.
+    Search keeps using the live storage meanwhile. When the table is
+    exhausted the job takes ``write_lock`` (which writers hold while
+    storing), embeds whatever was saved during the run, and calls
+    ``swap`` so that no save can land between the last pass and the
+    switch.
+
+    Deletes that race the job are handled twice: ``delete`` forwards them
+    to the shadow storage, and each batch drops rows that vanished from
+    SQLite while it was being embedded.
+    """
+
+    def __init__(
+        self,
+        store: Any,
+        embed_chunks: Callable[[List[str]], List[Tuple[List[str], np.ndarray]]],
+        open_shadow: Callable[[str], ContextManager[Any]],
+        model_fingerprint: str,
+        checkpoint_path: str,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        info: Optional[Dict[str, Any]] = None
+    ):
+        """Create the job.
+
+        Args:
+            store: ``SQLiteStore`` holding the memories.
+            embed_chunks: ``embed_chunks`` of a ``SearchService`` running
+                the new model.
+            open_shadow: Returns a context manager holding (creating if
+                needed) the shadow backend of a channel, e.g.
+                ``ChannelRegistry.lease``.
+            model_fingerprint: Fingerprint of the new model; a checkpoint
+                of another model is ignored.
+            checkpoint_path: File recording progress.
+            batch_size: Memories embedded per batch.
+            info: Extra fields stored in the checkpoint (e.g. model_dir).
+        """
+        self._store = store
+        self._embed_chunks = embed_chunks
+        self._open_shadow = open_shadow
+        self._model_fingerprint = model_fingerprint
+        self._checkpoint_path = checkpoint_path
+        self._batch_size = batch_size
+        self._info = dict(info or {})
+
+        self._lock = threading.Lock()
+        self._state = STATE_IDLE
+        self._error: Optional[str] = None
+        self._cancel = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._channels: Set[str] = set()
+        self._last_seq = 0
+        self._processed = 0
+        self._resumed_from = 0
+        self._total = 0
+        self._started: Optional[float] = None
+        self._finished: Optional[float] = None
+        self._resuming = False
+
+        checkpoint = self._read_checkpoint()
+        self._from_checkpoint = checkpoint is not None
+        if checkpoint is not None:
+            self._last_seq = checkpoint["last_seq"]
+            self._resumed_from = checkpoint["processed"]
+            self._channels = set(checkpoint.get("channels", []))
+            self._resuming = True
+
+    @property
+    def state(self) -> str:
+        """One of idle, running, done, failed, cancelled."""
+        return self._state
+
+    @property
+    def resuming(self) -> bool:
+        """Whether the job continues from a checkpoint of the same model."""
+        return self._from_checkpoint
+
+    def start(
+        self, write_lock: ContextManager, swap: Callable[[], None]
+    ) -> None:
+        """Run the job on a background thread (see ``run``).
+
+        Raises:
+            RuntimeError: If the job is already running.
+        """
+        with self._lock:
+            if self._state == STATE_RUNNING:
+                raise RuntimeError("Re-embedding is already running")
+            self._state = STATE_RUNNING
+        self._thread = threading.Thread(
+            target=self._run_guarded, args=(write_lock, swap),
+            name="reembed", daemon=True
+        )
+        self._thread.start()
+
+    def run(
+        self, write_lock: ContextManager, swap: Callable[[], None]
+    ) -> Dict[str, Any]:
+        """Re-embed everything, then switch models.
+
+        Args:
+            write_lock: Lock that writers hold while storing memories.
+            swap: Activates the new model and its storage; called with
+                ``write_lock`` held after the final catch-up pass.
+
+        Returns:
+            The final ``stats``.
+        """
+        with self._lock:
+            self._state = STATE_RUNNING
+            self._started = time.monotonic()
+            self._total = self._store.reader().execute(
+                "SELECT count(*) FROM memories"
+            ).fetchone()[0]
+        resuming = ""
+        if self._resuming:
+            resuming = f", resuming after seq {self._last_seq}"
+        logging.info(
+            f"Re-embedding {self._total} memories with "
+            f"{self._model_fingerprint}{resuming}"
+        )
+
+        if not self._drain():
+            return self._finish(STATE_CANCELLED)
+        with write_lock:
+            self._drain()
+            if self._cancel.is_set():
+                return self._finish(STATE_CANCELLED)
+            swap()
+        if os.path.exists(self._checkpoint_path):
+            os.remove(self._checkpoint_path)
+        return self._finish(STATE_DONE)
+
+    def cancel(self) -> None:
+        """Stop after the current batch; the checkpoint allows resuming."""
+        self._cancel.set()
+
+    def delete(self, ids: List[str]) -> None:
+        """Forward a delete to every shadow backend written so far."""
+        with self._lock:
+            channels = list(self._channels)
+        for channel in channels:
+            with self._open_shadow(channel) as shadow:
+                shadow.delete(ids)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return progress and throughput.
+
+        Returns:
+            Dict with state, model, memories processed (including those
+            done before a resume) and total, last seq, docs per second of
+            this run, elapsed seconds and, while running, an ETA.
+        """
+        with self._lock:
+            end = self._finished or time.monotonic()
+            elapsed = end - self._started if self._started is not None else 0.0
+            rate = self._processed / elapsed if elapsed > 0 else 0.0
+            done = self._resumed_from + self._processed
+            stats = {
+                "state": self._state,
+                "model_fingerprint": self._model_fingerprint,
+                "processed": done,
+                "total": self._total,
+                "last_seq": self._last_seq,
+                "docs_per_sec": round(rate, 2),
+                "elapsed_seconds": round(elapsed, 3),
+                "error": self._error
+            }
+            if self._state == STATE_RUNNING and rate > 0:
+                remaining = max(self._total - done, 0)
+                stats["eta_seconds"] = round(remaining / rate, 1)
+            return stats
+
+    def _run_guarded(
+        self, write_lock: ContextManager, swap: Callable[[], None]
+    ) -> None:
+        """Thread target: run and record any failure."""
+        try:
+            self.run(write_lock, swap)
+        except Exception as e:
+            logging.error(f"Re-embedding failed: {e}")
+            with self._lock:
+                self._error = str(e)
+            self._finish(STATE_FAILED)
+
+    def _finish(self, state: str) -> Dict[str, Any]:
+        """Record the final state and log it."""
+        with self._lock:
+            self._state = state
+            self._finished = time.monotonic()
+        stats = self.stats()
+        logging.info(f"Re-embedding {state}: {stats}")
+        return stats
+
+    def _drain(self) -> bool:
+        """Process batches until none is left; False if cancelled."""
+        while not self._cancel.is_set():
+            rows = self._store.reader().execute(
+                "SELECT seq, id, content, tags, note, created_at, channel "
+                "FROM memories WHERE seq > ? ORDER BY seq LIMIT ?",
+                (self._last_seq, self._batch_size)
+            ).fetchall()
+            if not rows:
+                return True
+            self._process(rows)
+        return False
+
+    def _process(self, rows: List[tuple]) -> None:
+        """Embed one batch into the shadow backends and checkpoint it."""
+        embedded = self._embed_chunks([row[2] for row in rows])
+        by_channel: Dict[str, List[Dict]] = {}
+        ids_by_channel: Dict[str, List[str]] = {}
+        for row, (chunks, vectors) in zip(rows, embedded):
+            memory = {
+                "id": row[1], "content": row[2], "tags": row[3], "note": row[4],
+                "created_at": row[5]
+            }
+            by_channel.setdefault(row[6], []).extend(
+                chunk_rows(memory, chunks, vectors)
+            )
+            ids_by_channel.setdefault(row[6], []).append(row[1])
+
+        with self._lock:
+            self._channels.update(by_channel)
+        for channel, channel_rows in by_channel.items():
+            with self._open_shadow(channel) as shadow:
+                if self._resuming:
+                    # The batch after the checkpoint may have been partly
+                    # written.
+                    shadow.delete(ids_by_channel[channel])
+                shadow.add(channel_rows)
+                ids = ids_by_channel[channel]
+                gone = set(ids) - existing_ids(self._store.reader(), ids)
+                if gone:
+                    shadow.delete(sorted(gone))
+        self._resuming = False
+
+        with self._lock:
+            self._last_seq = rows[-1][0]
+            self._processed += len(rows)
+            checkpoint = {
+                **self._info,
+                "model_fingerprint": self._model_fingerprint,
+                "last_seq": self._last_seq,
+                "processed": self._resumed_from + self._processed,
+                "channels": sorted(self._channels)
+            }
+        write_json_atomic(self._checkpoint_path, checkpoint)
+
+    def _read_checkpoint(self) -> Optional[Dict[str, Any]]:
+        """Load a checkpoint of this model, ignoring other models'."""
+        if not os.path.exists(self._checkpoint_path):
+            return None
+        try:
+            with open(self._checkpoint_path, "r", encoding="utf-8") as f:
+                checkpoint = json.load(f)
+        except ValueError:
+            return None
+        if checkpoint.get("model_fingerprint") != self._model_fingerprint:
+            logging.info("Ignoring re-embedding checkpoint of another model")
+            return None
+        return checkpoint
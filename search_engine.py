@@ -1,23 +1,62 @@
 """Search engine service with hybrid search and RRF fusion."""
+import contextlib
+import copy
 import logging
-from typing import Dict, List, Optional, Any
+import threading
+import time
+import unicodedata
+from concurrent.futures import (
+    ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+)
+from typing import Dict, List, Optional, Any, Sequence, Tuple
 
 import numpy as np
 
 from ranking import calculate_rrf_score, fuse_rankings, distance_to_similarity
+from channels import ALL_CHANNELS
+from chunking import parent_id
+from metrics import (
+    Metrics, STAGE_EMBED_QUERY, STAGE_EMBEDDER, STAGE_FTS, STAGE_FUSION,
+    STAGE_SESSION_RUN, STAGE_TOKENIZE, STAGE_VECTOR_SCAN
+)
+from storage import fetch_memories, list_channels
+from vector_backends import LanceDBBackend
 
 
 DEFAULT_TOP_K = 5
 DEFAULT_THRESHOLD = 0.7
 DEFAULT_RRF_K = 60
 FETCH_MULTIPLIER = 4
+EMBEDDING_DIM = 1024
+MAX_SEQ_LENGTH = 512
+DEFAULT_EMBED_BATCH_SIZE = 32
+DEFAULT_MODEL_FINGERPRINT = "bge-m3-onnx"
+DEFAULT_LEG_WORKERS = 8
+LEG_FTS = "fts"
+LEG_VECTOR = "vector"
+
+
+def normalize_query(query: str) -> str:
+    """Canonicalize a query for cache lookups.
+    
+    Applies NFKC normalization and collapses runs of whitespace. Case is
+    preserved because the tokenizer is case-sensitive.
+    
+    Args:
+        query: Raw query text.
+    
+    Returns:
+        Normalized query text.
+    """
+    return " ".join(unicodedata.normalize("NFKC", query).split())
 
 
 class SearchService:
     """Encapsulates hybrid search logic with RRF fusion.
     
     This service combines full-text search (SQLite FTS5) and vector search
-    (LanceDB) results using Reciprocal Rank Fusion algorithm.
+    (LanceDB or another vector backend) results using Reciprocal Rank
+    Fusion algorithm.
     """
 
     def __init__(
@@ -25,7 +64,20 @@ class SearchService:
         session: Any,
         tokenizer: Any,
         vector_table: Optional[Any],
-        sqlite_conn: Optional[Any]
+        sqlite_conn: Optional[Any],
+        query_cache: Optional[Any] = None,
+        model_fingerprint: str = DEFAULT_MODEL_FINGERPRINT,
+        result_cache: Optional[Any] = None,
+        embedding_store: Optional[Any] = None,
+        leg_timeout: Optional[float] = None,
+        leg_workers: int = DEFAULT_LEG_WORKERS,
+        sqlite_store: Optional[Any] = None,
+        vector_backend: Optional[Any] = None,
+        channels: Optional[Any] = None,
+        chunker: Optional[Any] = None,
+        embed_workers: int = 1,
+        embedder: Optional[Any] = None,
+        metrics: Optional[Metrics] = None
     ):
         """Initialize SearchService with dependencies.
         
@@ -34,31 +86,237 @@ class SearchService:
             tokenizer: Hugging Face tokenizer for text processing.
             vector_table: LanceDB table for vector search.
             sqlite_conn: SQLite connection for full-text search.
+            query_cache: Optional ``LRUCache`` of query embeddings.
+            model_fingerprint: Identifies the embedding model so cached
+                vectors are never reused across models.
+            result_cache: Optional ``LRUCache`` of whole hybrid_search
+                results, invalidated by the write generation.
+            embedding_store: Optional persistent ``EmbeddingStore`` that
+                ``embed_documents`` consults before running the model.
+            leg_timeout: Seconds hybrid_search waits for the FTS and vector
+                legs (which run concurrently); a leg that misses the
+                deadline is left out of the fusion. None waits forever.
+            leg_workers: Size of the thread pool running the legs.
+            sqlite_store: Optional ``SQLiteStore``; when given, FTS queries
+                use the calling thread's read-only connection instead of
+                ``sqlite_conn``.
+            vector_backend: Optional vector backend (see
+                ``vector_backends``); defaults to a ``LanceDBBackend``
+                over ``vector_table``.
+            channels: Optional ``ChannelRegistry``; when given, searches
+                scoped to a channel use that channel's backend instead of
+                ``vector_backend``.
+            chunker: Optional ``Chunker``; ``embed_chunks`` uses it to
+                embed long documents as several token windows.
+            embed_workers: Length buckets of one ``embed_batch`` run
+                concurrently on this many threads; set it to the size of
+                a ``SessionPool`` passed as ``session``.
+            embedder: Optional out-of-process embedder (e.g.
+                ``ProcessEmbedder``) whose ``embed_batch`` replaces the
+                in-process tokenizer and session for every embedding;
+                ``tokenizer`` is then only used by the chunker.
+            metrics: ``Metrics`` registry receiving stage timings, leg
+                counters and slow queries (a private one by default).
         """
         self._session = session
         self._tokenizer = tokenizer
-        self._vector_table = vector_table
+        self._embedder = embedder
+        self._metrics = metrics if metrics is not None else Metrics()
+        if vector_backend is None and vector_table:
+            vector_backend = LanceDBBackend(vector_table)
+        self._vector_backend = vector_backend
+        self._channels = channels
+        self._chunker = chunker
         self._sqlite_conn = sqlite_conn
+        self._sqlite_store = sqlite_store
+        self._query_cache = query_cache
+        self._model_fingerprint = model_fingerprint
+        self._result_cache = result_cache
+        self._embedding_store = embedding_store
+        self._leg_timeout = leg_timeout
+        self._leg_executor = ThreadPoolExecutor(
+            max_workers=leg_workers, thread_name_prefix="search-leg"
+        )
+        self._embed_executor = ThreadPoolExecutor(
+            max_workers=embed_workers, thread_name_prefix="embed-bucket"
+        ) if embed_workers > 1 else None
+        self._write_generation = 0
+        self._model_generation = 0
+        self._generation_lock = threading.Lock()
+        self._embed_scheduler = None
+
+    @property
+    def model_fingerprint(self) -> str:
+        """Identifier of the embedding model in use."""
+        return self._model_fingerprint
+
+    @property
+    def metrics(self) -> Metrics:
+        """Stage timings, counters and slow-query log of this service."""
+        return self._metrics
+
+    @property
+    def model_ready(self) -> bool:
+        """Whether a session or embedder is loaded (False while warming up)."""
+        return self._session is not None or self._embedder is not None
+
+    @property
+    def write_generation(self) -> int:
+        """Store-wide counter bumped by every write."""
+        return self._write_generation
+
+    def bump_write_generation(self) -> int:
+        """Record that the store changed, invalidating cached results.
+        
+        Must be called after every save or delete has been applied.
+        
+        Returns:
+            The new write generation.
+        """
+        with self._generation_lock:
+            self._write_generation += 1
+            generation = self._write_generation
+        if self._result_cache is not None:
+            self._result_cache.clear()
+        return generation
+
+    def swap_model(
+        self,
+        session: Any,
+        tokenizer: Any,
+        model_fingerprint: str,
+        vector_backend: Optional[Any] = None,
+        channels: Optional[Any] = None,
+        embedding_store: Optional[Any] = None,
+        chunker: Optional[Any] = None,
+        embedder: Optional[Any] = None
+    ) -> None:
+        """Switch to another embedding model and the vectors it produced.
+        
+        Every model-dependent reference is replaced under one lock and the
+        model generation is bumped. A vector search that started before
+        the swap notices the new generation and returns nothing rather
+        than a mix of one model's query vector and the other's index;
+        cached results are invalidated through the write generation.
+        
+        Args:
+            session: Inference session of the new model.
+            tokenizer: Tokenizer of the new model.
+            model_fingerprint: Fingerprint of the new model.
+            vector_backend: Backend holding the new model's vectors.
+            channels: ``ChannelRegistry`` of the new model's backends.
+            embedding_store: Embedding cache for the new model.
+            chunker: Chunker built on the new tokenizer.
+            embedder: Out-of-process embedder running the new model.
+        """
+        with self._generation_lock:
+            self._session = session
+            self._embedder = embedder
+            self._tokenizer = tokenizer
+            self._model_fingerprint = model_fingerprint
+            self._vector_backend = vector_backend
+            self._channels = channels
+            self._embedding_store = embedding_store
+            self._chunker = chunker
+            self._model_generation += 1
+        self.bump_write_generation()
+        logging.info(f"Switched embedding model to {model_fingerprint}")
+
+    def set_embed_scheduler(self, scheduler: Optional[Any]) -> None:
+        """Route single-text embeddings through a micro-batching scheduler.
+        
+        Args:
+            scheduler: An ``EmbeddingScheduler`` wrapping this service's
+                ``embed_batch``, or None to embed each text directly.
+        """
+        self._embed_scheduler = scheduler
+
+    def stats(self) -> Dict[str, Any]:
+        """Return runtime statistics of the service's subsystems.
+        
+        Returns:
+            Dict keyed by subsystem name.
+        """
+        stats = {}
+        if self._embed_scheduler is not None:
+            stats["embed_scheduler"] = self._embed_scheduler.stats()
+        if self._embedder is not None:
+            stats["embedder"] = self._embedder.stats()
+        if self._query_cache is not None:
+            stats["query_cache"] = self._query_cache.stats()
+        if self._result_cache is not None:
+            stats["result_cache"] = self._result_cache.stats()
+        if self._embedding_store is not None:
+            stats["embedding_store"] = self._embedding_store.stats()
+        stats["write_generation"] = self._write_generation
+        stats["leg_timeouts"] = {
+            leg: self._metrics.counter("leg_timeouts", leg=leg)
+            for leg in (LEG_FTS, LEG_VECTOR)
+        }
+        stats["metrics"] = self._metrics.snapshot()
+        return stats
+
+    def close(self) -> None:
+        """Shut down the search leg and embed bucket thread pools."""
+        self._leg_executor.shutdown(wait=False)
+        if self._embed_executor is not None:
+            self._embed_executor.shutdown(wait=False)
+
+    def embed_query(self, query: str) -> np.ndarray:
+        """Embed a search query, reusing cached vectors for repeats.
+        
+        Args:
+            query: Search query.
+        
+        Returns:
+            L2-normalized 1024-dimensional embedding vector.
+        """
+        if self._query_cache is None:
+            return self.embed(query)
+        
+        key = (normalize_query(query), self._model_fingerprint)
+        vector = self._query_cache.get(key)
+        if vector is None:
+            vector = self.embed(query)
+            # An all-zero vector means inference failed; do not cache it.
+            if vector.any():
+                self._query_cache.put(key, vector)
+        return vector
 
     def embed(self, text: str) -> np.ndarray:
         """Generate normalized embedding vector for text.
         
+        When an embed scheduler is attached, the text is coalesced with
+        concurrent requests into one batched inference.
+        
         Args:
             text: Input text to embed.
         
         Returns:
             L2-normalized 1024-dimensional embedding vector.
         """
+        if self._embed_scheduler is not None:
+            try:
+                return self._embed_scheduler.embed(text)
+            except Exception as e:
+                logging.error(f"Embed error: {e}")
+                return np.zeros(EMBEDDING_DIM, dtype=np.float32)
+        
+        if self._embedder is not None:
+            return self.embed_batch([text])[0]
+        
         try:
-            inputs = self._tokenizer(
-                text,
-                padding=True,
-                truncation=True,
-                max_length=512,
-                return_tensors="np"
-            )
+            with self._metrics.timer(STAGE_TOKENIZE):
+                inputs = self._tokenizer(
+                    text,
+                    padding=True,
+                    truncation=True,
+                    max_length=512,
+                    return_tensors="np"
+                )
             inputs = {k: v.astype(np.int64) for k, v in inputs.items()}
-            outputs = self._session.run(None, inputs)
+            with self._metrics.timer(STAGE_SESSION_RUN):
+                outputs = self._session.run(None, inputs)
             embedding = outputs[0].mean(axis=1)[0]
             
             norm = np.linalg.norm(embedding)
@@ -68,14 +326,213 @@ class SearchService:
             return embedding.astype(np.float32)
         except Exception as e:
             logging.error(f"Embed error: {e}")
-            return np.zeros(1024, dtype=np.float32)
+            return np.zeros(EMBEDDING_DIM, dtype=np.float32)
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        """Embed documents for storage, skipping already-embedded text.
+        
+        Texts found in the embedding store are served from disk; the rest
+        are embedded (one at a time through ``embed`` so concurrent saves
+        are coalesced, or as one ``embed_batch``) and written back.
+        
+        Args:
+            texts: Document texts to embed.
+        
+        Returns:
+            Float32 matrix of shape (len(texts), 1024) in input order.
+        """
+        if self._embedding_store is None:
+            if len(texts) == 1:
+                return self.embed(texts[0])[None, :]
+            return self.embed_batch(texts)
+        
+        embeddings = np.zeros((len(texts), EMBEDDING_DIM), dtype=np.float32)
+        cached = self._embedding_store.get_many(texts)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        for i, vector in enumerate(cached):
+            if vector is not None:
+                embeddings[i] = vector
+        
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            if len(missing_texts) == 1:
+                fresh = self.embed(missing_texts[0])[None, :]
+            else:
+                fresh = self.embed_batch(missing_texts)
+            embeddings[missing] = fresh
+            self._embedding_store.put_many(missing_texts, fresh)
+        
+        return embeddings
+
+    def embed_chunks(
+        self, texts: List[str]
+    ) -> List[Tuple[List[str], np.ndarray]]:
+        """Embed documents as one vector per token-window chunk.
+        
+        Without a chunker every text is a single chunk (truncated by the
+        model). With one, the chunks of all texts are embedded together
+        through ``embed_documents``, so they share length buckets and the
+        embedding store.
+        
+        Args:
+            texts: Document texts to embed.
+        
+        Returns:
+            One (chunk texts, (n_chunks, 1024) vectors) pair per text.
+        """
+        if self._chunker is None:
+            pieces = [[text] for text in texts]
+        else:
+            pieces = [self._chunker.split(text) for text in texts]
+        
+        vectors = self.embed_documents(
+            [chunk for chunks in pieces for chunk in chunks]
+        )
+        bounds = np.cumsum([len(chunks) for chunks in pieces])[:-1]
+        return list(zip(pieces, np.split(vectors, bounds)))
+
+    def embed_batch(
+        self,
+        texts: List[str],
+        batch_size: int = DEFAULT_EMBED_BATCH_SIZE
+    ) -> np.ndarray:
+        """Generate normalized embeddings for many texts at once.
+        
+        Texts are tokenized once without padding, sorted by token length and
+        split into buckets of ``batch_size``. Each bucket is padded only to
+        its own longest sequence, so short texts never pay for long ones.
+        With ``embed_workers`` > 1 the buckets run concurrently. With an
+        ``embedder`` the whole batch is handed to it instead.
+        
+        Args:
+            texts: Input texts to embed.
+            batch_size: Maximum number of texts per inference call.
+        
+        Returns:
+            Float32 matrix of shape (len(texts), 1024) with L2-normalized
+            rows in the same order as ``texts``. Rows of a bucket that
+            failed to embed are left as zeros.
+
+        Raises:
+            Exception: Whatever the ``embedder`` raised; its failures are
+                not turned into zero rows, which callers would store.
+        """
+        embeddings = np.zeros((len(texts), EMBEDDING_DIM), dtype=np.float32)
+        if not texts:
+            return embeddings
+        
+        embedder = self._embedder
+        if embedder is not None:
+            with self._metrics.timer(STAGE_EMBEDDER):
+                return embedder.embed_batch(list(texts), batch_size)
+        
+        try:
+            with self._metrics.timer(STAGE_TOKENIZE):
+                encoded = self._tokenizer(
+                    list(texts),
+                    padding=False,
+                    truncation=True,
+                    max_length=MAX_SEQ_LENGTH
+                )
+        except Exception as e:
+            logging.error(f"Embed batch tokenize error: {e}")
+            return embeddings
+        
+        lengths = [len(ids) for ids in encoded["input_ids"]]
+        order = sorted(range(len(texts)), key=lambda i: lengths[i])
+        buckets = [
+            order[start:start + batch_size]
+            for start in range(0, len(order), batch_size)
+        ]
+        session = self._session
+        
+        def run_bucket(bucket: List[int]) -> None:
+            try:
+                inputs = self._pad_bucket(encoded, bucket, lengths)
+                with self._metrics.timer(STAGE_SESSION_RUN):
+                    outputs = session.run(None, inputs)
+                embeddings[bucket] = self._pool(
+                    outputs[0], inputs["attention_mask"]
+                )
+            except Exception as e:
+                logging.error(f"Embed batch error: {e}")
+        
+        if self._embed_executor is None or len(buckets) == 1:
+            for bucket in buckets:
+                run_bucket(bucket)
+        else:
+            list(self._embed_executor.map(run_bucket, buckets))
+        
+        return embeddings
+
+    def _pad_bucket(
+        self,
+        encoded: Dict[str, List[List[int]]],
+        bucket: List[int],
+        lengths: List[int]
+    ) -> Dict[str, np.ndarray]:
+        """Build padded int64 model inputs for one length bucket.
+        
+        Args:
+            encoded: Unpadded tokenizer output for the whole batch.
+            bucket: Indices of the texts belonging to this bucket.
+            lengths: Token length of every text in the batch.
+        
+        Returns:
+            Dict of (len(bucket), max_len) int64 arrays keyed like the
+            tokenizer output, always including ``attention_mask``.
+        """
+        max_len = max(lengths[i] for i in bucket)
+        pad_id = getattr(self._tokenizer, "pad_token_id", None) or 0
+        
+        inputs = {}
+        for key, rows in encoded.items():
+            fill = pad_id if key == "input_ids" else 0
+            padded = np.full((len(bucket), max_len), fill, dtype=np.int64)
+            for row, i in enumerate(bucket):
+                padded[row, :lengths[i]] = rows[i]
+            inputs[key] = padded
+        
+        if "attention_mask" not in inputs:
+            mask = np.zeros((len(bucket), max_len), dtype=np.int64)
+            for row, i in enumerate(bucket):
+                mask[row, :lengths[i]] = 1
+            inputs["attention_mask"] = mask
+        
+        return inputs
+
+    @staticmethod
+    def _pool(hidden: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        """Attention-mask-aware mean pooling followed by L2 normalization.
+        
+        Args:
+            hidden: Token embeddings of shape (batch, seq_len, dim).
+            attention_mask: Mask of shape (batch, seq_len), 1 for real tokens.
+        
+        Returns:
+            Float32 matrix of shape (batch, dim) with unit-length rows
+            (all-zero rows are left unchanged).
+        """
+        mask = attention_mask[:, :, None].astype(np.float32)
+        summed = (hidden * mask).sum(axis=1)
+        counts = np.maximum(mask.sum(axis=1), 1.0)
+        pooled = summed / counts
+        
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        pooled = pooled / np.where(norms > 0, norms, 1.0)
+        
+        return pooled.astype(np.float32)
 
     def hybrid_search(
         self,
         query: str,
         top_k: int = DEFAULT_TOP_K,
         threshold: float = DEFAULT_THRESHOLD,
-        rrf_k: int = DEFAULT_RRF_K
+        rrf_k: int = DEFAULT_RRF_K,
+        nprobes: Optional[int] = None,
+        refine_factor: Optional[int] = None,
+        search_filter: Optional[Any] = None,
+        channel: Optional[str] = None
     ) -> List[Dict]:
         """Perform hybrid search combining FTS and vector search with RRF.
         
@@ -84,28 +541,114 @@ class SearchService:
             top_k: Number of results to return.
             threshold: Minimum similarity threshold for vector results.
             rrf_k: RRF constant (default 60).
+            nprobes: IVF partitions probed by an indexed vector search;
+                more is slower but recalls more. None keeps the default.
+            refine_factor: Re-rank ``limit * refine_factor`` PQ candidates
+                with exact distances. None disables refinement.
+            search_filter: Optional ``SearchFilter`` (tags, time range),
+                pushed down into both legs so each leg's fetch limit is
+                spent only on eligible memories.
+            channel: Search only this channel (its FTS partition and its
+                own vector backend); ``"*"`` searches every channel and
+                merges them with RRF. None searches unscoped.
         
         Returns:
-            List of memory dicts with id, content, tags, note fields.
+            List of memory dicts with id, content, tags, note fields, plus
+            ``sources`` naming the legs ("fts", "vector") that ranked each
+            memory and, for channel-scoped searches, its ``channel``.
         """
-        fetch_limit = top_k * FETCH_MULTIPLIER
+        started = time.perf_counter()
+        trace: Dict[str, float] = {}
+        vector_options = {"nprobes": nprobes, "refine_factor": refine_factor}
+        if self._result_cache is None:
+            results = self._hybrid_search(
+                query, top_k, threshold, rrf_k, vector_options, search_filter,
+                channel, trace
+            )[0]
+            self._metrics.record_query(
+                query, time.perf_counter() - started, trace, channel=channel
+            )
+            return results
         
-        fts_results = self._search_fts(query, fetch_limit)
-        vector_results = self._search_vector(query, fetch_limit, threshold)
+        # The generation is read before searching, so a result computed
+        # while a write lands is stored under the old generation and can
+        # never be served afterwards.
+        key = (
+            query, top_k, threshold, rrf_k, nprobes, refine_factor,
+            search_filter, channel, self._write_generation
+        )
+        cached = self._result_cache.get(key)
+        if cached is None:
+            cached, complete = self._hybrid_search(
+                query, top_k, threshold, rrf_k, vector_options, search_filter,
+                channel, trace
+            )
+            # Results missing a timed-out leg are not worth remembering.
+            if complete:
+                self._result_cache.put(key, cached)
+        results = copy.deepcopy(cached)
+        self._metrics.record_query(
+            query, time.perf_counter() - started, trace, channel=channel
+        )
+        return results
+
+    def _hybrid_search(
+        self,
+        query: str,
+        top_k: int,
+        threshold: float,
+        rrf_k: int,
+        vector_options: Dict[str, Any],
+        search_filter: Optional[Any] = None,
+        channel: Optional[str] = None,
+        trace: Optional[Dict[str, float]] = None
+    ) -> Tuple[List[Dict], bool]:
+        """Run both retrieval legs and fuse them with RRF (uncached).
         
-        all_docs = {**fts_results, **vector_results}
+        Args:
+            query: Search query string.
+            top_k: Number of results to return.
+            threshold: Minimum similarity threshold for vector results.
+            rrf_k: RRF constant.
+            vector_options: Extra keyword arguments for ``_search_vector``.
+            search_filter: Optional ``SearchFilter`` for both legs.
+            channel: Channel to search, ``"*"`` for all, None unscoped.
+            trace: Optional dict collecting this query's stage seconds.
         
-        if not all_docs:
-            return []
+        Returns:
+            Tuple of (results, complete) where ``complete`` is False if a
+            leg timed out and was left out of the fusion.
+        """
+        fetch_limit = top_k * FETCH_MULTIPLIER
         
-        fts_ranking = list(fts_results.keys())
-        vector_ranking = list(vector_results.keys())
+        if channel == ALL_CHANNELS:
+            conn = self._read_connection()
+            channels = list_channels(conn) if conn else []
+        else:
+            channels = [channel]
         
+        legs, complete = self._run_legs(
+            query, fetch_limit, threshold, vector_options, search_filter,
+            channels, trace
+        )
+        
+        with self._metrics.timer(STAGE_FUSION, trace):
+            return self._fuse(legs, top_k, rrf_k), complete
+
+    @staticmethod
+    def _fuse(
+        legs: List[Tuple[str, Optional[str], Dict[str, Dict]]],
+        top_k: int,
+        rrf_k: int
+    ) -> List[Dict]:
+        """Fuse the legs' rankings with RRF and label each hit's sources."""
+        all_docs = {}
         ranked_lists = []
-        if fts_ranking:
-            ranked_lists.append(fts_ranking)
-        if vector_ranking:
-            ranked_lists.append(vector_ranking)
+        for _, _, hits in legs:
+            for doc_id, doc in hits.items():
+                all_docs.setdefault(doc_id, doc)
+            if hits:
+                ranked_lists.append(list(hits.keys()))
         
         if not ranked_lists:
             return []
@@ -117,32 +660,148 @@ class SearchService:
         results = []
         for doc_id in sorted_ids[:top_k]:
             if doc_id in all_docs:
-                results.append(all_docs[doc_id])
+                doc = dict(all_docs[doc_id])
+                doc["sources"] = []
+                for leg, _, hits in legs:
+                    if doc_id in hits and leg not in doc["sources"]:
+                        doc["sources"].append(leg)
+                results.append(doc)
         
         return results
 
-    def _search_fts(self, query: str, limit: int) -> Dict[str, Dict]:
+    def _run_legs(
+        self,
+        query: str,
+        fetch_limit: int,
+        threshold: float,
+        vector_options: Dict[str, Any],
+        search_filter: Optional[Any] = None,
+        channels: Sequence[Optional[str]] = (None,),
+        trace: Optional[Dict[str, float]] = None
+    ) -> Tuple[List[Tuple[str, Optional[str], Dict[str, Dict]]], bool]:
+        """Run the FTS and vector legs concurrently under one deadline.
+        
+        Args:
+            query: Search query.
+            fetch_limit: Maximum results each leg fetches.
+            threshold: Minimum similarity for vector results.
+            vector_options: Extra keyword arguments for ``_search_vector``.
+            search_filter: Optional ``SearchFilter`` for both legs.
+            channels: Channels to search; each gets its own pair of legs
+                (None runs one unscoped pair).
+            trace: Optional dict collecting this query's stage seconds.
+                Each leg times into its own dict, merged here once the
+                leg finished, so legs never write a shared dict and a
+                timed-out leg adds nothing.
+        
+        Returns:
+            Tuple of (legs, complete) where ``legs`` lists (leg name,
+            channel, results) in submission order. A leg that misses the
+            deadline contributes an empty dict and makes ``complete``
+            False; it keeps running in the background. While no model is
+            loaded only the FTS legs run and ``complete`` is False.
+        """
+        model_ready = self.model_ready
+        futures = []
+        for channel in channels:
+            fts_trace: Dict[str, float] = {}
+            fts = self._leg_executor.submit(
+                self._search_fts, query, fetch_limit, search_filter, channel,
+                fts_trace
+            )
+            futures.append((LEG_FTS, channel, fts_trace, fts))
+            if not model_ready:
+                continue
+            vector_trace: Dict[str, float] = {}
+            vector = self._leg_executor.submit(
+                self._search_vector, query, fetch_limit, threshold,
+                search_filter=search_filter, channel=channel,
+                trace=vector_trace, **vector_options
+            )
+            futures.append((LEG_VECTOR, channel, vector_trace, vector))
+        deadline = None if self._leg_timeout is None \
+            else time.monotonic() + self._leg_timeout
+        
+        legs = []
+        complete = model_ready
+        for leg, channel, leg_trace, future in futures:
+            remaining = None if deadline is None \
+                else max(0.0, deadline - time.monotonic())
+            try:
+                hits = future.result(timeout=remaining)
+            except FutureTimeoutError:
+                logging.warning(
+                    f"Search leg '{leg}' exceeded {self._leg_timeout:.3f}s, "
+                    f"fusing without it"
+                )
+                self._metrics.increment("leg_timeouts", leg=leg)
+                hits = {}
+                complete = False
+            else:
+                if not hits:
+                    self._metrics.increment("empty_legs", leg=leg)
+                if trace is not None:
+                    for stage, seconds in leg_trace.items():
+                        trace[stage] = trace.get(stage, 0.0) + seconds
+            legs.append((leg, channel, hits))
+        
+        return legs, complete
+
+    def _read_connection(self) -> Optional[Any]:
+        """Return the SQLite connection the calling thread should read with."""
+        if self._sqlite_store is not None:
+            return self._sqlite_store.reader()
+        return self._sqlite_conn
+
+    def _search_fts(
+        self,
+        query: str,
+        limit: int,
+        search_filter: Optional[Any] = None,
+        channel: Optional[str] = None,
+        trace: Optional[Dict[str, float]] = None
+    ) -> Dict[str, Dict]:
         """Search SQLite FTS5 index.
         
         Args:
             query: Search query.
             limit: Maximum results to fetch.
+            search_filter: Optional ``SearchFilter``; tags become FTS5
+                ``tags`` column constraints and the time range a condition
+                on the joined metadata row, both applied before LIMIT.
+            channel: Restrict to one channel through the FTS ``channel``
+                column, so only that channel's postings are intersected.
+            trace: Optional dict collecting this query's stage seconds.
         
         Returns:
             Dict mapping doc IDs to memory dicts.
         """
         results = {}
         
-        if not self._sqlite_conn:
+        conn = self._read_connection()
+        if not conn:
             return results
         
+        match, conditions, params = f"{query}*", "", []
+        if search_filter is not None:
+            match = search_filter.fts_match(query)
+            conditions, params = search_filter.sql_conditions("m")
+        if channel is not None:
+            quoted = channel.replace('"', '""')
+            match = f'({match}) AND channel : "{quoted}"'
+            conditions += " AND m.channel = ?"
+            params = [*params, channel]
+        
         try:
-            cursor = self._sqlite_conn.execute(
-                "SELECT id, content, tags, note FROM memories "
-                "WHERE memories MATCH ? ORDER BY rank LIMIT ?",
-                (f"{query}*", limit)
-            )
-            for row in cursor:
+            with self._metrics.timer(STAGE_FTS, trace):
+                rows = list(conn.execute(
+                    "SELECT m.id, m.content, m.tags, m.note FROM memories_fts "
+                    "JOIN memories m ON m.seq = memories_fts.rowid "
+                    f"WHERE memories_fts MATCH ?{conditions} "
+                    "ORDER BY memories_fts.rank LIMIT ?",
+                    (match, *params, limit)
+                ))
+            for row in rows:
                 doc_id = row[0]
                 results[doc_id] = {
                     "id": doc_id,
@@ -150,8 +809,11 @@ class SearchService:
                     "tags": row[2].split() if row[2] else [],
                     "note": row[3]
                 }
+                if channel is not None:
+                    results[doc_id]["channel"] = channel
         except Exception as e:
-            logging.debug(f"FTS search error: {e}")
+            logging.warning(f"FTS search error: {e}")
+            self._metrics.increment("leg_failures", leg=LEG_FTS)
         
         return results
 
@@ -159,42 +821,137 @@ class SearchService:
         self,
         query: str,
         limit: int,
-        threshold: float
+        threshold: float,
+        nprobes: Optional[int] = None,
+        refine_factor: Optional[int] = None,
+        search_filter: Optional[Any] = None,
+        channel: Optional[str] = None,
+        trace: Optional[Dict[str, float]] = None
     ) -> Dict[str, Dict]:
-        """Search LanceDB vector index with similarity threshold.
+        """Search the vector backend with similarity threshold.
+        
+        Chunk hits are collapsed onto their memory, keeping the best
+        chunk's similarity (max-sim). Hits that carry only an id (e.g.
+        from ``NumpyBackend``) or a chunk's text are hydrated from SQLite;
+        ids missing there are dropped. The backend
+        prefilters with ``search_filter``; hits are re-checked here since
+        rows without stored metadata pass the prefilter.
         
         Args:
             query: Search query.
             limit: Maximum results to fetch.
             threshold: Minimum similarity score (0-1).
+            nprobes: IVF partitions to probe (indexed tables only).
+            refine_factor: Exact re-ranking factor for PQ candidates.
+            search_filter: Optional ``SearchFilter``.
+            channel: Channel whose backend to search (None: the default
+                backend).
+            trace: Optional dict collecting this query's stage seconds.
         
         Returns:
             Dict mapping doc IDs to memory dicts.
         """
         results = {}
         
-        if not self._vector_table:
-            return results
+        with self._generation_lock:
+            model_generation = self._model_generation
+            backend = self._vector_backend
+            channels = self._channels
+        if channel is not None and channels is not None:
+            # Leased so LRU eviction cannot close it mid-scan.
+            lease = channels.lease(channel)
+        else:
+            lease = contextlib.nullcontext(backend)
         
         try:
-            query_vector = self.embed(query)
-            hits = self._vector_table.search(query_vector).limit(limit).to_list()
+            with lease as backend:
+                if backend is None:
+                    return results
+                with self._metrics.timer(STAGE_EMBED_QUERY, trace):
+                    query_vector = self.embed_query(query)
+                search_options = {
+                    "nprobes": nprobes, "refine_factor": refine_factor
+                }
+                if search_filter is not None:
+                    search_options["search_filter"] = search_filter
+                with self._metrics.timer(STAGE_VECTOR_SCAN, trace):
+                    hits = backend.search(query_vector, limit, **search_options)
+            if self._model_generation != model_generation:
+                logging.debug(
+                    "Vector search raced a model swap, dropping its hits"
+                )
+                return results
+            kept = [
+                hit for hit in hits
+                if distance_to_similarity(hit.get("_distance", 1.0))
+                >= threshold
+            ]
+            if len(kept) < len(hits):
+                dropped = len(hits) - len(kept)
+                self._metrics.increment("threshold_dropped", dropped)
+            hits = self._collapse_chunks(kept)
+            
+            needs_time = search_filter is not None and (
+                search_filter.created_after is not None
+                or search_filter.created_before is not None
+            )
+            missing = [
+                hit["id"] for hit in hits
+                if "content" not in hit
+                or (needs_time and hit.get("created_at") is None)
+            ]
+            hydrated = {}
+            if missing:
+                conn = self._read_connection()
+                if conn:
+                    hydrated = fetch_memories(conn, missing)
             
             for hit in hits:
-                distance = hit.get("_distance", 1.0)
-                similarity = distance_to_similarity(distance)
-                
-                if similarity < threshold:
-                    continue
-                
                 doc_id = hit["id"]
-                results[doc_id] = {
-                    "id": doc_id,
-                    "content": hit["content"],
-                    "tags": hit["tags"].split() if hit["tags"] else [],
-                    "note": hit["note"]
-                }
+                if doc_id in hydrated:
+                    memory = dict(hydrated[doc_id])
+                elif "content" in hit and doc_id not in missing:
+                    memory = {
+                        "id": doc_id,
+                        "content": hit["content"],
+                        "tags": hit["tags"].split() if hit["tags"] else [],
+                        "note": hit["note"],
+                        "created_at": hit.get("created_at")
+                    }
+                else:
+                    continue
+                created_at = memory.pop("created_at", None)
+                if search_filter is not None and \
+                        not search_filter.matches(memory["tags"], created_at):
+                    continue
+                if channel is not None:
+                    memory["channel"] = channel
+                results[doc_id] = memory
         except Exception as e:
-            logging.debug(f"Vector search error: {e}")
+            logging.warning(f"Vector search error: {e}")
+            self._metrics.increment("leg_failures", leg=LEG_VECTOR)
         
         return results
+
+    @staticmethod
+    def _collapse_chunks(hits: List[Dict]) -> List[Dict]:
+        """Keep the nearest hit per memory, renamed to the memory id.
+        
+        Args:
+            hits: Backend hits, possibly several chunks of one memory.
+        
+        Returns:
+            One hit per memory, nearest first; chunk hits lose their
+            chunk-level fields so the memory is hydrated instead.
+        """
+        best: Dict[str, Dict] = {}
+        for hit in hits:
+            memory_id = parent_id(hit["id"])
+            current = best.get(memory_id)
+            if current is not None and \
+                    current.get("_distance", 1.0) <= hit.get("_distance", 1.0):
+                continue
+            if memory_id != hit["id"]:
+                hit = {"id": memory_id, "_distance": hit.get("_distance", 1.0)}
+            best[memory_id] = hit
+        return sorted(best.values(), key=lambda hit: hit.get("_distance", 1.0))
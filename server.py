@@ -1,7 +1,8 @@
 import os
 import logging
+import time
 import uuid
-from typing import List, Dict
+from typing import Any, List, Dict, Optional
 import uvicorn
 from fastmcp import FastMCP
 import numpy as np
@@ -12,173 +13,1182 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
-# --- 1. 初始化资源 (Eager Loading - 既然手动启动，就直接加载!) ---
-logging.info("Initializing resources... Please wait for TensorRT/CUDA loading...")
+# --- 1. 初始化资源 (Lazy Loading: 先绑定端口, 模型在后台预热) ---
+# 只有 SQLite 等轻量资源在导入时打开; tokenizer / ONNX Session / 向量库由 startup 在后台线程加载,
+# 加载完成前搜索只走全文检索, 用 memory_health 查看是否就绪以及各阶段耗时
+import asyncio
+import threading
+import reembed
+from warmup import WarmUp
 
-import lancedb
-import sqlite3
-import onnxruntime as ort
-from transformers import AutoTokenizer
+startup = WarmUp()
+# 写入/导入需要模型: 预热未完成时最多等待的秒数
+startup_wait = float(os.environ.get("MEMORY_STARTUP_WAIT", "120"))
 
-# Tokenizer
-model_dir = os.path.join(os.path.dirname(__file__), "bge-m3-onnx")
-logging.info(f"Loading tokenizer from {model_dir}")
-tokenizer = AutoTokenizer.from_pretrained(model_dir)
+base_dir = os.path.dirname(os.path.abspath(__file__))
 
-# ONNX Session
-onnx_path = os.path.join(model_dir, "sentence_transformers.onnx")
-logging.info(f"Loading ONNX Model (This may take a while): {onnx_path}")
+# 当前生效的模型: 重新嵌入 (reembed_start) 切换模型后记录在 manifest 中，
+# 新模型的向量存放在带 storage_suffix 的表/目录里
+manifest_path = os.path.join(base_dir, reembed.MANIFEST_FILE)
+manifest = reembed.read_manifest(manifest_path) or {}
+model_dir = manifest.get("model_dir") or os.path.join(base_dir, "bge-m3-onnx")
+storage_suffix = manifest.get("storage_suffix", "")
 
-session_options = ort.SessionOptions()
-session_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
-session_options.log_severity_level = 1 # Show warnings
+def _model_fingerprint(model_dir: str) -> str:
+    # 模型指纹: 模型文件变化后缓存的向量自动失效 (只读文件元数据, 不加载模型)
+    onnx_path = os.path.join(model_dir, "sentence_transformers.onnx")
+    return (
+        f"{os.path.basename(os.path.normpath(model_dir))}:"
+        f"{os.path.getsize(onnx_path)}:{int(os.path.getmtime(onnx_path))}"
+    )
 
-session = ort.InferenceSession(
-    onnx_path,
-    sess_options=session_options,
-    providers=['TensorrtExecutionProvider', 'CUDAExecutionProvider', 'CPUExecutionProvider']
+# 启动缓存 (MEMORY_MODEL_CACHE=0 关闭): 保存优化后的 ONNX 图和 tokenizer, 下次启动直接加载。
+# 以模型文件哈希 + onnxruntime 版本 + 执行提供者为键, 任何一项变化都会自动重建
+from model_cache import (
+    ModelCache, create_session, load_tokenizer, session_providers
 )
-logging.info(">>> ONNX Model Loaded Successfully! <<<")
-
-# LanceDB
-logging.info("Connecting to LanceDB...")
-db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "memory_db")
-db = lancedb.connect(db_path)
-try:
-    vector_table = db.open_table("memories")
-except Exception:
-    vector_table = db.create_table(
-        "memories",
-        data=[{"vector": np.zeros(1024, dtype=np.float32), "id": "dummy", "content": "", "tags": "", "note": ""}],
-        mode="create"
-    )
-
-# SQLite
+from session_pool import SessionPool, affinity_config, plan_cores
+
+model_cache_enabled = os.environ.get("MEMORY_MODEL_CACHE", "1") != "0"
+
+def _model_cache_dir(model_dir: str) -> str:
+    name = os.path.basename(os.path.normpath(model_dir))
+    return os.path.join(base_dir, "model_cache", name)
+
+def _open_model_cache(model_dir: str) -> Optional[ModelCache]:
+    if not model_cache_enabled:
+        return None
+    import onnxruntime as ort
+    import transformers
+
+    return ModelCache(
+        _model_cache_dir(model_dir),
+        os.path.join(model_dir, "sentence_transformers.onnx"),
+        runtime_version=ort.__version__,
+        provider=session_providers()[0],
+        tokenizer_version=transformers.__version__
+    )
+
+def _load_tokenizer(model_dir: str, cache: Optional[ModelCache] = None):
+    logging.info(f"Loading tokenizer from {model_dir}")
+    return load_tokenizer(model_dir, cache)
+
+# 推理会话池: 多个 Session 各自使用一组 CPU 核 (intra-op 线程), 并发请求分散到不同会话;
+# I/O binding 复用预分配的输入/输出缓冲区。池大小为 1 且关闭 I/O binding 时即单个 Session
+session_pool_size = max(1, int(os.environ.get("MEMORY_SESSION_POOL", "1")))
+# 0 = 平分可用核
+intra_op_threads = int(os.environ.get("MEMORY_INTRA_OP_THREADS", "0"))
+inter_op_threads = int(os.environ.get("MEMORY_INTER_OP_THREADS", "1"))
+pin_threads = os.environ.get("MEMORY_PIN_THREADS", "0") == "1"
+io_binding = os.environ.get("MEMORY_IO_BINDING", "1") != "0"
+
+def _create_session(model_dir: str, cache: Optional[ModelCache] = None):
+    onnx_path = os.path.join(model_dir, "sentence_transformers.onnx")
+    logging.info(f"Loading ONNX Model (This may take a while): {onnx_path}")
+    providers = session_providers()
+    sessions = []
+    for cores in plan_cores(session_pool_size, intra_op_threads):
+        def configure(options, cores=cores):
+            options.intra_op_num_threads = len(cores) or intra_op_threads
+            options.inter_op_num_threads = inter_op_threads
+            if session_pool_size > 1:
+                # 多个会话共享机器时, 空闲线程不自旋占用 CPU
+                options.add_session_config_entry(
+                    "session.intra_op.allow_spinning", "0"
+                )
+            if (pin_threads and len(cores) > 1
+                    and providers[0] == "CPUExecutionProvider"):
+                options.add_session_config_entry(
+                    "session.intra_op_thread_affinities", affinity_config(cores)
+                )
+        sessions.append(create_session(onnx_path, providers, cache, configure))
+    logging.info(
+        f">>> ONNX Model Loaded Successfully! ({len(sessions)} session(s)) <<<"
+    )
+    if len(sessions) == 1 and not io_binding:
+        return sessions[0]
+    return SessionPool(sessions, io_binding=io_binding)
+
+# 多进程推理 (MEMORY_EMBED_PROCESSES=N, 默认 0 = 进程内推理): 分词和池化受 GIL 限制, 多线程无法扩展;
+# N 个工作进程各自加载 tokenizer 和 ONNX Session, 向量经共享内存传回 (主进程不再创建 Session)
+from embed_workers import ProcessEmbedder, onnx_worker_factory
+
+embed_processes = int(os.environ.get("MEMORY_EMBED_PROCESSES", "0"))
+
+def _start_embed_processes(model_dir: str) -> ProcessEmbedder:
+    logging.info(
+        f"Starting {embed_processes} embedding worker process(es): {model_dir}"
+    )
+    cache_dir = _model_cache_dir(model_dir) if model_cache_enabled else None
+    # 每个进程一组核, 避免各进程的 intra-op 线程互相争抢
+    cores = plan_cores(embed_processes, intra_op_threads)[0]
+    threads = len(cores) or intra_op_threads
+    embedder = ProcessEmbedder(
+        onnx_worker_factory, (model_dir, cache_dir, threads),
+        workers=embed_processes
+    )
+    try:
+        embedder.wait_ready()
+    except Exception:
+        embedder.close()
+        raise
+    logging.info(f">>> {embedder.size} embedding worker(s) ready <<<")
+    return embedder
+
+def _prime_session(tokenizer, session) -> None:
+    # 预热推理: 让 TensorRT/CUDA 在第一个真实请求之前完成引擎构建和显存分配 (池中每个会话各一次)
+    # 多进程模式下 session 为 None, 工作进程启动时已各自预热
+    if session is None:
+        return
+    inputs = tokenizer("warm-up", return_tensors="np")
+    for _ in range(getattr(session, "size", 1)):
+        session.run(None, {k: v.astype(np.int64) for k, v in inputs.items()})
+
+def _load_model(model_dir: str):
+    """加载 tokenizer 和 ONNX Session (多进程模式下为工作进程)
+
+    返回 (tokenizer, session, embedder, 模型指纹)
+    """
+    cache = _open_model_cache(model_dir)
+    tokenizer = _load_tokenizer(model_dir, cache)
+    if embed_processes > 0:
+        embedder = _start_embed_processes(model_dir)
+        return tokenizer, None, embedder, _model_fingerprint(model_dir)
+    session = _create_session(model_dir, cache)
+    return tokenizer, session, None, _model_fingerprint(model_dir)
+
+# 预热完成前为 None (search_service 此时只做全文检索)
+tokenizer = session = process_embedder = model_cache = None
+model_fingerprint = _model_fingerprint(model_dir)
+
+# SQLite (WAL 模式: 每线程只读连接 + 单写线程合并提交)
 logging.info("Connecting to SQLite...")
-sqlite_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "memory.db")
-conn = sqlite3.connect(sqlite_path, check_same_thread=False)
-conn.execute("""
-    CREATE VIRTUAL TABLE IF NOT EXISTS memories USING fts5(
-        id, content, tags, note, tokenize='unicode61'
+from storage import (
+    SQLiteStore, insert_memories, delete_memories, existing_ids,
+    list_channels
+)
+from pagination import list_page
+
+sqlite_path = os.path.join(base_dir, "memory.db")
+with startup.phase("sqlite"):
+    store = SQLiteStore(
+        sqlite_path,
+        synchronous=os.environ.get("MEMORY_SQLITE_SYNCHRONOUS", "NORMAL"),
+        mmap_size=int(
+            os.environ.get("MEMORY_SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))
+        ),
+        cache_size_kib=int(
+            os.environ.get("MEMORY_SQLITE_CACHE_KIB", str(64 * 1024))
+        )
     )
-""")
-conn.commit()
 
-logging.info(">>> All Resources Ready! Server is starting... <<<")
+# 向量后端: lancedb (默认) 或 numpy (进程内精确检索，适合 20 万条以内的库)。
+# 每个频道 (channel, 例如一个 git 分支) 有独立的向量表/目录，首次使用时打开，LRU 只保留最近用过的若干个
+from vector_backends import (
+    BACKEND_LANCEDB, BACKEND_NUMPY, LanceDBBackend, NumpyBackend
+)
+from channels import (
+    ALL_CHANNELS, DEFAULT_CHANNEL, ChannelRegistry, channel_key,
+    validate_channel
+)
+
+vector_backend_name = os.environ.get(
+    "MEMORY_VECTOR_BACKEND", BACKEND_LANCEDB).lower()
+
+def _channel_has_memories(channel: str) -> bool:
+    return store.reader().execute(
+        "SELECT 1 FROM memories WHERE channel = ? LIMIT 1", (channel,)
+    ).fetchone() is not None
+
+# NumPy 后端为空但 SQLite 已有该频道的记忆 (例如刚从 LanceDB 切换过来) 时，
+# 后台补建向量。补建期间删除的记忆即使被重新写入向量，
+# 也会因 SQLite 中查不到而不会出现在结果里
+def _backfill_vector_backend(
+    backend, channel: str, batch_size: int = 64
+) -> None:
+    if not startup.wait():
+        logging.error(
+            f"Not backfilling channel '{channel}': "
+            "the embedding model failed to load"
+        )
+        return
+    cursor = store.reader().execute(
+        "SELECT id, content, tags, note, created_at FROM memories "
+        "WHERE channel = ?",
+        (channel,)
+    )
+    added = 0
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        embedded = search_service.embed_chunks([row[1] for row in rows])
+        backend.add([
+            chunk_row
+            for row, (chunks, vectors) in zip(rows, embedded)
+            for chunk_row in chunk_rows(
+                {
+                    "id": row[0], "content": row[1], "tags": row[2],
+                    "note": row[3], "created_at": row[4]
+                },
+                chunks, vectors
+            )
+        ])
+        added += len(rows)
+    search_service.bump_write_generation()
+    logging.info(
+        f"Vector backend of channel '{channel}' backfilled with "
+        f"{added} memories"
+    )
+
+def _numpy_root(suffix: str) -> str:
+    name = f"vector_store_{suffix}" if suffix else "vector_store"
+    return os.path.join(base_dir, name)
+
+def _lance_base_table(suffix: str) -> str:
+    return f"memories__m{suffix}" if suffix else "memories"
+
+if vector_backend_name == BACKEND_NUMPY:
+    import shutil
+
+    def _make_vector_opener(suffix: str, backfill: bool = True):
+        """返回打开某个模型 (storage_suffix) 下各频道向量库的函数"""
+        def open_backend(channel: str, create: bool):
+            return _open_numpy_backend(suffix, backfill, channel, create)
+        return open_backend
+
+    def _drop_vector_storage(suffix: str) -> None:
+        shutil.rmtree(_numpy_root(suffix), ignore_errors=True)
+
+    def _open_numpy_backend(
+        suffix: str, backfill: bool, channel: str, create: bool
+    ):
+        directory = _numpy_root(suffix)
+        if channel != DEFAULT_CHANNEL:
+            directory = os.path.join(
+                directory, "channels", channel_key(channel)
+            )
+        needs_backfill = backfill and _channel_has_memories(channel)
+        if not create and not needs_backfill and not os.path.isdir(directory):
+            return None
+
+        logging.info(f"Opening NumPy vector store of channel '{channel}'...")
+        backend = NumpyBackend(
+            directory,
+            dim=1024,
+            mmap=os.environ.get("MEMORY_NUMPY_MMAP", "1") != "0",
+            # float32 / float16 / int8 / binary; 有损模式下用 float32 重排候选
+            # (0 = 不重排, 也不保留 float32)
+            # 未设置时按模式取默认值: 重排要额外保留一份 float32, 以磁盘换召回
+            quantization=os.environ.get(
+                "MEMORY_VECTOR_QUANTIZATION", "float32"
+            ),
+            rescore_factor=(
+                int(os.environ["MEMORY_VECTOR_RESCORE"])
+                if os.environ.get("MEMORY_VECTOR_RESCORE") else None
+            )
+        )
+        if backend.count() == 0 and needs_backfill:
+            logging.info(
+                f"NumPy vector store of channel '{channel}' is empty, "
+                "backfilling..."
+            )
+            threading.Thread(
+                target=_backfill_vector_backend, args=(backend, channel),
+                name="vector-backfill", daemon=True
+            ).start()
+        return backend
+elif vector_backend_name == BACKEND_LANCEDB:
+    # LanceDB: 默认频道沿用 "memories" 表，其他频道各一张表
+    import lancedb
+    import pyarrow as pa
+    from vector_index import VectorIndexManager
+    from maintenance import TableMaintenance
+
+    logging.info("Connecting to LanceDB...")
+    with startup.phase("lancedb_connect"):
+        db = lancedb.connect(os.path.join(base_dir, "memory_db"))
+    lance_schema = pa.schema([
+        pa.field("vector", pa.list_(pa.float32(), 1024)),
+        pa.field("id", pa.string()),
+        pa.field("content", pa.string()),
+        pa.field("tags", pa.string()),
+        pa.field("note", pa.string()),
+        pa.field("created_at", pa.float64())
+    ])
+
+    def _make_vector_opener(suffix: str, backfill: bool = True):
+        """返回打开某个模型 (storage_suffix) 下各频道向量表的函数"""
+        def open_backend(channel: str, create: bool):
+            return _open_lance_backend(suffix, channel, create)
+        return open_backend
+
+    def _drop_vector_storage(suffix: str) -> None:
+        base = _lance_base_table(suffix)
+        for name in db.table_names():
+            if name == base or name.startswith(base + "__"):
+                db.drop_table(name)
+
+    def _open_lance_backend(suffix: str, channel: str, create: bool):
+        base = _lance_base_table(suffix)
+        table_name = base if channel == DEFAULT_CHANNEL \
+            else f"{base}__{channel_key(channel)}"
+        try:
+            table = db.open_table(table_name)
+        except Exception:
+            if not create:
+                return None
+            logging.info(
+                f"Creating LanceDB table {table_name} for channel '{channel}'"
+            )
+            table = db.create_table(
+                table_name, schema=lance_schema, exist_ok=True
+            )
+
+        # 行数超过阈值后自动在后台构建 IVF-PQ 索引，写入足够多后重新训练
+        index_manager = VectorIndexManager(
+            table,
+            min_rows=int(os.environ.get("MEMORY_INDEX_MIN_ROWS", "20000")),
+            retrain_after_writes=int(
+                os.environ.get("MEMORY_INDEX_RETRAIN_WRITES", "10000")
+            )
+        )
+        index_manager.maybe_schedule()
+
+        # 碎片合并 + 旧版本清理: 达到阈值或定时在后台执行，不阻塞搜索
+        table_maintenance = TableMaintenance(
+            table,
+            compact_after_adds=int(
+                os.environ.get("MEMORY_COMPACT_AFTER_ADDS", "200")
+            ),
+            compact_after_deletes=int(
+                os.environ.get("MEMORY_COMPACT_AFTER_DELETES", "100")
+            ),
+            interval_seconds=float(
+                os.environ.get("MEMORY_MAINTENANCE_INTERVAL", "3600")
+            )
+        )
+
+        backend = LanceDBBackend(
+            table, index_manager=index_manager, maintenance=table_maintenance
+        )
+        # 旧表补一列 created_at (旧数据为 NULL)，用于按时间预过滤
+        backend.ensure_created_at()
+        return backend
+else:
+    raise ValueError(f"Unknown MEMORY_VECTOR_BACKEND: {vector_backend_name!r}")
+
+max_open_channels = int(os.environ.get("MEMORY_MAX_OPEN_CHANNELS", "16"))
+channel_registry = ChannelRegistry(
+    _make_vector_opener(storage_suffix), max_open=max_open_channels
+)
 
 # Initialize SearchService
 from search_engine import SearchService
+from filters import SearchFilter
+from embed_scheduler import EmbeddingScheduler
+from caching import LRUCache
+from chunking import Chunker, chunk_rows, embedded_texts
+import transfer
+from embedding_store import EmbeddingStore
+
+def _embedding_cache_dir(suffix: str) -> str:
+    name = f"embedding_cache_{suffix}" if suffix else "embedding_cache"
+    return os.path.join(base_dir, name)
+
+# 按内容哈希 + 模型指纹持久化的向量缓存，相同文本无需再次推理
+embedding_store = EmbeddingStore(
+    _embedding_cache_dir(storage_suffix), model_id=model_fingerprint
+)
+
+def _make_chunker(tokenizer) -> Chunker:
+    # 长文档按 token 窗口分块 (带重叠)，每块一个向量，检索时按最相似的块归并到记忆
+    return Chunker(
+        tokenizer,
+        chunk_tokens=int(os.environ.get("MEMORY_CHUNK_TOKENS", "510")),
+        overlap=int(os.environ.get("MEMORY_CHUNK_OVERLAP", "64"))
+    )
+
+chunker = None
+
+# 延迟统计: 分词 / session.run / 全文 / 向量扫描 / RRF 融合各阶段的 p50/p95/p99,
+# 检索各路失败/空结果/阈值丢弃计数;
+# 超过 MEMORY_SLOW_QUERY_MS 的查询连同各阶段耗时记入警告日志 (0 关闭)
+from metrics import Metrics, start_metrics_server
+
+slow_query_ms = float(os.environ.get("MEMORY_SLOW_QUERY_MS", "500"))
+metrics = Metrics(
+    window=int(os.environ.get("MEMORY_METRICS_WINDOW", "1024")),
+    slow_query_ms=slow_query_ms if slow_query_ms > 0 else None
+)
 
 search_service = SearchService(
     session=session,
     tokenizer=tokenizer,
-    vector_table=vector_table,
-    sqlite_conn=conn
+    vector_table=None,
+    channels=channel_registry,
+    sqlite_conn=None,
+    sqlite_store=store,
+    chunker=chunker,
+    query_cache=LRUCache(
+        max_size=int(os.environ.get("MEMORY_QUERY_CACHE_SIZE", "1024")),
+        ttl_seconds=float(os.environ.get("MEMORY_QUERY_CACHE_TTL", "3600"))
+    ),
+    model_fingerprint=model_fingerprint,
+    result_cache=LRUCache(
+        max_size=int(os.environ.get("MEMORY_RESULT_CACHE_SIZE", "256")),
+        ttl_seconds=float(os.environ.get("MEMORY_RESULT_CACHE_TTL", "600"))
+    ),
+    embedding_store=embedding_store,
+    # 全文/向量两路并发检索，单路超时则只融合已返回的结果
+    leg_timeout=float(
+        os.environ.get("MEMORY_SEARCH_LEG_TIMEOUT_MS", "1000")
+    ) / 1000.0,
+    # 批量推理的各个长度分桶并发送入会话池
+    embed_workers=session_pool_size,
+    metrics=metrics
+)
+
+# 合并并发的 embed 请求为一次批量推理 (可通过环境变量调整);
+# 每个会话 (或嵌入进程) 一个刷新线程, 并发查询能同时用满整个会话池
+embed_scheduler = EmbeddingScheduler(
+    search_service.embed_batch,
+    max_batch_size=int(os.environ.get("MEMORY_EMBED_BATCH_SIZE", "32")),
+    max_wait_ms=float(os.environ.get("MEMORY_EMBED_MAX_WAIT_MS", "5")),
+    workers=embed_processes or session_pool_size
 )
+search_service.set_embed_scheduler(embed_scheduler)
+
+def _activate_model() -> None:
+    """预热完成: 把模型交给 search_service, 此后搜索恢复全文 + 向量混合检索"""
+    global chunker
+    chunker = _make_chunker(tokenizer)
+    search_service.swap_model(
+        session, tokenizer, model_fingerprint,
+        channels=channel_registry, embedding_store=embedding_store,
+        chunker=chunker, embedder=process_embedder
+    )
 
+def _open_startup_cache() -> None:
+    global model_cache
+    model_cache = _open_model_cache(model_dir)
 
+def _load_startup_tokenizer() -> None:
+    global tokenizer
+    tokenizer = _load_tokenizer(model_dir, model_cache)
+
+def _create_startup_session() -> None:
+    global session, process_embedder
+    if embed_processes > 0:
+        process_embedder = _start_embed_processes(model_dir)
+    else:
+        session = _create_session(model_dir, model_cache)
+
+# 后台预热的各个阶段 (按顺序执行, 每个阶段的耗时记录在日志和 memory_health 中)
+startup.add("model_cache", _open_startup_cache)
+startup.add("tokenizer", _load_startup_tokenizer)
+startup.add("onnx_session", _create_startup_session)
+startup.add("warmup_inference", lambda: _prime_session(tokenizer, session))
+startup.add("activate_model", _activate_model)
+# 打开默认频道 (调度索引构建 / 必要时补建向量)
+startup.add(
+    "vector_store",
+    lambda: channel_registry.get(DEFAULT_CHANNEL, create=True)
+)
+
+# 有界线程池: 推理 (CPU) 与数据库读写 (I/O) 分开，队列满时快速返回 busy
+from concurrency import BoundedExecutor, ExecutorBusyError
+from fastmcp.exceptions import ToolError
+
+max_pending = int(os.environ.get("MEMORY_MAX_PENDING", "32"))
+# 每个线程同一时刻占用一个 Session 或一个工作进程: 按其数量设定，使它们都能同时忙碌
+cpu_pool = BoundedExecutor(
+    "cpu",
+    int(os.environ.get(
+        "MEMORY_CPU_WORKERS",
+        str(max(2, embed_processes or session_pool_size))
+    )),
+    max_pending
+)
+io_pool = BoundedExecutor(
+    "io", int(os.environ.get("MEMORY_IO_WORKERS", "8")), max_pending
+)
+
+metrics.gauge("model_ready", lambda: float(search_service.model_ready))
+metrics.gauge("write_generation", lambda: search_service.write_generation)
+for _pool in (cpu_pool, io_pool):
+    metrics.gauge(
+        f"{_pool.name}_pool_in_flight",
+        lambda pool=_pool: pool.stats()["in_flight"]
+    )
+
+async def _model_ready() -> None:
+    """写入类工具需要模型: 预热未完成时 (不占用线程池) 等待, 超时或加载失败则报错"""
+    if not startup.ready:
+        await asyncio.get_running_loop().run_in_executor(
+            None, startup.wait, startup_wait
+        )
+    if not startup.ready:
+        raise ToolError(
+            f"Embedding model is not ready ({startup.state}), "
+            f"please retry later; see memory_health"
+        )
 
 # --- 定义 App (显式禁用 Redis 逻辑已在头部通过 env 实现) ---
 app = FastMCP(
     "Project Memory Bank (SSE Mode)"
 )
 
+# 写入时持有: 重新嵌入任务在切换模型前持有它做最后一轮补齐，保证切换瞬间没有写入落在旧模型上
+_write_lock = threading.Lock()
+
+def _write_memories(
+    rows: List[tuple], embedded, channel: str = DEFAULT_CHANNEL,
+    fingerprint: str = None
+) -> None:
+    """把一批记忆写入 SQLite (单事务) 和该频道的向量后端
+    (单次 add, 长文档每个分块一个向量)"""
+    with _write_lock:
+        if (fingerprint is not None
+                and fingerprint != search_service.model_fingerprint):
+            # 推理期间已切换模型: 用新模型重新计算
+            embedded = search_service.embed_chunks([row[1] for row in rows])
+        _store_memories(rows, embedded, channel)
+
+def _store_memories(rows: List[tuple], embedded, channel: str) -> None:
+    created_at = time.time()
+    try:
+        # SQLite: 一个事务写入整批 (由写线程合并提交)
+        store.write(lambda c: insert_memories(
+            c, rows, created_at=created_at, channel=channel
+        ))
+
+        # 向量后端: 一次 add 写入整批
+        # (频道首次写入时创建它的表/目录; 租用期间不会被 LRU 关闭)
+        with channel_registry.lease(channel, create=True) as backend:
+            backend.add([
+                chunk_row
+                for (memory_id, content, tags_str, note), (chunks, vectors)
+                in zip(rows, embedded)
+                for chunk_row in chunk_rows(
+                    {
+                        "id": memory_id,
+                        "content": content,
+                        "tags": tags_str,
+                        "note": note,
+                        "created_at": created_at
+                    },
+                    chunks, vectors
+                )
+            ])
+    finally:
+        # 写入完成 (或部分写入) 后推进写代数，使搜索结果缓存失效
+        search_service.bump_write_generation()
+
+def _list_memories(
+    limit: int,
+    offset: int,
+    cursor: Optional[str],
+    projection: str,
+    preview_bytes: int,
+    channel: Optional[str]
+) -> Dict[str, Any]:
+    # 按创建时间倒序 (走 created_at 索引)，这样能看到最新的记忆
+    memories, next_cursor = list_page(
+        store.reader(), limit, cursor=cursor, projection=projection,
+        preview_bytes=preview_bytes, offset=offset, channel=channel
+    )
+    return {"memories": memories, "next_cursor": next_cursor}
+
+def _delete_memory(memory_id: str, channel: Optional[str]) -> None:
+    # 还在写后日志里排队: 直接取消, 不会再写入
+    if journal is not None:
+        queued = [m for m in journal.pending() if m["id"] == memory_id]
+        if queued and channel is not None and queued[0]["channel"] != channel:
+            raise ValueError(
+                f"Memory {memory_id} belongs to channel "
+                f"'{queued[0]['channel']}', not '{channel}'"
+            )
+        if journal.cancel(memory_id):
+            return
+    # 先查出记忆所在频道, 删除对应频道的向量 (找不到时按默认频道处理)
+    row = store.reader().execute(
+        "SELECT channel FROM memories WHERE id = ?", (memory_id,)
+    ).fetchone()
+    owner = row[0] if row else DEFAULT_CHANNEL
+    if row and channel is not None and owner != channel:
+        raise ValueError(
+            f"Memory {memory_id} belongs to channel '{owner}', "
+            f"not '{channel}'"
+        )
+    try:
+        # 1. 删除 SQLite 记录
+        store.write(lambda c: delete_memories(c, [memory_id]))
+        logging.info("Deleted from SQLite")
+
+        # 2. 删除向量记录
+        try:
+            with channel_registry.lease(owner) as backend:
+                if backend is not None:
+                    backend.delete([memory_id])
+                    logging.info(
+                        f"Deleted from vector backend ({backend.name}, "
+                        f"channel '{owner}')"
+                    )
+            # 重新嵌入进行中: 影子表里也删掉
+            if (reembed_job is not None
+                    and reembed_job.state == reembed.STATE_RUNNING):
+                reembed_job.delete([memory_id])
+        except Exception as le:
+            logging.warning(f"Vector delete warning (might not exist): {le}")
+    finally:
+        search_service.bump_write_generation()
+
+def _channel_argument(channel: Optional[str], allow_all: bool = False) -> str:
+    try:
+        return validate_channel(channel, allow_all=allow_all)
+    except ValueError as e:
+        raise ToolError(str(e))
+
+# MCP 工具只能读写导出目录内的相对路径 (MEMORY_EXPORT_DIR, 默认 base_dir/exports);
+# 命令行 (python server.py export/import) 不受限制
+export_dir = (
+    os.environ.get("MEMORY_EXPORT_DIR") or os.path.join(base_dir, "exports")
+)
+
+def _export_path(path: str) -> str:
+    os.makedirs(export_dir, exist_ok=True)
+    return transfer.confined_path(export_dir, path)
+
+def _export_bank(path: str, fmt: Optional[str], channel: str) -> Dict:
+    """流式导出: 逐批读取 SQLite, 向量取自向量缓存或向量后端 (不做推理)"""
+    memories = transfer.iter_memories(
+        store.reader(), channel=None if channel == ALL_CHANNELS else channel
+    )
+    # 缓存未命中 (早于缓存保存或被压缩清掉) 的记忆从向量后端取向量
+    records = transfer.with_vectors(
+        memories, embedding_store, chunker, backend_for=channel_registry.lease
+    )
+    return transfer.export_memories(path, records, model_fingerprint, fmt=fmt)
+
+def _write_imported(records: List[Dict], embedded, fingerprint: str) -> None:
+    """写入一批导入的记忆 (保留原 id / 时间 / 频道)，按频道分组写入向量后端"""
+    with _write_lock:
+        if fingerprint != search_service.model_fingerprint:
+            embedded = search_service.embed_chunks(
+                [r["content"] for r in records]
+            )
+        _store_imported(records, embedded)
+
+def _store_imported(
+    records: List[Dict], embedded, replace: bool = False
+) -> None:
+    """replace=True 时先删除同 id 的旧行 (SQLite 同一事务内), 用于幂等地重放/重试写入日志"""
+    try:
+        transfer.store_records(
+            store, lambda channel: channel_registry.lease(channel, create=True),
+            records, embedded, replace=replace
+        )
+    finally:
+        search_service.bump_write_generation()
+
+def _import_bank(path: str, fmt: Optional[str]) -> Dict:
+    """流式导入: 模型指纹一致且分块一致时直接使用文件中的向量, 否则整批重新推理"""
+    header, records = transfer.read_export(path, fmt)
+    fingerprint = search_service.model_fingerprint
+    return transfer.import_memories(
+        header, records, fingerprint,
+        embed_chunks=search_service.embed_chunks,
+        write=lambda batch, embedded: _write_imported(
+            batch, embedded, fingerprint
+        ),
+        existing=lambda ids: existing_ids(store.reader(), ids),
+        chunker=chunker,
+        embedding_store=embedding_store
+    )
+
+# 写后日志 (MEMORY_WRITE_BEHIND=1): save_memory 只把记忆追加到本地日志 (fsync) 就返回 id,
+# 后台线程按批次推理并写入 SQLite / 向量后端; 重启后重放未完成的批次
+from journal import IngestJournal, match_pending
+
+def _apply_journal(memories: List[Dict], replay: bool) -> None:
+    """写入日志中的一批记忆: 一次推理、一个 SQLite 事务、每个频道一次 add"""
+    if not startup.wait(startup_wait):
+        # 模型尚未就绪: 抛错后日志线程稍后重试, 记忆仍安全地留在日志里
+        raise RuntimeError(f"Embedding model is not ready ({startup.state})")
+    fingerprint = search_service.model_fingerprint
+    embedded = search_service.embed_chunks([m["content"] for m in memories])
+    with _write_lock:
+        if fingerprint != search_service.model_fingerprint:
+            embedded = search_service.embed_chunks(
+                [m["content"] for m in memories]
+            )
+        # 重放或重试时这批可能已部分写入: 先删后写, 保证幂等
+        _store_imported(memories, embedded, replace=replay)
+
+journal = None
+if os.environ.get("MEMORY_WRITE_BEHIND", "0") == "1":
+    journal = IngestJournal(
+        os.path.join(base_dir, "journal"),
+        _apply_journal,
+        batch_size=int(os.environ.get("MEMORY_JOURNAL_BATCH", "32")),
+        # 连续失败的批次按指数退避重试, 超过次数后逐条重试, 仍失败的移入死信文件
+        max_attempts=int(os.environ.get("MEMORY_JOURNAL_MAX_ATTEMPTS", "8"))
+    )
+
+def _enqueue_memories(rows: List[tuple], channel: str) -> None:
+    created_at = time.time()
+    journal.append([
+        {
+            "id": memory_id,
+            "content": content,
+            "tags": tags_str.split(),
+            "note": note,
+            "created_at": created_at,
+            "channel": channel
+        }
+        for memory_id, content, tags_str, note in rows
+    ])
+
+# 后台重新嵌入任务 (切换模型)
+reembed_job = None
+reembed_checkpoint_path = os.path.join(base_dir, reembed.CHECKPOINT_FILE)
+
+def _start_reembed(new_model_dir: str, batch_size: int) -> Dict:
+    """加载新模型, 在影子表中逐批重新嵌入全部记忆, 完成后原子切换"""
+    global reembed_job
+    if reembed_job is not None and reembed_job.state == reembed.STATE_RUNNING:
+        raise RuntimeError("Re-embedding is already running")
+    # 只允许 base_dir 下的模型目录 (拒绝绝对路径和 "..")
+    new_model_dir = transfer.confined_path(base_dir, new_model_dir)
+    (new_tokenizer, new_session, new_process_embedder,
+     new_fingerprint) = _load_model(new_model_dir)
+    if new_fingerprint == search_service.model_fingerprint:
+        if new_process_embedder is not None:
+            new_process_embedder.close()
+        raise ValueError(f"Model {new_fingerprint} is already active")
+
+    suffix = reembed.storage_suffix(new_fingerprint)
+    new_chunker = _make_chunker(new_tokenizer)
+    new_embedding_store = EmbeddingStore(
+        _embedding_cache_dir(suffix), model_id=new_fingerprint
+    )
+    # 只用于推理的 SearchService (新模型)
+    embedder = SearchService(
+        session=new_session, tokenizer=new_tokenizer, vector_table=None,
+        sqlite_conn=None, model_fingerprint=new_fingerprint,
+        embedding_store=new_embedding_store, chunker=new_chunker,
+        embedder=new_process_embedder
+    )
+    new_registry = ChannelRegistry(
+        _make_vector_opener(suffix, backfill=False), max_open=max_open_channels
+    )
+    job = reembed.ReembedJob(
+        store, embedder.embed_chunks,
+        lambda channel: new_registry.lease(channel, create=True),
+        new_fingerprint, reembed_checkpoint_path,
+        batch_size=batch_size,
+        info={"model_dir": new_model_dir, "storage_suffix": suffix}
+    )
+    if not job.resuming:
+        # 没有可续传的检查点: 清掉该模型以前残留的影子数据
+        _drop_vector_storage(suffix)
+
+    def swap() -> None:
+        global tokenizer, session, process_embedder, model_fingerprint
+        global model_dir, storage_suffix
+        global embedding_store, chunker, channel_registry
+        reembed.write_json_atomic(manifest_path, {
+            "model_dir": new_model_dir,
+            "model_fingerprint": new_fingerprint,
+            "storage_suffix": suffix
+        })
+        old_registry = channel_registry
+        search_service.swap_model(
+            new_session, new_tokenizer, new_fingerprint,
+            channels=new_registry, embedding_store=new_embedding_store,
+            chunker=new_chunker, embedder=new_process_embedder
+        )
+        old_process_embedder = process_embedder
+        tokenizer, session = new_tokenizer, new_session
+        model_fingerprint = new_fingerprint
+        process_embedder = new_process_embedder
+        model_dir, storage_suffix = new_model_dir, suffix
+        embedding_store, chunker = new_embedding_store, new_chunker
+        channel_registry = new_registry
+        embedder.close()
+        old_registry.close()
+        if old_process_embedder is not None:
+            old_process_embedder.close()
+
+    job.start(_write_lock, swap)
+    reembed_job = job
+    return job.stats()
+
+def _busy(e: ExecutorBusyError) -> ToolError:
+    logging.warning(f"Rejected tool call, server busy: {e}")
+    metrics.increment("busy_rejections")
+    return ToolError(f"Server busy, please retry later ({e})")
+
 @app.tool("save_memory")
-def save_memory(content: str, tags: List[str] = None, note: str = "") -> str:
-    """保存一条项目记忆"""
-    logging.info(f"Tool called: save_memory | Content: {content[:20]}...")
+async def save_memory(
+    content: str, tags: List[str] = None, note: str = "",
+    channel: str = DEFAULT_CHANNEL
+) -> str:
+    """保存一条项目记忆 (channel: 所属频道, 例如 git 分支或项目名)"""
+    logging.info(
+        f"Tool called: save_memory | Channel: {channel} | "
+        f"Content: {content[:20]}..."
+    )
+    channel = _channel_argument(channel)
     try:
         memory_id = str(uuid.uuid4())
-        tags_str = " ".join(tags or [])
+        row = (memory_id, content, " ".join(tags or []), note)
+
+        if journal is not None:
+            # 写后模式: 追加到日志即返回, 由后台线程推理和写库
+            await io_pool.run(_enqueue_memories, [row], channel)
+            logging.info(f"Memory queued: {memory_id}")
+            return f"Memory saved with id: {memory_id}"
+
+        # 推理放 CPU 池，写库放 I/O 池
+        await _model_ready()
+        fingerprint = search_service.model_fingerprint
+        embedded = await cpu_pool.run(search_service.embed_chunks, [content])
+        await io_pool.run(
+            _write_memories, [row], embedded, channel, fingerprint
+        )
 
-        # SQLite
-        if conn:
-            conn.execute(
-                "INSERT INTO memories(id, content, tags, note) VALUES (?, ?, ?, ?)",
-                (memory_id, content, tags_str, note)
-            )
-            conn.commit()
-
-        # LanceDB
-        vector = search_service.embed(content)
-        if vector_table:
-            vector_table.add([{
-                "vector": vector,
-                "id": memory_id,
-                "content": content,
-                "tags": tags_str,
-                "note": note
-            }])
-            
         logging.info(f"Success! Memory saved: {memory_id}")
         return f"Memory saved with id: {memory_id}"
+    except ExecutorBusyError as e:
+        raise _busy(e)
     except Exception as e:
         logging.error(f"Error saving memory: {e}")
         return f"Error: {e}"
 
+@app.tool("save_memories")
+async def save_memories(
+    memories: List[Dict], batch_size: int = 64, channel: str = DEFAULT_CHANNEL
+) -> str:
+    """批量保存多条项目记忆到同一频道 (每项包含 content, 可选 tags/note)"""
+    logging.info(
+        f"Tool called: save_memories | Channel: {channel} | "
+        f"Count: {len(memories)}"
+    )
+    channel = _channel_argument(channel)
+    try:
+        saved_ids = []
+        for start in range(0, len(memories), batch_size):
+            batch = memories[start:start + batch_size]
+            rows = [
+                (
+                    str(uuid.uuid4()),
+                    item["content"],
+                    " ".join(item.get("tags") or []),
+                    item.get("note", "")
+                )
+                for item in batch
+            ]
+
+            if journal is not None:
+                await io_pool.run(_enqueue_memories, rows, channel)
+                saved_ids.extend(row[0] for row in rows)
+                continue
+
+            # 整批分块后一次推理 (按长度分桶)
+            await _model_ready()
+            fingerprint = search_service.model_fingerprint
+            embedded = await cpu_pool.run(
+                search_service.embed_chunks, [row[1] for row in rows]
+            )
+            await io_pool.run(
+                _write_memories, rows, embedded, channel, fingerprint
+            )
+            saved_ids.extend(row[0] for row in rows)
+
+        logging.info(f"Success! {len(saved_ids)} memories saved.")
+        return (
+            f"{len(saved_ids)} memories saved with ids: {', '.join(saved_ids)}"
+        )
+    except ExecutorBusyError as e:
+        raise _busy(e)
+    except Exception as e:
+        logging.error(f"Error saving memories: {e}")
+        return f"Error: {e}"
+
 @app.tool("search_memory")
-def search_memory(query: str, top_k: int = 5) -> List[Dict]:
-    """搜索记忆"""
-    logging.info(f"Tool called: search_memory | Query: {query}")
+async def search_memory(
+    query: str,
+    top_k: int = 5,
+    nprobes: Optional[int] = None,
+    refine_factor: Optional[int] = None,
+    tags: Optional[List[str]] = None,
+    created_after: Optional[str] = None,
+    created_before: Optional[str] = None,
+    channel: str = DEFAULT_CHANNEL,
+    include_pending: bool = False
+) -> List[Dict]:
+    """搜索记忆 (大库可用 nprobes / refine_factor 在召回率和延迟之间权衡)。
+    tags: 只返回同时带有这些标签的记忆; created_after / created_before: ISO 8601 时间或 Unix 秒,
+    过滤条件会下推到全文和向量两路检索中。
+    channel: 只搜索该频道; "*" 搜索所有频道并用 RRF 合并。
+    include_pending: 写后模式下, 把还在日志里排队、包含全部查询词的记忆放在结果最前面 (pending=true)"""
+    logging.info(
+        f"Tool called: search_memory | Channel: {channel} | Query: {query}"
+    )
+    channel = _channel_argument(channel, allow_all=True)
     try:
-        results = search_service.hybrid_search(query, top_k=top_k)
+        search_filter = SearchFilter.build(tags, created_after, created_before)
+    except ValueError as e:
+        raise ToolError(f"Invalid filter: {e}")
+    try:
+        # 含线程池排队时间, 与 search 阶段之差即排队等待
+        with metrics.timer("tool_search_memory"):
+            results = await cpu_pool.run(
+                search_service.hybrid_search, query, top_k=top_k,
+                nprobes=nprobes, refine_factor=refine_factor,
+                search_filter=search_filter, channel=channel
+            )
+        if include_pending and journal is not None:
+            pending = match_pending(
+                journal.pending(None if channel == ALL_CHANNELS else channel),
+                query, search_filter, limit=top_k
+            )
+            pending_ids = {memory["id"] for memory in pending}
+            results = pending + [
+                r for r in results if r["id"] not in pending_ids
+            ]
+            results = results[:top_k]
         logging.info(f"Found {len(results)} results.")
         return results
+    except ExecutorBusyError as e:
+        raise _busy(e)
     except Exception as e:
         logging.error(f"Search error: {e}")
+        metrics.increment("tool_errors", tool="search_memory")
         return []
 
 @app.tool("list_memories")
-def list_memories(limit: int = 10, offset: int = 0) -> List[Dict]:
-    """列出最近保存的记忆 (支持分页，默认返回最新的10条)"""
-    logging.info(f"Tool called: list_memories | Limit: {limit}, Offset: {offset}")
-    try:
-        results = []
-        if conn:
-            # 按 rowid 倒序排列，这样能看到最新的记忆
-            cursor = conn.execute(
-                "SELECT id, content, tags, note FROM memories ORDER BY rowid DESC LIMIT ? OFFSET ?", 
-                (limit, offset)
-            )
-            for row in cursor:
-                results.append({
-                    "id": row[0],
-                    "content": row[1],
-                    "tags": row[2].split() if row[2] else [],
-                    "note": row[3]
-                })
-        return results
+async def list_memories(
+    limit: int = 10,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    projection: str = "full",
+    preview_bytes: int = 200,
+    channel: Optional[str] = None
+) -> Dict[str, Any]:
+    """列出最近保存的记忆 (默认返回最新的10条), 返回 {"memories", "next_cursor"}。
+    next_cursor 非空时把它作为 cursor 传入获取下一页 (游标分页, 不受 offset 深度影响);
+    projection="summary" 只返回 id/tags/note/timestamp 和按字节截断的 preview;
+    不给 channel (或 channel="*") 时列出所有频道, 给出时只列该频道"""
+    logging.info(
+        f"Tool called: list_memories | Limit: {limit}, Offset: {offset}, "
+        f"Cursor: {cursor!r}, Projection: {projection}, Channel: {channel}"
+    )
+    if channel is not None:
+        channel = _channel_argument(channel, allow_all=True)
+    try:
+        return await io_pool.run(
+            _list_memories, limit, offset, cursor, projection, preview_bytes,
+            None if channel in (None, ALL_CHANNELS) else channel
+        )
+    except ExecutorBusyError as e:
+        raise _busy(e)
     except Exception as e:
         logging.error(f"List memories error: {e}")
-        return []
+        return {"memories": [], "next_cursor": None}
 
 @app.tool("delete_memory")
-def delete_memory(memory_id: str) -> str:
-    """根据ID永久删除一条记忆"""
+async def delete_memory(memory_id: str, channel: Optional[str] = None) -> str:
+    """根据ID永久删除一条记忆 (给出 channel 时, 记忆必须属于该频道)"""
     logging.info(f"Tool called: delete_memory | ID: {memory_id}")
+    if channel is not None:
+        channel = _channel_argument(channel)
     try:
-        # 1. 删除 SQLite 记录
-        if conn:
-            conn.execute("DELETE FROM memories WHERE id = ?", (memory_id,))
-            conn.commit()
-            logging.info("Deleted from SQLite")
-
-        # 2. 删除 LanceDB 记录
-        if vector_table:
-            try:
-                # LanceDB 的删除语法：delete("SQL-like filter")
-                vector_table.delete(f"id = '{memory_id}'")
-                logging.info("Deleted from LanceDB")
-            except Exception as le:
-                logging.warning(f"LanceDB delete warning (might not exist): {le}")
-
+        await io_pool.run(_delete_memory, memory_id, channel)
         return f"Memory {memory_id} deleted successfully."
+    except ExecutorBusyError as e:
+        raise _busy(e)
     except Exception as e:
         logging.error(f"Delete error: {e}")
         return f"Error deleting memory: {e}"
 
+@app.tool("compact_embedding_cache")
+async def compact_embedding_cache() -> Dict:
+    """清理向量缓存中已不再被任何记忆引用的条目"""
+    logging.info("Tool called: compact_embedding_cache")
+
+    def compact() -> Dict:
+        contents = (
+            row[0]
+            for row in store.reader().execute("SELECT content FROM memories")
+        )
+        # 长记忆按块缓存: 存活集合必须是分块后的文本, 否则块向量会被清掉
+        return embedding_store.compact(embedded_texts(contents, chunker))
+
+    try:
+        return await io_pool.run(compact)
+    except ExecutorBusyError as e:
+        raise _busy(e)
+    except Exception as e:
+        logging.error(f"Compact embedding cache error: {e}")
+        return {"error": str(e)}
+
+@app.tool("memory_maintenance")
+async def memory_maintenance(channel: str = DEFAULT_CHANNEL) -> Dict:
+    """立即整理向量库 (LanceDB: 合并碎片并清理旧版本; NumPy: 清除已删除的行)，返回回收情况。
+    channel="*" 依次整理所有频道, 返回 {频道: 回收情况}"""
+    logging.info(f"Tool called: memory_maintenance | Channel: {channel}")
+    channel = _channel_argument(channel, allow_all=True)
+
+    def maintain() -> Dict:
+        if channel != ALL_CHANNELS:
+            with channel_registry.lease(channel) as backend:
+                return backend.maintain() if backend is not None else {}
+        names = sorted({DEFAULT_CHANNEL, *list_channels(store.reader())})
+        reports = {}
+        for name in names:
+            with channel_registry.lease(name) as backend:
+                if backend is not None:
+                    reports[name] = backend.maintain()
+        return reports
+
+    try:
+        return await io_pool.run(maintain)
+    except ExecutorBusyError as e:
+        raise _busy(e)
+    except Exception as e:
+        logging.error(f"Maintenance error: {e}")
+        return {"error": str(e)}
+
+@app.tool("export_memories")
+async def export_memories(
+    path: str, format: Optional[str] = None, channel: str = ALL_CHANNELS
+) -> Dict:
+    """把记忆库 (含向量) 流式导出到服务器导出目录 (MEMORY_EXPORT_DIR) 下的文件, path 为其中的相对路径。
+    format: "jsonl" 或 "parquet" (默认按扩展名); channel: 只导出该频道, "*" 为全部"""
+    logging.info(
+        f"Tool called: export_memories | Path: {path} | Channel: {channel}"
+    )
+    channel = _channel_argument(channel, allow_all=True)
+    await _model_ready()
+    try:
+        return await io_pool.run(
+            _export_bank, _export_path(path), format, channel
+        )
+    except ExecutorBusyError as e:
+        raise _busy(e)
+    except Exception as e:
+        logging.error(f"Export error: {e}")
+        return {"error": str(e)}
+
+@app.tool("import_memories")
+async def import_memories(path: str, format: Optional[str] = None) -> Dict:
+    """从导出目录下 export_memories 导出的文件流式导入记忆 (已存在的 id 会跳过, 可重复执行)"""
+    logging.info(f"Tool called: import_memories | Path: {path}")
+    await _model_ready()
+    try:
+        return await io_pool.run(_import_bank, _export_path(path), format)
+    except ExecutorBusyError as e:
+        raise _busy(e)
+    except Exception as e:
+        logging.error(f"Import error: {e}")
+        return {"error": str(e)}
+
+@app.tool("reembed_start")
+async def reembed_start(model_dir: str, batch_size: int = 64) -> Dict:
+    """用新的嵌入模型 (服务器 base_dir 下的模型目录, 相对路径) 在后台重新嵌入全部记忆。
+    期间搜索继续使用旧模型, 完成后原子切换; 中断后用同一模型再次调用会从检查点继续"""
+    logging.info(f"Tool called: reembed_start | Model: {model_dir}")
+    await _model_ready()
+    try:
+        return await io_pool.run(_start_reembed, model_dir, batch_size)
+    except ExecutorBusyError as e:
+        raise _busy(e)
+    except (RuntimeError, ValueError) as e:
+        raise ToolError(str(e))
+
+@app.tool("reembed_status")
+def reembed_status() -> Dict:
+    """查看重新嵌入任务的进度和吞吐 (docs/sec)"""
+    if reembed_job is None:
+        return {
+            "state": reembed.STATE_IDLE, "model_fingerprint": model_fingerprint
+        }
+    return reembed_job.stats()
+
+@app.tool("reembed_stop")
+def reembed_stop() -> Dict:
+    """在当前批次结束后停止重新嵌入 (保留检查点, 可稍后继续)"""
+    if reembed_job is not None:
+        reembed_job.cancel()
+    return reembed_status()
+
+@app.tool("memory_health")
+def memory_health() -> Dict:
+    """就绪检查: status 为 ready 时全部功能可用; loading 时模型仍在后台加载, 搜索只走全文检索,
+    保存会等待加载完成; failed 时见 error。phases 为各启动阶段耗时 (秒)"""
+    health = startup.stats()
+    health["status"] = startup.state
+    health["search_mode"] = (
+        "hybrid" if search_service.model_ready else "fts_only"
+    )
+    health["model"] = model_fingerprint
+    if model_cache is not None:
+        health["model_cache"] = model_cache.stats()
+    return health
+
+@app.tool("memory_stats")
+def memory_stats() -> Dict:
+    """查看记忆服务的运行统计 (批量调度、查询缓存、线程池等);
+    metrics 为各阶段延迟分位数 (毫秒)、检索各路失败/空结果/阈值丢弃计数和最近的慢查询"""
+    logging.info("Tool called: memory_stats")
+    stats = search_service.stats()
+    stats["executors"] = {
+        pool.name: pool.stats() for pool in (cpu_pool, io_pool)
+    }
+    stats["sqlite"] = store.stats()
+    stats["model"] = model_fingerprint
+    if isinstance(session, SessionPool):
+        stats["session_pool"] = session.stats()
+    stats["startup"] = startup.stats()
+    if reembed_job is not None:
+        stats["reembed"] = reembed_job.stats()
+    if journal is not None:
+        stats["journal"] = journal.stats()
+    stats["channels"] = channel_registry.stats()
+    stats["vector_backends"] = {
+        name: backend.stats()
+        for name, backend in channel_registry.backends().items()
+    }
+    return stats
+
 if __name__ == "__main__":
+    import sys
+
+    # 命令行: python server.py export <文件> [频道] / python server.py import <文件>
+    if len(sys.argv) >= 3 and sys.argv[1] in ("export", "import"):
+        # 命令行模式: 同步加载模型
+        if not startup.run():
+            sys.exit(1)
+    if len(sys.argv) >= 3 and sys.argv[1] == "export":
+        channel = sys.argv[3] if len(sys.argv) > 3 else ALL_CHANNELS
+        channel = validate_channel(channel, allow_all=True)
+        print(_export_bank(sys.argv[2], None, channel))
+        sys.exit(0)
+    if len(sys.argv) >= 3 and sys.argv[1] == "import":
+        print(_import_bank(sys.argv[2], None))
+        sys.exit(0)
+
     # 使用 SSE 模式启动
     # host="0.0.0.0" 允许外部连接，port=8000
+    # 模型在后台预热, 端口立即可用
+    startup.start()
+    # 可选的 Prometheus 文本格式指标端点 (MEMORY_METRICS_PORT, 默认关闭)
+    metrics_port = int(os.environ.get("MEMORY_METRICS_PORT", "0"))
+    if metrics_port > 0:
+        metrics_host = os.environ.get("MEMORY_METRICS_HOST", "127.0.0.1")
+        start_metrics_server(metrics, metrics_port, host=metrics_host)
     logging.info("Starting SSE Server on port 8000...")
     app.run(transport="sse", host="0.0.0.0", port=8000)
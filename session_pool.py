@@ -0,0 +1,271 @@
+"""Pool of inference sessions with per-session CPU pinning and I/O binding."""
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+# Resolved output axes: the input batch size, the input sequence length,
+# or a fixed size.
+AXIS_BATCH = "batch"
+AXIS_SEQUENCE = "sequence"
+
+
+def plan_cores(
+    n_sessions: int,
+    intra_op_threads: int = 0,
+    cores: Optional[Sequence[int]] = None
+) -> List[List[int]]:
+    """Split CPU cores into one disjoint group per session.
+
+    Args:
+        n_sessions: Sessions in the pool.
+        intra_op_threads: Threads per session; 0 shares the cores evenly.
+        cores: Cores to use (default: those this process may run on).
+
+    Returns:
+        One list of core ids per session. Groups are empty when there are
+        fewer cores than requested threads (no pinning then).
+    """
+    if cores is None:
+        if hasattr(os, "sched_getaffinity"):
+            cores = sorted(os.sched_getaffinity(0))
+        else:
+            cores = list(range(os.cpu_count() or 1))
+    cores = list(cores)
+    per_session = intra_op_threads or max(1, len(cores) // max(1, n_sessions))
+    if per_session * n_sessions > len(cores):
+        return [[] for _ in range(n_sessions)]
+    return [
+        cores[i * per_session:(i + 1) * per_session]
+        for i in range(n_sessions)
+    ]
+
+
+def affinity_config(cores: Sequence[int]) -> str:
+    """Format ONNX Runtime's ``session.intra_op_thread_affinities`` entry.
+
+    The runtime starts ``len(cores) - 1`` intra-op threads (the calling
+    thread is the first); each is pinned to one core, written 1-based.
+
+    Args:
+        cores: Zero-based core ids of one session.
+
+    Returns:
+        The config value, empty for fewer than two cores.
+    """
+    return ";".join(str(core + 1) for core in cores[1:])
+
+
+class _Slot:
+    """One session plus its reusable binding and buffers."""
+
+    def __init__(self, session: Any, index: int, io_binding: bool):
+        self.session = session
+        self.index = index
+        self.runs = 0
+        self.busy_seconds = 0.0
+        self.binding = None
+        self.input_buffers: Dict[str, np.ndarray] = {}
+        self.output_buffers: Dict[str, np.ndarray] = {}
+        outputs = session.get_outputs()
+        self.output_names = [output.name for output in outputs]
+        self.declared_shapes = {
+            output.name: getattr(output, "shape", None) for output in outputs
+        }
+        self.output_axes: Optional[Dict[str, List[Any]]] = None
+        if io_binding:
+            try:
+                self.binding = session.io_binding()
+            except Exception as e:
+                logging.warning(
+                    f"Session pool: I/O binding unavailable, using run(): {e}"
+                )
+
+    def run(
+        self, output_names: Optional[List[str]], inputs: Dict[str, np.ndarray]
+    ) -> List[np.ndarray]:
+        """Run one request, through the binding once output shapes are known."""
+        names = output_names or self.output_names
+        shape = next(iter(inputs.values())).shape
+        if self.binding is None or len(shape) != 2:
+            return self.session.run(output_names, inputs)
+        if self.output_axes is None:
+            return self._learn_axes(names, inputs)
+        if not all(name in self.output_axes for name in names):
+            return self.session.run(output_names, inputs)
+
+        batch, sequence = shape
+        self.binding.clear_binding_inputs()
+        self.binding.clear_binding_outputs()
+        for name, value in inputs.items():
+            buffer = self._buffer(
+                self.input_buffers, name, value.size, np.int64
+            )
+            view = buffer[:value.size].reshape(value.shape)
+            np.copyto(view, value, casting="unsafe")
+            self.binding.bind_cpu_input(name, view)
+
+        views = []
+        for name in names:
+            sizes = {AXIS_BATCH: batch, AXIS_SEQUENCE: sequence}
+            out_shape = [
+                sizes.get(axis, axis) for axis in self.output_axes[name]
+            ]
+            size = int(np.prod(out_shape))
+            buffer = self._buffer(self.output_buffers, name, size, np.float32)
+            view = buffer[:size].reshape(out_shape)
+            self.binding.bind_output(
+                name, "cpu", 0, np.float32, list(out_shape), view.ctypes.data
+            )
+            views.append(view)
+        self.session.run_with_iobinding(self.binding)
+        # The buffers are reused by the next request on this slot.
+        return [view.copy() for view in views]
+
+    def _learn_axes(
+        self, names: List[str], inputs: Dict[str, np.ndarray]
+    ) -> List[np.ndarray]:
+        """Run without binding and record how output shapes follow the input.
+
+        Axes the model declares with a fixed size keep it; symbolic axes
+        are matched to the batch size or sequence length of this run.
+        Inputs with batch size equal to sequence length are ambiguous and
+        teach nothing; outputs with an unmatched axis are never bound.
+        """
+        batch, sequence = next(iter(inputs.values())).shape
+        outputs = self.session.run(self.output_names, inputs)
+        if batch != sequence:
+            self.output_axes = {}
+            for name, output in zip(self.output_names, outputs):
+                declared = (
+                    self.declared_shapes.get(name) or [None] * output.ndim
+                )
+                axes = []
+                for fixed, dim in zip(declared, output.shape):
+                    if isinstance(fixed, int):
+                        axes.append(fixed)
+                    elif dim in (batch, sequence):
+                        axes.append(
+                            AXIS_BATCH if dim == batch else AXIS_SEQUENCE
+                        )
+                    else:
+                        break
+                if output.dtype == np.float32 and len(axes) == output.ndim:
+                    self.output_axes[name] = axes
+        by_name = dict(zip(self.output_names, outputs))
+        return [by_name[name] for name in names]
+
+    @staticmethod
+    def _buffer(
+        buffers: Dict[str, np.ndarray], name: str, size: int, dtype: Any
+    ) -> np.ndarray:
+        """Return a flat buffer of at least ``size`` elements.
+
+        Buffers grow by doubling.
+        """
+        buffer = buffers.get(name)
+        if buffer is None or buffer.size < size:
+            capacity = size if buffer is None else max(size, 2 * buffer.size)
+            buffer = np.empty(capacity, dtype=dtype)
+            buffers[name] = buffer
+        return buffer
+
+
+class SessionPool:
+    """Spreads ``run`` calls over several inference sessions.
+
+    Drop-in for one ``onnxruntime.InferenceSession`` wherever only
+    ``run``, ``get_inputs`` and ``get_outputs`` are used. Each call takes
+    an idle session (blocking while all are busy), so up to ``size``
+    inferences run at once; with each session built with its own pinned
+    intra-op threads (see ``plan_cores``) concurrent requests use
+    separate cores instead of contending for the same ones.
+
+    With ``io_binding``, inputs are copied into per-session int64
+    buffers and outputs written into per-session float32 buffers bound
+    through the session's I/O binding, so steady-state runs allocate
+    only the returned copy. Output shapes are learned from the first
+    plain run of each session.
+    """
+
+    def __init__(self, sessions: Sequence[Any], io_binding: bool = True):
+        """Create the pool.
+
+        Args:
+            sessions: Inference sessions of the same model.
+            io_binding: Run through preallocated, bound buffers.
+
+        Raises:
+            ValueError: If ``sessions`` is empty.
+        """
+        if not sessions:
+            raise ValueError("SessionPool needs at least one session")
+        self._slots = [
+            _Slot(session, i, io_binding) for i, session in enumerate(sessions)
+        ]
+        self._idle: "queue.Queue[_Slot]" = queue.Queue()
+        for slot in self._slots:
+            self._idle.put(slot)
+        self._lock = threading.Lock()
+        self._waits = 0
+
+    @property
+    def size(self) -> int:
+        """Number of sessions, i.e. inferences that can run at once."""
+        return len(self._slots)
+
+    def get_inputs(self) -> Any:
+        """Inputs of the model (``InferenceSession.get_inputs``)."""
+        return self._slots[0].session.get_inputs()
+
+    def get_outputs(self) -> Any:
+        """Outputs of the model (``InferenceSession.get_outputs``)."""
+        return self._slots[0].session.get_outputs()
+
+    def run(
+        self, output_names: Optional[List[str]], inputs: Dict[str, np.ndarray]
+    ) -> List[np.ndarray]:
+        """Run the model on the next idle session.
+
+        Args:
+            output_names: Outputs to return, None for all.
+            inputs: Model inputs keyed by name.
+
+        Returns:
+            Output arrays, like ``InferenceSession.run``.
+        """
+        try:
+            slot = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                self._waits += 1
+            slot = self._idle.get()
+        started = time.perf_counter()
+        try:
+            return slot.run(output_names, inputs)
+        finally:
+            with self._lock:
+                slot.runs += 1
+                slot.busy_seconds += time.perf_counter() - started
+            self._idle.put(slot)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return pool size, idle sessions, waits and per-session load."""
+        with self._lock:
+            return {
+                "size": self.size,
+                "idle": self._idle.qsize(),
+                "waits": self._waits,
+                "io_binding": any(
+                    slot.binding is not None for slot in self._slots
+                ),
+                "runs": [slot.runs for slot in self._slots],
+                "busy_seconds": [
+                    round(slot.busy_seconds, 3) for slot in self._slots
+                ]
+            }
@@ -0,0 +1,513 @@
+"""Thread-safe SQLite access.
+
+WAL mode, per-thread readers and one batching writer.
+"""
+import logging
+import os
+import pathlib
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import (
+    Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+)
+
+from channels import DEFAULT_CHANNEL
+
+
+DEFAULT_MMAP_SIZE = 256 * 1024 * 1024
+DEFAULT_CACHE_SIZE_KIB = 64 * 1024
+DEFAULT_BUSY_TIMEOUT_MS = 5000
+DEFAULT_MAX_WRITE_BATCH = 64
+
+SCHEMA_VERSION = 2
+
+# ``memories`` is the source of truth; ``memories_fts`` is an
+# external-content FTS5 index over it kept in sync by triggers. ``seq`` is
+# the stable integer rowid the index points at (a TEXT primary key would
+# leave rowids free to change on VACUUM); ``id`` is the unique public key.
+# ``channel`` partitions memories: it has its own index for listing and is
+# an FTS column so a channel-scoped MATCH only intersects that channel's
+# postings.
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS memories (
+        seq INTEGER PRIMARY KEY,
+        id TEXT NOT NULL UNIQUE,
+        content TEXT NOT NULL,
+        tags TEXT NOT NULL DEFAULT '',
+        note TEXT NOT NULL DEFAULT '',
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL,
+        channel TEXT NOT NULL DEFAULT 'default'
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_memories_created_at
+    ON memories(created_at)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_memories_channel_created_at
+    ON memories(channel, created_at, seq)
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS memories_fts USING fts5(
+        content, tags, note, channel,
+        content='memories', content_rowid='seq', tokenize='unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS memories_ai AFTER INSERT ON memories BEGIN
+        INSERT INTO memories_fts(rowid, content, tags, note, channel)
+        VALUES (new.seq, new.content, new.tags, new.note, new.channel);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS memories_ad AFTER DELETE ON memories BEGIN
+        INSERT INTO memories_fts(
+            memories_fts, rowid, content, tags, note, channel
+        )
+        VALUES (
+            'delete', old.seq, old.content, old.tags, old.note, old.channel
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS memories_au AFTER UPDATE ON memories BEGIN
+        INSERT INTO memories_fts(
+            memories_fts, rowid, content, tags, note, channel
+        )
+        VALUES (
+            'delete', old.seq, old.content, old.tags, old.note, old.channel
+        );
+        INSERT INTO memories_fts(rowid, content, tags, note, channel)
+        VALUES (new.seq, new.content, new.tags, new.note, new.channel);
+    END
+    """
+]
+
+
+def insert_memories(
+    conn: sqlite3.Connection,
+    rows: Iterable[Sequence[str]],
+    created_at: Optional[float] = None,
+    channel: str = DEFAULT_CHANNEL
+) -> None:
+    """Insert memories; the FTS index is updated by trigger.
+
+    Args:
+        conn: Writer connection.
+        rows: (id, content, tags, note) tuples.
+        created_at: Creation timestamp (Unix seconds), defaults to now.
+        channel: Channel the memories belong to.
+    """
+    now = time.time() if created_at is None else created_at
+    conn.executemany(
+        "INSERT INTO memories"
+        "(id, content, tags, note, created_at, updated_at, channel) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        ((*row, now, now, channel) for row in rows)
+    )
+
+
+def insert_memory_records(
+    conn: sqlite3.Connection,
+    rows: Iterable[Tuple[str, str, str, str, float, str]]
+) -> None:
+    """Insert memories that bring their own timestamp and channel (imports).
+
+    Args:
+        conn: Writer connection.
+        rows: (id, content, tags, note, created_at, channel) tuples.
+    """
+    conn.executemany(
+        "INSERT INTO memories"
+        "(id, content, tags, note, created_at, updated_at, channel) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        ((memory_id, content, tags, note, created_at, created_at, channel)
+         for memory_id, content, tags, note, created_at, channel in rows)
+    )
+
+
+def delete_memories(conn: sqlite3.Connection, ids: Sequence[str]) -> int:
+    """Delete memories by id (a unique-index lookup per id).
+
+    Args:
+        conn: Writer connection.
+        ids: Memory ids.
+
+    Returns:
+        Number of rows deleted.
+    """
+    cursor = conn.executemany(
+        "DELETE FROM memories WHERE id = ?", ((i,) for i in ids)
+    )
+    return cursor.rowcount
+
+
+def fetch_memories(
+    conn: sqlite3.Connection, ids: Sequence[str]
+) -> Dict[str, Dict]:
+    """Fetch memories by id through the unique index.
+
+    Args:
+        conn: Any connection.
+        ids: Memory ids.
+
+    Returns:
+        Dict mapping each found id to a memory dict with id, content,
+        tags (list), note and created_at.
+    """
+    results: Dict[str, Dict] = {}
+    ids = list(ids)
+    # Stay well below SQLite's bound-parameter limit.
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        placeholders = ", ".join("?" * len(chunk))
+        cursor = conn.execute(
+            "SELECT id, content, tags, note, created_at FROM memories "
+            f"WHERE id IN ({placeholders})",
+            chunk
+        )
+        for row in cursor:
+            results[row[0]] = {
+                "id": row[0],
+                "content": row[1],
+                "tags": row[2].split() if row[2] else [],
+                "note": row[3],
+                "created_at": row[4]
+            }
+    return results
+
+
+def existing_ids(conn: sqlite3.Connection, ids: Sequence[str]) -> Set[str]:
+    """Return which of the given ids are stored (index-only lookups).
+
+    Args:
+        conn: Any connection.
+        ids: Memory ids.
+
+    Returns:
+        The subset of ``ids`` present in ``memories``.
+    """
+    found: Set[str] = set()
+    ids = list(ids)
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        placeholders = ", ".join("?" * len(chunk))
+        found.update(row[0] for row in conn.execute(
+            f"SELECT id FROM memories WHERE id IN ({placeholders})", chunk
+        ))
+    return found
+
+
+def list_channels(conn: sqlite3.Connection) -> List[str]:
+    """Return every channel that holds at least one memory.
+
+    Args:
+        conn: Any connection.
+
+    Returns:
+        Channel names, sorted (read from the channel index).
+    """
+    return [row[0] for row in conn.execute(
+        "SELECT DISTINCT channel FROM memories ORDER BY channel"
+    )]
+
+
+def migrate(conn: sqlite3.Connection) -> None:
+    """Create the schema, migrating older databases once.
+
+    Databases written before schema version 1 stored everything in an
+    FTS5 virtual table named ``memories``. Its rows are copied into the
+    new metadata table in their original order (all stamped with the
+    migration time) and the old table is dropped. Version 1 databases get
+    the ``channel`` column (existing rows land in the default channel) and
+    an FTS index rebuilt with it.
+
+    Args:
+        conn: Writer connection in autocommit mode.
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return
+
+    row = conn.execute(
+        "SELECT sql FROM sqlite_master "
+        "WHERE type = 'table' AND name = 'memories'"
+    ).fetchone()
+    legacy = row is not None and "VIRTUAL TABLE" in row[0].upper()
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if legacy:
+            conn.execute("ALTER TABLE memories RENAME TO memories_legacy")
+        elif version == 1:
+            conn.execute(
+                "ALTER TABLE memories "
+                "ADD COLUMN channel TEXT NOT NULL DEFAULT 'default'"
+            )
+            for trigger in ("memories_ai", "memories_ad", "memories_au"):
+                conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            conn.execute("DROP TABLE IF EXISTS memories_fts")
+        for statement in SCHEMA:
+            conn.execute(statement)
+        if version == 1 and not legacy:
+            conn.execute(
+                "INSERT INTO memories_fts(memories_fts) VALUES ('rebuild')"
+            )
+        if legacy:
+            now = time.time()
+            conn.execute(
+                "INSERT OR IGNORE INTO memories"
+                "(id, content, tags, note, created_at, updated_at) "
+                "SELECT id, COALESCE(content, ''), COALESCE(tags, ''), "
+                "COALESCE(note, ''), ?, ? "
+                "FROM memories_legacy ORDER BY rowid",
+                (now, now)
+            )
+            conn.execute("DROP TABLE memories_legacy")
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+    if legacy or version == 1:
+        count = conn.execute("SELECT count(*) FROM memories").fetchone()[0]
+        logging.info(
+            f"Migrated {count} memories to schema version {SCHEMA_VERSION}"
+        )
+
+
+class SQLiteStore:
+    """Owns every SQLite connection of the memory database.
+
+    The database runs in WAL mode so readers never wait for the writer.
+    Each thread gets its own read-only connection from ``reader()``; all
+    writes are funnelled through one writer thread that groups whatever
+    is queued into a single transaction (group commit). Every write runs
+    inside its own savepoint, so one failing write does not roll back the
+    others committed with it.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        synchronous: str = "NORMAL",
+        mmap_size: int = DEFAULT_MMAP_SIZE,
+        cache_size_kib: int = DEFAULT_CACHE_SIZE_KIB,
+        max_write_batch: int = DEFAULT_MAX_WRITE_BATCH
+    ):
+        """Open the database, create the schema and start the writer.
+
+        Args:
+            path: Database file path.
+            synchronous: ``PRAGMA synchronous`` level for the writer.
+            mmap_size: Bytes of the database to memory-map per connection.
+            cache_size_kib: Page cache size per connection in KiB.
+            max_write_batch: Most writes committed in one transaction.
+        """
+        self._path = os.path.abspath(path)
+        self._synchronous = synchronous
+        self._mmap_size = mmap_size
+        self._cache_size_kib = cache_size_kib
+        self._max_write_batch = max(1, max_write_batch)
+
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+
+        self._queue: "queue.Queue[Optional[Tuple[Callable, Future]]]" = (
+            queue.Queue()
+        )
+        # Guards ``_closed`` so no write can be queued behind the close
+        # sentinel, where the writer would never run it.
+        self._submit_lock = threading.Lock()
+        self._closed = False
+        self._stats_lock = threading.Lock()
+        self._writes = 0
+        self._commits = 0
+        self._failed_writes = 0
+
+        self._writer_conn = self._connect_writer()
+        self._writer = threading.Thread(
+            target=self._run_writer, name="sqlite-writer", daemon=True
+        )
+        self._writer.start()
+
+    @property
+    def path(self) -> str:
+        """Absolute path of the database file."""
+        return self._path
+
+    def reader(self) -> sqlite3.Connection:
+        """Return the calling thread's read-only connection.
+
+        Returns:
+            A ``sqlite3.Connection`` opened with ``mode=ro``, created on
+            first use and reused by the same thread afterwards.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            uri = pathlib.Path(self._path).as_uri() + "?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            self._apply_pragmas(conn)
+            conn.execute("PRAGMA query_only = ON")
+            self._local.conn = conn
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
+
+    def submit(self, fn: Callable[[sqlite3.Connection], Any]) -> Future:
+        """Queue a write for the writer thread.
+
+        Args:
+            fn: Callable receiving the writer connection. It must not
+                commit or roll back; the writer does that.
+
+        Returns:
+            Future resolving to ``fn``'s return value once committed.
+
+        Raises:
+            RuntimeError: If the store has been closed.
+        """
+        future: Future = Future()
+        with self._submit_lock:
+            if self._closed:
+                raise RuntimeError("SQLiteStore is closed")
+            self._queue.put((fn, future))
+        return future
+
+    def write(
+        self,
+        fn: Callable[[sqlite3.Connection], Any],
+        timeout: Optional[float] = None
+    ) -> Any:
+        """Run a write through the writer and wait until it is committed.
+
+        Args:
+            fn: Callable receiving the writer connection.
+            timeout: Seconds to wait, None to wait forever.
+
+        Returns:
+            ``fn``'s return value.
+        """
+        return self.submit(fn).result(timeout=timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return writer and reader counters.
+
+        Returns:
+            Dict with writes, commits, failed writes, mean writes per
+            commit, queued writes and open reader connections.
+        """
+        with self._stats_lock:
+            stats = {
+                "writes": self._writes,
+                "commits": self._commits,
+                "failed_writes": self._failed_writes,
+                "writes_per_commit": (
+                    self._writes / self._commits if self._commits else 0.0
+                ),
+                "queued_writes": self._queue.qsize()
+            }
+        with self._readers_lock:
+            stats["reader_connections"] = len(self._readers)
+        return stats
+
+    def close(self) -> None:
+        """Drain pending writes, stop the writer and close every connection."""
+        with self._submit_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._writer.join()
+        with self._readers_lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers.clear()
+
+    def _connect_writer(self) -> sqlite3.Connection:
+        """Open the writer connection, enable WAL and create the schema."""
+        conn = sqlite3.connect(
+            self._path, isolation_level=None, check_same_thread=False
+        )
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute(f"PRAGMA synchronous = {self._synchronous}")
+        self._apply_pragmas(conn)
+        migrate(conn)
+        return conn
+
+    def _apply_pragmas(self, conn: sqlite3.Connection) -> None:
+        """Apply the per-connection performance pragmas."""
+        conn.execute(f"PRAGMA mmap_size = {int(self._mmap_size)}")
+        conn.execute(f"PRAGMA cache_size = -{int(self._cache_size_kib)}")
+        conn.execute(f"PRAGMA busy_timeout = {DEFAULT_BUSY_TIMEOUT_MS}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+
+    def _run_writer(self) -> None:
+        """Writer loop: group queued writes into one transaction each."""
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            if item is None:
+                stop = True
+                batch = []
+            else:
+                batch = [item]
+            while len(batch) < self._max_write_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    continue
+                batch.append(item)
+            if batch:
+                self._commit_batch(batch)
+        self._writer_conn.close()
+
+    def _commit_batch(self, batch: List[Tuple[Callable, Future]]) -> None:
+        """Apply a batch of writes in one transaction and resolve futures.
+
+        Args:
+            batch: Queued (fn, future) pairs.
+        """
+        conn = self._writer_conn
+        outcomes: List[Tuple[Future, bool, Any]] = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for fn, future in batch:
+                conn.execute("SAVEPOINT write_op")
+                try:
+                    result = fn(conn)
+                    conn.execute("RELEASE write_op")
+                    outcomes.append((future, True, result))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write_op")
+                    conn.execute("RELEASE write_op")
+                    outcomes.append((future, False, e))
+            conn.execute("COMMIT")
+        except Exception as e:
+            logging.error(f"SQLite group commit failed: {e}")
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            outcomes = [(future, False, e) for _, future in batch]
+
+        failed = sum(1 for _, ok, _ in outcomes if not ok)
+        with self._stats_lock:
+            self._writes += len(batch)
+            self._failed_writes += failed
+            if failed < len(batch):
+                self._commits += 1
+
+        for future, ok, value in outcomes:
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
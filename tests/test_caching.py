@@ -0,0 +1,73 @@
+"""Unit tests for LRUCache."""
+from caching import LRUCache
+
+
+class FakeClock:
+    """Manually advanced clock."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLRUCache:
+    """Tests for LRUCache."""
+
+    def test_get_returns_stored_value(self):
+        """A stored value should be returned and counted as a hit."""
+        cache = LRUCache(max_size=2)
+        cache.put("a", 1)
+
+        assert cache.get("a") == 1
+        assert cache.stats()["hits"] == 1
+
+    def test_missing_key_counts_as_miss(self):
+        """Unknown keys should return None and count as a miss."""
+        cache = LRUCache(max_size=2)
+
+        assert cache.get("missing") is None
+        assert cache.stats()["misses"] == 1
+
+    def test_evicts_least_recently_used(self):
+        """When full, the least recently used entry is evicted."""
+        cache = LRUCache(max_size=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert cache.stats()["evictions"] == 1
+
+    def test_expired_entries_are_dropped(self):
+        """Entries older than the TTL are misses and get removed."""
+        clock = FakeClock()
+        cache = LRUCache(max_size=2, ttl_seconds=10, clock=clock)
+        cache.put("a", 1)
+
+        clock.now = 11
+        assert cache.get("a") is None
+        assert len(cache) == 0
+        assert cache.stats()["expirations"] == 1
+
+    def test_no_ttl_never_expires(self):
+        """A TTL of None disables expiry."""
+        clock = FakeClock()
+        cache = LRUCache(max_size=2, ttl_seconds=None, clock=clock)
+        cache.put("a", 1)
+
+        clock.now = 1e9
+        assert cache.get("a") == 1
+
+    def test_hit_rate(self):
+        """Hit rate should be hits over lookups."""
+        cache = LRUCache(max_size=2)
+        cache.put("a", 1)
+        cache.get("a")
+        cache.get("b")
+
+        assert cache.stats()["hit_rate"] == 0.5
@@ -0,0 +1,182 @@
+"""Unit tests for channel names and the ChannelRegistry."""
+import threading
+from unittest.mock import Mock
+
+import pytest
+
+from channels import (
+    ALL_CHANNELS, DEFAULT_CHANNEL, ChannelRegistry, channel_key,
+    validate_channel
+)
+
+
+class TestValidateChannel:
+    """Tests for validate_channel."""
+
+    def test_empty_means_default(self):
+        """None and "" should map to the default channel."""
+        assert validate_channel(None) == DEFAULT_CHANNEL
+        assert validate_channel("") == DEFAULT_CHANNEL
+
+    def test_branch_names_are_accepted(self):
+        """Typical git branch names should be valid channels."""
+        assert validate_channel("feature/login-v2") == "feature/login-v2"
+
+    def test_all_channels_needs_permission(self):
+        """"*" is only accepted where fan-out is allowed."""
+        assert validate_channel(ALL_CHANNELS, allow_all=True) == ALL_CHANNELS
+        with pytest.raises(ValueError):
+            validate_channel(ALL_CHANNELS)
+
+    def test_invalid_names_raise(self):
+        """Names with quotes, spaces or a leading symbol should be rejected."""
+        for name in ('a"b', "has space", "-leading", "x" * 200):
+            with pytest.raises(ValueError):
+                validate_channel(name)
+
+
+class TestChannelKey:
+    """Tests for channel_key."""
+
+    def test_keys_are_safe_and_distinct(self):
+        """Names that sanitize alike should still get different keys."""
+        first, second = channel_key("feature/a"), channel_key("feature_a")
+
+        assert first != second
+        assert first.startswith("feature_a_")
+        assert all(c.isalnum() or c in "_-" for c in first)
+
+
+class TestChannelRegistry:
+    """Tests for ChannelRegistry."""
+
+    def test_backends_are_opened_once(self):
+        """Repeated lookups should reuse the open backend."""
+        opener = Mock(side_effect=lambda channel, create: Mock(name=channel))
+        registry = ChannelRegistry(opener)
+
+        assert registry.get("a") is registry.get("a")
+        assert opener.call_count == 1
+
+    def test_unknown_channel_is_not_created(self):
+        """A missing channel should only be created when asked to."""
+        backend = Mock()
+        registry = ChannelRegistry(
+            lambda channel, create: backend if create else None
+        )
+
+        assert registry.get("new") is None
+        assert registry.open_channels() == []
+        assert registry.get("new", create=True) is backend
+
+    def test_least_recently_used_backend_is_closed(self):
+        """Opening past max_open should close the least recently used one."""
+        backends = {}
+
+        def opener(channel, create):
+            backends[channel] = Mock()
+            return backends[channel]
+
+        registry = ChannelRegistry(opener, max_open=2)
+        registry.get("a")
+        registry.get("b")
+        registry.get("a")
+        registry.get("c")
+
+        assert registry.open_channels() == ["a", "c"]
+        backends["b"].close.assert_called_once()
+        backends["a"].close.assert_not_called()
+        assert registry.stats()["evictions"] == 1
+
+    def test_close_closes_everything(self):
+        """close() should close every open backend."""
+        backends = [Mock(), Mock()]
+        registry = ChannelRegistry(lambda channel, create: backends.pop())
+        opened = [registry.get("a"), registry.get("b")]
+
+        registry.close()
+
+        assert registry.open_channels() == []
+        for backend in opened:
+            backend.close.assert_called_once()
+
+    def test_leased_backend_is_closed_on_release(self):
+        """Evicting a leased backend defers its close to the lease's end."""
+        backends = {}
+
+        def opener(channel, create):
+            backends[channel] = Mock()
+            return backends[channel]
+
+        registry = ChannelRegistry(opener, max_open=1)
+        with registry.lease("a") as backend:
+            registry.get("b")
+            assert registry.open_channels() == ["b"]
+            backend.close.assert_not_called()
+
+        backends["a"].close.assert_called_once()
+
+    def test_close_waits_for_leases(self):
+        """close() should leave a leased backend open until it is released."""
+        backend = Mock()
+        registry = ChannelRegistry(lambda channel, create: backend)
+
+        with registry.lease("a"):
+            registry.close()
+            backend.close.assert_not_called()
+
+        backend.close.assert_called_once()
+
+    def test_slow_open_does_not_block_other_channels(self):
+        """Opening one channel should not hold up lookups of another."""
+        started, finish = threading.Event(), threading.Event()
+        opened = []
+
+        def opener(channel, create):
+            opened.append(channel)
+            if channel == "slow":
+                started.set()
+                finish.wait(5)
+            return Mock(name=channel)
+
+        registry = ChannelRegistry(opener)
+        slow = [
+            threading.Thread(target=registry.get, args=("slow",))
+            for _ in range(2)
+        ]
+        for thread in slow:
+            thread.start()
+        assert started.wait(5)
+
+        assert registry.get("fast") is not None
+        finish.set()
+        for thread in slow:
+            thread.join(5)
+
+        assert sorted(opened) == ["fast", "slow"]
+
+    def test_leased_backend_is_reused_after_eviction(self):
+        """A lookup should get the evicted, still leased instance back."""
+        opener = Mock(side_effect=lambda channel, create: Mock(name=channel))
+        registry = ChannelRegistry(opener, max_open=1)
+
+        with registry.lease("a") as backend:
+            registry.get("b")
+            again = registry.get("a")
+            assert again is backend
+            assert registry.open_channels() == ["a"]
+
+        assert opener.call_count == 2
+        backend.close.assert_not_called()
+
+    def test_lookup_after_close_raises(self):
+        """A closed registry should refuse to reopen backends."""
+        registry = ChannelRegistry(lambda channel, create: Mock())
+        registry.get("a")
+        registry.close()
+
+        with pytest.raises(RuntimeError):
+            registry.get("a")
+        with pytest.raises(RuntimeError):
+            with registry.lease("b"):
+                pass
@@ -0,0 +1,115 @@
+"""Unit tests for token-window chunking."""
+import re
+
+import numpy as np
+import pytest
+
+from chunking import (
+    Chunker, chunk_id, chunk_rows, embedded_texts, parent_id, token_windows
+)
+from embedding_store import EmbeddingStore
+
+
+class WordTokenizer:
+    """Whitespace tokenizer reporting character offsets like a fast one."""
+
+    def __call__(
+        self, text, add_special_tokens=True, return_offsets_mapping=False
+    ):
+        spans = [m.span() for m in re.finditer(r"\S+", text)]
+        encoded = {"input_ids": list(range(len(spans)))}
+        if return_offsets_mapping:
+            encoded["offset_mapping"] = spans
+        return encoded
+
+
+def words(n):
+    return " ".join(f"w{i}" for i in range(n))
+
+
+class TestTokenWindows:
+    """Tests for token_windows."""
+
+    def test_windows_overlap_and_cover_the_sequence(self):
+        """Windows advance by chunk - overlap and end at the last token."""
+        assert list(token_windows(10, 4, 1)) == [(0, 4), (3, 7), (6, 10)]
+
+    def test_short_sequence_is_one_window(self):
+        """A sequence shorter than a chunk should yield a single window."""
+        assert list(token_windows(3, 4, 1)) == [(0, 3)]
+
+
+class TestChunker:
+    """Tests for Chunker."""
+
+    def test_short_text_is_unchanged(self):
+        """Text within one chunk should come back as is."""
+        text = "  a short  memory "
+
+        chunker = Chunker(WordTokenizer(), chunk_tokens=8, overlap=2)
+        assert chunker.split(text) == [text]
+
+    def test_chunks_are_cut_on_token_boundaries(self):
+        """Chunks should be exact substrings holding chunk_tokens tokens."""
+        chunker = Chunker(WordTokenizer(), chunk_tokens=4, overlap=1)
+
+        chunks = chunker.split(words(10))
+
+        assert chunks == ["w0 w1 w2 w3", "w3 w4 w5 w6", "w6 w7 w8 w9"]
+
+    def test_invalid_overlap_raises(self):
+        """An overlap as large as the chunk would never advance."""
+        with pytest.raises(ValueError):
+            Chunker(WordTokenizer(), chunk_tokens=4, overlap=4)
+
+
+class TestEmbeddedTexts:
+    """Tests for embedded_texts."""
+
+    def test_compaction_keeps_chunk_vectors(self, tmp_path):
+        """Compacting with the chunked texts should keep every chunk vector."""
+        chunker = Chunker(WordTokenizer(), chunk_tokens=4, overlap=1)
+        long_text, short_text = words(10), "short note"
+        chunks = chunker.split(long_text)
+        store = EmbeddingStore(str(tmp_path), "model-a", dim=len(chunks) + 2)
+        store.put_many(
+            chunks + [short_text, "deleted"], np.eye(len(chunks) + 2)
+        )
+
+        store.compact(embedded_texts([long_text, short_text], chunker))
+
+        assert len(chunks) > 1
+        assert all(v is not None for v in store.get_many(chunks + [short_text]))
+        assert store.get("deleted") is None
+
+    def test_without_chunker_contents_are_the_texts(self):
+        """Unchunked memories should be embedded under their whole content."""
+        assert list(embedded_texts(["a b", "c"], None)) == ["a b", "c"]
+
+
+class TestChunkRows:
+    """Tests for chunk ids and chunk_rows."""
+
+    def test_chunk_ids_round_trip(self):
+        """A chunk id should map back to its memory id."""
+        assert parent_id(chunk_id("m1", 3)) == "m1"
+        assert parent_id("m1") == "m1"
+
+    def test_single_chunk_keeps_the_memory_id(self):
+        """An unchunked memory should be stored under its own id."""
+        rows = chunk_rows({"id": "m1", "content": "x"}, ["x"], np.ones((1, 2)))
+
+        assert [row["id"] for row in rows] == ["m1"]
+
+    def test_chunked_memory_gets_one_row_per_chunk(self):
+        """Each chunk should get its own id, text and vector."""
+        vectors = np.eye(2)
+
+        row = {"id": "m1", "content": "a b", "tags": "t"}
+        rows = chunk_rows(row, ["a", "b"], vectors)
+
+        ids = [chunk_id("m1", 0), chunk_id("m1", 1)]
+        assert [row["id"] for row in rows] == ids
+        assert [row["content"] for row in rows] == ["a", "b"]
+        assert all(row["tags"] == "t" for row in rows)
+        assert np.array_equal(rows[1]["vector"], vectors[1])
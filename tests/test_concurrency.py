@@ -0,0 +1,73 @@
+"""Unit tests for BoundedExecutor."""
+import asyncio
+import threading
+
+import pytest
+
+from concurrency import BoundedExecutor, ExecutorBusyError
+
+
+class TestBoundedExecutor:
+    """Tests for BoundedExecutor."""
+
+    def test_run_returns_result(self):
+        """Run should return the callable's result."""
+        pool = BoundedExecutor("test", max_workers=1, max_pending=0)
+        try:
+            result = asyncio.run(pool.run(lambda a, b=0: a + b, 1, b=2))
+        finally:
+            pool.shutdown()
+
+        assert result == 3
+        assert pool.stats()["completed"] == 1
+
+    def test_run_propagates_exceptions(self):
+        """Exceptions raised on the pool should reach the awaiting caller."""
+        pool = BoundedExecutor("test", max_workers=1, max_pending=0)
+
+        def fail():
+            raise ValueError("boom")
+
+        try:
+            with pytest.raises(ValueError):
+                asyncio.run(pool.run(fail))
+        finally:
+            pool.shutdown()
+
+    def test_rejects_when_full(self):
+        """Work beyond workers + pending should fail fast as busy."""
+        pool = BoundedExecutor("test", max_workers=1, max_pending=1)
+        release = threading.Event()
+
+        async def scenario():
+            first = asyncio.ensure_future(pool.run(release.wait, 5))
+            second = asyncio.ensure_future(pool.run(release.wait, 5))
+            await asyncio.sleep(0.05)
+            with pytest.raises(ExecutorBusyError):
+                await pool.run(lambda: None)
+            release.set()
+            await asyncio.gather(first, second)
+
+        try:
+            asyncio.run(scenario())
+        finally:
+            pool.shutdown()
+
+        stats = pool.stats()
+        assert stats["rejected"] == 1
+        assert stats["in_flight"] == 0
+
+    def test_slot_is_freed_after_completion(self):
+        """Finished tasks should free their slot for new work."""
+        pool = BoundedExecutor("test", max_workers=1, max_pending=0)
+
+        async def scenario():
+            await pool.run(lambda: None)
+            await pool.run(lambda: None)
+
+        try:
+            asyncio.run(scenario())
+        finally:
+            pool.shutdown()
+
+        assert pool.stats()["rejected"] == 0
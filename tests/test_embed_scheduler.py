@@ -0,0 +1,177 @@
+"""Unit tests for EmbeddingScheduler."""
+import threading
+import time
+
+import numpy as np
+import pytest
+from unittest.mock import Mock
+
+from embed_scheduler import EmbeddingScheduler
+from session_pool import SessionPool
+
+
+def fake_embed_batch(texts):
+    """Encode each text's length in column 0 so rows can be told apart."""
+    vectors = np.zeros((len(texts), 4), dtype=np.float32)
+    vectors[:, 0] = [len(t) for t in texts]
+    return vectors
+
+
+class TestEmbeddingScheduler:
+    """Tests for EmbeddingScheduler."""
+
+    def test_embed_returns_callers_own_row(self):
+        """Each caller should get the row for its own text."""
+        scheduler = EmbeddingScheduler(fake_embed_batch, max_wait_ms=1)
+        try:
+            assert scheduler.embed("abc")[0] == 3
+            assert scheduler.embed("abcdef")[0] == 6
+        finally:
+            scheduler.close()
+
+    def test_concurrent_requests_are_coalesced(self):
+        """Requests arriving inside the wait window share one batch."""
+        calls = []
+
+        def embed_batch(texts):
+            calls.append(len(texts))
+            return fake_embed_batch(texts)
+
+        scheduler = EmbeddingScheduler(
+            embed_batch, max_batch_size=8, max_wait_ms=200
+        )
+        try:
+            futures = [scheduler.submit("x" * i) for i in range(1, 9)]
+            results = [f.result(timeout=5) for f in futures]
+        finally:
+            scheduler.close()
+
+        assert calls == [8]
+        assert [r[0] for r in results] == list(range(1, 9))
+
+    def test_batch_size_caps_each_flush(self):
+        """No batch should exceed max_batch_size."""
+        calls = []
+
+        def embed_batch(texts):
+            calls.append(len(texts))
+            return fake_embed_batch(texts)
+
+        scheduler = EmbeddingScheduler(
+            embed_batch, max_batch_size=3, max_wait_ms=200
+        )
+        try:
+            futures = [scheduler.submit("x") for _ in range(7)]
+            for f in futures:
+                f.result(timeout=5)
+        finally:
+            scheduler.close()
+
+        assert max(calls) <= 3
+        assert sum(calls) == 7
+
+    def test_batch_error_propagates_to_every_caller(self):
+        """A failed batch should fail all of its callers."""
+        embed_batch = Mock(side_effect=RuntimeError("boom"))
+        scheduler = EmbeddingScheduler(embed_batch, max_wait_ms=1)
+        try:
+            with pytest.raises(RuntimeError):
+                scheduler.embed("abc", timeout=5)
+        finally:
+            scheduler.close()
+
+    def test_stats_records_batches_and_queue_depth(self):
+        """Stats should count requests, batches and batch sizes."""
+        release = threading.Event()
+
+        def embed_batch(texts):
+            release.wait(5)
+            return fake_embed_batch(texts)
+
+        scheduler = EmbeddingScheduler(
+            embed_batch, max_batch_size=2, max_wait_ms=1
+        )
+        try:
+            futures = [scheduler.submit("x") for _ in range(4)]
+            release.set()
+            for f in futures:
+                f.result(timeout=5)
+            stats = scheduler.stats()
+        finally:
+            scheduler.close()
+
+        assert stats["requests"] == 4
+        assert stats["batches"] == sum(stats["batch_size_histogram"].values())
+        assert sum(s * c for s, c in stats["batch_size_histogram"].items()) == 4
+        assert stats["max_queue_depth"] >= 1
+
+    def test_submit_after_close_raises(self):
+        """A closed scheduler should refuse new work."""
+        scheduler = EmbeddingScheduler(fake_embed_batch)
+        scheduler.close()
+
+        with pytest.raises(RuntimeError):
+            scheduler.submit("abc")
+
+    def test_submit_racing_close_is_resolved_or_refused(self):
+        """Requests submitted around close() should be answered or refused."""
+        scheduler = EmbeddingScheduler(fake_embed_batch, max_wait_ms=0)
+        futures, refused = [], []
+        start = threading.Barrier(5)
+
+        def submitter():
+            start.wait()
+            for _ in range(200):
+                try:
+                    futures.append(scheduler.submit("abc"))
+                except RuntimeError:
+                    refused.append(True)
+
+        threads = [threading.Thread(target=submitter) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        start.wait()
+        scheduler.close(timeout=5)
+        for thread in threads:
+            thread.join()
+
+        assert len(futures) + len(refused) == 800
+        for future in futures:
+            assert future.result(timeout=1)[0] == 3
+
+    def test_workers_keep_every_pooled_session_busy(self):
+        """Concurrent embeds should run on more than one pooled session."""
+        active, peak = [0], [0]
+        lock = threading.Lock()
+
+        class SlowSession:
+            def get_outputs(self):
+                return []
+
+            def run(self, output_names, inputs):
+                with lock:
+                    active[0] += 1
+                    peak[0] = max(peak[0], active[0])
+                time.sleep(0.05)
+                with lock:
+                    active[0] -= 1
+                return [fake_embed_batch(inputs["texts"])]
+
+        pool = SessionPool([SlowSession(), SlowSession()], io_binding=False)
+        scheduler = EmbeddingScheduler(
+            lambda texts: pool.run(None, {"texts": np.array(texts)})[0],
+            max_batch_size=2, max_wait_ms=1, workers=2
+        )
+        threads = [
+            threading.Thread(target=scheduler.embed, args=("abc",))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        scheduler.close()
+
+        assert peak[0] == 2
+        assert all(runs > 0 for runs in pool.stats()["runs"])
+        assert scheduler.stats()["workers"] == 2
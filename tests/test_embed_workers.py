@@ -0,0 +1,171 @@
+"""Unit tests for the process-pool embedder."""
+import os
+import time
+
+import numpy as np
+import pytest
+
+from embed_workers import ProcessEmbedder
+
+DIM = 4
+
+
+def fake_vector(text):
+    return np.array(
+        [len(text), text.count("a"), ord(text[0]) if text else 0, 1.0],
+        dtype=np.float32
+    )
+
+
+def length_embedder(fail_on=None):
+    """Worker factory: embeds each text as a deterministic vector."""
+    def embed_batch(texts):
+        if fail_on is not None and fail_on in texts:
+            raise ValueError(f"cannot embed {fail_on}")
+        return np.stack([fake_vector(text) for text in texts])
+    return embed_batch
+
+
+def pid_embedder():
+    """Worker factory: every row holds the worker's pid."""
+    def embed_batch(texts):
+        return np.full((len(texts), DIM), os.getpid(), dtype=np.float32)
+    return embed_batch
+
+
+def fragile_embedder():
+    """Worker factory: exits on "die" and hangs on "hang"."""
+    def embed_batch(texts):
+        if "die" in texts:
+            os._exit(3)
+        if "hang" in texts:
+            time.sleep(60)
+        return np.stack([fake_vector(text) for text in texts])
+    return embed_batch
+
+
+def broken_factory():
+    raise RuntimeError("model missing")
+
+
+@pytest.fixture
+def make_embedder():
+    embedders = []
+
+    def make(factory, factory_args=(), **kwargs):
+        kwargs.setdefault("dim", DIM)
+        kwargs.setdefault("task_timeout", 60)
+        embedder = ProcessEmbedder(factory, factory_args, **kwargs)
+        embedders.append(embedder)
+        return embedder
+
+    yield make
+    for embedder in embedders:
+        embedder.close()
+
+
+class TestProcessEmbedder:
+    """Tests for ProcessEmbedder."""
+
+    def test_rows_keep_input_order(self, make_embedder):
+        """Tasks split across workers come back in input order."""
+        embedder = make_embedder(length_embedder, workers=2, max_rows=3)
+        assert embedder.wait_ready(60)
+        texts = [f"text {'a' * i}" for i in range(11)]
+
+        result = embedder.embed_batch(texts)
+
+        np.testing.assert_array_equal(
+            result, np.stack([fake_vector(t) for t in texts])
+        )
+        stats = embedder.stats()
+        assert sum(stats["tasks"]) == 4
+        assert stats["embedded"] == 11
+
+    def test_batch_is_split_over_all_workers(self, make_embedder):
+        """A batch smaller than workers * max_rows still uses every worker."""
+        embedder = make_embedder(pid_embedder, workers=2, max_rows=64)
+        embedder.wait_ready(60)
+
+        result = embedder.embed_batch([str(i) for i in range(10)])
+
+        assert len(set(result[:, 0])) == 2
+        assert embedder.stats()["tasks"] == [1, 1]
+
+    def test_tasks_spread_over_workers(self, make_embedder):
+        """More tasks than workers keep every worker busy."""
+        embedder = make_embedder(pid_embedder, workers=2, max_rows=1)
+        embedder.wait_ready(60)
+
+        result = embedder.embed_batch([str(i) for i in range(8)])
+
+        assert len(set(result[:, 0])) == 2
+        assert embedder.stats()["ready"] == 2
+
+    def test_failed_task_fails_the_batch(self, make_embedder):
+        """A failing task raises instead of returning zero rows."""
+        embedder = make_embedder(
+            length_embedder, ("bad",), workers=1, max_rows=2
+        )
+        embedder.wait_ready(60)
+
+        with pytest.raises(RuntimeError, match="cannot embed bad"):
+            embedder.embed_batch(["ok", "fine", "bad", "x"])
+
+        assert embedder.stats()["task_errors"] == 1
+        assert embedder.embed_batch(["ok"]).shape == (1, DIM)
+
+    def test_dead_worker_is_respawned(self, make_embedder):
+        """A worker that exits fails its task at once and is replaced."""
+        embedder = make_embedder(fragile_embedder, workers=1)
+        embedder.wait_ready(60)
+
+        started = time.monotonic()
+        with pytest.raises(RuntimeError, match="exited with code 3"):
+            embedder.embed_batch(["die"])
+
+        assert time.monotonic() - started < 30
+        np.testing.assert_array_equal(
+            embedder.embed_batch(["ok"]), fake_vector("ok")[None, :]
+        )
+        assert embedder.stats()["respawns"] == 1
+
+    def test_hung_worker_is_killed_and_respawned(self, make_embedder):
+        """A task over task_timeout fails the batch and restarts its worker."""
+        embedder = make_embedder(fragile_embedder, workers=1, task_timeout=2)
+        embedder.wait_ready(60)
+
+        with pytest.raises(RuntimeError, match="timed out"):
+            embedder.embed_batch(["hang"])
+
+        embedder._task_timeout = 60
+        np.testing.assert_array_equal(
+            embedder.embed_batch(["ok"]), fake_vector("ok")[None, :]
+        )
+        assert not embedder._pending
+        assert embedder.stats()["respawns"] == 1
+
+    def test_factory_failure_raises(self, make_embedder):
+        """If no worker can start, callers get an error instead of zeros."""
+        embedder = make_embedder(broken_factory, workers=2)
+
+        with pytest.raises(RuntimeError, match="model missing"):
+            embedder.wait_ready(60)
+        assert len(embedder.stats()["failed"]) == 2
+
+    def test_empty_batch(self, make_embedder):
+        embedder = make_embedder(length_embedder, workers=1)
+
+        assert embedder.embed_batch([]).shape == (0, DIM)
+
+    def test_closed_embedder_rejects_work(self, make_embedder):
+        """close() stops the workers and frees the shared blocks."""
+        embedder = make_embedder(length_embedder, workers=1)
+        embedder.wait_ready(60)
+        embedder.close()
+
+        assert all(
+            not worker.process.is_alive() for worker in embedder._workers
+        )
+        with pytest.raises(RuntimeError):
+            embedder.embed_batch(["late"])
@@ -0,0 +1,150 @@
+"""Unit tests for EmbeddingStore."""
+import os
+
+import numpy as np
+import pytest
+
+import generations
+
+from embedding_store import EmbeddingStore, content_key, VECTORS_FILE, KEYS_FILE
+
+
+def unit_rows(n, dim=8, seed=0):
+    """Return n random unit vectors."""
+    rng = np.random.default_rng(seed)
+    rows = rng.standard_normal((n, dim)).astype(np.float32)
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+
+class TestEmbeddingStore:
+    """Tests for EmbeddingStore."""
+
+    def test_put_then_get_round_trip(self, tmp_path):
+        """Stored vectors should be returned unchanged."""
+        store = EmbeddingStore(str(tmp_path), "model-a", dim=8)
+        vectors = unit_rows(2)
+        store.put_many(["a", "b"], vectors)
+
+        assert np.array_equal(store.get("a"), vectors[0])
+        assert np.array_equal(store.get("b"), vectors[1])
+        assert store.get("c") is None
+
+    def test_reopen_maps_existing_rows(self, tmp_path):
+        """A reopened store should see every previously appended row."""
+        vectors = unit_rows(3)
+        EmbeddingStore(str(tmp_path), "model-a", dim=8).put_many(
+            ["a", "b", "c"], vectors
+        )
+
+        store = EmbeddingStore(str(tmp_path), "model-a", dim=8)
+
+        assert len(store) == 3
+        assert np.array_equal(store.get("c"), vectors[2])
+
+    def test_key_includes_model_id(self, tmp_path):
+        """Vectors from another model must not be returned."""
+        EmbeddingStore(str(tmp_path), "model-a", dim=8).put_many(
+            ["a"], unit_rows(1)
+        )
+
+        store = EmbeddingStore(str(tmp_path), "model-b", dim=8)
+
+        assert store.get("a") is None
+        assert content_key("a", "model-a") != content_key("a", "model-b")
+
+    def test_duplicates_and_zero_vectors_are_skipped(self, tmp_path):
+        """Known texts and failed (all-zero) vectors are not appended."""
+        store = EmbeddingStore(str(tmp_path), "model-a", dim=8)
+        store.put_many(["a"], unit_rows(1))
+
+        appended = store.put_many(
+            ["a", "b"], np.vstack([unit_rows(1), np.zeros((1, 8), np.float32)])
+        )
+
+        assert appended == 0
+        assert len(store) == 1
+
+    def test_torn_append_is_truncated_on_open(self, tmp_path):
+        """A partial trailing row left by a crash should be dropped."""
+        EmbeddingStore(str(tmp_path), "model-a", dim=8).put_many(
+            ["a"], unit_rows(1)
+        )
+        with open(os.path.join(tmp_path, VECTORS_FILE), "ab") as f:
+            f.write(b"\x00" * 12)
+
+        store = EmbeddingStore(str(tmp_path), "model-a", dim=8)
+
+        assert len(store) == 1
+        assert os.path.getsize(os.path.join(tmp_path, VECTORS_FILE)) == 32
+        assert os.path.getsize(os.path.join(tmp_path, KEYS_FILE)) == 16
+
+    def test_compact_drops_unreferenced_rows(self, tmp_path):
+        """Compaction keeps only live texts and reclaims their space."""
+        store = EmbeddingStore(str(tmp_path), "model-a", dim=8)
+        vectors = unit_rows(3)
+        store.put_many(["a", "b", "c"], vectors)
+
+        report = store.compact(["c", "a"])
+
+        assert report["kept"] == 2
+        assert report["removed"] == 1
+        assert report["bytes_reclaimed"] == 32 + 16
+        assert store.get("b") is None
+        assert np.array_equal(store.get("c"), vectors[2])
+        reopened = EmbeddingStore(str(tmp_path), "model-a", dim=8)
+        assert np.array_equal(reopened.get("a"), vectors[0])
+
+    def test_compact_twice_and_append(self, tmp_path):
+        """Appends after a compaction go to the current generation."""
+        store = EmbeddingStore(str(tmp_path), "model-a", dim=8)
+        vectors = unit_rows(3)
+        store.put_many(["a", "b"], vectors[:2])
+        store.compact(["a", "b"])
+        store.put_many(["c"], vectors[2:])
+        store.compact(["a", "c"])
+
+        reopened = EmbeddingStore(str(tmp_path), "model-a", dim=8)
+        assert np.array_equal(reopened.get("c"), vectors[2])
+        assert reopened.get("b") is None
+        assert sorted(os.listdir(tmp_path)) == ["CURRENT", "gen-2"]
+
+    def test_crash_before_switch_keeps_old_generation(
+        self, tmp_path, monkeypatch
+    ):
+        """A compaction interrupted before CURRENT moves leaves the old pair."""
+        store = EmbeddingStore(str(tmp_path), "model-a", dim=8)
+        vectors = unit_rows(3)
+        store.put_many(["a", "b", "c"], vectors)
+
+        def crash(directory, generation):
+            raise OSError("power loss")
+
+        monkeypatch.setattr(generations, "switch_generation", crash)
+        with pytest.raises(OSError):
+            store.compact(["c"])
+
+        reopened = EmbeddingStore(str(tmp_path), "model-a", dim=8)
+        assert len(reopened) == 3
+        assert np.array_equal(reopened.get("a"), vectors[0])
+        assert not any(name.startswith("gen-") for name in os.listdir(tmp_path))
+
+    def test_crash_after_switch_uses_new_generation(
+        self, tmp_path, monkeypatch
+    ):
+        """Once CURRENT moved, the compacted pair wins over leftover files."""
+        store = EmbeddingStore(str(tmp_path), "model-a", dim=8)
+        vectors = unit_rows(3)
+        store.put_many(["a", "b", "c"], vectors)
+
+        def crash(path):
+            raise OSError("power loss")
+
+        monkeypatch.setattr(os, "remove", crash)
+        with pytest.raises(OSError):
+            store.compact(["c"])
+        monkeypatch.undo()
+
+        reopened = EmbeddingStore(str(tmp_path), "model-a", dim=8)
+        assert len(reopened) == 1
+        assert np.array_equal(reopened.get("c"), vectors[2])
+        assert not os.path.exists(tmp_path / VECTORS_FILE)
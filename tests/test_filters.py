@@ -0,0 +1,85 @@
+"""Unit tests for SearchFilter."""
+import pytest
+
+from filters import SearchFilter, parse_time
+from storage import SQLiteStore, insert_memories
+
+
+class TestParseTime:
+    """Tests for parse_time."""
+
+    def test_accepts_seconds_and_iso(self):
+        """Numbers, numeric strings and ISO 8601 (UTC by default) parse."""
+        assert parse_time(12.5) == 12.5
+        assert parse_time("100") == 100.0
+        assert parse_time("1970-01-02") == 86400.0
+        assert parse_time("1970-01-01T01:00:00Z") == 3600.0
+        assert parse_time("1970-01-01T02:00:00+01:00") == 3600.0
+
+    def test_empty_is_none(self):
+        """None and "" mean no bound."""
+        assert parse_time(None) is None
+        assert parse_time("") is None
+
+    def test_rejects_garbage(self):
+        """Unparseable times raise ValueError."""
+        with pytest.raises(ValueError):
+            parse_time("yesterday")
+
+
+class TestSearchFilter:
+    """Tests for SearchFilter."""
+
+    def test_build_without_constraints_is_none(self):
+        """No tags and no bounds means no filter."""
+        assert SearchFilter.build([], None, "") is None
+
+    def test_build_normalizes_tags(self):
+        """Tags are deduplicated and sorted so equal filters hash equal."""
+        built = SearchFilter.build(["b", "a", "b"])
+        assert built == SearchFilter.build(["a", "b"])
+        assert hash(built) == hash(SearchFilter(tags=("a", "b")))
+
+    def test_matches(self):
+        """All tags are required; after is inclusive, before exclusive."""
+        search_filter = SearchFilter(
+            tags=("db",), created_after=10, created_before=20
+        )
+
+        assert search_filter.matches(["db", "x"], 10)
+        assert not search_filter.matches(["x"], 15)
+        assert not search_filter.matches(["db"], 20)
+        assert not search_filter.matches(["db"], None)
+
+    def test_lance_where(self):
+        """The LanceDB prefilter quotes tags and keeps NULL times eligible."""
+        where = SearchFilter(tags=("it's",), created_after=5.0).lance_where()
+
+        assert "LIKE '% it''s %'" in where
+        assert "(created_at IS NULL OR created_at >= 5.0)" in where
+        assert "created_at" not in SearchFilter(
+            tags=("a",), created_after=5.0
+        ).lance_where(include_time=False)
+
+    def test_fts_constraints_select_exact_tags(self, tmp_path):
+        """MATCH plus SQL conditions keep only exactly tagged, in-range rows."""
+        store = SQLiteStore(str(tmp_path / "memory.db"))
+        try:
+            for memory_id, tags, created_at in (
+                ("a", "c++ db", 100), ("b", "c db", 200), ("c", "c++", 300)
+            ):
+                row = (memory_id, "shared text", tags, "")
+                store.write(lambda c: insert_memories(c, [row], created_at))
+
+            search_filter = SearchFilter(tags=("c++",), created_before=250)
+            conditions, params = search_filter.sql_conditions("m")
+            rows = store.reader().execute(
+                "SELECT m.id FROM memories_fts "
+                "JOIN memories m ON m.seq = memories_fts.rowid "
+                f"WHERE memories_fts MATCH ?{conditions}",
+                (search_filter.fts_match("shared"), *params)
+            ).fetchall()
+        finally:
+            store.close()
+
+        assert [row[0] for row in rows] == ["a"]
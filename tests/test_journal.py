@@ -0,0 +1,394 @@
+"""Unit tests for the write-behind ingestion journal."""
+import contextlib
+import json
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from filters import SearchFilter
+from journal import (
+    DEAD_LETTER_FILE, JOURNAL_FILE, IngestJournal, match_pending
+)
+from storage import SQLiteStore
+from transfer import store_records
+
+
+def memory(
+    memory_id, content="some content", channel="main", tags=None,
+    created_at=None
+):
+    return {
+        "id": memory_id,
+        "content": content,
+        "tags": tags or [],
+        "note": "",
+        "created_at": created_at if created_at is not None else time.time(),
+        "channel": channel
+    }
+
+
+class Recorder:
+    """apply callback recording batches; can fail or block on demand."""
+
+    def __init__(self, failures=0):
+        self.batches = []
+        self.failures = failures
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def __call__(self, memories, replay):
+        self.gate.wait(5)
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("disk full")
+        self.batches.append(([m["id"] for m in memories], replay))
+
+    @property
+    def ids(self):
+        return [i for ids, _ in self.batches for i in ids]
+
+
+class FlakyBackend:
+    """Vector backend whose first ``failures`` adds raise."""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.rows = {}
+
+    def add(self, rows):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("vector add failed")
+        for row in rows:
+            self.rows[row["id"]] = row
+
+    def delete(self, ids):
+        for memory_id in ids:
+            self.rows.pop(memory_id, None)
+
+
+def open_journal(tmp_path, apply, **kwargs):
+    kwargs.setdefault("fsync", False)
+    return IngestJournal(str(tmp_path), apply, **kwargs)
+
+
+def read_records(tmp_path):
+    with open(tmp_path / JOURNAL_FILE, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+class TestIngestJournal:
+    """Tests for IngestJournal."""
+
+    def test_append_is_drained_in_batches(self, tmp_path):
+        """Queued memories are applied in order, batch_size at a time."""
+        apply = Recorder()
+        apply.gate.clear()
+        journal = open_journal(tmp_path, apply, batch_size=2)
+        journal.append([memory(f"m{i}") for i in range(5)])
+        apply.gate.set()
+
+        assert journal.flush(timeout=5)
+        journal.close()
+
+        assert apply.ids == ["m0", "m1", "m2", "m3", "m4"]
+        assert all(len(ids) <= 2 for ids, _ in apply.batches)
+        assert not any(replay for _, replay in apply.batches)
+        assert journal.stats()["applied"] == 5
+
+    def test_append_is_written_before_returning(self, tmp_path):
+        """An acknowledged save is already in the file."""
+        apply = Recorder()
+        apply.gate.clear()
+        journal = open_journal(tmp_path, apply)
+        journal.append([memory("m0")])
+
+        assert read_records(tmp_path)[0]["memory"]["id"] == "m0"
+        apply.gate.set()
+        journal.close()
+
+    def test_failed_batch_is_retried(self, tmp_path):
+        """A failing apply is retried until it succeeds."""
+        apply = Recorder(failures=2)
+        journal = open_journal(tmp_path, apply, retry_seconds=0.01)
+        journal.append([memory("m0")])
+
+        assert journal.flush(timeout=5)
+        stats = journal.stats()
+        journal.close()
+
+        assert apply.ids == ["m0"]
+        assert stats["failures"] == 2
+        assert stats["last_error"] == "disk full"
+
+    def test_retries_back_off_despite_appends(self, tmp_path):
+        """Appends must not cut the pause; each pause doubles."""
+        apply = Recorder(failures=1000)
+        journal = open_journal(
+            tmp_path, apply, retry_seconds=0.05, max_retry_seconds=10
+        )
+        journal.append([memory("m0")])
+        deadline = time.monotonic() + 0.5
+        while time.monotonic() < deadline:
+            journal.append([memory(f"x{time.monotonic()}")])
+            time.sleep(0.005)
+        failures = journal.stats()["failures"]
+        journal.close(timeout=0.1)
+
+        # Pauses of 0.05, 0.1, 0.2 and 0.4 s fit at most 4 tries in 0.5 s.
+        assert 2 <= failures <= 4
+
+    def test_poisoned_entry_is_dead_lettered(self, tmp_path):
+        """An entry that keeps failing is set aside; the rest are stored."""
+        seen = []
+
+        def apply(memories, replay):
+            seen.append([m["id"] for m in memories])
+            if any(m["id"] == "bad" for m in memories):
+                raise RuntimeError("cannot embed")
+
+        journal = open_journal(
+            tmp_path, apply, retry_seconds=0.01, max_attempts=2
+        )
+        journal.append([memory("m0"), memory("bad"), memory("m1")])
+        assert journal.flush(timeout=5)
+        journal.append([memory("m2")])
+        assert journal.flush(timeout=5)
+        stats = journal.stats()
+        journal.close()
+
+        assert seen[-4:] == [["m0"], ["bad"], ["m1"], ["m2"]]
+        assert stats["dead_lettered"] == 1
+        with open(tmp_path / DEAD_LETTER_FILE, encoding="utf-8") as f:
+            dead = [json.loads(line) for line in f]
+        assert [(d["memory"]["id"], d["error"]) for d in dead] == [
+            ("bad", "cannot embed")
+        ]
+
+        replayed = Recorder()
+        reopened = open_journal(tmp_path, replayed)
+        assert reopened.flush(timeout=5)
+        reopened.close()
+        assert replayed.ids == []
+
+    def test_retried_batch_is_replayed(self, tmp_path):
+        """A retry may follow a partial write, so it runs as a replay."""
+        calls = []
+
+        def apply(memories, replay):
+            calls.append(replay)
+            if len(calls) == 1:
+                raise RuntimeError("vector add failed")
+
+        journal = open_journal(tmp_path, apply, retry_seconds=0.01)
+        journal.append([memory("m0")])
+        assert journal.flush(timeout=5)
+        journal.append([memory("m1")])
+        assert journal.flush(timeout=5)
+        journal.close()
+
+        assert calls == [False, True, False]
+
+    def test_failure_after_commit_is_stored_on_retry(self, tmp_path):
+        """The server apply path: SQLite commits, the vector add fails once."""
+        store = SQLiteStore(str(tmp_path / "memory.db"))
+        backend = FlakyBackend(failures=1)
+
+        def apply(memories, replay):
+            vector = np.ones((1, 4), dtype=np.float32)
+            embedded = [([m["content"]], vector) for m in memories]
+            store_records(
+                store, lambda channel: contextlib.nullcontext(backend),
+                memories, embedded, replace=replay
+            )
+
+        journal = open_journal(tmp_path / "journal", apply, retry_seconds=0.01)
+        journal.append([memory("m0"), memory("m1")])
+        assert journal.flush(timeout=5)
+        stats = journal.stats()
+        journal.close()
+
+        reader = store.reader()
+        count = reader.execute("SELECT COUNT(*) FROM memories").fetchone()[0]
+        store.close()
+        assert count == 2
+        assert sorted(backend.rows) == ["m0", "m1"]
+        assert stats["failures"] == 1
+
+    def test_restart_replays_unapplied_entries(self, tmp_path):
+        """Entries after the last applied marker are replayed on open."""
+        apply = Recorder()
+        journal = open_journal(tmp_path, apply)
+        journal.append([memory("m0")])
+        assert journal.flush(timeout=5)
+        apply.gate.clear()
+        journal.append([memory("m1"), memory("m2")])
+        journal.close(timeout=0.1)
+        apply.gate.set()
+
+        replayed = Recorder()
+        reopened = open_journal(tmp_path, replayed)
+        assert reopened.flush(timeout=5)
+        reopened.append([memory("m3")])
+        assert reopened.flush(timeout=5)
+        reopened.close()
+
+        assert replayed.batches[0] == (["m1", "m2"], True)
+        assert replayed.batches[-1] == (["m3"], False)
+
+    def test_cancel_drops_queued_memory(self, tmp_path):
+        """A cancelled save is neither applied nor replayed."""
+        apply = Recorder()
+        apply.gate.clear()
+        journal = open_journal(tmp_path, apply, batch_size=1)
+        journal.append([memory("m0"), memory("m1")])
+        # Let the worker pick up the first batch.
+        time.sleep(0.05)
+
+        assert journal.cancel("m1")
+        assert not journal.cancel("missing")
+        journal.close(timeout=0.1)
+        apply.gate.set()
+
+        replayed = Recorder()
+        reopened = open_journal(tmp_path, replayed)
+        assert reopened.flush(timeout=5)
+        reopened.close()
+        assert replayed.ids == ["m0"]
+
+    def test_cancel_of_in_flight_memory_waits_for_it(self, tmp_path):
+        """Cancelling a memory being applied returns False once it is stored."""
+        apply = Recorder()
+        apply.gate.clear()
+        journal = open_journal(tmp_path, apply)
+        journal.append([memory("m0")])
+        time.sleep(0.05)
+        threading.Timer(0.05, apply.gate.set).start()
+
+        assert not journal.cancel("m0")
+        assert apply.ids == ["m0"]
+        journal.close()
+
+    def test_cancel_of_stuck_memory_times_out(self, tmp_path):
+        """A batch that keeps failing does not block cancel forever."""
+        apply = Recorder()
+        apply.gate.clear()
+        journal = open_journal(tmp_path, apply)
+        journal.append([memory("m0")])
+        time.sleep(0.05)
+
+        with pytest.raises(TimeoutError):
+            journal.cancel("m0", timeout=0.1)
+        journal.close(timeout=0.1)
+        apply.gate.set()
+
+    def test_cancel_after_failed_batch_reports_stored(self, tmp_path):
+        """A memory whose batch failed may be partly stored: delete it."""
+        apply = Recorder(failures=1000)
+        journal = open_journal(tmp_path, apply, retry_seconds=1.0)
+        journal.append([memory("m0")])
+        time.sleep(0.05)
+
+        assert not journal.cancel("m0")
+        assert journal.pending() == []
+        journal.close()
+
+    def test_torn_tail_is_truncated(self, tmp_path):
+        """A half-written last line is dropped on open."""
+        apply = Recorder()
+        apply.gate.clear()
+        journal = open_journal(tmp_path, apply)
+        journal.append([memory("m0")])
+        journal.close(timeout=0.1)
+        apply.gate.set()
+        with open(tmp_path / JOURNAL_FILE, "a", encoding="utf-8") as f:
+            f.write('{"n": 2, "memory": {"id": "m1"')
+
+        replayed = Recorder()
+        reopened = open_journal(tmp_path, replayed)
+        assert reopened.flush(timeout=5)
+        reopened.append([memory("m2")])
+        assert reopened.flush(timeout=5)
+        reopened.close()
+
+        assert replayed.ids == ["m0", "m2"]
+        numbers = [r.get("n") for r in read_records(tmp_path) if "n" in r]
+        assert numbers == [1, 2]
+
+    def test_drained_journal_is_compacted(self, tmp_path):
+        """Once drained past compact_bytes the file is truncated."""
+        journal = open_journal(tmp_path, Recorder(), compact_bytes=0)
+        journal.append([memory("m0")])
+        assert journal.flush(timeout=5)
+        journal.close()
+
+        assert (tmp_path / JOURNAL_FILE).stat().st_size == 0
+
+    def test_pending_and_stats(self, tmp_path):
+        """pending filters by channel; stats report depth and age."""
+        apply = Recorder()
+        apply.gate.clear()
+        journal = open_journal(tmp_path, apply)
+        journal.append([
+            memory("m0", channel="main", created_at=time.time() - 10),
+            memory("d0", channel="dev")
+        ])
+
+        assert [m["id"] for m in journal.pending("dev")] == ["d0"]
+        assert len(journal.pending()) == 2
+        stats = journal.stats()
+        assert stats["pending"] == 2
+        assert stats["oldest_pending_seconds"] >= 10
+        apply.gate.set()
+        journal.close()
+
+    def test_append_after_close_raises(self, tmp_path):
+        """A closed journal refuses new saves."""
+        journal = open_journal(tmp_path, Recorder())
+        journal.close()
+
+        with pytest.raises(RuntimeError):
+            journal.append([memory("m0")])
+
+
+class TestMatchPending:
+    """Tests for match_pending."""
+
+    def test_every_query_word_must_match(self):
+        """Words may come from content, tags or note, case-insensitively."""
+        memories = [
+            memory("m0", "Deploy uses Docker", tags=["infra"]),
+            memory("m1", "Docker compose file")
+        ]
+
+        results = match_pending(memories, "docker INFRA")
+
+        assert [r["id"] for r in results] == ["m0"]
+        assert results[0]["pending"] is True
+        assert results[0]["sources"] == ["pending"]
+
+    def test_newest_first_with_limit(self):
+        """Newer pending memories come first and limit is honoured."""
+        memories = [memory(f"m{i}", "cache note") for i in range(3)]
+
+        results = match_pending(memories, "cache", limit=2)
+
+        assert [r["id"] for r in results] == ["m2", "m1"]
+
+    def test_filter_is_applied(self):
+        """Tag and time filters apply to pending memories too."""
+        memories = [
+            memory("m0", "cache", tags=["perf"]),
+            memory("m1", "cache")
+        ]
+
+        search_filter = SearchFilter.build(tags=["perf"])
+        results = match_pending(memories, "cache", search_filter)
+
+        assert [r["id"] for r in results] == ["m0"]
+
+    def test_empty_query_matches_nothing(self):
+        """A query without words returns no pending memories."""
+        assert match_pending([memory("m0")], "  ") == []
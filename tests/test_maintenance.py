@@ -0,0 +1,120 @@
+"""Unit tests for TableMaintenance."""
+import threading
+
+import pytest
+from unittest.mock import Mock
+
+from maintenance import TableMaintenance
+
+
+def make_table(fragments=10):
+    """Return a mock LanceDB table with compaction/cleanup results."""
+    table = Mock()
+    dataset = table.to_lance.return_value
+    dataset.get_fragments.return_value = [object()] * fragments
+    table.compact_files.return_value = Mock(
+        fragments_removed=9, fragments_added=1, files_removed=9, files_added=1
+    )
+    table.cleanup_old_versions.return_value = Mock(
+        old_versions=8, bytes_removed=4096
+    )
+    return table
+
+
+def wait_for_run():
+    """Block until a running background maintenance run has finished."""
+    for thread in threading.enumerate():
+        if thread.name == "lance-maintenance":
+            thread.join(5)
+
+
+class TestTableMaintenance:
+    """Tests for TableMaintenance."""
+
+    def test_run_reports_what_was_reclaimed(self):
+        """A manual run compacts, cleans up and reports both."""
+        table = make_table()
+        maintenance = TableMaintenance(table, interval_seconds=None)
+
+        report = maintenance.run()
+
+        table.compact_files.assert_called_once()
+        table.cleanup_old_versions.assert_called_once()
+        assert report["fragments_before"] == 10
+        assert report["fragments_removed"] == 9
+        assert report["old_versions_removed"] == 8
+        assert report["bytes_removed"] == 4096
+
+    def test_add_threshold_triggers_background_run(self):
+        """Crossing compact_after_adds starts a background run."""
+        table = make_table()
+        maintenance = TableMaintenance(
+            table, compact_after_adds=3, interval_seconds=None
+        )
+
+        maintenance.note_writes(adds=2)
+        assert table.compact_files.call_count == 0
+
+        maintenance.note_writes(adds=1)
+        wait_for_run()
+
+        assert table.compact_files.call_count == 1
+        assert maintenance.stats()["adds_since_run"] == 0
+
+    def test_delete_threshold_triggers_background_run(self):
+        """Crossing compact_after_deletes starts a background run."""
+        table = make_table()
+        maintenance = TableMaintenance(
+            table, compact_after_deletes=2, interval_seconds=None
+        )
+
+        maintenance.note_writes(deleted_rows=2)
+        wait_for_run()
+
+        assert table.compact_files.call_count == 1
+
+    def test_failed_background_run_is_recorded(self):
+        """Background failures are kept in stats, not raised."""
+        table = make_table()
+        table.compact_files.side_effect = RuntimeError("boom")
+        maintenance = TableMaintenance(
+            table, compact_after_adds=1, interval_seconds=None
+        )
+
+        maintenance.note_writes(adds=1)
+        wait_for_run()
+
+        stats = maintenance.stats()
+        assert stats["last_error"] == "boom"
+        assert stats["running"] is False
+
+    def test_concurrent_manual_run_is_rejected(self):
+        """Only one run may be in progress at a time."""
+        table = make_table()
+        release = threading.Event()
+        table.compact_files.side_effect = lambda: release.wait(5)
+        maintenance = TableMaintenance(table, interval_seconds=None)
+
+        maintenance.run_in_background()
+        try:
+            with pytest.raises(RuntimeError):
+                maintenance.run()
+        finally:
+            release.set()
+            wait_for_run()
+
+    def test_timer_runs_when_writes_are_pending(self):
+        """The periodic timer runs maintenance only if writes are pending."""
+        table = make_table()
+        maintenance = TableMaintenance(table, interval_seconds=0.02)
+        try:
+            maintenance.note_writes(adds=1)
+            for _ in range(100):
+                if maintenance.stats()["runs"]:
+                    break
+                threading.Event().wait(0.02)
+        finally:
+            maintenance.close()
+            wait_for_run()
+
+        assert table.compact_files.call_count >= 1
@@ -0,0 +1,144 @@
+"""Unit tests for stage metrics and the Prometheus endpoint."""
+import logging
+import urllib.request
+
+import pytest
+
+from metrics import Histogram, Metrics, start_metrics_server
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestHistogram:
+    """Tests for Histogram."""
+
+    def test_quantiles(self):
+        histogram = Histogram()
+        for ms in range(1, 101):
+            histogram.observe(ms / 1000)
+
+        summary = histogram.summary()
+        assert summary["count"] == 100
+        assert summary["p50_ms"] == 50
+        assert summary["p95_ms"] == 95
+        assert summary["p99_ms"] == 99
+        assert summary["max_ms"] == 100
+
+    def test_window_keeps_recent_samples(self):
+        """Quantiles follow the window; count and sum cover everything."""
+        histogram = Histogram(window=10)
+        for _ in range(100):
+            histogram.observe(1.0)
+        for _ in range(10):
+            histogram.observe(0.001)
+
+        assert histogram.summary()["p99_ms"] == 1
+        assert histogram.count == 110
+        assert histogram.total == pytest.approx(100.01)
+
+
+class TestMetrics:
+    """Tests for Metrics."""
+
+    def test_timer_records_stage_and_trace(self):
+        clock = FakeClock()
+        metrics = Metrics(clock=clock)
+        trace = {}
+
+        with metrics.timer("fts", trace):
+            clock.now += 0.25
+        with pytest.raises(ValueError):
+            with metrics.timer("fts", trace):
+                clock.now += 0.5
+                raise ValueError("boom")
+
+        assert trace == {"fts": pytest.approx(0.75)}
+        assert metrics.snapshot()["stages"]["fts"]["count"] == 2
+
+    def test_labelled_counters(self):
+        metrics = Metrics()
+        metrics.increment("leg_failures", leg="fts")
+        metrics.increment("leg_failures", leg="fts")
+        metrics.increment("leg_failures", leg="vector")
+        metrics.increment("threshold_dropped", 5)
+
+        assert metrics.counter("leg_failures", leg="fts") == 2
+        assert metrics.snapshot()["counters"] == {
+            "leg_failures{leg=fts}": 2,
+            "leg_failures{leg=vector}": 1,
+            "threshold_dropped": 5
+        }
+
+    def test_slow_query_log(self, caplog):
+        """Only queries over the threshold are logged, with their stages."""
+        metrics = Metrics(slow_query_ms=100, slow_log_size=2)
+
+        with caplog.at_level(logging.WARNING):
+            metrics.record_query("fast", 0.05)
+            for i in range(3):
+                metrics.record_query(
+                    f"slow {i}", 0.2, {"vector_scan": 0.15}, channel="main"
+                )
+
+        slow = metrics.snapshot()["slow_queries"]
+        assert [entry["query"] for entry in slow] == ["slow 1", "slow 2"]
+        assert slow[0]["stages_ms"] == {"vector_scan": 150.0}
+        assert slow[0]["channel"] == "main"
+        assert metrics.counter("slow_queries") == 3
+        assert metrics.snapshot()["stages"]["search"]["count"] == 4
+        assert "Slow query" in caplog.text and "fast" not in caplog.text
+
+    def test_slow_query_log_disabled(self):
+        metrics = Metrics(slow_query_ms=None)
+        metrics.record_query("q", 10.0)
+
+        assert metrics.snapshot()["slow_queries"] == []
+
+    def test_failing_gauge_is_skipped(self):
+        metrics = Metrics()
+        metrics.gauge("ok", lambda: 3)
+        metrics.gauge("broken", lambda: 1 / 0)
+
+        assert metrics.snapshot()["gauges"] == {"broken": None, "ok": 3}
+        assert "memory_broken" not in metrics.prometheus()
+
+    def test_prometheus_text(self):
+        metrics = Metrics()
+        metrics.observe("session_run", 0.002)
+        metrics.increment("empty_legs", leg="vector")
+        metrics.gauge("model_ready", lambda: 1.0)
+
+        text = metrics.prometheus()
+
+        assert "# TYPE memory_stage_seconds summary" in text
+        line = 'memory_stage_seconds{stage="session_run",quantile="0.99"}'
+        assert f"{line} 0.002000" in text
+        assert 'memory_stage_seconds_count{stage="session_run"} 1' in text
+        assert 'memory_empty_legs_total{leg="vector"} 1' in text
+        assert "memory_model_ready 1" in text
+
+
+class TestMetricsServer:
+    """Tests for the Prometheus HTTP endpoint."""
+
+    def test_serves_metrics(self):
+        metrics = Metrics()
+        metrics.increment("busy_rejections")
+        server = start_metrics_server(metrics, 0)
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+            with urllib.request.urlopen(url, timeout=5) as response:
+                body = response.read().decode()
+                content_type = response.headers["Content-Type"]
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        assert content_type.startswith("text/plain")
+        assert "memory_busy_rejections_total 1" in body
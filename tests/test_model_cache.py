@@ -0,0 +1,183 @@
+"""Unit tests for the startup model cache."""
+import os
+
+import pytest
+
+import model_cache
+from model_cache import (
+    DIGESTS_FILE, OPTIMIZED_MODEL_FILE, ModelCache, file_digest
+)
+
+
+@pytest.fixture
+def model_dir(tmp_path):
+    directory = tmp_path / "model"
+    directory.mkdir()
+    (directory / "sentence_transformers.onnx").write_bytes(b"graph")
+    (directory / "sentence_transformers.onnx_data").write_bytes(b"weights")
+    (directory / "tokenizer.json").write_text('{"vocab": 1}')
+    return directory
+
+
+def make_cache(
+    tmp_path, model_dir, runtime="1.17.0", provider="CPUExecutionProvider"
+):
+    return ModelCache(
+        str(tmp_path / "cache"), str(model_dir / "sentence_transformers.onnx"),
+        runtime_version=runtime, provider=provider, tokenizer_version="4.40"
+    )
+
+
+def load_tokenizer(tmp_path, model_dir, loader):
+    """Load the tokenizer through a fresh cache instance."""
+    cache = make_cache(tmp_path, model_dir)
+    return cache.load_tokenizer(str(model_dir), loader)
+
+
+def write_graph(cache):
+    """Stand in for the runtime writing optimized_model_filepath."""
+    path = cache.prepare_graph()
+    with open(path, "wb") as f:
+        f.write(b"optimized")
+    return path
+
+
+class TestGraphKey:
+    """Tests for the optimized-graph key."""
+
+    def test_key_is_stable(self, tmp_path, model_dir):
+        """Same files and runtime give the same key."""
+        assert make_cache(tmp_path, model_dir).graph_key == \
+            make_cache(tmp_path, model_dir).graph_key
+
+    @pytest.mark.parametrize("change", ["runtime", "provider", "weights"])
+    def test_key_changes_with_inputs(self, tmp_path, model_dir, change):
+        """Runtime version, provider and model content are in the key."""
+        before = make_cache(tmp_path, model_dir).graph_key
+        if change == "runtime":
+            after = make_cache(tmp_path, model_dir, runtime="1.18.0").graph_key
+        elif change == "provider":
+            after = make_cache(
+                tmp_path, model_dir, provider="CUDAExecutionProvider"
+            ).graph_key
+        else:
+            weights = model_dir / "sentence_transformers.onnx_data"
+            weights.write_bytes(b"new weights!")
+            after = make_cache(tmp_path, model_dir).graph_key
+
+        assert before != after
+
+    def test_digests_are_remembered(self, tmp_path, model_dir, monkeypatch):
+        """An unchanged file is not hashed again by the next cache."""
+        make_cache(tmp_path, model_dir)
+        assert os.path.exists(tmp_path / "cache" / DIGESTS_FILE)
+
+        def fail(path):
+            raise AssertionError(f"rehashed {path}")
+
+        monkeypatch.setattr(model_cache, "file_digest", fail)
+        make_cache(tmp_path, model_dir)
+
+    def test_file_digest(self, tmp_path):
+        """Equal content gives equal digests."""
+        (tmp_path / "a").write_bytes(b"x" * 10)
+        (tmp_path / "b").write_bytes(b"x" * 10)
+        (tmp_path / "c").write_bytes(b"y" * 10)
+
+        a, b, c = (file_digest(str(tmp_path / name)) for name in "abc")
+        assert a == b
+        assert a != c
+
+
+class TestGraphCache:
+    """Tests for staging, publishing and discarding the optimized graph."""
+
+    def test_miss_then_hit_after_commit(self, tmp_path, model_dir):
+        """A committed graph is found by the next start."""
+        cache = make_cache(tmp_path, model_dir)
+        assert cache.cached_graph() is None
+        write_graph(cache)
+        assert cache.cached_graph() is None
+
+        cache.commit_graph()
+
+        again = make_cache(tmp_path, model_dir)
+        path = again.cached_graph()
+        assert path == os.path.join(again.graph_dir, OPTIMIZED_MODEL_FILE)
+        assert again.stats()["graph"] == "hit"
+
+    def test_commit_without_graph_publishes_nothing(self, tmp_path, model_dir):
+        """If the runtime wrote nothing, there is still no hit."""
+        cache = make_cache(tmp_path, model_dir)
+        cache.prepare_graph()
+        cache.commit_graph()
+
+        assert cache.cached_graph() is None
+
+    def test_new_key_prunes_old_graph(self, tmp_path, model_dir):
+        """Publishing a graph removes graphs of other keys."""
+        old = make_cache(tmp_path, model_dir)
+        write_graph(old)
+        old.commit_graph()
+
+        new = make_cache(tmp_path, model_dir, runtime="1.18.0")
+        write_graph(new)
+        new.commit_graph()
+
+        assert not os.path.exists(old.graph_dir)
+        assert new.cached_graph() is not None
+
+    def test_discard(self, tmp_path, model_dir):
+        """A discarded graph is a miss again."""
+        cache = make_cache(tmp_path, model_dir)
+        write_graph(cache)
+        cache.commit_graph()
+
+        cache.discard_graph()
+
+        assert cache.cached_graph() is None
+
+
+class TestTokenizerCache:
+    """Tests for the pickled tokenizer."""
+
+    def test_loader_runs_once(self, tmp_path, model_dir):
+        """The second load is served from the pickle."""
+        calls = []
+
+        def loader():
+            calls.append(True)
+            return {"vocab": 1}
+
+        first = load_tokenizer(tmp_path, model_dir, loader)
+        cache = make_cache(tmp_path, model_dir)
+        second = cache.load_tokenizer(str(model_dir), loader)
+
+        assert first == second == {"vocab": 1}
+        assert len(calls) == 1
+        assert cache.stats()["tokenizer"] == "hit"
+
+    def test_changed_tokenizer_file_rebuilds(self, tmp_path, model_dir):
+        """Editing a tokenizer file invalidates and prunes the old pickle."""
+        load_tokenizer(tmp_path, model_dir, lambda: "old")
+        (model_dir / "tokenizer.json").write_text('{"vocab": 2}')
+
+        tokenizer = load_tokenizer(tmp_path, model_dir, lambda: "new")
+
+        assert tokenizer == "new"
+        pickles = [
+            n for n in os.listdir(tmp_path / "cache")
+            if n.startswith("tokenizer-")
+        ]
+        assert len(pickles) == 1
+
+    def test_corrupt_pickle_is_rebuilt(self, tmp_path, model_dir):
+        """An unreadable pickle falls back to the loader."""
+        load_tokenizer(tmp_path, model_dir, lambda: "tok")
+        for name in os.listdir(tmp_path / "cache"):
+            if name.startswith("tokenizer-"):
+                (tmp_path / "cache" / name).write_bytes(b"not a pickle")
+
+        tokenizer = load_tokenizer(tmp_path, model_dir, lambda: "fresh")
+
+        assert tokenizer == "fresh"
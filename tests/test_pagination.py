@@ -0,0 +1,119 @@
+"""Unit tests for keyset pagination helpers."""
+import pytest
+
+from pagination import (
+    decode_cursor, encode_cursor, list_page, make_preview, PROJECTION_SUMMARY
+)
+from storage import SQLiteStore, insert_memories
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = SQLiteStore(str(tmp_path / "memory.db"))
+    s.write(lambda c: [
+        insert_memories(
+            c, [(f"id{i}", f"content {i}", "", "")], created_at=float(i // 2)
+        )
+        for i in range(25)
+    ])
+    yield s
+    s.close()
+
+
+class TestCursor:
+    """Tests for cursor encoding."""
+
+    def test_round_trip(self):
+        """A cursor should decode to the values it was made from."""
+        cursor = encode_cursor(1712345678.123456, 42)
+        assert decode_cursor(cursor) == (1712345678.123456, 42)
+
+    def test_malformed_cursor_raises(self):
+        """Garbage cursors should raise ValueError."""
+        with pytest.raises(ValueError):
+            decode_cursor("not-a-cursor")
+
+
+class TestMakePreview:
+    """Tests for make_preview."""
+
+    def test_does_not_split_multibyte_characters(self):
+        """A cut inside a character should drop the partial character."""
+        data = "记忆库".encode("utf-8")
+
+        assert make_preview(data, 4) == "记"
+        assert make_preview(data, 9) == "记忆库"
+
+
+class TestListPage:
+    """Tests for list_page."""
+
+    def test_walks_every_row_exactly_once(self, store):
+        """Following next_cursor should visit each memory once, newest first."""
+        seen = []
+        cursor = ""
+        while cursor is not None:
+            page, cursor = list_page(store.reader(), 4, cursor=cursor)
+            seen.extend(m["id"] for m in page)
+
+        assert seen == [f"id{i}" for i in reversed(range(25))]
+
+    def test_last_page_has_no_cursor(self, store):
+        """A page that reaches the end should return no next cursor."""
+        page, cursor = list_page(store.reader(), 100)
+
+        assert len(page) == 25
+        assert cursor is None
+
+    def test_offset_page_cursor_continues_after_it(self, store):
+        """An offset page's cursor should lead to the rows right after it."""
+        first, cursor = list_page(store.reader(), 5, offset=5)
+        second, _ = list_page(store.reader(), 5, cursor=cursor)
+
+        expected = [f"id{i}" for i in range(19, 9, -1)]
+        assert [m["id"] for m in first + second] == expected
+
+    def test_cursor_pages_use_the_index(self, store):
+        """Deep pages should be an index range search, not an OFFSET scan."""
+        plan = store.reader().execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM memories "
+            "WHERE (created_at, seq) < (?, ?) "
+            "ORDER BY created_at DESC, seq DESC LIMIT ?", (5.0, 10, 5)
+        ).fetchall()
+
+        assert any("idx_memories_created_at" in row[-1] for row in plan)
+
+    def test_summary_projection(self, tmp_path):
+        """Summary rows carry a byte-bounded preview instead of content."""
+        s = SQLiteStore(str(tmp_path / "summary.db"))
+        try:
+            row = ("big", "x" * 1000, "a b", "n")
+            s.write(lambda c: insert_memories(c, [row], 0.0))
+            page, _ = list_page(
+                s.reader(), 10, projection=PROJECTION_SUMMARY, preview_bytes=16
+            )
+        finally:
+            s.close()
+
+        item = page[0]
+        assert "content" not in item
+        assert item["preview"] == "x" * 16
+        assert item["truncated"] is True
+        assert item["tags"] == ["a", "b"]
+        assert item["timestamp"].startswith("1970-01-01T00:00:00")
+
+    def test_unknown_projection_raises(self, store):
+        """Unknown projections should be rejected."""
+        with pytest.raises(ValueError):
+            list_page(store.reader(), 10, projection="everything")
+
+    def test_channel_filter(self, store):
+        """Only the requested channel's memories should be listed."""
+        row = ("dev1", "dev", "", "")
+        store.write(lambda c: insert_memories(c, [row], 100.0, "dev"))
+
+        page, _ = list_page(store.reader(), 5, channel="dev")
+        everything, _ = list_page(store.reader(), 1)
+
+        assert [(m["id"], m["channel"]) for m in page] == [("dev1", "dev")]
+        assert everything[0]["id"] == "dev1"
@@ -0,0 +1,120 @@
+"""Unit tests for the vector quantizers."""
+import numpy as np
+import pytest
+
+from quantization import (
+    MODE_BINARY, MODE_FLOAT16, MODE_FLOAT32, MODE_INT8, MODES, get_quantizer
+)
+
+
+DIM = 64
+
+
+def unit_vectors(n, seed=0):
+    """Return n random unit vectors."""
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class TestQuantizers:
+    """Tests for the quantizers."""
+
+    @pytest.mark.parametrize("mode, row_bytes", [
+        (MODE_FLOAT32, DIM * 4),
+        (MODE_FLOAT16, DIM * 2),
+        (MODE_INT8, DIM + 4),
+        (MODE_BINARY, DIM // 8)
+    ])
+    def test_encoded_row_width(self, mode, row_bytes):
+        """Codes should be uint8 rows of the advertised width."""
+        quantizer = get_quantizer(mode, DIM)
+
+        codes = quantizer.encode(unit_vectors(3))
+
+        assert quantizer.row_bytes == row_bytes
+        assert codes.dtype == np.uint8
+        assert codes.shape == (3, row_bytes)
+
+    @pytest.mark.parametrize("mode, tolerance", [
+        (MODE_FLOAT32, 1e-6), (MODE_FLOAT16, 1e-3), (MODE_INT8, 2e-2)
+    ])
+    def test_scores_approximate_dot_products(self, mode, tolerance):
+        """Float and int8 scores should be close to exact dot products."""
+        quantizer = get_quantizer(mode, DIM)
+        vectors = unit_vectors(20)
+        query = unit_vectors(1, seed=1)[0]
+
+        scores = quantizer.scores(
+            quantizer.encode(vectors), quantizer.prepare_query(query)
+        )
+
+        np.testing.assert_allclose(scores, vectors @ query, atol=tolerance)
+
+    def test_binary_scores_the_query_against_the_signs(self):
+        """Binary scores are the float query against the decoded signs."""
+        quantizer = get_quantizer(MODE_BINARY, DIM)
+        vectors = unit_vectors(20)
+        query = unit_vectors(1, seed=1)[0]
+
+        codes = quantizer.encode(vectors)
+        scores = quantizer.scores(codes, quantizer.prepare_query(query))
+
+        np.testing.assert_allclose(
+            scores, quantizer.decode(codes) @ query, atol=1e-6
+        )
+        assert scores[0] == pytest.approx(-quantizer.scores(
+            quantizer.encode(-vectors[:1]), quantizer.prepare_query(query)
+        )[0], abs=1e-6)
+
+    def test_binary_ranks_better_than_hamming(self):
+        """Asymmetric scores recover more true neighbours than sign codes."""
+        quantizer = get_quantizer(MODE_BINARY, DIM)
+        vectors = unit_vectors(2000)
+        query = unit_vectors(1, seed=1)[0]
+        codes = quantizer.encode(vectors)
+        exact = set(np.argsort(-(vectors @ query))[:10])
+
+        scores = quantizer.scores(codes, quantizer.prepare_query(query))
+        hamming = np.unpackbits(
+            codes ^ quantizer.encode(query[None, :]), axis=1
+        ).sum(axis=1)
+
+        found = len(exact & set(np.argsort(-scores)[:50]))
+        assert found > len(exact & set(np.argsort(hamming, kind="stable")[:50]))
+
+    @pytest.mark.parametrize("dim", [DIM, 13])
+    def test_float16_scores_without_decoding(self, dim):
+        """float16 scores match decoded dot products, subnormals included."""
+        quantizer = get_quantizer(MODE_FLOAT16, dim)
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((300, dim)).astype(np.float32)
+        vectors[0, :3] = 0.0
+        vectors[1, :3] = [1e-6, -3e-7, 6e-8]
+        query = vectors[5]
+
+        codes = quantizer.encode(vectors)
+        scores = quantizer.scores(codes, quantizer.prepare_query(query))
+
+        np.testing.assert_allclose(
+            scores, quantizer.decode(codes) @ query, rtol=1e-5, atol=1e-5
+        )
+
+    def test_int8_keeps_zero_vectors(self):
+        """A zero vector has scale 0 and decodes to zeros."""
+        quantizer = get_quantizer(MODE_INT8, DIM)
+
+        zeros = np.zeros((1, DIM), dtype=np.float32)
+        decoded = quantizer.decode(quantizer.encode(zeros))
+
+        assert not decoded.any()
+
+    def test_unknown_mode_is_rejected(self):
+        """get_quantizer should reject unknown modes."""
+        with pytest.raises(ValueError):
+            get_quantizer("int4", DIM)
+
+    def test_all_modes_registered(self):
+        """Every mode constant should be selectable."""
+        expected = {MODE_FLOAT32, MODE_FLOAT16, MODE_INT8, MODE_BINARY}
+        assert set(MODES) == expected
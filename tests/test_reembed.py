@@ -0,0 +1,157 @@
+"""Unit tests for the background re-embedding job."""
+import contextlib
+import json
+import threading
+
+import numpy as np
+import pytest
+
+import reembed
+from storage import SQLiteStore, delete_memories, insert_memories
+from vector_backends import NumpyBackend
+
+DIM = 4
+
+
+def fake_embed_chunks(texts):
+    vector = np.full((1, DIM), 0.5, dtype=np.float32)
+    return [([text], vector) for text in texts]
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = SQLiteStore(str(tmp_path / "memory.db"))
+    s.write(lambda c: insert_memories(
+        c, [(f"m{i}", f"memory {i}", "", "") for i in range(5)], channel="main"
+    ))
+    s.write(lambda c: insert_memories(
+        c, [("d0", "dev memory", "", "")], channel="dev"
+    ))
+    yield s
+    s.close()
+
+
+class Shadows:
+    """Opens one NumpyBackend per channel under a directory."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.backends = {}
+
+    def __call__(self, channel):
+        if channel not in self.backends:
+            self.backends[channel] = NumpyBackend(
+                str(self.directory / channel), dim=DIM
+            )
+        return contextlib.nullcontext(self.backends[channel])
+
+
+def make_job(store, tmp_path, shadows, embed=fake_embed_chunks, model="m2"):
+    return reembed.ReembedJob(
+        store, embed, shadows, model, str(tmp_path / "checkpoint.json"),
+        batch_size=2, info={"model_dir": "new-model"}
+    )
+
+
+class TestReembedJob:
+    """Tests for ReembedJob."""
+
+    def test_everything_is_embedded_then_swapped(self, store, tmp_path):
+        """Every memory lands in its channel's shadow, then swap runs once."""
+        shadows = Shadows(tmp_path / "shadow")
+        swap_calls = []
+
+        stats = make_job(store, tmp_path, shadows).run(
+            threading.Lock(), lambda: swap_calls.append(True)
+        )
+
+        assert stats["state"] == reembed.STATE_DONE
+        assert stats["processed"] == stats["total"] == 6
+        assert swap_calls == [True]
+        assert shadows.backends["main"].count() == 5
+        assert shadows.backends["dev"].count() == 1
+        assert not (tmp_path / "checkpoint.json").exists()
+
+    def test_interrupted_job_resumes_from_checkpoint(self, store, tmp_path):
+        """A second job of the same model continues after the last batch."""
+        shadows = Shadows(tmp_path / "shadow")
+        calls = []
+
+        def failing_embed(texts):
+            calls.append(texts)
+            if len(calls) == 2:
+                raise RuntimeError("crash")
+            return fake_embed_chunks(texts)
+
+        with pytest.raises(RuntimeError):
+            make_job(store, tmp_path, shadows, embed=failing_embed).run(
+                threading.Lock(), lambda: None
+            )
+        checkpoint = json.loads((tmp_path / "checkpoint.json").read_text())
+        assert checkpoint["processed"] == 2
+        assert checkpoint["model_dir"] == "new-model"
+
+        embedded = []
+        job = make_job(
+            store, tmp_path, shadows,
+            embed=lambda t: embedded.extend(t) or fake_embed_chunks(t)
+        )
+        assert job.resuming
+        stats = job.run(threading.Lock(), lambda: None)
+
+        assert len(embedded) == 4
+        assert stats["processed"] == 6
+        assert shadows.backends["main"].count() == 5
+
+    def test_checkpoint_of_another_model_is_ignored(self, store, tmp_path):
+        """Progress made for one model must not be reused for another."""
+        (tmp_path / "checkpoint.json").write_text(
+            json.dumps({
+                "model_fingerprint": "other", "last_seq": 4, "processed": 4
+            })
+        )
+
+        job = make_job(store, tmp_path, Shadows(tmp_path / "shadow"))
+        assert not job.resuming
+
+    def test_memories_deleted_mid_batch_are_dropped(self, store, tmp_path):
+        """A memory deleted while its batch is embedded stays out of it."""
+        shadows = Shadows(tmp_path / "shadow")
+
+        def embed_and_delete(texts):
+            if "memory 0" in texts:
+                store.write(lambda c: delete_memories(c, ["m0"]))
+            return fake_embed_chunks(texts)
+
+        make_job(store, tmp_path, shadows, embed=embed_and_delete).run(
+            threading.Lock(), lambda: None
+        )
+
+        found = shadows.backends["main"].search(np.ones(DIM), 10)
+        hits = {hit["id"] for hit in found}
+        assert hits == {"m1", "m2", "m3", "m4"}
+
+    def test_cancel_keeps_the_checkpoint(self, store, tmp_path):
+        """A cancelled job never swaps and can be resumed."""
+        job = make_job(store, tmp_path, Shadows(tmp_path / "shadow"))
+        swap_calls = []
+        job.cancel()
+
+        stats = job.run(threading.Lock(), lambda: swap_calls.append(True))
+
+        assert stats["state"] == reembed.STATE_CANCELLED
+        assert swap_calls == []
+
+
+class TestManifest:
+    """Tests for the active-model manifest."""
+
+    def test_round_trip(self, tmp_path):
+        """A written manifest reads back; a missing one is None."""
+        path = str(tmp_path / reembed.MANIFEST_FILE)
+        assert reembed.read_manifest(path) is None
+
+        manifest = {"model_dir": "x", "storage_suffix": "ab"}
+        reembed.write_json_atomic(path, manifest)
+
+        assert reembed.read_manifest(path) == manifest
@@ -222,3 +222,989 @@ class TestSearchServiceHybridSearch:
         
         result = service.hybrid_search("test query", top_k=3)
         assert len(result) <= 3
+
+
+class FakeBatchTokenizer:
+    """Tokenizer stub that maps each word to one token id."""
+
+    pad_token_id = 0
+
+    def __call__(self, texts, **kwargs):
+        input_ids = [[i + 1 for i, _ in enumerate(t.split())] for t in texts]
+        return {
+            "input_ids": input_ids,
+            "attention_mask": [[1] * len(ids) for ids in input_ids]
+        }
+
+
+class TestSearchServiceEmbedBatch:
+    """Tests for SearchService.embed_batch method."""
+
+    def _make_service(self, session):
+        from search_engine import SearchService
+
+        return SearchService(
+            session=session,
+            tokenizer=FakeBatchTokenizer(),
+            vector_table=None,
+            sqlite_conn=None
+        )
+
+    def test_embed_batch_shape_and_normalization(self):
+        """Embed batch should return an (N, 1024) matrix of unit rows."""
+        mock_session = Mock()
+        mock_session.run.side_effect = lambda _, inputs: [
+            np.random.randn(*inputs["input_ids"].shape, 1024).astype(np.float32)
+        ]
+        service = self._make_service(mock_session)
+
+        result = service.embed_batch(["a b c", "d", "e f"])
+
+        assert result.shape == (3, 1024)
+        assert result.dtype == np.float32
+        assert np.linalg.norm(result, axis=1) == pytest.approx(
+            [1.0] * 3, abs=1e-5
+        )
+
+    def test_embed_batch_pads_each_bucket_to_its_own_length(self):
+        """Buckets are sorted by length and padded to their longest text."""
+        mock_session = Mock()
+        seen_shapes = []
+
+        def run(_, inputs):
+            seen_shapes.append(inputs["input_ids"].shape)
+            return [
+                np.ones((*inputs["input_ids"].shape, 1024), dtype=np.float32)
+            ]
+
+        mock_session.run.side_effect = run
+        service = self._make_service(mock_session)
+
+        service.embed_batch(["w " * 9, "w", "w " * 10, "w w"], batch_size=2)
+
+        assert seen_shapes == [(2, 2), (2, 10)]
+
+    def test_embed_batch_ignores_padding_when_pooling(self):
+        """Padded positions must not contribute to the pooled vector."""
+        mock_session = Mock()
+
+        def run(_, inputs):
+            hidden = np.zeros(
+                (*inputs["input_ids"].shape, 1024), dtype=np.float32
+            )
+            hidden[:, :, 0] = 1.0
+            hidden[inputs["attention_mask"] == 0] = 0.0
+            hidden[inputs["attention_mask"] == 0, 1] = 100.0
+            return [hidden]
+
+        mock_session.run.side_effect = run
+        service = self._make_service(mock_session)
+
+        result = service.embed_batch(["a", "a b c d"])
+
+        assert result[0, 0] == pytest.approx(1.0)
+        assert result[0, 1] == pytest.approx(0.0)
+
+    def test_embed_batch_preserves_input_order(self):
+        """Rows must come back in input order even after length sorting."""
+        mock_session = Mock()
+
+        def run(_, inputs):
+            lengths = inputs["attention_mask"].sum(axis=1)
+            hidden = np.zeros(
+                (*inputs["input_ids"].shape, 1024), dtype=np.float32
+            )
+            for row, length in enumerate(lengths):
+                hidden[row, :, int(length)] = 1.0
+            return [hidden]
+
+        mock_session.run.side_effect = run
+        service = self._make_service(mock_session)
+
+        result = service.embed_batch(["a b c", "a", "a b"], batch_size=1)
+
+        assert list(result.argmax(axis=1)) == [3, 1, 2]
+
+    def test_embed_batch_runs_buckets_concurrently(self):
+        """With embed_workers, buckets overlap and rows keep input order."""
+        import threading
+        import time
+        from search_engine import SearchService
+
+        active, peak, lock = [0], [0], threading.Lock()
+
+        def run(_, inputs):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            lengths = inputs["attention_mask"].sum(axis=1)
+            shape = (*inputs["input_ids"].shape, 1024)
+            hidden = np.zeros(shape, dtype=np.float32)
+            for row, length in enumerate(lengths):
+                hidden[row, :, int(length)] = 1.0
+            return [hidden]
+
+        mock_session = Mock()
+        mock_session.run.side_effect = run
+        service = SearchService(
+            session=mock_session, tokenizer=FakeBatchTokenizer(),
+            vector_table=None, sqlite_conn=None, embed_workers=3
+        )
+
+        result = service.embed_batch(["a b c", "a", "a b"], batch_size=1)
+        service.close()
+
+        assert list(result.argmax(axis=1)) == [3, 1, 2]
+        assert peak[0] > 1
+
+    def test_embed_batch_empty_input(self):
+        """Empty input should return an empty (0, 1024) matrix."""
+        service = self._make_service(Mock())
+
+        result = service.embed_batch([])
+
+        assert result.shape == (0, 1024)
+
+
+class TestSearchServiceEmbedScheduler:
+    """Tests for routing SearchService.embed through a scheduler."""
+
+    def test_embed_uses_attached_scheduler(self):
+        """Embed should delegate to the scheduler when one is attached."""
+        from search_engine import SearchService
+
+        mock_session = Mock()
+        service = SearchService(
+            session=mock_session,
+            tokenizer=Mock(),
+            vector_table=None,
+            sqlite_conn=None
+        )
+        scheduler = Mock()
+        scheduler.embed.return_value = np.ones(1024, dtype=np.float32)
+        service.set_embed_scheduler(scheduler)
+
+        result = service.embed("test text")
+
+        scheduler.embed.assert_called_once_with("test text")
+        mock_session.run.assert_not_called()
+        assert result.shape == (1024,)
+
+    def test_embed_scheduler_failure_returns_zero_vector(self):
+        """Scheduler errors should degrade like direct embed errors."""
+        from search_engine import SearchService
+
+        service = SearchService(
+            session=Mock(),
+            tokenizer=Mock(),
+            vector_table=None,
+            sqlite_conn=None
+        )
+        scheduler = Mock()
+        scheduler.embed.side_effect = RuntimeError("boom")
+        service.set_embed_scheduler(scheduler)
+
+        result = service.embed("test text")
+
+        assert not result.any()
+
+
+class TestSearchServiceQueryCache:
+    """Tests for the query-embedding cache in SearchService."""
+
+    def _make_service(self, session, fingerprint="model-a", cache=None):
+        from search_engine import SearchService
+        from caching import LRUCache
+
+        mock_tokenizer = Mock()
+        mock_tokenizer.return_value = {
+            "input_ids": np.array([[1, 2, 3]]),
+            "attention_mask": np.array([[1, 1, 1]])
+        }
+        return SearchService(
+            session=session,
+            tokenizer=mock_tokenizer,
+            vector_table=None,
+            sqlite_conn=None,
+            query_cache=cache if cache is not None else LRUCache(max_size=8),
+            model_fingerprint=fingerprint
+        )
+
+    def test_repeated_query_skips_inference(self):
+        """A repeated query should hit the cache instead of the model."""
+        mock_session = Mock()
+        mock_session.run.return_value = [
+            np.random.randn(1, 3, 1024).astype(np.float32)
+        ]
+        service = self._make_service(mock_session)
+
+        first = service.embed_query("where is the config")
+        second = service.embed_query("  where is   the config ")
+
+        assert mock_session.run.call_count == 1
+        assert np.array_equal(first, second)
+        assert service.stats()["query_cache"]["hits"] == 1
+
+    def test_cache_key_includes_model_fingerprint(self):
+        """Vectors cached for one model must not be reused by another."""
+        from caching import LRUCache
+
+        cache = LRUCache(max_size=8)
+        mock_session = Mock()
+        mock_session.run.return_value = [
+            np.random.randn(1, 3, 1024).astype(np.float32)
+        ]
+        self._make_service(mock_session, "model-a", cache).embed_query("q")
+        self._make_service(mock_session, "model-b", cache).embed_query("q")
+
+        assert mock_session.run.call_count == 2
+
+    def test_failed_embedding_is_not_cached(self):
+        """Zero vectors from failed inference should not be cached."""
+        mock_session = Mock()
+        mock_session.run.side_effect = RuntimeError("boom")
+        service = self._make_service(mock_session)
+
+        service.embed_query("q")
+        service.embed_query("q")
+
+        assert mock_session.run.call_count == 2
+
+
+class TestSearchServiceResultCache:
+    """Tests for the write-generation-aware hybrid_search result cache."""
+
+    def _make_service(self, mock_conn):
+        from search_engine import SearchService
+        from caching import LRUCache
+
+        mock_session = Mock()
+        mock_session.run.return_value = [
+            np.random.randn(1, 3, 1024).astype(np.float32)
+        ]
+        mock_tokenizer = Mock()
+        mock_tokenizer.return_value = {
+            "input_ids": np.array([[1, 2, 3]]),
+            "attention_mask": np.array([[1, 1, 1]])
+        }
+        mock_table = Mock()
+        chain = mock_table.search.return_value.limit.return_value
+        chain.to_list.return_value = []
+        return SearchService(
+            session=mock_session,
+            tokenizer=mock_tokenizer,
+            vector_table=mock_table,
+            sqlite_conn=mock_conn,
+            result_cache=LRUCache(max_size=8)
+        )
+
+    def test_repeated_search_is_served_from_cache(self):
+        """The same search should skip both legs the second time."""
+        mock_conn = Mock()
+        mock_conn.execute.return_value = [("id1", "content1", "", "")]
+        service = self._make_service(mock_conn)
+
+        first = service.hybrid_search("test query")
+        second = service.hybrid_search("test query")
+
+        assert first == second
+        assert mock_conn.execute.call_count == 1
+
+    def test_different_parameters_miss_the_cache(self):
+        """top_k, threshold and rrf_k are part of the cache key."""
+        mock_conn = Mock()
+        mock_conn.execute.return_value = []
+        service = self._make_service(mock_conn)
+
+        service.hybrid_search("test query", top_k=5)
+        service.hybrid_search("test query", top_k=3)
+        service.hybrid_search("test query", top_k=3, threshold=0.5)
+
+        assert mock_conn.execute.call_count == 3
+
+    def test_write_generation_invalidates_cached_results(self):
+        """A write must be visible to the very next search."""
+        mock_conn = Mock()
+        mock_conn.execute.return_value = [("id1", "content1", "", "")]
+        service = self._make_service(mock_conn)
+        service.hybrid_search("test query")
+
+        mock_conn.execute.return_value = [("id2", "content2", "", "")]
+        generation = service.bump_write_generation()
+        result = service.hybrid_search("test query")
+
+        assert generation == 1
+        assert [r["id"] for r in result] == ["id2"]
+
+    def test_cached_results_are_not_shared_with_callers(self):
+        """Mutating a returned result must not corrupt the cache."""
+        mock_conn = Mock()
+        mock_conn.execute.return_value = [("id1", "content1", "a", "")]
+        service = self._make_service(mock_conn)
+
+        service.hybrid_search("test query")[0]["tags"].append("x")
+
+        assert service.hybrid_search("test query")[0]["tags"] == ["a"]
+
+
+class TestSearchServiceEmbedDocuments:
+    """Tests for SearchService.embed_documents with an embedding store."""
+
+    def test_stored_text_is_not_re_embedded(self, tmp_path):
+        """Texts already in the store should skip inference entirely."""
+        from search_engine import SearchService
+        from embedding_store import EmbeddingStore
+
+        mock_session = Mock()
+        mock_session.run.side_effect = lambda _, inputs: [
+            np.random.randn(*inputs["input_ids"].shape, 1024).astype(np.float32)
+        ]
+        service = SearchService(
+            session=mock_session,
+            tokenizer=FakeBatchTokenizer(),
+            vector_table=None,
+            sqlite_conn=None,
+            embedding_store=EmbeddingStore(str(tmp_path), "model-a")
+        )
+
+        first = service.embed_documents(["a b", "c d e"])
+        calls = mock_session.run.call_count
+        second = service.embed_documents(["c d e", "a b"])
+
+        assert mock_session.run.call_count == calls
+        assert np.array_equal(first[0], second[1])
+        assert np.array_equal(first[1], second[0])
+
+    def test_only_missing_texts_are_embedded(self, tmp_path):
+        """A partial hit should embed just the missing texts."""
+        from search_engine import SearchService
+        from embedding_store import EmbeddingStore
+
+        seen = []
+
+        def run(_, inputs):
+            seen.append(inputs["input_ids"].shape[0])
+            shape = (*inputs["input_ids"].shape, 1024)
+            return [np.random.randn(*shape).astype(np.float32)]
+
+        mock_session = Mock()
+        mock_session.run.side_effect = run
+        service = SearchService(
+            session=mock_session,
+            tokenizer=FakeBatchTokenizer(),
+            vector_table=None,
+            sqlite_conn=None,
+            embedding_store=EmbeddingStore(str(tmp_path), "model-a")
+        )
+        service.embed_documents(["a", "b"])
+        seen.clear()
+
+        result = service.embed_documents(["a", "x y", "z w v"])
+
+        assert sum(seen) == 2
+        assert result.shape == (3, 1024)
+
+
+class TestSearchServiceLegFanOut:
+    """Tests for concurrent FTS/vector legs in hybrid_search."""
+
+    def _make_service(self, mock_conn, mock_table, leg_timeout=None):
+        from search_engine import SearchService
+
+        mock_session = Mock()
+        mock_session.run.return_value = [
+            np.random.randn(1, 3, 1024).astype(np.float32)
+        ]
+        mock_tokenizer = Mock()
+        mock_tokenizer.return_value = {
+            "input_ids": np.array([[1, 2, 3]]),
+            "attention_mask": np.array([[1, 1, 1]])
+        }
+        return SearchService(
+            session=mock_session,
+            tokenizer=mock_tokenizer,
+            vector_table=mock_table,
+            sqlite_conn=mock_conn,
+            leg_timeout=leg_timeout
+        )
+
+    def test_legs_run_concurrently(self):
+        """Total latency should be close to the slower leg, not the sum."""
+        import time
+
+        def slow_execute(*args):
+            time.sleep(0.2)
+            return [("id1", "content1", "", "")]
+
+        def slow_to_list():
+            time.sleep(0.2)
+            return [{
+                "id": "id2", "content": "c2", "tags": "", "note": "",
+                "_distance": 0.1
+            }]
+
+        mock_conn = Mock()
+        mock_conn.execute.side_effect = slow_execute
+        mock_table = Mock()
+        chain = mock_table.search.return_value.limit.return_value
+        chain.to_list.side_effect = slow_to_list
+        service = self._make_service(mock_conn, mock_table)
+
+        started = time.monotonic()
+        result = service.hybrid_search("test query")
+        elapsed = time.monotonic() - started
+
+        assert {r["id"] for r in result} == {"id1", "id2"}
+        assert elapsed < 0.35
+
+    def test_slow_leg_is_dropped_after_timeout(self):
+        """A leg missing the deadline is fused without and counted."""
+        import threading
+
+        release = threading.Event()
+
+        def slow_to_list():
+            release.wait(5)
+            return [{
+                "id": "id2", "content": "c2", "tags": "", "note": "",
+                "_distance": 0.1
+            }]
+
+        mock_conn = Mock()
+        mock_conn.execute.return_value = [("id1", "content1", "", "")]
+        mock_table = Mock()
+        chain = mock_table.search.return_value.limit.return_value
+        chain.to_list.side_effect = slow_to_list
+        service = self._make_service(mock_conn, mock_table, leg_timeout=0.05)
+
+        try:
+            result = service.hybrid_search("test query")
+        finally:
+            release.set()
+
+        assert [r["id"] for r in result] == ["id1"]
+        assert result[0]["sources"] == ["fts"]
+        assert service.stats()["leg_timeouts"]["vector"] == 1
+
+    def test_results_name_contributing_legs(self):
+        """Each result should list the legs that ranked it."""
+        mock_conn = Mock()
+        mock_conn.execute.return_value = [("id1", "content1", "", "")]
+        mock_table = Mock()
+        chain = mock_table.search.return_value.limit.return_value
+        chain.to_list.return_value = [
+            {"id": "id1", "content": "content1", "tags": "", "note": "",
+             "_distance": 0.1},
+            {"id": "id2", "content": "c2", "tags": "", "note": "",
+             "_distance": 0.1},
+        ]
+        service = self._make_service(mock_conn, mock_table)
+
+        results = service.hybrid_search("test query")
+        result = {r["id"]: r["sources"] for r in results}
+
+        assert result == {"id1": ["fts", "vector"], "id2": ["vector"]}
+
+
+class TestSearchServiceSQLiteStore:
+    """Tests for FTS search against a real SQLiteStore."""
+
+    def test_fts_leg_reads_metadata_table(self, tmp_path):
+        """FTS hits should be resolved through the metadata table."""
+        from search_engine import SearchService
+        from storage import SQLiteStore, insert_memories
+
+        store = SQLiteStore(str(tmp_path / "memory.db"))
+        try:
+            store.write(lambda c: insert_memories(c, [
+                ("id1", "lancedb stores vectors", "db vector", "n1"),
+                ("id2", "sqlite stores text", "db", "")
+            ]))
+            service = SearchService(
+                session=Mock(),
+                tokenizer=Mock(),
+                vector_table=None,
+                sqlite_conn=None,
+                sqlite_store=store
+            )
+
+            result = service.hybrid_search("lancedb")
+        finally:
+            store.close()
+
+        assert [r["id"] for r in result] == ["id1"]
+        assert result[0]["tags"] == ["db", "vector"]
+        assert result[0]["note"] == "n1"
+
+
+class TestSearchServiceAnnParameters:
+    """Tests for nprobes / refine_factor in hybrid_search."""
+
+    def test_parameters_reach_the_vector_query(self):
+        """nprobes and refine_factor should be applied to the LanceDB query."""
+        from search_engine import SearchService
+
+        mock_session = Mock()
+        mock_session.run.return_value = [
+            np.random.randn(1, 3, 1024).astype(np.float32)
+        ]
+        mock_tokenizer = Mock()
+        mock_tokenizer.return_value = {
+            "input_ids": np.array([[1, 2, 3]]),
+            "attention_mask": np.array([[1, 1, 1]])
+        }
+        mock_conn = Mock()
+        mock_conn.execute.return_value = []
+        mock_table = Mock()
+        query = mock_table.search.return_value.limit.return_value
+        refined = query.nprobes.return_value.refine_factor.return_value
+        refined.to_list.return_value = [
+            {"id": "doc1", "content": "c", "tags": "", "note": "",
+             "_distance": 0.1}
+        ]
+        service = SearchService(
+            session=mock_session,
+            tokenizer=mock_tokenizer,
+            vector_table=mock_table,
+            sqlite_conn=mock_conn
+        )
+
+        result = service.hybrid_search("q", nprobes=32, refine_factor=5)
+
+        query.nprobes.assert_called_once_with(32)
+        query.nprobes.return_value.refine_factor.assert_called_once_with(5)
+        assert [r["id"] for r in result] == ["doc1"]
+
+
+class TestSearchServiceVectorBackend:
+    """Tests for pluggable vector backends."""
+
+    def test_numpy_hits_are_hydrated_from_sqlite(self, tmp_path):
+        """Id-only hits get content from SQLite; stale ids are dropped."""
+        from search_engine import SearchService
+        from storage import SQLiteStore, insert_memories
+        from vector_backends import NumpyBackend
+
+        vector = np.zeros(1024, dtype=np.float32)
+        vector[0] = 1.0
+        backend = NumpyBackend(str(tmp_path / "vectors"))
+        backend.add(
+            [{"id": "id1", "vector": vector}, {"id": "gone", "vector": vector}]
+        )
+
+        store = SQLiteStore(str(tmp_path / "memory.db"))
+        try:
+            row = ("id1", "stored text", "a b", "n")
+            store.write(lambda c: insert_memories(c, [row]))
+            service = SearchService(
+                session=Mock(),
+                tokenizer=Mock(),
+                vector_table=None,
+                sqlite_conn=None,
+                sqlite_store=store,
+                vector_backend=backend
+            )
+            service.embed_query = Mock(return_value=vector)
+
+            result = service._search_vector("anything", 10, 0.7)
+        finally:
+            store.close()
+
+        assert list(result) == ["id1"]
+        assert result["id1"] == {
+            "id": "id1", "content": "stored text", "tags": ["a", "b"],
+            "note": "n"
+        }
+
+
+class TestSearchServiceFilters:
+    """Tests for tag/time filter pushdown in hybrid_search."""
+
+    def test_filter_reaches_both_legs(self, tmp_path):
+        """FTS and vector legs only return memories matching the filter."""
+        from filters import SearchFilter
+        from search_engine import SearchService
+        from storage import SQLiteStore, insert_memories
+        from vector_backends import NumpyBackend
+
+        vector = np.zeros(1024, dtype=np.float32)
+        vector[0] = 1.0
+        backend = NumpyBackend(str(tmp_path / "vectors"))
+        # "old" has no metadata in the backend, so only the SQLite re-check
+        # drops it.
+        backend.add([
+            {"id": "new", "vector": vector, "tags": "db", "created_at": 200.0},
+            {"id": "old", "vector": vector}
+        ])
+
+        store = SQLiteStore(str(tmp_path / "memory.db"))
+        try:
+            for memory_id, created_at in (("old", 100.0), ("new", 200.0)):
+                row = (memory_id, "lancedb note", "db", "")
+                store.write(lambda c: insert_memories(c, [row], created_at))
+            service = SearchService(
+                session=Mock(),
+                tokenizer=Mock(),
+                vector_table=None,
+                sqlite_conn=None,
+                sqlite_store=store,
+                vector_backend=backend
+            )
+            service.embed_query = Mock(return_value=vector)
+
+            result = service.hybrid_search(
+                "lancedb",
+                search_filter=SearchFilter(tags=("db",), created_after=150.0)
+            )
+            unfiltered = service.hybrid_search("lancedb")
+        finally:
+            store.close()
+
+        assert [r["id"] for r in result] == ["new"]
+        assert result[0]["sources"] == ["fts", "vector"]
+        assert {r["id"] for r in unfiltered} == {"old", "new"}
+
+
+class TestSearchServiceChannels:
+    """Tests for channel-scoped and fan-out search."""
+
+    def test_scoped_and_fan_out_search(self, tmp_path):
+        """A channel sees only its memories; "*" merges every channel."""
+        from channels import ChannelRegistry
+        from search_engine import SearchService
+        from storage import SQLiteStore, insert_memories
+        from vector_backends import NumpyBackend
+
+        vector = np.zeros(1024, dtype=np.float32)
+        vector[0] = 1.0
+        backends = {}
+
+        def open_backend(channel, create):
+            if channel not in backends and create:
+                backends[channel] = NumpyBackend(str(tmp_path / channel))
+            return backends.get(channel)
+
+        registry = ChannelRegistry(open_backend)
+        store = SQLiteStore(str(tmp_path / "memory.db"))
+        try:
+            for memory_id, channel in (("m1", "main"), ("d1", "dev")):
+                store.write(lambda c: insert_memories(
+                    c, [(memory_id, "lancedb note", "", "")], 1.0, channel
+                ))
+                registry.get(channel, create=True).add([{
+                    "id": memory_id, "vector": vector, "content": "lancedb note"
+                }])
+            service = SearchService(
+                session=Mock(),
+                tokenizer=Mock(),
+                vector_table=None,
+                sqlite_conn=None,
+                sqlite_store=store,
+                channels=registry
+            )
+            service.embed_query = Mock(return_value=vector)
+
+            scoped = service.hybrid_search("lancedb", channel="dev")
+            missing = service.hybrid_search("lancedb", channel="nope")
+            merged = service.hybrid_search("lancedb", channel="*")
+        finally:
+            store.close()
+
+        assert [(r["id"], r["channel"]) for r in scoped] == [("d1", "dev")]
+        assert scoped[0]["sources"] == ["fts", "vector"]
+        assert missing == []
+        merged_ids = {(r["id"], r["channel"]) for r in merged}
+        assert merged_ids == {("m1", "main"), ("d1", "dev")}
+        assert "nope" not in registry.open_channels()
+
+
+class TestSearchServiceChunks:
+    """Tests for chunked embedding and max-sim collapsing."""
+
+    def test_embed_chunks_batches_every_chunk(self):
+        """All chunks are embedded in one call, then split back per text."""
+        from search_engine import SearchService
+
+        chunker = Mock()
+        chunker.split.side_effect = lambda text: text.split("|")
+        service = SearchService(
+            session=Mock(), tokenizer=Mock(), vector_table=None,
+            sqlite_conn=None, chunker=chunker
+        )
+        service.embed_documents = Mock(
+            side_effect=lambda texts: np.arange(
+                len(texts), dtype=np.float32
+            )[:, None]
+        )
+
+        embedded = service.embed_chunks(["a|b|c", "d"])
+
+        service.embed_documents.assert_called_once_with(["a", "b", "c", "d"])
+        assert [chunks for chunks, _ in embedded] == [["a", "b", "c"], ["d"]]
+        assert embedded[0][1].ravel().tolist() == [0, 1, 2]
+        assert embedded[1][1].ravel().tolist() == [3]
+
+    def test_chunk_hits_collapse_to_their_memory(self, tmp_path):
+        """A long memory is found through any chunk, once, at its best score."""
+        from chunking import chunk_id
+        from search_engine import SearchService
+        from storage import SQLiteStore, insert_memories
+        from vector_backends import NumpyBackend
+
+        query = np.zeros(1024, dtype=np.float32)
+        query[0] = 1.0
+        near, far = query.copy(), np.zeros(1024, dtype=np.float32)
+        far[0], far[1] = 0.8, 0.6
+        backend = NumpyBackend(str(tmp_path / "vectors"))
+        backend.add([
+            {"id": chunk_id("long", 0), "vector": far},
+            {"id": chunk_id("long", 1), "vector": near},
+            {"id": "short", "vector": far}
+        ])
+
+        store = SQLiteStore(str(tmp_path / "memory.db"))
+        try:
+            store.write(lambda c: insert_memories(c, [
+                ("long", "a long document", "", ""), ("short", "a note", "", "")
+            ]))
+            service = SearchService(
+                session=Mock(), tokenizer=Mock(), vector_table=None,
+                sqlite_conn=None, sqlite_store=store, vector_backend=backend
+            )
+            service.embed_query = Mock(return_value=query)
+
+            results = service._search_vector("document", 10, threshold=0.0)
+        finally:
+            store.close()
+
+        assert list(results) == ["long", "short"]
+        assert results["long"]["content"] == "a long document"
+
+        backend.delete(["long"])
+        assert [hit["id"] for hit in backend.search(query, 10)] == ["short"]
+
+
+class TestSearchServiceSwapModel:
+    """Tests for swap_model."""
+
+    def test_swap_replaces_model_and_backend(self):
+        """After a swap, searches use the new backend; the cache is dropped."""
+        from caching import LRUCache
+        from search_engine import SearchService
+
+        old_backend, new_backend = Mock(), Mock()
+        old_backend.search.return_value = [{"id": "old", "_distance": 0.0}]
+        new_backend.search.return_value = [{"id": "new", "_distance": 0.0}]
+        for backend, memory_id in ((old_backend, "old"), (new_backend, "new")):
+            backend.search.return_value[0].update(
+                content=memory_id, tags="", note=""
+            )
+        service = SearchService(
+            session=Mock(), tokenizer=Mock(), vector_table=None,
+            sqlite_conn=None, vector_backend=old_backend, model_fingerprint="a",
+            result_cache=LRUCache(max_size=8)
+        )
+        service.embed_query = Mock(return_value=np.ones(1024, dtype=np.float32))
+        before = service.hybrid_search("q")
+
+        service.swap_model(Mock(), Mock(), "b", vector_backend=new_backend)
+        after = service.hybrid_search("q")
+
+        assert [r["id"] for r in before] == ["old"]
+        assert [r["id"] for r in after] == ["new"]
+        assert service.model_fingerprint == "b"
+
+    def test_search_racing_a_swap_returns_nothing(self):
+        """Hits of the old model are dropped if a swap lands mid-search."""
+        from search_engine import SearchService
+
+        backend = Mock()
+        service = SearchService(
+            session=Mock(), tokenizer=Mock(), vector_table=None,
+            sqlite_conn=None, vector_backend=backend
+        )
+        service.embed_query = Mock(return_value=np.ones(1024, dtype=np.float32))
+
+        def search_then_swap(*args, **kwargs):
+            service.swap_model(Mock(), Mock(), "b", vector_backend=backend)
+            return [{
+                "id": "x", "_distance": 0.0, "content": "x", "tags": "",
+                "note": ""
+            }]
+
+        backend.search.side_effect = search_then_swap
+
+        assert service._search_vector("q", 5, threshold=0.0) == {}
+
+
+class TestSearchServiceModelLoading:
+    """Tests for searching before a model is loaded."""
+
+    def test_fts_only_until_model_is_loaded(self):
+        """Without a session only FTS runs and the result is not cached."""
+        from caching import LRUCache
+        from search_engine import SearchService
+
+        backend = Mock()
+        backend.search.return_value = [{
+            "id": "v", "_distance": 0.0, "content": "v", "tags": "", "note": ""
+        }]
+        cache = LRUCache(max_size=8)
+        service = SearchService(
+            session=None, tokenizer=None, vector_table=None, sqlite_conn=None,
+            vector_backend=backend, result_cache=cache
+        )
+        service._search_fts = Mock(return_value={
+            "f": {"id": "f", "content": "f", "tags": [], "note": ""}
+        })
+        service.embed_query = Mock(return_value=np.ones(1024, dtype=np.float32))
+
+        assert not service.model_ready
+        assert [r["id"] for r in service.hybrid_search("q")] == ["f"]
+        backend.search.assert_not_called()
+        assert len(cache) == 0
+
+        service.swap_model(Mock(), Mock(), "m", vector_backend=backend)
+        results = service.hybrid_search("q")
+
+        assert service.model_ready
+        assert {r["id"] for r in results} == {"f", "v"}
+
+
+class TestSearchServiceEmbedder:
+    """Tests for delegating embedding to an out-of-process embedder."""
+
+    def test_embedder_replaces_session(self):
+        """embed and embed_batch go to the embedder; the session is unused."""
+        from search_engine import SearchService
+
+        embedder = Mock()
+        embedder.embed_batch.side_effect = (
+            lambda texts, batch_size=None:
+            np.ones((len(texts), 1024), dtype=np.float32)
+        )
+        embedder.stats.return_value = {"workers": 2}
+        service = SearchService(
+            session=None, tokenizer=None, vector_table=None, sqlite_conn=None,
+            embedder=embedder
+        )
+
+        assert service.model_ready
+        assert service.embed_batch(["a", "b"]).shape == (2, 1024)
+        assert service.embed("c").shape == (1024,)
+        assert embedder.embed_batch.call_count == 2
+        assert service.stats()["embedder"] == {"workers": 2}
+
+    def test_embedder_failure_is_raised(self):
+        """Embedder errors propagate so no zero vectors get stored."""
+        from search_engine import SearchService
+
+        embedder = Mock()
+        embedder.embed_batch.side_effect = RuntimeError("workers gone")
+        service = SearchService(
+            session=None, tokenizer=None, vector_table=None, sqlite_conn=None,
+            embedder=embedder
+        )
+
+        with pytest.raises(RuntimeError, match="workers gone"):
+            service.embed_batch(["a"])
+        with pytest.raises(RuntimeError, match="workers gone"):
+            service.embed_documents(["a", "b"])
+
+
+class TestSearchServiceMetrics:
+    """Tests for per-stage instrumentation."""
+
+    def test_stages_and_leg_counters(self):
+        """A search records its stages, empty legs and dropped hits."""
+        from metrics import Metrics
+        from search_engine import SearchService
+
+        backend = Mock()
+        backend.search.return_value = [
+            {"id": "near", "_distance": 0.0, "content": "n", "tags": "",
+             "note": ""},
+            {"id": "far", "_distance": 1.9, "content": "f", "tags": "",
+             "note": ""}
+        ]
+        conn = Mock()
+        conn.execute.return_value = []
+        metrics = Metrics(slow_query_ms=None)
+        service = SearchService(
+            session=Mock(), tokenizer=Mock(), vector_table=None,
+            sqlite_conn=conn, vector_backend=backend, metrics=metrics
+        )
+        service.embed_query = Mock(return_value=np.ones(1024, dtype=np.float32))
+
+        results = service.hybrid_search("q", threshold=0.5)
+
+        assert [r["id"] for r in results] == ["near"]
+        stages = metrics.snapshot()["stages"]
+        stage_names = (
+            "search", "fts", "embed_query", "vector_scan", "rrf_fusion"
+        )
+        for stage in stage_names:
+            assert stages[stage]["count"] == 1
+        assert metrics.counter("empty_legs", leg="fts") == 1
+        assert metrics.counter("threshold_dropped") == 1
+        assert "metrics" in service.stats()
+
+    def test_leg_traces_are_merged_into_the_slow_query_log(self):
+        """Both legs' stages reach the trace; a timed-out leg adds none."""
+        import threading
+        from metrics import Metrics
+        from search_engine import SearchService
+
+        release = threading.Event()
+        backend = Mock()
+        backend.search.side_effect = (
+            lambda *args, **kwargs: release.wait(5) and []
+        )
+        conn = Mock()
+        conn.execute.return_value = []
+        metrics = Metrics(slow_query_ms=0)
+        service = SearchService(
+            session=Mock(), tokenizer=Mock(), vector_table=None,
+            sqlite_conn=conn, vector_backend=backend, metrics=metrics,
+            leg_timeout=0.05
+        )
+        service.embed_query = Mock(return_value=np.ones(1024, dtype=np.float32))
+
+        try:
+            service.hybrid_search("slow")
+        finally:
+            release.set()
+        service.hybrid_search("fast")
+
+        slow, fast = metrics.snapshot()["slow_queries"]
+        assert "fts" in slow["stages_ms"]
+        assert "vector_scan" not in slow["stages_ms"]
+        assert {"fts", "embed_query", "vector_scan"} <= set(fast["stages_ms"])
+        assert service.stats()["leg_timeouts"] == {"fts": 0, "vector": 1}
+
+    def test_leg_failures_are_counted_and_logged(self, caplog):
+        import logging
+        from metrics import Metrics
+        from search_engine import SearchService
+
+        backend = Mock()
+        backend.search.side_effect = RuntimeError("index gone")
+        conn = Mock()
+        conn.execute.side_effect = RuntimeError("fts syntax")
+        metrics = Metrics(slow_query_ms=None)
+        service = SearchService(
+            session=Mock(), tokenizer=Mock(), vector_table=None,
+            sqlite_conn=conn, vector_backend=backend, metrics=metrics
+        )
+        service.embed_query = Mock(return_value=np.ones(1024, dtype=np.float32))
+
+        with caplog.at_level(logging.WARNING):
+            assert service.hybrid_search("q") == []
+
+        assert metrics.counter("leg_failures", leg="fts") == 1
+        assert metrics.counter("leg_failures", leg="vector") == 1
+        assert "FTS search error" in caplog.text
+        assert "Vector search error" in caplog.text
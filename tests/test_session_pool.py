@@ -0,0 +1,205 @@
+"""Unit tests for the inference session pool."""
+import ctypes
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from session_pool import SessionPool, affinity_config, plan_cores
+
+DIM = 3
+
+
+def model(inputs):
+    """Fake model: (batch, seq) ids -> (batch, seq, DIM) hidden states."""
+    ids = inputs["input_ids"].astype(np.float32)
+    return np.repeat(ids[:, :, None], DIM, axis=2)
+
+
+class FakeBinding:
+    def __init__(self):
+        self.inputs = {}
+        self.outputs = {}
+
+    def bind_cpu_input(self, name, array):
+        self.inputs[name] = array
+
+    def bind_output(self, name, device_type, device_id, element_type, shape,
+                    buffer_ptr):
+        self.outputs[name] = (shape, buffer_ptr)
+
+    def clear_binding_inputs(self):
+        self.inputs = {}
+
+    def clear_binding_outputs(self):
+        self.outputs = {}
+
+
+class FakeSession:
+    """Implements run, get_outputs and I/O binding like an InferenceSession."""
+
+    def __init__(self, delay=0.0, binding=True):
+        self.delay = delay
+        self.plain_runs = 0
+        self.bound_runs = 0
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+        self.binding = binding
+
+    def get_inputs(self):
+        return [SimpleNamespace(name="input_ids"),
+                SimpleNamespace(name="attention_mask")]
+
+    def get_outputs(self):
+        shape = ["batch", "sequence", DIM]
+        return [SimpleNamespace(name="last_hidden_state", shape=shape)]
+
+    def io_binding(self):
+        if not self.binding:
+            raise RuntimeError("no binding")
+        return FakeBinding()
+
+    def _enter(self):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+
+    def run(self, output_names, inputs):
+        self._enter()
+        self.plain_runs += 1
+        return [model(inputs)]
+
+    def run_with_iobinding(self, binding):
+        self._enter()
+        self.bound_runs += 1
+        assert all(value.dtype == np.int64 for value in binding.inputs.values())
+        result = model(binding.inputs)
+        shape, pointer = binding.outputs["last_hidden_state"]
+        size = int(np.prod(shape))
+        array = (ctypes.c_float * size).from_address(pointer)
+        target = np.ctypeslib.as_array(array)
+        target[:] = result.ravel()
+
+
+def inputs(batch, seq, offset=0):
+    ids = np.arange(batch * seq, dtype=np.int32).reshape(batch, seq) + offset
+    mask = np.ones((batch, seq), dtype=np.int32)
+    return {"input_ids": ids, "attention_mask": mask}
+
+
+class TestSessionPool:
+    """Tests for SessionPool."""
+
+    def test_bound_runs_match_plain_runs(self):
+        """The first run learns output shapes; later runs use the binding."""
+        session = FakeSession()
+        pool = SessionPool([session])
+
+        shapes = ((2, 3, 0), (1, 5, 7), (4, 2, 100), (2, 3, 1))
+        for batch, seq, offset in shapes:
+            feed = inputs(batch, seq, offset)
+            (out,) = pool.run(None, feed)
+            np.testing.assert_array_equal(out, model(feed))
+
+        assert session.plain_runs == 1
+        assert session.bound_runs == 3
+
+    def test_results_survive_buffer_reuse(self):
+        """A returned array is not overwritten by the next run."""
+        pool = SessionPool([FakeSession()])
+        first = pool.run(None, inputs(2, 3, 0))[0]
+        pool.run(None, inputs(2, 3, 50))
+
+        np.testing.assert_array_equal(first, model(inputs(2, 3, 0)))
+
+    def test_square_inputs_fall_back_until_axes_known(self):
+        """batch == seq is ambiguous, so those runs stay plain."""
+        session = FakeSession()
+        pool = SessionPool([session])
+
+        pool.run(None, inputs(2, 2))
+        pool.run(None, inputs(2, 3))
+        pool.run(None, inputs(3, 3))
+
+        assert session.plain_runs == 2
+        assert session.bound_runs == 1
+
+    def test_fixed_axis_equal_to_sequence_length(self):
+        """A declared fixed axis is not mistaken for the sequence axis."""
+        session = FakeSession()
+        pool = SessionPool([session])
+
+        pool.run(None, inputs(2, DIM))
+        feed = inputs(1, 5)
+        (out,) = pool.run(None, feed)
+
+        np.testing.assert_array_equal(out, model(feed))
+        assert session.bound_runs == 1
+
+    def test_without_binding_support(self):
+        """Sessions without I/O binding use run()."""
+        session = FakeSession(binding=False)
+        pool = SessionPool([session])
+
+        pool.run(None, inputs(2, 3))
+        pool.run(None, inputs(2, 3))
+
+        assert session.plain_runs == 2
+        assert not pool.stats()["io_binding"]
+
+    def test_concurrent_requests_use_every_session(self):
+        """Concurrent runs spread over the pool, one at a time per session."""
+        sessions = [FakeSession(delay=0.05) for _ in range(3)]
+        pool = SessionPool(sessions, io_binding=False)
+
+        threads = [
+            threading.Thread(target=pool.run, args=(None, inputs(2, 3)))
+            for _ in range(6)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = pool.stats()
+        assert stats["runs"] == [2, 2, 2]
+        assert all(session.max_active == 1 for session in sessions)
+        assert stats["idle"] == 3
+
+    def test_sequential_requests_rotate(self):
+        """Idle sessions are handed out round-robin."""
+        pool = SessionPool([FakeSession(), FakeSession()], io_binding=False)
+        for _ in range(4):
+            pool.run(None, inputs(1, 2))
+
+        assert pool.stats()["runs"] == [2, 2]
+
+    def test_empty_pool_is_rejected(self):
+        with pytest.raises(ValueError):
+            SessionPool([])
+
+
+class TestCorePlanning:
+    """Tests for plan_cores and affinity_config."""
+
+    def test_even_split(self):
+        assert plan_cores(2, cores=range(8)) == [[0, 1, 2, 3], [4, 5, 6, 7]]
+
+    def test_explicit_threads(self):
+        plan = plan_cores(2, intra_op_threads=3, cores=range(8))
+        assert plan == [[0, 1, 2], [3, 4, 5]]
+
+    def test_oversubscription_disables_pinning(self):
+        plan = plan_cores(4, intra_op_threads=4, cores=range(8))
+        assert plan == [[], [], [], []]
+
+    def test_affinity_skips_calling_thread(self):
+        """The first core is the caller's; the rest are listed 1-based."""
+        assert affinity_config([4, 5, 6]) == "6;7"
+        assert affinity_config([0]) == ""
@@ -0,0 +1,291 @@
+"""Unit tests for SQLiteStore."""
+import sqlite3
+import threading
+
+import pytest
+
+from storage import (
+    SQLiteStore, SCHEMA_VERSION, insert_memories, delete_memories,
+    fetch_memories, list_channels, insert_memory_records, existing_ids
+)
+
+
+def insert(memory_id, content="content", tags="", created_at=None):
+    """Return a write inserting one memory row."""
+    rows = [(memory_id, content, tags, "")]
+    return lambda c: insert_memories(c, rows, created_at)
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = SQLiteStore(str(tmp_path / "memory.db"))
+    yield s
+    s.close()
+
+
+class TestSQLiteStore:
+    """Tests for SQLiteStore."""
+
+    def test_database_uses_wal(self, store):
+        """The database should be switched to WAL journaling."""
+        mode = store.reader().execute("PRAGMA journal_mode").fetchone()[0]
+        assert mode == "wal"
+
+    def test_write_is_visible_to_readers(self, store):
+        """Committed writes should be visible to reader connections."""
+        store.write(insert("id1"))
+
+        rows = store.reader().execute("SELECT id FROM memories").fetchall()
+        assert rows == [("id1",)]
+
+    def test_reader_is_read_only(self, store):
+        """Reader connections must reject writes."""
+        with pytest.raises(sqlite3.OperationalError):
+            store.reader().execute("DELETE FROM memories")
+
+    def test_each_thread_gets_its_own_reader(self, store):
+        """Reader connections are per thread and reused within a thread."""
+        main_reader = store.reader()
+        other = []
+        thread = threading.Thread(target=lambda: other.append(store.reader()))
+        thread.start()
+        thread.join()
+
+        assert store.reader() is main_reader
+        assert other[0] is not main_reader
+        assert store.stats()["reader_connections"] == 2
+
+    def test_failed_write_does_not_affect_others(self, store):
+        """A failing write is rolled back alone; its batch-mates commit."""
+        def broken(c):
+            insert_memories(c, [("bad", "", "", "")])
+            raise ValueError("boom")
+
+        futures = [
+            store.submit(insert("id1")), store.submit(broken),
+            store.submit(insert("id2"))
+        ]
+
+        futures[0].result(timeout=5)
+        futures[2].result(timeout=5)
+        with pytest.raises(ValueError):
+            futures[1].result(timeout=5)
+        ids = {r[0] for r in store.reader().execute("SELECT id FROM memories")}
+        assert ids == {"id1", "id2"}
+
+    def test_concurrent_writes_are_grouped(self, store):
+        """Queued writes should share commits."""
+        futures = [store.submit(insert(f"id{i}")) for i in range(50)]
+        for future in futures:
+            future.result(timeout=5)
+
+        stats = store.stats()
+        assert stats["writes"] == 50
+        assert stats["commits"] <= 50
+        reader = store.reader()
+        count = reader.execute("SELECT count(*) FROM memories").fetchone()[0]
+        assert count == 50
+
+    def test_write_after_close_raises(self, tmp_path):
+        """A closed store should refuse writes."""
+        s = SQLiteStore(str(tmp_path / "memory.db"))
+        s.close()
+
+        with pytest.raises(RuntimeError):
+            s.submit(insert("id1"))
+
+    def test_submit_racing_close_is_run_or_refused(self, tmp_path):
+        """Every write submitted around close() should run or be refused."""
+        s = SQLiteStore(str(tmp_path / "memory.db"))
+        futures, refused = [], []
+        start = threading.Barrier(5)
+
+        def submitter(worker):
+            start.wait()
+            for i in range(100):
+                try:
+                    futures.append(s.submit(insert(f"id{worker}-{i}")))
+                except RuntimeError:
+                    refused.append(True)
+
+        threads = [
+            threading.Thread(target=submitter, args=(w,)) for w in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        start.wait()
+        s.close()
+        for thread in threads:
+            thread.join()
+
+        assert len(futures) + len(refused) == 400
+        for future in futures:
+            future.result(timeout=1)
+
+
+class TestSchema:
+    """Tests for the metadata table, FTS index and migration."""
+
+    def test_fts_index_follows_inserts_and_deletes(self, store):
+        """Triggers should keep the external-content FTS index in sync."""
+        store.write(insert("id1", "lancedb vector search"))
+        store.write(insert("id2", "sqlite full text"))
+        match = (
+            "SELECT m.id FROM memories_fts "
+            "JOIN memories m ON m.seq = memories_fts.rowid "
+            "WHERE memories_fts MATCH ?"
+        )
+
+        hits = store.reader().execute(match, ("vector",)).fetchall()
+        assert hits == [("id1",)]
+
+        store.write(lambda c: delete_memories(c, ["id1"]))
+        assert store.reader().execute(match, ("vector",)).fetchall() == []
+
+    def test_id_lookups_use_the_unique_index(self, store):
+        """Deleting and fetching by id must not scan the table."""
+        plan = store.reader().execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM memories WHERE id = ?", ("x",)
+        ).fetchall()
+
+        assert any("USING INDEX" in row[-1] for row in plan)
+
+    def test_listing_by_time_uses_the_index(self, store):
+        """Time-ordered listing should walk the created_at index."""
+        plan = store.reader().execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM memories "
+            "ORDER BY created_at DESC, seq DESC LIMIT 10"
+        ).fetchall()
+
+        assert any("idx_memories_created_at" in row[-1] for row in plan)
+
+    def test_fetch_memories_by_id(self, store):
+        """fetch_memories should return only the requested rows."""
+        store.write(insert("id1", "one", "a b", created_at=10.0))
+        store.write(insert("id2", "two"))
+
+        found = fetch_memories(store.reader(), ["id1", "missing"])
+
+        assert list(found) == ["id1"]
+        assert found["id1"]["tags"] == ["a", "b"]
+        assert found["id1"]["created_at"] == 10.0
+
+    def test_legacy_fts_database_is_migrated(self, tmp_path):
+        """A legacy FTS-only memories table is copied over once."""
+        path = str(tmp_path / "legacy.db")
+        legacy = sqlite3.connect(path)
+        legacy.execute(
+            "CREATE VIRTUAL TABLE memories "
+            "USING fts5(id, content, tags, note, tokenize='unicode61')"
+        )
+        legacy.executemany(
+            "INSERT INTO memories(id, content, tags, note) VALUES (?, ?, ?, ?)",
+            [("old1", "first memory", "t1", "n1"),
+             ("old2", "second memory", "", "")]
+        )
+        legacy.commit()
+        legacy.close()
+
+        s = SQLiteStore(path)
+        try:
+            reader = s.reader()
+            rows = reader.execute(
+                "SELECT id, tags, note FROM memories ORDER BY seq"
+            ).fetchall()
+            version = reader.execute("PRAGMA user_version").fetchone()[0]
+            hits = reader.execute(
+                "SELECT rowid FROM memories_fts "
+                "WHERE memories_fts MATCH 'second'"
+            ).fetchall()
+        finally:
+            s.close()
+
+        assert rows == [("old1", "t1", "n1"), ("old2", "", "")]
+        assert version == SCHEMA_VERSION
+        assert len(hits) == 1
+
+    def test_version_1_database_gains_channels(self, tmp_path):
+        """Version 1 rows land in the default channel, still searchable."""
+        path = str(tmp_path / "v1.db")
+        v1 = sqlite3.connect(path)
+        v1.executescript("""
+            CREATE TABLE memories (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT NOT NULL UNIQUE,
+                content TEXT NOT NULL, tags TEXT NOT NULL DEFAULT '',
+                note TEXT NOT NULL DEFAULT '', created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE VIRTUAL TABLE memories_fts USING fts5(
+                content, tags, note, content='memories', content_rowid='seq'
+            );
+            CREATE TRIGGER memories_ai AFTER INSERT ON memories BEGIN
+                INSERT INTO memories_fts(rowid, content, tags, note)
+                VALUES (new.seq, new.content, new.tags, new.note);
+            END;
+            INSERT INTO memories(id, content, created_at, updated_at)
+            VALUES ('v1', 'kept memory', 1, 1);
+            PRAGMA user_version = 1;
+        """)
+        v1.close()
+
+        s = SQLiteStore(path)
+        try:
+            row = ("v2", "kept too", "", "")
+            s.write(lambda c: insert_memories(c, [row], 2.0, "main"))
+            reader = s.reader()
+            channels = dict(reader.execute("SELECT id, channel FROM memories"))
+            hits = reader.execute(
+                "SELECT rowid FROM memories_fts WHERE memories_fts MATCH 'kept'"
+            ).fetchall()
+            version = reader.execute("PRAGMA user_version").fetchone()[0]
+        finally:
+            s.close()
+
+        assert channels == {"v1": "default", "v2": "main"}
+        assert len(hits) == 2
+        assert version == SCHEMA_VERSION
+
+
+    def test_imported_records_keep_their_metadata(self, store):
+        """Imported rows should keep their own timestamp and channel."""
+        row = ("i1", "x", "t", "n", 5.0, "dev")
+        store.write(lambda c: insert_memory_records(c, [row]))
+
+        row = store.reader().execute(
+            "SELECT created_at, channel FROM memories WHERE id = 'i1'"
+        ).fetchone()
+
+        assert row == (5.0, "dev")
+        assert existing_ids(store.reader(), ["i1", "i2"]) == {"i1"}
+
+
+class TestChannels:
+    """Tests for the channel partition key."""
+
+    def test_list_channels(self, store):
+        """Every channel holding a memory should be listed once."""
+        for row, channel in (
+            (("a", "x", "", ""), "main"), (("b", "y", "", ""), "dev"),
+            (("c", "z", "", ""), "main")
+        ):
+            store.write(
+                lambda c: insert_memories(c, [row], channel=channel)
+            )
+
+        assert list_channels(store.reader()) == ["dev", "main"]
+
+    def test_fts_can_be_scoped_to_a_channel(self, store):
+        """A channel column filter should only match that channel's rows."""
+        for memory_id, channel in (("a", "main"), ("b", "dev")):
+            row = (memory_id, "shared", "", "")
+            store.write(
+                lambda c: insert_memories(c, [row], channel=channel)
+            )
+
+        rows = store.reader().execute(
+            "SELECT m.id FROM memories_fts f "
+            "JOIN memories m ON m.seq = f.rowid "
+            "WHERE memories_fts MATCH 'shared AND channel : \"dev\"'"
+        ).fetchall()
+
+        assert rows == [("b",)]
@@ -0,0 +1,251 @@
+"""Unit tests for streaming memory-bank export and import."""
+import contextlib
+import os
+from unittest.mock import Mock
+
+import numpy as np
+import pytest
+
+import transfer
+from embedding_store import EmbeddingStore
+from vector_backends import NumpyBackend
+from storage import SQLiteStore, existing_ids, insert_memories
+
+DIM = 8
+
+
+def vector(seed):
+    v = np.random.default_rng(seed).standard_normal(DIM).astype(np.float32)
+    return v / np.linalg.norm(v)
+
+
+@pytest.fixture
+def bank(tmp_path):
+    """A store with three memories in two channels and their cached vectors."""
+    store = SQLiteStore(str(tmp_path / "memory.db"))
+    for row, created_at, channel in (
+        (("a", "alpha", "x y", "n"), 1.0, "main"),
+        (("b", "beta", "", ""), 2.0, "dev"),
+        (("c", "gamma", "", ""), 3.0, "main")
+    ):
+        store.write(
+            lambda c: insert_memories(c, [row], created_at, channel)
+        )
+    embeddings = EmbeddingStore(str(tmp_path / "cache"), model_id="m1", dim=DIM)
+    embeddings.put_many(["alpha", "beta"], np.stack([vector(1), vector(2)]))
+    yield store, embeddings
+    store.close()
+
+
+class RecordingWriter:
+    """Collects what import_memories writes."""
+
+    def __init__(self):
+        self.records = []
+        self.vectors = {}
+
+    def __call__(self, records, embedded):
+        for record, (chunks, vectors) in zip(records, embedded):
+            self.records.append(record)
+            self.vectors[record["id"]] = vectors
+
+
+def export(bank, path, channel=None):
+    store, embeddings = bank
+    memories = transfer.iter_memories(
+        store.reader(), channel=channel, batch_size=2
+    )
+    records = transfer.with_vectors(memories, embeddings)
+    return transfer.export_memories(str(path), records, "m1", dim=DIM)
+
+
+class TestExport:
+    """Tests for export."""
+
+    def test_memories_stream_in_insertion_order(self, bank):
+        """iter_memories should page through every row once."""
+        store, _ = bank
+
+        memories = transfer.iter_memories(store.reader(), batch_size=2)
+        ids = [m["id"] for m in memories]
+
+        assert ids == ["a", "b", "c"]
+
+    def test_cached_vectors_are_exported(self, bank, tmp_path):
+        """Memories with cached vectors carry them; the rest do not."""
+        report = export(bank, tmp_path / "bank.jsonl")
+        header, records = transfer.read_export(str(tmp_path / "bank.jsonl"))
+        records = list(records)
+
+        assert report["exported"] == 3 and report["with_vectors"] == 2
+        assert header["model"] == "m1"
+        assert records[0]["tags"] == ["x", "y"]
+        assert records[0]["channel"] == "main"
+        decoded = transfer.decode_vector(records[0]["vectors"][0], DIM)
+        assert np.array_equal(decoded, vector(1))
+        assert "vectors" not in records[2]
+
+    def test_cache_misses_fall_back_to_the_backend(self, bank, tmp_path):
+        """Vectors missing from the cache should come from the backend."""
+        store, embeddings = bank
+        backend = NumpyBackend(str(tmp_path / "main"), dim=DIM)
+        backend.add([{"id": "c", "vector": vector(3)}])
+
+        def backend_for(channel):
+            leased = backend if channel == "main" else None
+            return contextlib.nullcontext(leased)
+
+        records = list(transfer.with_vectors(
+            transfer.iter_memories(store.reader()), embeddings,
+            backend_for=backend_for
+        ))
+
+        assert all(record.get("vectors") for record in records)
+        assert np.array_equal(
+            transfer.decode_vector(records[2]["vectors"][0], DIM), vector(3)
+        )
+
+    def test_channel_export(self, bank, tmp_path):
+        """Exporting one channel should skip the others."""
+        report = export(bank, tmp_path / "dev.jsonl", channel="dev")
+        assert report["exported"] == 1
+
+    def test_unknown_format_raises(self, tmp_path):
+        """Only jsonl and parquet are supported."""
+        with pytest.raises(ValueError):
+            transfer.detect_format(str(tmp_path / "bank.csv"))
+
+
+class TestImport:
+    """Tests for import."""
+
+    def _import(self, path, model, existing=lambda ids: set()):
+        header, records = transfer.read_export(str(path))
+        embed_chunks = Mock(side_effect=lambda texts: [
+            ([t], vector(99)[None, :]) for t in texts
+        ])
+        writer = RecordingWriter()
+        report = transfer.import_memories(
+            header, records, model, embed_chunks, writer, existing, batch_size=2
+        )
+        return report, writer, embed_chunks
+
+    def test_same_model_reuses_vectors(self, bank, tmp_path):
+        """Only memories exported without vectors should be re-embedded."""
+        export(bank, tmp_path / "bank.jsonl")
+
+        path = tmp_path / "bank.jsonl"
+        report, writer, embed_chunks = self._import(path, "m1")
+
+        assert [r["id"] for r in writer.records] == ["a", "b", "c"]
+        assert report["reused_vectors"] == 2 and report["embedded"] == 1
+        embed_chunks.assert_called_once_with(["gamma"])
+        assert np.array_equal(writer.vectors["a"][0], vector(1))
+        assert writer.records[0]["created_at"] == 1.0
+
+    def test_other_model_re_embeds_everything(self, bank, tmp_path):
+        """Vectors from another model must not be reused."""
+        export(bank, tmp_path / "bank.jsonl")
+
+        report, _, _ = self._import(tmp_path / "bank.jsonl", "m2")
+
+        assert report["embedded"] == 3 and report["reused_vectors"] == 0
+
+    def test_existing_ids_are_skipped(self, bank, tmp_path):
+        """Importing into the source bank should write nothing."""
+        store, _ = bank
+        export(bank, tmp_path / "bank.jsonl")
+
+        report, writer, _ = self._import(
+            tmp_path / "bank.jsonl", "m1",
+            lambda ids: existing_ids(store.reader(), ids)
+        )
+
+        assert report["skipped"] == 3 and writer.records == []
+
+    def test_missing_header_raises(self, tmp_path):
+        """A file without the header line is rejected."""
+        path = tmp_path / "other.jsonl"
+        path.write_text('{"id": "a"}\n')
+
+        with pytest.raises(ValueError):
+            transfer.read_export(str(path))
+
+    def test_invalid_records_are_reported(self, tmp_path):
+        """Bad ids and channels are skipped, not written."""
+        path = tmp_path / "bad.jsonl"
+        transfer.write_jsonl(str(path), transfer.make_header("m1", dim=DIM), [
+            {"id": "ok", "content": "fine"},
+            {"id": "a#1", "content": "would collapse into a"},
+            {"id": "", "content": "no id"},
+            {"content": "missing id"},
+            {"id": "c", "content": "bad channel", "channel": "../x"},
+            {"id": "d"}
+        ])
+
+        report, writer, _ = self._import(path, "m1")
+
+        assert [r["id"] for r in writer.records] == ["ok"]
+        assert report["invalid"] == 5
+        assert len(report["errors"]) == 5
+
+    def test_repeated_id_keeps_the_last_record(self, tmp_path):
+        """An id repeated in one batch is written once, as its last copy."""
+        path = tmp_path / "dup.jsonl"
+        transfer.write_jsonl(str(path), transfer.make_header("m1", dim=DIM), [
+            {"id": "a", "content": "first"},
+            {"id": "a", "content": "second"}
+        ])
+
+        report, writer, _ = self._import(path, "m1")
+
+        assert [r["content"] for r in writer.records] == ["second"]
+        assert report["imported"] == 1 and report["duplicates"] == 1
+
+    @pytest.mark.parametrize("created_at", ["2024-01-01", True, [1.0]])
+    def test_non_numeric_created_at_is_invalid(self, tmp_path, created_at):
+        """created_at must be a number of seconds."""
+        path = tmp_path / "time.jsonl"
+        transfer.write_jsonl(str(path), transfer.make_header("m1", dim=DIM), [
+            {"id": "a", "content": "x", "created_at": created_at},
+            {"id": "b", "content": "y", "created_at": 5}
+        ])
+
+        report, writer, _ = self._import(path, "m1")
+
+        assert [r["id"] for r in writer.records] == ["b"]
+        assert writer.records[0]["created_at"] == 5.0
+        assert report["invalid"] == 1 and "created_at" in report["errors"][0]
+
+    def test_parquet_round_trip(self, bank, tmp_path):
+        """Parquet exports should import like JSONL ones."""
+        pytest.importorskip("pyarrow")
+        export(bank, tmp_path / "bank.parquet")
+
+        report, writer, _ = self._import(tmp_path / "bank.parquet", "m1")
+
+        assert report["reused_vectors"] == 2
+        assert np.array_equal(writer.vectors["b"][0], vector(2))
+
+
+class TestConfinedPath:
+    """Tests for confining tool paths to the export directory."""
+
+    def test_relative_path_is_resolved_inside_root(self, tmp_path):
+        assert transfer.confined_path(str(tmp_path), "backups/bank.jsonl") == \
+            os.path.join(os.path.realpath(tmp_path), "backups", "bank.jsonl")
+
+    @pytest.mark.parametrize(
+        "path", ["", "/etc/passwd", "../memory.db", "a/../../x", ".."]
+    )
+    def test_escaping_paths_are_rejected(self, tmp_path, path):
+        with pytest.raises(ValueError):
+            transfer.confined_path(str(tmp_path), path)
+
+    def test_symlink_out_of_root_is_rejected(self, tmp_path):
+        root = tmp_path / "exports"
+        root.mkdir()
+        (root / "link").symlink_to(tmp_path)
+
+        with pytest.raises(ValueError):
+            transfer.confined_path(str(root), "link/memory.db")
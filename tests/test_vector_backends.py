@@ -0,0 +1,463 @@
+"""Unit tests for the vector backends."""
+import os
+
+import numpy as np
+import pytest
+from unittest.mock import Mock
+
+import generations
+from vector_backends import LanceDBBackend, NumpyBackend, VECTORS_FILE, LOG_FILE
+
+
+DIM = 8
+
+
+def unit(seed):
+    """Return a deterministic unit vector."""
+    vector = np.random.default_rng(seed).standard_normal(DIM).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def rows_for(ids, seeds=None):
+    """Return backend rows for ids, one unit vector each."""
+    seeds = seeds if seeds is not None else range(len(ids))
+    return [
+        {"id": memory_id, "vector": unit(seed)}
+        for memory_id, seed in zip(ids, seeds)
+    ]
+
+
+class TestNumpyBackend:
+    """Tests for NumpyBackend."""
+
+    @pytest.mark.parametrize("mmap", [True, False])
+    def test_search_matches_brute_force(self, tmp_path, mmap):
+        """Top-k should equal a full sort of dot products."""
+        backend = NumpyBackend(str(tmp_path), dim=DIM, mmap=mmap)
+        ids = [f"m{i}" for i in range(50)]
+        backend.add(rows_for(ids[:20]))
+        backend.add(rows_for(ids[20:], seeds=range(20, 50)))
+        query = unit(1000)
+
+        hits = backend.search(query, 5)
+
+        scores = np.stack([unit(i) for i in range(50)]) @ query
+        expected = [ids[i] for i in np.argsort(-scores)[:5]]
+        assert [hit["id"] for hit in hits] == expected
+        distance = 2 - 2 * scores.max()
+        assert hits[0]["_distance"] == pytest.approx(distance, abs=1e-5)
+
+    def test_exact_match_has_zero_distance(self, tmp_path):
+        """A stored vector is its own nearest neighbour at distance 0."""
+        backend = NumpyBackend(str(tmp_path), dim=DIM)
+        backend.add(rows_for(["a", "b", "c"]))
+
+        hits = backend.search(unit(1), 1)
+
+        assert hits[0]["id"] == "b"
+        assert hits[0]["_distance"] == pytest.approx(0.0, abs=1e-5)
+
+    def test_delete_tombstones_rows(self, tmp_path):
+        """Deleted ids never come back from search."""
+        backend = NumpyBackend(str(tmp_path), dim=DIM)
+        backend.add(rows_for(["a", "b", "c"]))
+
+        backend.delete(["b", "unknown"])
+
+        assert backend.count() == 2
+        assert "b" not in [hit["id"] for hit in backend.search(unit(1), 10)]
+
+    def test_add_replaces_existing_id(self, tmp_path):
+        """Adding an id again replaces its vector."""
+        backend = NumpyBackend(str(tmp_path), dim=DIM)
+        backend.add(rows_for(["a"], seeds=[1]))
+        backend.add(rows_for(["a"], seeds=[2]))
+
+        hits = backend.search(unit(2), 10)
+
+        assert backend.count() == 1
+        assert [hit["id"] for hit in hits] == ["a"]
+        assert hits[0]["_distance"] == pytest.approx(0.0, abs=1e-5)
+
+    def test_state_survives_reopen(self, tmp_path):
+        """Rows and tombstones are replayed from disk."""
+        backend = NumpyBackend(str(tmp_path), dim=DIM)
+        backend.add(rows_for(["a", "b", "c"]))
+        backend.delete(["a"])
+
+        reopened = NumpyBackend(str(tmp_path), dim=DIM)
+
+        assert reopened.count() == 2
+        assert reopened.search(unit(2), 1)[0]["id"] == "c"
+
+    def test_torn_append_is_truncated(self, tmp_path):
+        """Surplus vector bytes and a partial log line are dropped on open."""
+        backend = NumpyBackend(str(tmp_path), dim=DIM)
+        backend.add(rows_for(["a", "b"]))
+        with open(tmp_path / VECTORS_FILE, "ab") as f:
+            f.write(unit(5).tobytes()[:10])
+        with open(tmp_path / LOG_FILE, "a") as f:
+            f.write('{"add": "c"')
+
+        reopened = NumpyBackend(str(tmp_path), dim=DIM)
+
+        assert reopened.count() == 2
+        assert os.path.getsize(tmp_path / VECTORS_FILE) == 2 * DIM * 4
+        reopened.add(rows_for(["d"], seeds=[3]))
+        assert NumpyBackend(str(tmp_path), dim=DIM).count() == 3
+
+    def test_maintain_drops_tombstones(self, tmp_path):
+        """maintain rewrites the files without deleted rows."""
+        backend = NumpyBackend(str(tmp_path), dim=DIM)
+        backend.add(rows_for(["a", "b", "c"]))
+        backend.delete(["a", "b"])
+
+        report = backend.maintain()
+
+        assert report["kept"] == 1
+        assert report["removed"] == 2
+        assert report["bytes_reclaimed"] > 0
+        assert sorted(os.listdir(tmp_path)) == ["CURRENT", "gen-1"]
+        assert os.path.getsize(tmp_path / "gen-1" / VECTORS_FILE) == DIM * 4
+        assert backend.search(unit(0), 10)[0]["id"] == "c"
+
+    def test_vectors_returns_stored_rows(self, tmp_path):
+        """vectors should return live rows by id and skip unknown ones."""
+        backend = NumpyBackend(str(tmp_path), dim=DIM)
+        backend.add(rows_for(["a", "b", "c"]))
+        backend.delete(["c"])
+
+        stored = backend.vectors(["b", "c", "x"])
+
+        assert list(stored) == ["b"]
+        assert np.array_equal(stored["b"], unit(1))
+
+    def test_empty_store_returns_nothing(self, tmp_path):
+        """Searching an empty store is not an error."""
+        assert NumpyBackend(str(tmp_path), dim=DIM).search(unit(0), 5) == []
+
+
+class TestLanceDBBackend:
+    """Tests for LanceDBBackend."""
+
+    def test_search_builds_query_chain(self):
+        """search should apply limit and the optional ANN parameters."""
+        table = Mock()
+        chain = table.search.return_value.limit.return_value
+        chain.nprobes.return_value.to_list.return_value = [
+            {"id": "a", "_distance": 0.1}
+        ]
+
+        hits = LanceDBBackend(table).search(unit(0), 7, nprobes=4)
+
+        table.search.return_value.limit.assert_called_once_with(7)
+        chain.nprobes.assert_called_once_with(4)
+        assert hits == [{"id": "a", "_distance": 0.1}]
+
+    def test_writes_notify_hooks(self):
+        """add and delete should notify the index manager and maintainer."""
+        table = Mock()
+        index_manager = Mock()
+        maintenance = Mock()
+        backend = LanceDBBackend(
+            table, index_manager=index_manager, maintenance=maintenance
+        )
+
+        backend.add(rows_for(["a", "b"]))
+        backend.delete(["a", "o'brien"])
+
+        table.delete.assert_called_once_with(
+            "id IN ('a', 'o''brien') OR id LIKE 'a#%' OR id LIKE 'o''brien#%'"
+        )
+        index_manager.note_writes.assert_any_call(added=2)
+        index_manager.note_writes.assert_any_call(deleted=2)
+        maintenance.note_writes.assert_any_call(adds=1)
+        maintenance.note_writes.assert_any_call(deleted_rows=2)
+
+    def test_vectors_selects_rows_by_id(self):
+        """vectors should scan for the ids and return their vectors."""
+        table = Mock()
+        chain = table.search.return_value.where.return_value
+        chain.select.return_value.limit.return_value.to_list.return_value = [
+            {"id": "a", "vector": [1.0, 0.0]}
+        ]
+
+        stored = LanceDBBackend(table).vectors(["a", "o'b"])
+
+        table.search.return_value.where.assert_called_once_with(
+            "id IN ('a', 'o''b')"
+        )
+        assert list(stored) == ["a"]
+        assert stored["a"].dtype == np.float32
+
+    def test_chunk_delete_escapes_like_wildcards(self):
+        """'_' and '%' in an id must not match other memories' chunk rows."""
+        table = Mock()
+        backend = LanceDBBackend(table)
+
+        backend.delete(["a_b", "50%"])
+
+        table.delete.assert_called_once_with(
+            "id IN ('a_b', '50%') OR id LIKE 'a\\_b#%' OR id LIKE '50\\%#%'"
+        )
+
+
+class TestNumpyBackendQuantization:
+    """Tests for NumpyBackend quantized storage."""
+
+    @pytest.mark.parametrize("mode, factor, exact", [
+        ("float16", 0, False), ("int8", 4, True), ("binary", 0, None)
+    ])
+    def test_vectors_need_enough_precision(self, tmp_path, mode, factor, exact):
+        """Vectors come from the float32 copy or float16 codes, else none."""
+        backend = NumpyBackend(
+            str(tmp_path), dim=DIM, quantization=mode, rescore_factor=factor
+        )
+        backend.add(rows_for(["a"]))
+
+        stored = backend.vectors(["a"])
+
+        if exact is None:
+            assert stored == {}
+        elif exact:
+            assert np.array_equal(stored["a"], unit(0))
+        else:
+            assert np.allclose(stored["a"], unit(0), atol=1e-3)
+
+    @pytest.mark.parametrize("mode", ["float16", "int8", "binary"])
+    def test_rescoring_returns_exact_distances(self, tmp_path, mode):
+        """With rescoring, the nearest row is found with its exact distance."""
+        backend = NumpyBackend(
+            str(tmp_path), dim=DIM, quantization=mode, rescore_factor=10
+        )
+        backend.add(rows_for([f"m{i}" for i in range(30)]))
+
+        hits = backend.search(unit(7), 3)
+
+        assert hits[0]["id"] == "m7"
+        assert hits[0]["_distance"] == pytest.approx(0.0, abs=1e-5)
+
+    def test_without_rescoring_no_float32_file_is_kept(self, tmp_path):
+        """rescore_factor=0 stores only the codes."""
+        backend = NumpyBackend(
+            str(tmp_path), dim=DIM, quantization="int8", rescore_factor=0
+        )
+        backend.add(rows_for(["a", "b"]))
+
+        assert not os.path.exists(tmp_path / VECTORS_FILE)
+        assert os.path.getsize(tmp_path / "vectors.i8") == 2 * (DIM + 4)
+        assert backend.search(unit(1), 1)[0]["id"] == "b"
+
+    @pytest.mark.parametrize(
+        "mode, factor", [("float16", 0), ("int8", 4), ("binary", 32)]
+    )
+    def test_default_rescore_factor_depends_on_mode(
+        self, tmp_path, mode, factor
+    ):
+        """float16 keeps no float32 copy by default; binary rescores widely."""
+        backend = NumpyBackend(str(tmp_path), dim=DIM, quantization=mode)
+        backend.add(rows_for(["a"]))
+
+        assert backend.stats()["rescore_factor"] == factor
+        assert os.path.exists(tmp_path / VECTORS_FILE) == (factor > 0)
+
+    def test_turning_rescoring_off_drops_the_float32_file(self, tmp_path):
+        """A kept float32 copy is removed when reopened without rescoring."""
+        NumpyBackend(
+            str(tmp_path), dim=DIM, quantization="float16", rescore_factor=2
+        ).add(rows_for(["a", "b"]))
+
+        backend = NumpyBackend(
+            str(tmp_path), dim=DIM, quantization="float16", rescore_factor=0
+        )
+        backend.add(rows_for(["c"], seeds=[2]))
+
+        assert not os.path.exists(tmp_path / VECTORS_FILE)
+        assert NumpyBackend(
+            str(tmp_path), dim=DIM, quantization="float16", rescore_factor=0
+        ).count() == 3
+
+    def test_switching_mode_re_encodes_from_float32(self, tmp_path):
+        """A float32 store reopened as binary is encoded from its vectors."""
+        NumpyBackend(str(tmp_path), dim=DIM).add(rows_for(["a", "b", "c"]))
+
+        backend = NumpyBackend(
+            str(tmp_path), dim=DIM, quantization="binary", rescore_factor=2
+        )
+
+        assert backend.count() == 3
+        assert os.path.getsize(tmp_path / "vectors.b1") == 3 * DIM // 8
+        assert backend.search(unit(2), 1)[0]["id"] == "c"
+
+    def test_switching_mode_without_float32_fails(self, tmp_path):
+        """A codes-only store cannot be re-encoded into another mode."""
+        NumpyBackend(
+            str(tmp_path), dim=DIM, quantization="int8", rescore_factor=0
+        ).add(rows_for(["a"]))
+
+        with pytest.raises(ValueError):
+            NumpyBackend(
+                str(tmp_path), dim=DIM, quantization="binary", rescore_factor=0
+            )
+        assert NumpyBackend(
+            str(tmp_path), dim=DIM, quantization="int8", rescore_factor=0
+        ).count() == 1
+
+    def test_maintain_rewrites_codes_and_float32(self, tmp_path):
+        """Compaction shrinks both the code and the float32 file."""
+        backend = NumpyBackend(
+            str(tmp_path), dim=DIM, quantization="float16", rescore_factor=2
+        )
+        backend.add(rows_for(["a", "b", "c"]))
+        backend.delete(["a"])
+
+        backend.maintain()
+
+        f16 = tmp_path / "gen-1" / "vectors.f16"
+        assert os.path.getsize(f16) == 2 * DIM * 2
+        assert os.path.getsize(tmp_path / "gen-1" / VECTORS_FILE) == 2 * DIM * 4
+        assert backend.search(unit(2), 1)[0]["id"] == "c"
+
+    def test_crash_before_switch_keeps_old_files(self, tmp_path, monkeypatch):
+        """A crash writing the new generation leaves the old files intact."""
+        backend = NumpyBackend(
+            str(tmp_path), dim=DIM, quantization="int8", rescore_factor=2
+        )
+        backend.add(rows_for(["a", "b", "c"]))
+        backend.delete(["a"])
+        sizes = {
+            name: os.path.getsize(tmp_path / name)
+            for name in ("vectors.i8", VECTORS_FILE)
+        }
+
+        def crash(directory, generation):
+            raise OSError("crash")
+
+        monkeypatch.setattr(generations, "switch_generation", crash)
+        with pytest.raises(OSError):
+            backend.maintain()
+        monkeypatch.undo()
+        reopened = NumpyBackend(
+            str(tmp_path), dim=DIM, quantization="int8", rescore_factor=2
+        )
+
+        assert not os.path.exists(tmp_path / "gen-1")
+        assert reopened.count() == 2
+        after = {name: os.path.getsize(tmp_path / name) for name in sizes}
+        assert after == sizes
+        assert reopened.search(unit(2), 1)[0]["id"] == "c"
+
+    def test_crash_after_switch_uses_new_files(self, tmp_path, monkeypatch):
+        """A crash after the switch reopens the compacted generation."""
+        backend = NumpyBackend(
+            str(tmp_path), dim=DIM, quantization="binary", rescore_factor=2
+        )
+        backend.add(rows_for(["a", "b", "c"]))
+        backend.delete(["a"])
+
+        def crash(directory, generation, base_files=()):
+            raise OSError("crash")
+
+        monkeypatch.setattr(generations, "remove_stale", crash)
+        with pytest.raises(OSError):
+            backend.maintain()
+        monkeypatch.undo()
+        reopened = NumpyBackend(
+            str(tmp_path), dim=DIM, quantization="binary", rescore_factor=2
+        )
+
+        assert sorted(os.listdir(tmp_path)) == ["CURRENT", "gen-1"]
+        assert reopened.count() == 2
+        assert reopened.search(unit(2), 1)[0]["id"] == "c"
+
+
+class TestNumpyBackendFilters:
+    """Tests for metadata filtering in NumpyBackend."""
+
+    def _backend(self, tmp_path):
+        backend = NumpyBackend(str(tmp_path), dim=DIM)
+        rows = rows_for(["a", "b", "c", "legacy"])
+        tags_and_times = zip(["x y", "x", "y", None], [10, 20, 30, None])
+        for row, (tags, created_at) in zip(rows, tags_and_times):
+            if tags is not None:
+                row["tags"] = tags
+                row["created_at"] = created_at
+        backend.add(rows)
+        return backend
+
+    def test_filter_is_a_mask_before_top_k(self, tmp_path):
+        """Only eligible rows (and rows without metadata) are returned."""
+        from filters import SearchFilter
+
+        backend = self._backend(tmp_path)
+
+        tagged = SearchFilter(tags=("x",))
+        hits = backend.search(unit(2), 1, search_filter=tagged)
+        all_hits = backend.search(unit(2), 10, search_filter=SearchFilter(
+            tags=("x",), created_after=15
+        ))
+
+        eligible = {"a": 0, "b": 1, "legacy": 3}
+        best = max(
+            eligible, key=lambda memory_id: unit(eligible[memory_id]) @ unit(2)
+        )
+        assert [hit["id"] for hit in hits] == [best]
+        assert {hit["id"] for hit in all_hits} == {"b", "legacy"}
+
+    def test_metadata_survives_reopen_and_maintain(self, tmp_path):
+        """Tags and times are replayed from the log and kept by compaction."""
+        from filters import SearchFilter
+
+        backend = self._backend(tmp_path)
+        backend.delete(["a"])
+        backend.maintain()
+        reopened = NumpyBackend(str(tmp_path), dim=DIM)
+
+        search_filter = SearchFilter(created_before=25)
+        hits = reopened.search(unit(0), 10, search_filter=search_filter)
+
+        assert {hit["id"] for hit in hits} == {"b", "legacy"}
+
+
+class TestLanceDBBackendFilters:
+    """Tests for LanceDB filter pushdown."""
+
+    def test_filter_becomes_a_prefilter(self):
+        """A filter is applied with where(..., prefilter=True) before limit."""
+        from filters import SearchFilter
+
+        table = Mock()
+        table.schema.names = [
+            "vector", "id", "content", "tags", "note", "created_at"
+        ]
+        backend = LanceDBBackend(table)
+        backend.ensure_created_at()
+
+        search_filter = SearchFilter(tags=("db",), created_after=1.0)
+        backend.search(unit(0), 5, search_filter=search_filter)
+
+        where, kwargs = table.search.return_value.where.call_args
+        assert "created_at >= 1.0" in where[0]
+        assert kwargs == {"prefilter": True}
+        where_chain = table.search.return_value.where.return_value
+        where_chain.limit.assert_called_once_with(5)
+        table.add_columns.assert_not_called()
+
+    def test_missing_column_is_added(self):
+        """Old tables get a nullable created_at column."""
+        table = Mock()
+        table.schema.names = ["vector", "id", "content", "tags", "note"]
+
+        assert LanceDBBackend(table).ensure_created_at()
+        table.add_columns.assert_called_once_with(
+            {"created_at": "CAST(NULL AS DOUBLE)"}
+        )
+
+    def test_created_at_is_dropped_without_the_column(self):
+        """Rows are written without created_at if the column is unavailable."""
+        table = Mock()
+        backend = LanceDBBackend(table)
+
+        backend.add([{"id": "a", "vector": unit(0), "created_at": 1.0}])
+
+        assert "created_at" not in table.add.call_args[0][0][0]
@@ -0,0 +1,81 @@
+"""Unit tests for VectorIndexManager."""
+import threading
+
+from unittest.mock import Mock
+
+from vector_index import VectorIndexManager
+
+
+def make_table(rows, has_index=False):
+    """Return a mock LanceDB table with a row count and index list."""
+    table = Mock()
+    table.count_rows.return_value = rows
+    index = Mock()
+    index.columns = ["vector"]
+    table.list_indices.return_value = [index] if has_index else []
+    return table
+
+
+def wait_for_build(manager):
+    """Block until a running background build has finished."""
+    for thread in threading.enumerate():
+        if thread.name == "vector-index":
+            thread.join(5)
+
+
+class TestVectorIndexManager:
+    """Tests for VectorIndexManager."""
+
+    def test_small_table_is_not_indexed(self):
+        """Tables below min_rows stay brute force."""
+        table = make_table(100)
+        manager = VectorIndexManager(table, min_rows=1000)
+
+        assert manager.maybe_schedule() is False
+        table.create_index.assert_not_called()
+
+    def test_crossing_threshold_builds_index(self):
+        """The first index is built once the row count passes min_rows."""
+        table = make_table(999)
+        manager = VectorIndexManager(table, min_rows=1000)
+        table.count_rows.return_value = 1000
+
+        manager.note_writes(added=1)
+        wait_for_build(manager)
+
+        table.create_index.assert_called_once()
+        assert table.create_index.call_args.kwargs["metric"] == "L2"
+        assert manager.stats()["has_index"] is True
+
+    def test_retrains_after_enough_writes(self):
+        """An existing index is retrained after retrain_after_writes writes."""
+        table = make_table(5000, has_index=True)
+        manager = VectorIndexManager(
+            table, min_rows=1000, retrain_after_writes=10
+        )
+
+        manager.note_writes(added=5)
+        assert table.create_index.call_count == 0
+
+        manager.note_writes(added=3, deleted=2)
+        wait_for_build(manager)
+
+        assert table.create_index.call_count == 1
+        assert manager.stats()["writes_since_build"] == 0
+
+    def test_failed_build_backs_off(self):
+        """A failed build is recorded and not retried on the next write."""
+        table = make_table(5000)
+        table.create_index.side_effect = RuntimeError("boom")
+        manager = VectorIndexManager(
+            table, min_rows=1000, retrain_after_writes=10
+        )
+
+        manager.maybe_schedule()
+        wait_for_build(manager)
+        manager.note_writes(added=1)
+        wait_for_build(manager)
+
+        assert table.create_index.call_count == 1
+        assert manager.stats()["last_error"] == "boom"
+
@@ -0,0 +1,58 @@
+"""Unit tests for the background startup warm-up."""
+import threading
+
+import warmup
+from warmup import WarmUp
+
+
+class TestWarmUp:
+    """Tests for WarmUp."""
+
+    def test_phases_run_in_order_and_are_timed(self):
+        """Every phase runs once, in order, and gets a timing."""
+        calls = []
+        startup = WarmUp([
+            ("a", lambda: calls.append("a")), ("b", lambda: calls.append("b"))
+        ])
+        with startup.phase("inline"):
+            pass
+
+        assert startup.state == warmup.STATE_PENDING
+        assert startup.run()
+
+        stats = startup.stats()
+        assert calls == ["a", "b"]
+        assert startup.ready
+        assert list(stats["phases"]) == ["inline", "a", "b"]
+        assert stats["ready_after_seconds"] is not None
+        assert stats["error"] is None
+
+    def test_failing_phase_stops_the_sequence(self):
+        """A failing phase leaves the warm-up failed with its error."""
+        calls = []
+
+        def broken():
+            raise OSError("model file missing")
+
+        startup = WarmUp([
+            ("load", broken), ("after", lambda: calls.append("after"))
+        ])
+
+        assert not startup.run()
+        assert startup.state == warmup.STATE_FAILED
+        assert startup.stats()["error"] == "model file missing"
+        assert "load" in startup.stats()["phases"]
+        assert calls == []
+
+    def test_start_runs_in_background(self):
+        """start returns at once; wait blocks until the phases finish."""
+        gate = threading.Event()
+        startup = WarmUp([("slow", lambda: gate.wait(5))])
+
+        startup.start()
+        assert not startup.wait(timeout=0.05)
+        assert startup.state == warmup.STATE_LOADING
+
+        gate.set()
+        assert startup.wait(timeout=5)
+        assert startup.ready
@@ -0,0 +1,644 @@
+"""Streaming export and import of memory banks as JSONL or Parquet."""
+import base64
+import itertools
+import json
+import logging
+import os
+import time
+from typing import (
+    Any, Callable, ContextManager, Dict, Iterable, Iterator, List, Optional,
+    Sequence, Set, Tuple
+)
+
+import numpy as np
+
+from channels import DEFAULT_CHANNEL, validate_channel
+from chunking import CHUNK_ID_SEPARATOR, chunk_rows, vector_ids
+from storage import delete_memories, insert_memory_records
+
+
+FORMAT_NAME = "memory-bank"
+FORMAT_VERSION = 1
+FORMAT_JSONL = "jsonl"
+FORMAT_PARQUET = "parquet"
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_EMBEDDING_DIM = 1024
+MAX_REPORTED_ERRORS = 10
+
+# Parquet files carry the JSONL header line in this schema metadata key.
+PARQUET_HEADER_KEY = b"memory_bank"
+
+
+def make_header(model: str, dim: int = DEFAULT_EMBEDDING_DIM) -> Dict[str, Any]:
+    """Return the header describing an export.
+
+    Args:
+        model: Fingerprint of the model that produced the vectors.
+        dim: Embedding dimension.
+
+    Returns:
+        Header dict written first in every export.
+    """
+    return {
+        "format": FORMAT_NAME, "version": FORMAT_VERSION, "model": model,
+        "dim": dim
+    }
+
+
+def encode_vector(vector: np.ndarray) -> str:
+    """Encode a vector as base64 of little-endian float32."""
+    data = np.asarray(vector, dtype="<f4").tobytes()
+    return base64.b64encode(data).decode("ascii")
+
+
+def decode_vector(data: str, dim: int) -> Optional[np.ndarray]:
+    """Decode ``encode_vector`` output, None if it has the wrong size."""
+    raw = base64.b64decode(data)
+    if len(raw) != dim * 4:
+        return None
+    return np.frombuffer(raw, dtype="<f4").astype(np.float32)
+
+
+def confined_path(root: str, path: str) -> str:
+    """Resolve a client-supplied relative path inside ``root``.
+
+    Args:
+        root: Directory the path must stay in.
+        path: Relative path (no drive, no leading slash, no ``..``).
+
+    Returns:
+        The real absolute path, inside the real ``root``.
+
+    Raises:
+        ValueError: If the path is empty, absolute, contains ``..`` or
+            resolves (through symlinks) outside ``root``.
+    """
+    if not path or os.path.isabs(path) or os.path.splitdrive(path)[0]:
+        raise ValueError(
+            f"Path must be relative to the export directory: {path!r}"
+        )
+    if ".." in path.replace("\\", "/").split("/"):
+        raise ValueError(f"Path must not contain '..': {path!r}")
+    real_root = os.path.realpath(root)
+    resolved = os.path.realpath(os.path.join(real_root, path))
+    if (os.path.commonpath([real_root, resolved]) != real_root
+            or resolved == real_root):
+        raise ValueError(f"Path escapes {root}: {path!r}")
+    return resolved
+
+
+def detect_format(path: str, fmt: Optional[str] = None) -> str:
+    """Pick the file format from an explicit name or the file extension.
+
+    Raises:
+        ValueError: If the format is unknown.
+    """
+    fmt = (fmt or os.path.splitext(path)[1].lstrip(".")).lower()
+    if fmt in ("jsonl", "ndjson"):
+        return FORMAT_JSONL
+    if fmt in ("parquet", "pq"):
+        return FORMAT_PARQUET
+    raise ValueError(f"Unknown export format {fmt!r}: use jsonl or parquet")
+
+
+def batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Yield lists of up to ``size`` items from any iterable."""
+    iterator = iter(items)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def iter_memories(
+    conn: Any,
+    channel: Optional[str] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE
+) -> Iterator[Dict[str, Any]]:
+    """Stream every memory in insertion order.
+
+    Pages by ``seq`` (the rowid) so each query is an index range scan and
+    at most ``batch_size`` rows are held at a time.
+
+    Args:
+        conn: Read connection.
+        channel: Only this channel; None for all.
+        batch_size: Rows fetched per query.
+
+    Yields:
+        Memory dicts with id, content, tags (list), note, created_at and
+        channel.
+    """
+    last_seq = 0
+    condition, params = "", []
+    if channel is not None:
+        condition, params = "AND channel = ? ", [channel]
+    while True:
+        rows = conn.execute(
+            "SELECT seq, id, content, tags, note, created_at, channel "
+            "FROM memories "
+            f"WHERE seq > ? {condition}ORDER BY seq LIMIT ?",
+            [last_seq, *params, batch_size]
+        ).fetchall()
+        if not rows:
+            return
+        for row in rows:
+            yield {
+                "id": row[1],
+                "content": row[2],
+                "tags": row[3].split() if row[3] else [],
+                "note": row[4],
+                "created_at": row[5],
+                "channel": row[6]
+            }
+        last_seq = rows[-1][0]
+
+
+def with_vectors(
+    memories: Iterable[Dict[str, Any]],
+    embedding_store: Optional[Any],
+    chunker: Optional[Any] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    backend_for: Optional[Callable[[str], ContextManager[Any]]] = None
+) -> Iterator[Dict[str, Any]]:
+    """Attach stored chunk vectors to memories, without running the model.
+
+    Vectors come from the embedding store, or for memories it misses
+    (saved before the cache existed, or dropped by its compaction) from
+    the rows of their channel's vector backend. A memory with any chunk
+    missing from both is exported without vectors and re-embedded on
+    import.
+
+    Args:
+        memories: Memory dicts.
+        embedding_store: ``EmbeddingStore`` of the current model, or None.
+        chunker: ``Chunker`` used when the memories were saved.
+        batch_size: Memories looked up per store call.
+        backend_for: Returns a context manager holding a channel's
+            backend (None if it has no storage), e.g.
+            ``ChannelRegistry.lease``.
+
+    Yields:
+        Memory dicts, with ``vectors`` (base64 strings, one per chunk)
+        when all were found.
+    """
+    for batch in batched(memories, batch_size):
+        pieces = [
+            chunker.split(memory["content"]) if chunker
+            else [memory["content"]]
+            for memory in batch
+        ]
+        texts = [chunk for chunks in pieces for chunk in chunks]
+        if embedding_store is not None:
+            found = iter(embedding_store.get_many(texts))
+        else:
+            found = iter([None] * len(texts))
+        vectors = [[next(found) for _ in chunks] for chunks in pieces]
+
+        missing = [
+            i for i, row in enumerate(vectors)
+            if any(vector is None for vector in row)
+        ]
+        if missing and backend_for is not None:
+            _backend_vectors(
+                backend_for, [batch[i] for i in missing],
+                [vectors[i] for i in missing]
+            )
+
+        for memory, row in zip(batch, vectors):
+            if all(vector is not None for vector in row):
+                memory = dict(
+                    memory, vectors=[encode_vector(v) for v in row]
+                )
+            yield memory
+
+
+def _backend_vectors(
+    backend_for: Callable[[str], ContextManager[Any]],
+    memories: Sequence[Dict[str, Any]],
+    vectors: Sequence[List[Optional[np.ndarray]]]
+) -> None:
+    """Fill ``vectors`` (one list per memory) from the channel backends."""
+    by_channel: Dict[str, List[int]] = {}
+    for i, memory in enumerate(memories):
+        by_channel.setdefault(memory["channel"], []).append(i)
+    for channel, indices in by_channel.items():
+        ids = {
+            i: vector_ids(memories[i]["id"], len(vectors[i])) for i in indices
+        }
+        with backend_for(channel) as backend:
+            if backend is None:
+                continue
+            stored = backend.vectors(
+                [row_id for i in indices for row_id in ids[i]]
+            )
+        for i in indices:
+            if all(row_id in stored for row_id in ids[i]):
+                vectors[i][:] = [stored[row_id] for row_id in ids[i]]
+
+
+def write_jsonl(
+    path: str, header: Dict[str, Any], records: Iterable[Dict[str, Any]]
+) -> int:
+    """Write a header line and one JSON line per memory.
+
+    Args:
+        path: Output file.
+        header: ``make_header`` output.
+        records: Memory dicts.
+
+    Returns:
+        Number of memories written.
+    """
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(header) + "\n")
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+def read_jsonl(path: str) -> Tuple[Dict[str, Any], Iterator[Dict[str, Any]]]:
+    """Open a JSONL export.
+
+    Returns:
+        Tuple of (header, lazily read memory dicts).
+
+    Raises:
+        ValueError: If the first line is not a memory-bank header.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        header = _check_header(json.loads(f.readline() or "{}"))
+
+    def records() -> Iterator[Dict[str, Any]]:
+        with open(path, "r", encoding="utf-8") as f:
+            f.readline()
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    return header, records()
+
+
+def _parquet_schema(header: Dict[str, Any]) -> Any:
+    """Arrow schema of a Parquet export, header in the metadata."""
+    import pyarrow as pa
+
+    return pa.schema([
+        pa.field("id", pa.string()),
+        pa.field("content", pa.string()),
+        pa.field("tags", pa.list_(pa.string())),
+        pa.field("note", pa.string()),
+        pa.field("created_at", pa.float64()),
+        pa.field("channel", pa.string()),
+        pa.field("vectors", pa.list_(pa.binary()))
+    ], metadata={PARQUET_HEADER_KEY: json.dumps(header).encode("utf-8")})
+
+
+def write_parquet(
+    path: str,
+    header: Dict[str, Any],
+    records: Iterable[Dict[str, Any]],
+    batch_size: int = DEFAULT_BATCH_SIZE
+) -> int:
+    """Write memories as Parquet, one row group per batch (needs pyarrow).
+
+    Vectors are stored as raw float32 bytes rather than base64.
+
+    Returns:
+        Number of memories written.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _parquet_schema(header)
+    count = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for batch in batched(records, batch_size):
+            columns = {
+                name: [record.get(name) for record in batch]
+                for name in schema.names
+            }
+            columns["vectors"] = [
+                [base64.b64decode(v) for v in record["vectors"]]
+                if record.get("vectors") else None
+                for record in batch
+            ]
+            batch_table = pa.RecordBatch.from_pydict(columns, schema=schema)
+            writer.write_batch(batch_table)
+            count += len(batch)
+    return count
+
+
+def read_parquet(
+    path: str,
+    batch_size: int = DEFAULT_BATCH_SIZE
+) -> Tuple[Dict[str, Any], Iterator[Dict[str, Any]]]:
+    """Open a Parquet export (needs pyarrow).
+
+    Returns:
+        Tuple of (header, memory dicts read one record batch at a time).
+
+    Raises:
+        ValueError: If the file has no memory-bank header.
+    """
+    import pyarrow.parquet as pq
+
+    metadata = pq.read_schema(path).metadata or {}
+    header = _check_header(json.loads(metadata.get(PARQUET_HEADER_KEY, b"{}")))
+
+    def records() -> Iterator[Dict[str, Any]]:
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+            for record in batch.to_pylist():
+                if record.get("vectors"):
+                    record["vectors"] = [
+                        base64.b64encode(v).decode("ascii")
+                        for v in record["vectors"]
+                    ]
+                yield record
+
+    return header, records()
+
+
+def export_memories(
+    path: str,
+    records: Iterable[Dict[str, Any]],
+    model: str,
+    fmt: Optional[str] = None,
+    dim: int = DEFAULT_EMBEDDING_DIM
+) -> Dict[str, Any]:
+    """Stream memories into an export file.
+
+    Args:
+        path: Output file.
+        records: Memory dicts, e.g. ``with_vectors(iter_memories(...))``.
+        model: Fingerprint of the model behind the vectors.
+        fmt: ``"jsonl"`` or ``"parquet"``; defaults to the extension.
+        dim: Embedding dimension.
+
+    Returns:
+        Report with path, format, memories written, those carrying
+        vectors, and seconds.
+    """
+    started = time.monotonic()
+    fmt = detect_format(path, fmt)
+    counts = {"with_vectors": 0}
+
+    def counted(items: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        for item in items:
+            if item.get("vectors"):
+                counts["with_vectors"] += 1
+            yield item
+
+    header = make_header(model, dim)
+    writer = write_jsonl if fmt == FORMAT_JSONL else write_parquet
+    exported = writer(path, header, counted(records))
+    report = {
+        "path": path,
+        "format": fmt,
+        "exported": exported,
+        "with_vectors": counts["with_vectors"],
+        "seconds": time.monotonic() - started
+    }
+    logging.info(f"Exported memory bank: {report}")
+    return report
+
+
+def read_export(
+    path: str, fmt: Optional[str] = None
+) -> Tuple[Dict[str, Any], Iterator[Dict]]:
+    """Open an export file of either format (see ``read_jsonl``)."""
+    if detect_format(path, fmt) == FORMAT_JSONL:
+        return read_jsonl(path)
+    return read_parquet(path)
+
+
+def import_memories(
+    header: Dict[str, Any],
+    records: Iterable[Dict[str, Any]],
+    model: str,
+    embed_chunks: Callable[[List[str]], List[Tuple[List[str], np.ndarray]]],
+    write: Callable[
+        [List[Dict[str, Any]], List[Tuple[List[str], np.ndarray]]], None
+    ],
+    existing: Callable[[Sequence[str]], Set[str]],
+    chunker: Optional[Any] = None,
+    embedding_store: Optional[Any] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE
+) -> Dict[str, Any]:
+    """Stream an export into the bank, batch by batch.
+
+    Stored vectors are reused when the export was made with the same
+    model and chunking; every other memory is re-embedded, a whole batch
+    per ``embed_chunks`` call. Ids already in the bank are skipped, so an
+    interrupted import can simply be run again. Records with a missing
+    or malformed id, no content, a non-numeric ``created_at`` or an
+    invalid channel are skipped and reported under ``invalid``. An id
+    repeated within a batch is written once, from its last record, and
+    the earlier ones are counted under ``duplicates``.
+
+    Args:
+        header: Export header.
+        records: Memory dicts.
+        model: Fingerprint of the current model.
+        embed_chunks: ``SearchService.embed_chunks``.
+        write: Stores one batch: memory dicts plus their (chunks,
+            vectors) pairs.
+        existing: Returns which of some ids are already stored.
+        chunker: ``Chunker`` the bank uses.
+        embedding_store: Optional ``EmbeddingStore`` that reused vectors
+            are added to.
+        batch_size: Memories per batch.
+
+    Returns:
+        Report with memories imported, skipped, invalid, duplicates,
+        reusing vectors, re-embedded, seconds, and the first few
+        ``errors``.
+    """
+    started = time.monotonic()
+    dim = int(header.get("dim", DEFAULT_EMBEDDING_DIM))
+    reuse = header.get("model") == model
+    report = {
+        "imported": 0, "skipped": 0, "invalid": 0, "duplicates": 0,
+        "reused_vectors": 0, "embedded": 0
+    }
+    errors: List[str] = []
+
+    for batch in batched(records, batch_size):
+        # A repeated id would fail the batch's insert; the last one wins.
+        by_id: Dict[str, Dict[str, Any]] = {}
+        for record in batch:
+            try:
+                normalized = _normalize(record)
+            except (KeyError, TypeError, ValueError) as e:
+                report["invalid"] += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append(str(e))
+                continue
+            if by_id.pop(normalized["id"], None) is not None:
+                report["duplicates"] += 1
+            by_id[normalized["id"]] = normalized
+        valid = list(by_id.values())
+        present = existing([record["id"] for record in valid])
+        fresh = [record for record in valid if record["id"] not in present]
+        report["skipped"] += len(valid) - len(fresh)
+        if not fresh:
+            continue
+
+        embedded: List[Optional[Tuple[List[str], np.ndarray]]] = []
+        for record in fresh:
+            pair = _stored_vectors(record, dim, chunker) if reuse else None
+            embedded.append(pair)
+        missing = [i for i, pair in enumerate(embedded) if pair is None]
+        reused = [pair for pair in embedded if pair is not None]
+        if missing:
+            texts = [fresh[i]["content"] for i in missing]
+            for i, pair in zip(missing, embed_chunks(texts)):
+                embedded[i] = pair
+
+        if embedding_store is not None and reused:
+            embedding_store.put_many(
+                [chunk for chunks, _ in reused for chunk in chunks],
+                np.concatenate([vectors for _, vectors in reused])
+            )
+
+        write(fresh, embedded)
+        report["imported"] += len(fresh)
+        report["embedded"] += len(missing)
+        report["reused_vectors"] += len(fresh) - len(missing)
+
+    report["seconds"] = time.monotonic() - started
+    if errors:
+        report["errors"] = errors
+        logging.warning(
+            f"Import skipped {report['invalid']} invalid records: {errors}"
+        )
+    logging.info(f"Imported memory bank: {report}")
+    return report
+
+
+def store_records(
+    store: Any,
+    backend_for: Callable[[str], ContextManager[Any]],
+    records: Sequence[Dict[str, Any]],
+    embedded: Sequence[Tuple[List[str], np.ndarray]],
+    replace: bool = False
+) -> None:
+    """Write memories that bring their own id, timestamp and channel.
+
+    One SQLite transaction for all records, then one ``add`` per channel
+    backend. With ``replace`` the ids are deleted first (in the same
+    transaction and from each backend), which makes the write idempotent:
+    a batch that failed after committing, or is replayed after a crash,
+    can run again.
+
+    Args:
+        store: ``SQLiteStore``.
+        backend_for: Returns a context manager holding (creating if
+            needed) a channel's backend, e.g. ``ChannelRegistry.lease``.
+        records: Normalized memory dicts (id, content, tags list, note,
+            created_at, channel).
+        embedded: (chunks, vectors) per record, from ``embed_chunks``.
+        replace: Delete existing rows of these ids first.
+    """
+    ids = [record["id"] for record in records]
+
+    def insert(conn: Any) -> None:
+        if replace:
+            delete_memories(conn, ids)
+        insert_memory_records(conn, [
+            (r["id"], r["content"], " ".join(r["tags"]), r["note"],
+             r["created_at"], r["channel"])
+            for r in records
+        ])
+
+    store.write(insert)
+    by_channel: Dict[str, list] = {}
+    for record, pair in zip(records, embedded):
+        by_channel.setdefault(record["channel"], []).append((record, pair))
+    for channel, items in by_channel.items():
+        with backend_for(channel) as backend:
+            if replace:
+                backend.delete([record["id"] for record, _ in items])
+            backend.add([
+                row
+                for record, (chunks, vectors) in items
+                for row in chunk_rows(
+                    {
+                        "id": record["id"],
+                        "content": record["content"],
+                        "tags": " ".join(record["tags"]),
+                        "note": record["note"],
+                        "created_at": record["created_at"]
+                    },
+                    chunks, vectors
+                )
+            ])
+
+
+def _check_header(header: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate an export header."""
+    if header.get("format") != FORMAT_NAME:
+        raise ValueError("Not a memory-bank export (missing header)")
+    if header.get("version", 0) > FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported memory-bank export version {header.get('version')}"
+        )
+    return header
+
+
+def _normalize(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate an imported memory and fill defaults for optional fields.
+
+    Raises:
+        ValueError: If the id is missing, not a string or contains the
+            chunk separator, the content is missing, ``created_at`` is
+            not a number, or the channel name is invalid.
+    """
+    memory_id = record.get("id")
+    if not isinstance(memory_id, str) or not memory_id.strip():
+        raise ValueError(f"Invalid memory id {memory_id!r}")
+    if CHUNK_ID_SEPARATOR in memory_id:
+        raise ValueError(
+            f"Memory id {memory_id!r} contains {CHUNK_ID_SEPARATOR!r}"
+        )
+    if not isinstance(record.get("content"), str):
+        raise ValueError(f"Memory {memory_id!r} has no content")
+    created_at = record.get("created_at")
+    if created_at is None:
+        created_at = time.time()
+    elif (isinstance(created_at, bool)
+          or not isinstance(created_at, (int, float))):
+        raise ValueError(
+            f"Memory {memory_id!r} has a non-numeric created_at {created_at!r}"
+        )
+    tags = record.get("tags") or []
+    return {
+        "id": memory_id,
+        "content": record["content"],
+        "tags": tags.split() if isinstance(tags, str) else list(tags),
+        "note": record.get("note") or "",
+        "created_at": float(created_at),
+        "channel": validate_channel(record.get("channel") or DEFAULT_CHANNEL),
+        "vectors": record.get("vectors")
+    }
+
+
+def _stored_vectors(
+    record: Dict[str, Any],
+    dim: int,
+    chunker: Optional[Any]
+) -> Optional[Tuple[List[str], np.ndarray]]:
+    """Return a memory's exported (chunks, vectors), None if unusable."""
+    if not record.get("vectors"):
+        return None
+    content = record["content"]
+    chunks = chunker.split(content) if chunker else [content]
+    if len(chunks) != len(record["vectors"]):
+        return None  # exported with other chunk settings
+    vectors = [decode_vector(data, dim) for data in record["vectors"]]
+    if any(vector is None for vector in vectors):
+        return None
+    return chunks, np.stack(vectors)
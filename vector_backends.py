@@ -0,0 +1,801 @@
+"""Pluggable vector search backends: LanceDB and an in-process NumPy engine."""
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+import generations
+from chunking import CHUNK_ID_SEPARATOR, parent_id
+from quantization import (
+    MODE_BINARY, MODE_FLOAT16, MODE_FLOAT32, MODE_INT8, get_quantizer
+)
+
+
+DEFAULT_EMBEDDING_DIM = 1024
+BACKEND_LANCEDB = "lancedb"
+BACKEND_NUMPY = "numpy"
+VECTORS_FILE = "vectors.f32"
+LOG_FILE = "rows.jsonl"
+# Rescoring keeps a float32 copy next to the codes, so it costs disk.
+# float16 ranks like float32 and needs none; binary needs many candidates
+# for usable recall.
+DEFAULT_RESCORE_FACTORS = {
+    MODE_FLOAT32: 0, MODE_FLOAT16: 0, MODE_INT8: 4, MODE_BINARY: 32
+}
+SCAN_CHUNK_ROWS = 16384
+
+
+def _add_record(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the ``rows.jsonl`` record of an appended row."""
+    record: Dict[str, Any] = {"add": row["id"]}
+    if row.get("tags") is not None:
+        record["tags"] = row["tags"]
+    if row.get("created_at") is not None:
+        record["created_at"] = row["created_at"]
+    return record
+
+
+def _like_literal(text: str) -> str:
+    """Escape ``\\``, ``%`` and ``_`` so LIKE matches ``text`` literally."""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class LanceDBBackend:
+    """Vector backend backed by a LanceDB table.
+
+    Hits carry the full row (id, content, tags, note, created_at) plus
+    ``_distance``. Writes are forwarded to the optional index manager and
+    maintenance hooks so they can schedule index builds and compaction.
+    Tables created before ``created_at`` existed get the column added
+    (NULL for old rows) by ``ensure_created_at``.
+    """
+
+    name = BACKEND_LANCEDB
+
+    def __init__(
+        self,
+        table: Any,
+        index_manager: Optional[Any] = None,
+        maintenance: Optional[Any] = None
+    ):
+        """Wrap a table.
+
+        Args:
+            table: LanceDB table with vector, id, content, tags and note.
+            index_manager: Optional ``VectorIndexManager``.
+            maintenance: Optional ``TableMaintenance``.
+        """
+        self._table = table
+        self._index_manager = index_manager
+        self._maintenance = maintenance
+        self._has_created_at = False
+
+    def ensure_created_at(self) -> bool:
+        """Add a nullable ``created_at`` column if the table lacks one.
+
+        Returns:
+            True if the table has the column afterwards.
+        """
+        try:
+            if "created_at" not in self._table.schema.names:
+                self._table.add_columns({"created_at": "CAST(NULL AS DOUBLE)"})
+                logging.info("Added created_at column to the LanceDB table")
+            self._has_created_at = True
+        except Exception as e:
+            logging.warning(
+                f"LanceDB: cannot add created_at column, time filters "
+                f"will be checked after the vector search: {e}"
+            )
+            self._has_created_at = False
+        return self._has_created_at
+
+    def search(
+        self,
+        vector: np.ndarray,
+        limit: int,
+        nprobes: Optional[int] = None,
+        refine_factor: Optional[int] = None,
+        search_filter: Optional[Any] = None
+    ) -> List[Dict]:
+        """Return the ``limit`` nearest rows by squared L2 distance.
+
+        Args:
+            vector: Normalized query vector.
+            limit: Maximum hits.
+            nprobes: IVF partitions to probe (indexed tables only).
+            refine_factor: Exact re-ranking factor for PQ candidates.
+            search_filter: Optional ``SearchFilter`` applied as a ``where``
+                prefilter, so the limit counts eligible rows only.
+
+        Returns:
+            Hit dicts with ``_distance``, nearest first.
+        """
+        search = self._table.search(vector)
+        if search_filter is not None:
+            where = search_filter.lance_where(include_time=self._has_created_at)
+            if where:
+                search = search.where(where, prefilter=True)
+        search = search.limit(limit)
+        if nprobes is not None:
+            search = search.nprobes(nprobes)
+        if refine_factor is not None:
+            search = search.refine_factor(refine_factor)
+        return search.to_list()
+
+    def add(self, rows: List[Dict]) -> None:
+        """Append rows in a single ``add`` call.
+
+        Args:
+            rows: Dicts with vector, id, content, tags, note and
+                optionally created_at.
+        """
+        if not self._has_created_at:
+            rows = [
+                {key: value for key, value in row.items()
+                 if key != "created_at"}
+                for row in rows
+            ]
+        self._table.add(rows)
+        if self._index_manager is not None:
+            self._index_manager.note_writes(added=len(rows))
+        if self._maintenance is not None:
+            self._maintenance.note_writes(adds=1)
+
+    def delete(self, ids: Sequence[str]) -> None:
+        """Delete rows by id, including the chunk rows of those memories.
+
+        Args:
+            ids: Memory ids.
+        """
+        if not ids:
+            return
+        escaped = [memory_id.replace("'", "''") for memory_id in ids]
+        quoted = ", ".join(f"'{memory_id}'" for memory_id in escaped)
+        # LIKE metacharacters in an id must match literally, or "a_b"
+        # would also delete the chunk rows of "axb" (backslash escapes).
+        chunks = " OR ".join(
+            f"id LIKE '{_like_literal(memory_id)}{CHUNK_ID_SEPARATOR}%'"
+            for memory_id in escaped
+        )
+        self._table.delete(f"id IN ({quoted}) OR {chunks}")
+        if self._index_manager is not None:
+            self._index_manager.note_writes(deleted=len(ids))
+        if self._maintenance is not None:
+            self._maintenance.note_writes(deleted_rows=len(ids))
+
+    def vectors(self, ids: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Return the stored vectors of some rows.
+
+        Args:
+            ids: Row ids (memory ids or chunk ids).
+
+        Returns:
+            Vector by id, for the ids that are stored.
+        """
+        if not ids:
+            return {}
+        quoted = ", ".join(
+            "'" + row_id.replace("'", "''") + "'" for row_id in ids
+        )
+        rows = (
+            self._table.search()
+            .where(f"id IN ({quoted})")
+            .select(["id", "vector"])
+            .limit(len(ids))
+            .to_list()
+        )
+        return {
+            row["id"]: np.asarray(row["vector"], dtype=np.float32)
+            for row in rows
+        }
+
+    def count(self) -> int:
+        """Return the number of rows in the table."""
+        return int(self._table.count_rows())
+
+    def maintain(self) -> Dict[str, Any]:
+        """Compact fragments and clean up old versions now.
+
+        Returns:
+            The maintenance report, empty if no maintainer is attached.
+        """
+        if self._maintenance is None:
+            return {}
+        return self._maintenance.run()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return index and maintenance statistics."""
+        stats: Dict[str, Any] = {"backend": self.name}
+        if self._index_manager is not None:
+            stats["vector_index"] = self._index_manager.stats()
+        if self._maintenance is not None:
+            stats["maintenance"] = self._maintenance.stats()
+        return stats
+
+    def close(self) -> None:
+        """Stop the maintenance timer (the table itself needs no closing)."""
+        if self._maintenance is not None:
+            self._maintenance.close()
+
+
+class NumpyBackend:
+    """Exact or quantized in-process vector search over one contiguous matrix.
+
+    Embeddings are appended to a raw file of fixed-width codes (float32 by
+    default, or a ``quantization`` mode from ``quantization``), optionally
+    memory-mapped instead of held in RAM, with a parallel list of ids. A
+    query is one scan of the matrix in chunks followed by ``argpartition``,
+    which beats an ANN round trip for stores up to a few hundred thousand
+    rows. Deletes only set a tombstone; ``maintain`` rewrites the files
+    without the dead rows.
+
+    With a lossy mode and ``rescore_factor > 0``, the float32 vectors are
+    also kept on disk (always memory-mapped, never loaded): the codes pick
+    ``limit * rescore_factor`` candidates and only those rows are rescored
+    at full precision. Rescoring trades disk for recall, since the store
+    then takes the float32 size plus the codes.
+    ``rescore_factor=0`` drops the float32 file too.
+
+    Only ids, vectors and filterable metadata (tags, creation time) are
+    stored: hits carry ``id`` and ``_distance`` and the caller hydrates
+    content from SQLite. ``_distance`` is the
+    squared L2 distance of unit vectors, ``2 - 2 * dot``, the same scale
+    LanceDB reports, so similarity thresholds carry over unchanged.
+
+    ``rows.jsonl`` is an ordered log of ``{"add": id, "tags": ...,
+    "created_at": ...}`` and ``{"delete": id}`` records; replaying it
+    rebuilds ids, metadata and tombstones.
+    Vectors are written before their log records, so a crash can only
+    leave surplus vector rows, which are truncated on the next open.
+    ``maintain`` writes the compacted files into a new generation
+    directory and switches to it with one atomic rename (see
+    ``generations``), so a crash never mixes compacted and stale files.
+    """
+
+    name = BACKEND_NUMPY
+
+    def __init__(
+        self,
+        directory: str,
+        dim: int = DEFAULT_EMBEDDING_DIM,
+        mmap: bool = True,
+        quantization: str = MODE_FLOAT32,
+        rescore_factor: Optional[int] = None
+    ):
+        """Open (or create) the store in a directory.
+
+        Switching a store to another quantization re-encodes it from the
+        float32 vectors if they were kept.
+
+        Args:
+            directory: Directory holding the store files.
+            dim: Embedding dimension.
+            mmap: Memory-map the code file instead of loading it.
+            quantization: Storage mode, one of ``quantization.MODES``.
+            rescore_factor: Candidates per requested hit rescored at full
+                precision (lossy modes only); 0 disables rescoring and
+                stops keeping float32 vectors. None uses the mode's
+                ``DEFAULT_RESCORE_FACTORS`` entry.
+
+        Raises:
+            ValueError: On an unknown mode, or if the store must be
+                re-encoded but its float32 vectors were not kept.
+        """
+        self._directory = directory
+        self._dim = dim
+        self._mmap = mmap
+        self._quantizer = get_quantizer(quantization, dim)
+        self._lossy = quantization != MODE_FLOAT32
+        if rescore_factor is None:
+            rescore_factor = DEFAULT_RESCORE_FACTORS[self._quantizer.mode]
+        self._rescore_factor = rescore_factor if self._lossy else 0
+        self._keep_full = self._rescore_factor > 0
+        self._generation = 0
+        self._set_paths(directory)
+        self._lock = threading.Lock()
+
+        self._ids: List[str] = []
+        self._records: List[Dict[str, Any]] = []
+        self._row_of: Dict[str, int] = {}
+        self._alive = np.zeros(0, dtype=bool)
+        self._created = np.zeros(0, dtype=np.float64)
+        self._tags_known = np.zeros(0, dtype=bool)
+        self._tag_rows: Dict[str, List[int]] = {}
+        self._chunks_of: Dict[str, Set[str]] = {}
+        self._codes = self._empty_codes()
+        self._full: Optional[np.ndarray] = None
+        self._rows = 0
+        self._searches = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def search(
+        self,
+        vector: np.ndarray,
+        limit: int,
+        nprobes: Optional[int] = None,
+        refine_factor: Optional[int] = None,
+        search_filter: Optional[Any] = None
+    ) -> List[Dict]:
+        """Return the ``limit`` most similar live rows.
+
+        Args:
+            vector: Normalized query vector.
+            limit: Maximum hits.
+            nprobes: Ignored (the scan covers every row).
+            refine_factor: Overrides ``rescore_factor`` for this query.
+            search_filter: Optional ``SearchFilter`` applied as a row mask
+                before top-k selection. Rows stored without tags or
+                creation time pass the corresponding constraint.
+
+        Returns:
+            Dicts with ``id`` and ``_distance``, nearest first.
+        """
+        with self._lock:
+            codes = self._codes[:self._rows]
+            full = self._full
+            eligible = self._alive
+            ids = self._ids
+            live = len(self._row_of)
+            if search_filter is not None:
+                eligible = self._filter_mask(search_filter)
+                live = int(eligible.sum())
+            self._searches += 1
+
+        k = min(limit, live)
+        if k <= 0:
+            return []
+
+        query = np.asarray(vector, dtype=np.float32)
+        prepared = self._quantizer.prepare_query(query)
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SCAN_CHUNK_ROWS):
+            chunk = codes[start:start + SCAN_CHUNK_ROWS]
+            chunk_scores = self._quantizer.scores(chunk, prepared)
+            scores[start:start + len(chunk)] = chunk_scores
+        scores[~eligible] = -np.inf
+
+        factor = refine_factor
+        if factor is None:
+            factor = self._rescore_factor
+        rescore = full is not None and factor > 0
+        top = self._top(scores, min(k * factor, live) if rescore else k)
+
+        if rescore:
+            top = np.sort(top)  # sequential reads from the mapping
+            exact = full[top] @ query
+            order = np.argsort(-exact, kind="stable")[:k]
+            top, top_scores = top[order], exact[order]
+        else:
+            top_scores = scores[top]
+
+        return [
+            {"id": ids[row], "_distance": max(0.0, 2.0 - 2.0 * float(score))}
+            for row, score in zip(top, top_scores)
+            if eligible[row]
+        ]
+
+    def add(self, rows: List[Dict]) -> None:
+        """Append rows; an id that is already stored is replaced.
+
+        Args:
+            rows: Dicts with at least ``id`` and ``vector``; optional
+                ``tags`` (space-joined) and ``created_at`` are kept as
+                filterable metadata.
+        """
+        if not rows:
+            return
+        block = np.ascontiguousarray(
+            [row["vector"] for row in rows], dtype=np.float32
+        ).reshape(len(rows), self._dim)
+        codes = self._quantizer.encode(block)
+        records = [_add_record(row) for row in rows]
+
+        with self._lock:
+            if self._keep_full:
+                with open(self._full_path, "ab") as f:
+                    f.write(block.tobytes())
+            with open(self._codes_path, "ab") as f:
+                f.write(codes.tobytes())
+            with open(self._log_path, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(record) + "\n" for record in records)
+
+            added = np.ones(len(rows), dtype=bool)
+            alive = np.concatenate([self._alive, added])
+            for offset, row in enumerate(rows):
+                previous = self._row_of.get(row["id"])
+                if previous is not None:
+                    alive[previous] = False
+                self._row_of[row["id"]] = self._rows + offset
+            self._append_metadata(records)
+            self._append_codes(codes)
+            self._alive = alive
+            self._rows += len(rows)
+            if self._keep_full:
+                self._full = self._map_full(self._rows)
+
+    def delete(self, ids: Sequence[str]) -> None:
+        """Tombstone rows by id, including chunk rows; unknown ids are ignored.
+
+        Args:
+            ids: Memory ids.
+        """
+        with self._lock:
+            targets = [*ids]
+            for memory_id in ids:
+                targets.extend(self._chunks_of.pop(memory_id, ()))
+            found = [
+                memory_id for memory_id in targets
+                if memory_id in self._row_of
+            ]
+            if not found:
+                return
+            with open(self._log_path, "a", encoding="utf-8") as f:
+                f.writelines(
+                    json.dumps({"delete": memory_id}) + "\n"
+                    for memory_id in found
+                )
+            # Copy-on-write so searches holding the old mask stay consistent.
+            alive = self._alive.copy()
+            for memory_id in found:
+                alive[self._row_of.pop(memory_id)] = False
+            self._alive = alive
+
+    def vectors(self, ids: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Return the stored vectors of some live rows.
+
+        Vectors come from the float32 copy when one is kept, else from
+        the codes of the float32 and float16 modes. Lower precision modes
+        without a float32 copy return nothing.
+
+        Args:
+            ids: Row ids (memory ids or chunk ids).
+
+        Returns:
+            Vector by id, for the ids that are stored.
+        """
+        with self._lock:
+            found = [
+                (row_id, self._row_of[row_id])
+                for row_id in ids if row_id in self._row_of
+            ]
+            if not found:
+                return {}
+            rows = np.array([row for _, row in found], dtype=np.int64)
+            if self._full is not None:
+                matrix = np.array(self._full[rows])
+            elif self._quantizer.mode in (MODE_FLOAT32, MODE_FLOAT16):
+                matrix = self._quantizer.decode(self._codes[rows])
+            else:
+                return {}
+        return {
+            row_id: vector for (row_id, _), vector in zip(found, matrix)
+        }
+
+    def count(self) -> int:
+        """Return the number of live rows."""
+        with self._lock:
+            return len(self._row_of)
+
+    def maintain(self) -> Dict[str, Any]:
+        """Rewrite the store without tombstoned rows.
+
+        Returns:
+            Dict with rows kept, rows removed and bytes reclaimed.
+        """
+        with self._lock:
+            size_before = self._disk_size()
+            kept = sorted(self._row_of.items(), key=lambda item: item[1])
+            removed = self._rows - len(kept)
+
+            if removed:
+                generation = self._generation + 1
+                new_dir = generations.new_generation(
+                    self._directory, generation
+                )
+                keep_rows = np.array([row for _, row in kept], dtype=np.int64)
+                replaced = {self._codes_path: self._codes[:self._rows]}
+                if self._full is not None:
+                    replaced.setdefault(self._full_path, self._full)
+                for path, matrix in replaced.items():
+                    target = os.path.join(new_dir, os.path.basename(path))
+                    with open(target, "wb") as f:
+                        for start in range(0, len(keep_rows), SCAN_CHUNK_ROWS):
+                            rows = keep_rows[start:start + SCAN_CHUNK_ROWS]
+                            block = np.ascontiguousarray(matrix[rows])
+                            f.write(block.tobytes())
+                        f.flush()
+                        os.fsync(f.fileno())
+                with open(
+                    os.path.join(new_dir, LOG_FILE), "w", encoding="utf-8"
+                ) as f:
+                    f.writelines(
+                        json.dumps(self._records[row]) + "\n" for _, row in kept
+                    )
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                # Release the mappings before switching files (required on
+                # Windows).
+                replaced = matrix = None
+                self._codes = self._empty_codes()
+                self._full = None
+                generations.switch_generation(self._directory, generation)
+                self._load()
+
+            reclaimed = size_before - self._disk_size()
+
+        logging.info(
+            f"NumPy vector store compacted: kept {len(kept)}, "
+            f"removed {removed}, reclaimed {reclaimed} bytes"
+        )
+        return {
+            "kept": len(kept), "removed": removed, "bytes_reclaimed": reclaimed
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Return row counts, storage mode, disk usage and search count."""
+        with self._lock:
+            return {
+                "backend": self.name,
+                "rows": len(self._row_of),
+                "tombstones": self._rows - len(self._row_of),
+                "quantization": self._quantizer.mode,
+                "bytes_per_vector": self._quantizer.row_bytes,
+                "rescore_factor": self._rescore_factor,
+                "mmap": self._mmap,
+                "resident_bytes": (
+                    0 if self._mmap else int(self._codes[:self._rows].nbytes)
+                ),
+                "disk_bytes": self._disk_size(),
+                "searches": self._searches
+            }
+
+    @staticmethod
+    def _top(scores: np.ndarray, k: int) -> np.ndarray:
+        """Indices of the ``k`` highest scores, best first."""
+        if k < len(scores):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        return top[np.argsort(-scores[top], kind="stable")]
+
+    def _filter_mask(self, search_filter: Any) -> np.ndarray:
+        """Rows that are alive and may match a filter.
+
+        The caller holds the lock.
+        """
+        mask = self._alive.copy()
+        # NaN (unknown) creation times compare False and stay eligible.
+        if search_filter.created_after is not None:
+            mask &= ~(self._created < search_filter.created_after)
+        if search_filter.created_before is not None:
+            mask &= ~(self._created >= search_filter.created_before)
+        for tag in search_filter.tags:
+            tagged = ~self._tags_known
+            tagged[self._tag_rows.get(tag, [])] = True
+            mask &= tagged
+        return mask
+
+    def _append_metadata(self, records: List[Dict[str, Any]]) -> None:
+        """Index ids, tags and creation times of appended rows.
+
+        The caller holds the lock.
+        """
+        start = len(self._ids)
+        for offset, record in enumerate(records):
+            self._ids.append(record["add"])
+            self._records.append(record)
+            memory_id = parent_id(record["add"])
+            if memory_id != record["add"]:
+                self._chunks_of.setdefault(memory_id, set()).add(record["add"])
+            for tag in (record.get("tags") or "").split():
+                self._tag_rows.setdefault(tag, []).append(start + offset)
+        # Rebuilt rather than resized in place so searches keep a stable copy.
+        created = [record.get("created_at", np.nan) for record in records]
+        self._created = np.concatenate([self._created, np.array(
+            created, dtype=np.float64
+        )])
+        self._tags_known = np.concatenate([self._tags_known, np.array(
+            ["tags" in record for record in records], dtype=bool
+        )])
+
+    def _set_paths(self, data_dir: str) -> None:
+        """Point the store at the files of one generation directory."""
+        self._codes_path = os.path.join(
+            data_dir, f"vectors.{self._quantizer.suffix}"
+        )
+        self._full_path = os.path.join(data_dir, VECTORS_FILE)
+        self._log_path = os.path.join(data_dir, LOG_FILE)
+
+    def _load(self) -> None:
+        """Replay the row log and repair torn appends (caller holds the lock).
+
+        Raises:
+            ValueError: If the store holds rows that the configured mode
+                has no vectors for and cannot re-encode.
+        """
+        self._generation = generations.current_generation(self._directory)
+        self._set_paths(
+            generations.generation_dir(self._directory, self._generation)
+        )
+        generations.remove_stale(self._directory, self._generation, [
+            name for name in os.listdir(self._directory)
+            if name == LOG_FILE or name.startswith("vectors.")
+        ])
+        codes_existed = os.path.exists(self._codes_path)
+        full_existed = os.path.exists(self._full_path)
+        row_bytes = self._quantizer.row_bytes
+        code_rows = full_rows = 0
+        if codes_existed:
+            code_rows = os.path.getsize(self._codes_path) // row_bytes
+        if full_existed:
+            full_rows = os.path.getsize(self._full_path) // (self._dim * 4)
+
+        if self._lossy and full_rows > code_rows:
+            # New mode, or a crash between the two appends: encode the gap.
+            self._encode_from_full(code_rows, full_rows)
+            code_rows = full_rows
+            codes_existed = True
+
+        if self._lossy and not self._keep_full and full_existed:
+            # Rescoring is off, so the float32 copy is dead weight (and
+            # would fall behind the codes, truncating them on a later open).
+            os.remove(self._full_path)
+            full_existed = False
+
+        records = self._read_log()
+        # A file created by an earlier append is only ever short by a torn
+        # tail; a missing file means the store was written in another mode.
+        if any("add" in record for record, _ in records):
+            if not codes_existed:
+                raise ValueError(
+                    f"Vector store {self._directory} has no "
+                    f"{self._quantizer.mode} vectors and no float32 vectors "
+                    f"to encode them from"
+                )
+            if self._keep_full and not full_existed:
+                raise ValueError(
+                    f"Vector store {self._directory} kept no float32 vectors; "
+                    f"open it with rescore_factor=0"
+                )
+
+        for path in (self._codes_path, self._log_path):
+            if not os.path.exists(path):
+                open(path, "wb").close()
+        if self._keep_full and not full_existed:
+            open(self._full_path, "wb").close()
+
+        available = min(code_rows, full_rows) if self._keep_full else code_rows
+        adds: List[Dict[str, Any]] = []
+        row_of: Dict[str, int] = {}
+        good_bytes = 0
+        for record, end in records:
+            if "add" in record:
+                if len(adds) >= available:
+                    break
+                row_of[record["add"]] = len(adds)
+                adds.append(record)
+            else:
+                row_of.pop(record["delete"], None)
+            good_bytes = end
+        ids = [record["add"] for record in adds]
+
+        if os.path.getsize(self._log_path) != good_bytes:
+            os.truncate(self._log_path, good_bytes)
+        if os.path.getsize(self._codes_path) != len(ids) * row_bytes:
+            os.truncate(self._codes_path, len(ids) * row_bytes)
+        full_bytes = len(ids) * self._dim * 4
+        if (self._keep_full
+                and os.path.getsize(self._full_path) != full_bytes):
+            os.truncate(self._full_path, full_bytes)
+
+        alive = np.zeros(len(ids), dtype=bool)
+        alive[list(row_of.values())] = True
+        self._ids = []
+        self._records = []
+        self._created = np.zeros(0, dtype=np.float64)
+        self._tags_known = np.zeros(0, dtype=bool)
+        self._tag_rows = {}
+        self._chunks_of = {}
+        self._append_metadata(adds)
+        self._row_of = row_of
+        self._alive = alive
+        self._rows = len(ids)
+        self._codes = self._read_codes()
+        self._full = self._map_full(self._rows) if self._keep_full else None
+
+    def _read_log(self) -> List[Tuple[Dict[str, str], int]]:
+        """Parse the row log up to the first torn line.
+
+        Returns:
+            List of (record, byte offset just past the record).
+        """
+        records: List[Tuple[Dict[str, str], int]] = []
+        if not os.path.exists(self._log_path):
+            return records
+        offset = 0
+        with open(self._log_path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                offset += len(line)
+                records.append((record, offset))
+        return records
+
+    def _encode_from_full(self, start: int, stop: int) -> None:
+        """Append codes for float32 rows ``start:stop`` to the code file."""
+        full = self._map_full(stop)
+        with open(self._codes_path, "ab") as f:
+            for chunk in range(start, stop, SCAN_CHUNK_ROWS):
+                end = min(stop, chunk + SCAN_CHUNK_ROWS)
+                block = np.asarray(full[chunk:end])
+                f.write(self._quantizer.encode(block).tobytes())
+        logging.info(
+            f"Encoded {stop - start} vectors as {self._quantizer.mode} "
+            f"in {self._directory}"
+        )
+
+    def _empty_codes(self) -> np.ndarray:
+        """A code matrix with no rows."""
+        return np.zeros((0, self._quantizer.row_bytes), dtype=np.uint8)
+
+    def _read_codes(self) -> np.ndarray:
+        """Map or load every row of the code file."""
+        if self._rows == 0:
+            return self._empty_codes()
+        shape = (self._rows, self._quantizer.row_bytes)
+        if self._mmap:
+            return np.memmap(
+                self._codes_path, dtype=np.uint8, mode="r", shape=shape
+            )
+        return np.fromfile(
+            self._codes_path, dtype=np.uint8, count=shape[0] * shape[1]
+        ).reshape(shape)
+
+    def _map_full(self, rows: int) -> Optional[np.ndarray]:
+        """Map the first ``rows`` float32 vectors (never loaded into RAM)."""
+        if rows == 0:
+            return None
+        return np.memmap(
+            self._full_path, dtype=np.float32, mode="r", shape=(rows, self._dim)
+        )
+
+    def _append_codes(self, codes: np.ndarray) -> None:
+        """Extend the in-memory view by rows just written.
+
+        The caller holds the lock.
+        """
+        rows = self._rows + len(codes)
+        if self._mmap:
+            self._codes = np.memmap(
+                self._codes_path, dtype=np.uint8, mode="r",
+                shape=(rows, self._quantizer.row_bytes)
+            )
+            return
+        if rows > self._codes.shape[0]:
+            # Grow geometrically; searches keep their view of the old array.
+            grown = np.empty(
+                (max(rows, 2 * self._codes.shape[0]),
+                 self._quantizer.row_bytes),
+                dtype=np.uint8
+            )
+            grown[:self._rows] = self._codes[:self._rows]
+            self._codes = grown
+        self._codes[self._rows:rows] = codes
+
+    def _disk_size(self) -> int:
+        """Total size of the store files in bytes."""
+        return sum(
+            os.path.getsize(path)
+            for path in {self._codes_path, self._full_path, self._log_path}
+            if os.path.exists(path)
+        )
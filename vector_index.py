@@ -0,0 +1,182 @@
+"""Automatic ANN index lifecycle for the LanceDB memories table."""
+import logging
+import math
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+DEFAULT_INDEX_MIN_ROWS = 20_000
+DEFAULT_RETRAIN_AFTER_WRITES = 10_000
+DEFAULT_NUM_SUB_VECTORS = 64
+MIN_PARTITIONS = 16
+MAX_PARTITIONS = 4096
+
+
+class VectorIndexManager:
+    """Builds and retrains an IVF-PQ index as the table grows.
+
+    Below ``min_rows`` searches stay brute force (exact and already fast).
+    Once the row count crosses it, an index is built in a background
+    thread; afterwards it is retrained in the background whenever
+    ``retrain_after_writes`` rows have been added or deleted since the
+    last build. LanceDB versions the table, so searches keep running on
+    the previous index while a new one is trained.
+    """
+
+    def __init__(
+        self,
+        table: Any,
+        min_rows: int = DEFAULT_INDEX_MIN_ROWS,
+        retrain_after_writes: int = DEFAULT_RETRAIN_AFTER_WRITES,
+        num_sub_vectors: int = DEFAULT_NUM_SUB_VECTORS,
+        metric: str = "L2"
+    ):
+        """Inspect the table and remember its size and index state.
+
+        Args:
+            table: LanceDB table holding a ``vector`` column.
+            min_rows: Row count at which the first index is built.
+            retrain_after_writes: Writes after which the index is rebuilt.
+            num_sub_vectors: PQ sub-vectors (must divide the dimension).
+            metric: Distance metric; must match the one searches use.
+        """
+        self._table = table
+        self._min_rows = min_rows
+        self._retrain_after_writes = retrain_after_writes
+        self._num_sub_vectors = num_sub_vectors
+        self._metric = metric
+
+        self._lock = threading.Lock()
+        self._building = False
+        self._builds = 0
+        self._last_build_seconds: Optional[float] = None
+        self._last_error: Optional[str] = None
+        self._writes_since_build = 0
+
+        self._rows = self._count_rows()
+        self._has_index = self._detect_index()
+
+    def note_writes(self, added: int = 0, deleted: int = 0) -> None:
+        """Record writes and start a background (re)build if one is due.
+
+        Args:
+            added: Rows appended to the table.
+            deleted: Rows deleted from the table.
+        """
+        with self._lock:
+            self._rows = max(0, self._rows + added - deleted)
+            self._writes_since_build += added + deleted
+        self.maybe_schedule()
+
+    def maybe_schedule(self) -> bool:
+        """Start a background build if the thresholds say one is due.
+
+        Returns:
+            True if a build was started.
+        """
+        with self._lock:
+            if self._building or not self._is_due():
+                return False
+            self._building = True
+
+        threading.Thread(
+            target=self._build_in_background, name="vector-index", daemon=True
+        ).start()
+        return True
+
+    def build(self) -> Dict[str, Any]:
+        """Build (or replace) the index synchronously.
+
+        Returns:
+            Dict describing the build: rows, partitions and seconds.
+        """
+        rows = self._count_rows()
+        partitions = int(math.sqrt(rows))
+        partitions = min(MAX_PARTITIONS, max(MIN_PARTITIONS, partitions))
+        started = time.monotonic()
+        with self._lock:
+            writes_at_start = self._writes_since_build
+
+        self._table.create_index(
+            metric=self._metric,
+            num_partitions=partitions,
+            num_sub_vectors=self._num_sub_vectors,
+            vector_column_name="vector",
+            replace=True
+        )
+
+        elapsed = time.monotonic() - started
+        with self._lock:
+            self._rows = rows
+            self._has_index = True
+            self._builds += 1
+            self._last_build_seconds = elapsed
+            self._last_error = None
+            # Writes that landed during the build count toward the next one.
+            self._writes_since_build -= writes_at_start
+        logging.info(
+            f"Vector index built: {rows} rows, {partitions} partitions, "
+            f"{elapsed:.1f}s"
+        )
+        return {"rows": rows, "partitions": partitions, "seconds": elapsed}
+
+    def stats(self) -> Dict[str, Any]:
+        """Return index state and build counters.
+
+        Returns:
+            Dict with row estimate, index presence, pending writes, build
+            count, last build time and last error.
+        """
+        with self._lock:
+            return {
+                "rows": self._rows,
+                "has_index": self._has_index,
+                "building": self._building,
+                "writes_since_build": self._writes_since_build,
+                "min_rows": self._min_rows,
+                "retrain_after_writes": self._retrain_after_writes,
+                "builds": self._builds,
+                "last_build_seconds": self._last_build_seconds,
+                "last_error": self._last_error
+            }
+
+    def _is_due(self) -> bool:
+        """Whether an index build is due (caller holds the lock)."""
+        if self._rows < self._min_rows:
+            return False
+        if not self._has_index and self._last_error is None:
+            return True
+        return self._writes_since_build >= self._retrain_after_writes
+
+    def _build_in_background(self) -> None:
+        """Thread target: build, record failures, clear the busy flag."""
+        try:
+            self.build()
+        except Exception as e:
+            logging.error(f"Vector index build failed: {e}")
+            with self._lock:
+                self._last_error = str(e)
+                # Back off until another batch of writes arrives.
+                self._writes_since_build = 0
+        finally:
+            with self._lock:
+                self._building = False
+
+    def _count_rows(self) -> int:
+        """Return the table's row count, 0 if it cannot be read."""
+        try:
+            return int(self._table.count_rows())
+        except Exception as e:
+            logging.warning(f"Vector index: cannot count rows: {e}")
+            return 0
+
+    def _detect_index(self) -> bool:
+        """Return True if the table already has a vector index."""
+        try:
+            return any(
+                "vector" in getattr(index, "columns", [])
+                for index in self._table.list_indices()
+            )
+        except Exception:
+            return False
@@ -0,0 +1,135 @@
+"""Background startup: load heavy resources after the server has bound."""
+import contextlib
+import logging
+import threading
+import time
+from typing import (
+    Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+)
+
+
+STATE_PENDING = "pending"
+STATE_LOADING = "loading"
+STATE_READY = "ready"
+STATE_FAILED = "failed"
+
+
+class WarmUp:
+    """Runs named startup phases in order and records how long each took.
+
+    Cheap phases done inline at import time are timed with ``phase``;
+    the heavy ones (tokenizer, inference session, a dummy inference to
+    prime it, opening vector storage) are registered with the
+    constructor or ``add`` and run by ``start`` on a background thread,
+    so the server can accept connections meanwhile. ``ready`` turns True
+    once every phase has succeeded; a failing phase stops the sequence
+    and leaves the error in ``stats``.
+    """
+
+    def __init__(self, phases: Sequence[Tuple[str, Callable[[], Any]]] = ()):
+        """Create the warm-up.
+
+        Args:
+            phases: (name, callable) pairs run in order by ``run``.
+        """
+        self._phases = list(phases)
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._state = STATE_PENDING
+        self._timings: List[Tuple[str, float]] = []
+        self._error: Optional[str] = None
+        self._created = time.monotonic()
+        self._ready_after: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, name: str, step: Callable[[], Any]) -> None:
+        """Append a phase for ``run`` (before it starts)."""
+        self._phases.append((name, step))
+
+    @property
+    def state(self) -> str:
+        """One of pending, loading, ready, failed."""
+        return self._state
+
+    @property
+    def ready(self) -> bool:
+        """Whether every phase has completed."""
+        return self._state == STATE_READY
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time one startup phase and log its duration."""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            seconds = time.monotonic() - started
+            with self._lock:
+                self._timings.append((name, seconds))
+            logging.info(f"Startup phase '{name}' took {seconds:.3f}s")
+
+    def start(self) -> None:
+        """Run the phases on a background thread (at most once)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self.run, name="warm-up", daemon=True
+            )
+        self._thread.start()
+
+    def run(self) -> bool:
+        """Run the phases on the calling thread.
+
+        Returns:
+            True if every phase succeeded.
+        """
+        self._state = STATE_LOADING
+        try:
+            for name, step in self._phases:
+                with self.phase(name):
+                    step()
+        except Exception as e:
+            logging.error(f"Startup failed: {e}")
+            with self._lock:
+                self._error = str(e)
+            self._state = STATE_FAILED
+        else:
+            self._ready_after = time.monotonic() - self._created
+            self._state = STATE_READY
+            logging.info(
+                f">>> All resources ready after {self._ready_after:.3f}s: "
+                + ", ".join(
+                    f"{name}={seconds:.3f}s" for name, seconds in self._timings
+                )
+                + " <<<"
+            )
+        finally:
+            self._done.set()
+        return self.ready
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the warm-up has finished.
+
+        Returns:
+            True if it finished successfully within ``timeout``.
+        """
+        self._done.wait(timeout)
+        return self.ready
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the state, per-phase seconds and time to readiness."""
+        with self._lock:
+            return {
+                "state": self._state,
+                "ready": self.ready,
+                "phases": {
+                    name: round(seconds, 3) for name, seconds in self._timings
+                },
+                "ready_after_seconds": (
+                    round(self._ready_after, 3)
+                    if self._ready_after is not None else None
+                ),
+                "uptime_seconds": round(time.monotonic() - self._created, 3),
+                "error": self._error
+            }